@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+向量化回測效能 (Backtest Benchmark)
+把 --years 年 x --symbols 檔的合成日線寫入暫存的 Parquet 資料集，量測 BacktestService.run：
+- load    ：read_panel 一次 Dataset 掃描讀出收盤價寬表
+- simulate：整段訊號序列 + 進出場模擬 + 績效摘要
+另外以 --sample-days 個日期估算「每天呼叫一次 compute_signals_batch」的逐日回放耗時作為對照。
+
+用法: python benchmarks/bench_backtest.py [--symbols 500] [--years 10] [--strategy trend_rsi]
+"""
+
+import sys
+import os
+import time
+import argparse
+import tempfile
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+from fakes import synthetic_ohlcv, stock_symbols
+from investment_bot.services.backtest import BacktestService, STRATEGIES
+from investment_bot.services.indicators import compute_signals_batch
+from investment_bot.utils.data_store import DataStore
+from investment_bot.utils.metrics import start_run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=500)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--strategy", default="trend_rsi", choices=STRATEGIES)
+    parser.add_argument("--sample-days", type=int, default=20, help="估算逐日回放耗時所取樣的日期數")
+    args = parser.parse_args()
+
+    bars = args.years * 252
+    with tempfile.TemporaryDirectory(prefix="investment_bot_bench_") as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "bench.db"), market_data_dir=os.path.join(tmp, "market_data"))
+        print(f"📦 寫入 {args.symbols} 檔 x {bars} 根合成日線...")
+        store.save_market_data_many({s: synthetic_ohlcv(s, bars=bars, end="2024-12-31")
+                                     for s in stock_symbols(args.symbols)}, "Stock")
+
+        metrics = start_run()
+        start = time.perf_counter()
+        result = BacktestService(store=store).run("Stock", strategy=args.strategy)
+        total = time.perf_counter() - start
+        load, simulate = (metrics.stages[name]["seconds"] for name in ("backtest.load", "backtest.simulate"))
+
+        panel = store.market_data.read_panel("Stock")
+        days = np.linspace(60, len(panel) - 1, args.sample_days).astype(int)
+        start = time.perf_counter()
+        for t in days:
+            compute_signals_batch(panel.iloc[:t + 1], "Stock")
+        replay = (time.perf_counter() - start) / len(days) * len(panel)
+        store.db.engine.dispose()
+
+    summary = result.summary
+    print(f"⏱️  回測 {args.symbols} 檔 x {bars} 根 ({args.strategy})")
+    print(f"  load     {load:8.3f}s")
+    print(f"  simulate {simulate:8.3f}s")
+    print(f"  total    {total:8.3f}s")
+    print(f"  逐日回放 (估算) {replay:8.1f}s  ({replay / total:.0f}x)")
+    print(f"  平均總報酬 {summary['total_return'].mean():+.2%}  買進持有 {summary['buy_hold_return'].mean():+.2%}  "
+          f"勝率 {summary['hit_rate'].mean():.1%}  最大回撤 {summary['max_drawdown'].mean():.1%}")
+
+
+if __name__ == "__main__":
+    main()
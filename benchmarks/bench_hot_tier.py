@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+K 線讀取效能比較：Parquet 冷層 vs Arrow IPC 熱層 (Hot Tier Benchmark)
+產生 N 檔假 K 線後，分別在獨立子行程中讀取全部標的 (L1 關閉)，比較：
+- 每次 load_market_data 的延遲 (p50 / p95)
+- 讀完所有標的並持有 DataFrame 時的 RSS (匿名記憶體 vs 檔案映射)
+熱層的數值欄位直接引用 mmap，RssAnon 應明顯較低 (頁面屬於 page cache，可跨行程共用)。
+
+用法: python benchmarks/bench_hot_tier.py [--symbols 1000] [--bars 1000]
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def read_rss_kb():
+    """從 /proc/self/status 讀取 RssAnon / RssFile (Linux)"""
+    rss = {}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(("RssAnon", "RssFile")):
+                    key, value = line.split(":")
+                    rss[key] = int(value.split()[0])
+    except OSError:
+        pass
+    return rss
+
+
+def make_store(root, hot_tier):
+    from investment_bot.utils.data_store import DataStore
+    return DataStore(db_path=os.path.join(root, "bench.db"), market_data_dir=os.path.join(root, "market_data"),
+                     hot_dir=os.path.join(root, "hot"), hot_tier=hot_tier)
+
+
+def prepare(root, n_symbols, bars):
+    rng = np.random.default_rng(0)
+    index = pd.bdate_range(end="2024-12-31", periods=bars, name="Date")
+    store = make_store(root, hot_tier=True)
+    for i in range(n_symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars)))
+        df = pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                           "Volume": rng.integers(1, 10**6, bars).astype(float)}, index=index)
+        store.save_market_data(df, f"S{i}", "Stock")
+    store.db.engine.dispose()
+
+
+def worker(root, mode, n_symbols):
+    """在子行程中讀取所有標的 (第一輪暖機 page cache，第二輪計時)"""
+    store = make_store(root, hot_tier=(mode == "hot"))
+    store.frame_cache.max_bytes = 0  # 關閉 L1，量測的是每次真正的讀取
+    symbols = [f"S{i}" for i in range(n_symbols)]
+
+    for symbol in symbols:
+        store.load_market_data(symbol, "Stock")
+
+    baseline = read_rss_kb()
+    frames, latencies = [], []
+    for symbol in symbols:
+        start = time.perf_counter()
+        frames.append(store.load_market_data(symbol, "Stock"))
+        latencies.append(time.perf_counter() - start)
+    # 實際觸碰數據，讓 mmap 頁面計入 RSS
+    checksum = float(sum(df["Close"].sum() for df in frames))
+    after = read_rss_kb()
+
+    print(json.dumps({
+        "mode": mode,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p95_ms": float(np.percentile(latencies, 95) * 1000),
+        "total_s": float(sum(latencies)),
+        "rss_anon_mb": (after.get("RssAnon", 0) - baseline.get("RssAnon", 0)) / 1024,
+        "rss_file_mb": (after.get("RssFile", 0) - baseline.get("RssFile", 0)) / 1024,
+        "checksum": checksum,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=1000)
+    parser.add_argument("--bars", type=int, default=1000)
+    parser.add_argument("--worker", choices=["parquet", "hot"])
+    parser.add_argument("--root")
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.root, args.worker, args.symbols)
+        return
+
+    with tempfile.TemporaryDirectory() as root:
+        print(f"📦 產生 {args.symbols} 檔 x {args.bars} 根 K 棒...")
+        prepare(root, args.symbols, args.bars)
+
+        results = {}
+        for mode in ("parquet", "hot"):
+            out = subprocess.run([sys.executable, __file__, "--worker", mode, "--root", root,
+                                  "--symbols", str(args.symbols)], capture_output=True, text=True, check=True)
+            results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'模式':<10}{'p50 (ms)':>10}{'p95 (ms)':>10}{'總計 (s)':>10}{'RssAnon MB':>12}{'RssFile MB':>12}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['total_s']:>10.2f}{r['rss_anon_mb']:>12.1f}{r['rss_file_mb']:>12.1f}")
+    assert results["parquet"]["checksum"] == results["hot"]["checksum"]
+    print(f"\n⚡ 熱層讀取加速 (p50): {results['parquet']['p50_ms'] / results['hot']['p50_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+CLI 啟動時間與 import 退化追蹤 (Import Time Benchmark)
+每個子指令在獨立子行程以 `python -X importtime` 載入它用到的模組，統計：
+- 總 import 耗時 (扣除直譯器啟動時就載入的 site / encodings 等)
+- 各最上層套件的 self 耗時 (找出是誰把啟動拖慢)
+- 不該被載入的重量級套件 (例如 cache stats 載入了 pandas / SQLAlchemy 即視為失敗)
+另以合成資料集實際執行 `python -m investment_bot cache stats`，量測端到端 wall time 是否低於目標 (預設 300 ms)。
+結果格式與 suite.py 相同 (只有 seconds)，可與基準檔比較，超過門檻即以非零代碼結束。
+
+用法:
+    python benchmarks/bench_import_time.py                      # 與 import_baseline.json 比較
+    python benchmarks/bench_import_time.py --update-baseline
+    python benchmarks/bench_import_time.py --commands cache_stats,report --repeat 10
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from suite import compare, write_json, DEFAULT_THRESHOLD
+
+DEFAULT_BASELINE = os.path.join(current_dir, "import_baseline.json")
+DEFAULT_OUTPUT = os.path.join(current_dir, "results", "import_time.json")
+DEFAULT_TARGET = 0.3
+
+HEAVY = ("pandas", "numpy", "pyarrow", "sqlalchemy", "yfinance", "ccxt", "ta", "googleapiclient")
+# 子指令 -> (載入的模組, 不該被載入的最上層套件)
+COMMANDS = {
+    "cache_stats": (["investment_bot.cli", "investment_bot.utils.cache_stats"], HEAVY),
+    "report": (["investment_bot.main"], HEAVY),
+    "fetch": (["investment_bot.services.market_data"], ("yfinance", "ccxt", "ta", "googleapiclient")),
+    "screen": (["investment_bot.services.screener"], ("yfinance", "ccxt", "ta", "googleapiclient")),
+    "backtest": (["investment_bot.services.backtest"], ("yfinance", "ccxt", "ta", "googleapiclient")),
+}
+
+
+def parse_importtime(stderr, skip=()):
+    """
+    解析 -X importtime 的輸出 (子模組先於上層模組印出，最上層模組沒有縮排)
+    :param skip: 略過的最上層模組 (連同其子模組)，例如直譯器啟動時就載入的模組
+    :return: (總耗時秒數, {最上層套件: self 耗時秒數}, 載入的模組名稱 set)
+    """
+    total, packages, modules, pending = 0, {}, set(), []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if not line.startswith("import time:") or len(parts) != 3:
+            continue
+        self_us = parts[0].split(":")[1].strip()
+        if not self_us.isdigit():
+            continue  # 表頭
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        pending.append((name.strip(), int(self_us)))
+        if depth > 0:
+            continue
+        if name.strip() not in skip:
+            total += int(parts[1])
+            for module, us in pending:
+                modules.add(module)
+                package = module.split(".")[0]
+                packages[package] = packages.get(package, 0) + us / 1e6
+        pending = []
+    return total / 1e6, packages, modules
+
+
+def _run(args, **kwargs):
+    return subprocess.run([sys.executable, *args], cwd=project_root, capture_output=True, text=True,
+                          check=True, **kwargs)
+
+
+def startup_modules():
+    """直譯器啟動時就載入的最上層模組"""
+    return parse_importtime(_run(["-X", "importtime", "-c", "pass"]).stderr)[2]
+
+
+def measure_imports(modules, repeat, skip):
+    """:return: 最快一次的 (總耗時, 各套件 self 耗時, 載入的模組)"""
+    code = "; ".join(f"import {module}" for module in modules)
+    runs = [parse_importtime(_run(["-X", "importtime", "-c", code]).stderr, skip) for _ in range(repeat)]
+    return min(runs, key=lambda run: run[0])
+
+
+def measure_wall(args, repeat, env=None):
+    """子行程端到端 wall time (含直譯器啟動)，取最快一次"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _run(args, env=env)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def build_cache_fixture(root, symbols):
+    """以合成 K 線建立資料庫與 Parquet 資料集，讓 cache stats 有實際內容可掃描"""
+    from fakes import synthetic_ohlcv, stock_symbols
+    from investment_bot.utils.data_store import DataStore
+
+    store = DataStore(db_path=os.path.join(root, "bench.db"), market_data_dir=os.path.join(root, "market_data"))
+    try:
+        store.save_market_data_many({s: synthetic_ohlcv(s) for s in stock_symbols(symbols)}, "Stock")
+    finally:
+        store.db.engine.dispose()
+    return ["--db", os.path.join(root, "bench.db"), "--market-data-dir", os.path.join(root, "market_data"),
+            "--hot-dir", os.path.join(root, "market_data_hot")]
+
+
+def run_benchmark(commands=None, repeat=5, symbols=200, log=print):
+    commands = commands or list(COMMANDS)
+    skip = startup_modules()
+    results, violations = {}, []
+    for command in commands:
+        modules, forbidden = COMMANDS[command]
+        seconds, packages, loaded = measure_imports(modules, repeat, skip)
+        results[f"import.{command}"] = {"seconds": round(seconds, 6), "peak_mb": None}
+        leaked = sorted(p for p in forbidden if p in loaded)
+        violations.extend((command, package) for package in leaked)
+        top = ", ".join(f"{name} {us * 1000:.0f}ms" for name, us in
+                        sorted(packages.items(), key=lambda item: -item[1])[:4])
+        log(f"  {command:<12}{seconds * 1000:>9.1f} ms   {top}" + (f"   ❌ 載入了 {', '.join(leaked)}" if leaked else ""))
+
+    results["wall.python_startup"] = {"seconds": round(measure_wall(["-c", "pass"], repeat), 6), "peak_mb": None}
+    with tempfile.TemporaryDirectory() as tmp:
+        with contextlib.redirect_stdout(io.StringIO()):
+            paths = build_cache_fixture(tmp, symbols)
+        wall = measure_wall(["-m", "investment_bot", "cache", "stats", *paths], repeat)
+    results["wall.cache_stats"] = {"seconds": round(wall, 6), "peak_mb": None}
+    log(f"  {'python -c pass':<26}{results['wall.python_startup']['seconds'] * 1000:>9.1f} ms")
+    log(f"  {'cache stats (wall)':<26}{wall * 1000:>9.1f} ms")
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+            "symbols": symbols,
+        },
+        "results": results,
+    }, violations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--commands", default=",".join(COMMANDS), help="要量測的子指令，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=5, help="量測次數 (取最快)")
+    parser.add_argument("--symbols", type=int, default=200, help="cache stats 掃描的合成標的數")
+    parser.add_argument("--target", type=float, default=DEFAULT_TARGET, help="cache stats 的 wall time 目標 (秒)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="結果 JSON 路徑")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基準 JSON 路徑")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允許的退化比例 (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="以本次結果覆寫基準檔")
+    args = parser.parse_args(argv)
+
+    commands = [command for command in args.commands.split(",") if command]
+    unknown = set(commands) - set(COMMANDS)
+    if unknown:
+        parser.error(f"未知的子指令: {sorted(unknown)}")
+
+    print(f"⏱️  import 時間 (repeat={args.repeat})")
+    current, violations = run_benchmark(commands, args.repeat, args.symbols)
+    write_json(args.output, current)
+    print(f"📝 結果已寫入 {args.output}")
+
+    failed = False
+    for command, package in violations:
+        print(f"❌ {command} 不該載入 {package}")
+        failed = True
+    wall = current["results"]["wall.cache_stats"]["seconds"]
+    if wall > args.target:
+        print(f"❌ cache stats {wall * 1000:.0f} ms 超過目標 {args.target * 1000:.0f} ms")
+        failed = True
+
+    if args.update_baseline:
+        write_json(args.baseline, current)
+        print(f"📌 基準已更新 {args.baseline}")
+        return int(failed)
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ 找不到基準檔，略過退化檢查 (以 --update-baseline 建立)")
+        return int(failed)
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"❌ {len(regressions)} 項超過 {args.threshold:.0%} 的退化:")
+        for key, metric, base, value, ratio in regressions:
+            print(f"   {key:<24}{metric:<9}{base:>12.4f} -> {value:<12.4f}({ratio:.2f}x)")
+        failed = True
+    elif not failed:
+        print(f"✅ 沒有超過 {args.threshold:.0%} 的退化")
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
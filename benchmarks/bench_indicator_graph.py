@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+指標計算效能比較 (Indicator Graph Benchmark)
+比較 ta 套件逐一建立指標物件 (compute_signals_ta) 與記憶化相依圖 (compute_signals)
+對單一標的的計算時間，並列出相依圖實際計算的節點數。
+
+用法: python benchmarks/bench_indicator_graph.py [--symbols 200] [--bars 300] [--repeat 3]
+"""
+
+import sys
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from investment_bot.services.indicators import IndicatorGraph
+from investment_bot.services import indicators
+from investment_bot.services.tech_analysis import compute_signals, compute_signals_ta
+
+
+def make_frames(n_symbols, bars, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2020-01-01", periods=bars, freq="D")
+    return {
+        f"S{i}": pd.DataFrame({"Close": 50 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))}, index=index)
+        for i in range(n_symbols)
+    }
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def count_nodes(df, asset_type):
+    """記錄一次 compute_signals 實際計算的節點 (依種類)"""
+    graphs = []
+    original = indicators.IndicatorGraph
+    indicators.IndicatorGraph = lambda close: graphs.append(IndicatorGraph(close)) or graphs[-1]
+    try:
+        compute_signals(df, asset_type)
+    finally:
+        indicators.IndicatorGraph = original
+    return dict(graphs[-1].evaluations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=300)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = make_frames(args.symbols, args.bars)
+    print(f"📊 {args.symbols} 檔 x {args.bars} 根 K 棒 (best of {args.repeat})")
+
+    for asset_type in ("Stock", "Crypto"):
+        ta_time = best_of(lambda: [compute_signals_ta(df, asset_type) for df in frames.values()], args.repeat)
+        graph_time = best_of(lambda: [compute_signals(df, asset_type) for df in frames.values()], args.repeat)
+        print(f"\n[{asset_type}]")
+        print(f"  ta 逐一計算 : {ta_time * 1000:8.1f} ms ({ta_time / args.symbols * 1e6:7.0f} µs/檔)")
+        print(f"  相依圖     : {graph_time * 1000:8.1f} ms ({graph_time / args.symbols * 1e6:7.0f} µs/檔)")
+        print(f"  加速       : {ta_time / graph_time:8.2f}x")
+        print(f"  計算節點   : {count_nodes(next(iter(frames.values())), asset_type)}")
+
+
+if __name__ == "__main__":
+    main()
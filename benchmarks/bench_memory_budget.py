@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+大量標的的記憶體峰值比較 (Peak RSS Benchmark)
+以離線的假市場數據服務跑 analyze_holdings_concurrent，比較三種設定的峰值 RSS：
+- default：float64 + DatetimeIndex，整個資產類別一次抓完再分析
+- compact：COMPACT_FRAMES=true (float32 OHLCV、int64 epoch index)
+- budget ：compact + PIPELINE_MEMORY_BUDGET_MB (分批抓取，超過預算的 K 線溢出到磁碟)
+每種設定在獨立子行程中執行 (環境變數需在載入 Config 前設定)，以 ru_maxrss 的增量計算峰值。
+
+用法: python benchmarks/bench_memory_budget.py [--symbols 2000] [--bars 1500] [--budget-mb 16]
+"""
+
+import sys
+import os
+import io
+import json
+import contextlib
+import time
+import argparse
+import resource
+import subprocess
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+MODES = {
+    "default": {"COMPACT_FRAMES": "false", "PIPELINE_MEMORY_BUDGET_MB": "0"},
+    "compact": {"COMPACT_FRAMES": "true", "PIPELINE_MEMORY_BUDGET_MB": "0"},
+    "budget": {"COMPACT_FRAMES": "true"},
+}
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的單位是 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class FakeMarketService:
+    """離線產生 K 線，經過 MarketDataService 相同的精簡處理"""
+    def __init__(self, bars):
+        self.bars = bars
+        self.index = pd.bdate_range(end="2024-12-31", periods=bars, name="Date")
+
+    def _frame(self, symbol):
+        from investment_bot.services.market_data import MarketDataService
+        rng = np.random.default_rng(int(symbol[1:]))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, self.bars)))
+        df = pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                           "Volume": rng.integers(1, 10**6, self.bars).astype(float)}, index=self.index)
+        return MarketDataService._compact(df)
+
+    def get_historical_data(self, symbol, asset_type, days=200):
+        return self._frame(symbol)
+
+    def get_historical_data_many(self, symbols, asset_type='Stock', days=200):
+        return {symbol: self._frame(symbol) for symbol in symbols}
+
+
+def worker(n_symbols, bars):
+    from investment_bot.main import analyze_holdings_concurrent
+
+    holdings = [(f"S{i}", "Stock", 1.0, 10.0) for i in range(n_symbols)]
+    market = FakeMarketService(bars)
+    # 暖機：載入指標模組等一次性的記憶體不列入比較
+    analyze_holdings_concurrent(holdings[:2], market, fetch_workers=1, ta_workers=0, timeout=600)
+
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        outcomes = analyze_holdings_concurrent(holdings, market, fetch_workers=2, ta_workers=0, timeout=600)
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({
+        "peak_rss_delta_mb": peak_rss_mb() - baseline,
+        "seconds": elapsed,
+        "analyzed": sum(1 for analysis, _ in outcomes.values() if analysis),
+        "checksum": round(sum(analysis["current_price"] for analysis, _ in outcomes.values() if analysis), 2),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--bars", type=int, default=1500)
+    parser.add_argument("--budget-mb", type=int, default=16)
+    parser.add_argument("--worker", action="store_true")
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.symbols, args.bars)
+        return
+
+    print(f"📦 {args.symbols} 檔 x {args.bars} 根 K 棒 (逐檔 float64 約 {args.symbols * args.bars * 48 / 1024**2:.0f} MB)")
+    results = {}
+    for mode, env in MODES.items():
+        env = {**os.environ, "PIPELINE_MEMORY_BUDGET_MB": str(args.budget_mb), **env}
+        out = subprocess.run([sys.executable, __file__, "--worker", "--symbols", str(args.symbols), "--bars", str(args.bars)],
+                             env=env, capture_output=True, text=True, check=True)
+        results[mode] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"\n{'模式':<10}{'峰值 RSS 增量 (MB)':>20}{'耗時 (s)':>10}{'成功':>8}")
+    for mode, r in results.items():
+        print(f"{mode:<10}{r['peak_rss_delta_mb']:>20.1f}{r['seconds']:>10.2f}{r['analyzed']:>8}")
+    base = results["default"]["peak_rss_delta_mb"]
+    for mode in ("compact", "budget"):
+        print(f"📉 {mode}: 峰值 RSS 減少 {100 * (1 - results[mode]['peak_rss_delta_mb'] / base):.0f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+持倉表解析效能比較 (Sheet Parsing Benchmark)
+以數萬列的合成表格 (美股 Sheet + 十分之一列數的加密貨幣 Sheet) 比較兩種標準化寫法：
+- rowwise   ：逐格 apply(pd.to_numeric)、axis=1 計算 ReturnRate、逐列判斷 Type、to_dict('records') 合併
+- vectorized：GoogleSheetService._parse_sheet + _merge_frames (單一 pd.to_numeric、np.where、isin、pd.concat)
+兩者輸出先比對一致再計時，耗時取 --repeat 次中最快的一次。
+
+用法: python benchmarks/bench_sheet_parse.py [--rows 10000,50000,100000] [--repeat 5]
+"""
+
+import sys
+import os
+import io
+import time
+import argparse
+import contextlib
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import sheet_values, stock_symbols
+from investment_bot.config import Config
+from investment_bot.services.google_sheet import GoogleSheetService, NUMERIC_COLUMNS
+
+CRYPTO_HEADER = ["token", "總數量", "每顆成本", "目前價格", "損益"]
+
+
+def crypto_values(rows):
+    """加密貨幣 Sheet：沒有獲益率欄位 (需計算 ReturnRate)，部分成本為 0"""
+    rng = np.random.default_rng(rows)
+    tokens = list(Config.CRYPTO_MAPPING) + ["DOGE", "PEPE"]
+    values = [CRYPTO_HEADER]
+    for i in range(rows):
+        cost = 0.0 if i % 50 == 0 else float(rng.uniform(0.1, 60000))
+        price = cost * float(rng.uniform(0.5, 2.0))
+        qty = float(rng.uniform(0.01, 10))
+        values.append([tokens[i % len(tokens)], f"{qty:.4f}", f"${cost:,.2f}", f"${price:,.2f}",
+                       f"${qty * (price - cost):,.2f}"])
+    return values
+
+
+def rowwise_parse(values):
+    """改寫前的逐列標準化 (作為比較基準，欄位對映與清洗與 _parse_sheet 相同)"""
+    df = pd.DataFrame(values[1:], columns=values[0])
+    key = 'stock' if 'stock' in df.columns else 'token'
+    df = df.dropna(subset=[key])
+    df = df[df[key] != '']
+    df = df.rename(columns={'stock': 'Symbol', 'token': 'Symbol', '總數量': 'Qty', '每股成本': 'Cost',
+                            '每顆成本': 'Cost', '目前價格': 'MarketPrice', '目前價值': 'MarketValue',
+                            '損益': 'UnrealizedPL', '獲益率': 'ReturnRate'})
+    for col in NUMERIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col].astype(str).str.replace(r'[$,]', '', regex=True),
+                                    errors='coerce').fillna(0)
+    if 'ReturnRate' in df.columns:
+        df['ReturnRate'] = df['ReturnRate'].astype(str).str.replace('%', '').apply(
+            lambda x: pd.to_numeric(x, errors='coerce') / 100 if x.strip() != '' else 0
+        ).fillna(0)
+    else:
+        df['ReturnRate'] = df.apply(
+            lambda row: (row['MarketPrice'] - row['Cost']) / row['Cost'] if row['Cost'] != 0 else 0, axis=1)
+    crypto_keys = set(Config.CRYPTO_MAPPING.keys())
+    df['Type'] = df['Symbol'].apply(lambda s: 'Crypto' if str(s).upper().strip() in crypto_keys else 'Stock')
+    return df
+
+
+def rowwise(stock, crypto):
+    stock_df, crypto_df = rowwise_parse(stock), rowwise_parse(crypto)
+    for col in set(stock_df.columns) | set(crypto_df.columns):
+        for frame in (stock_df, crypto_df):
+            if col not in frame.columns:
+                frame[col] = 0 if col in NUMERIC_COLUMNS + ['ReturnRate'] else ''
+    return pd.DataFrame(stock_df.to_dict('records') + crypto_df.to_dict('records'))
+
+
+def vectorized(stock, crypto):
+    with contextlib.redirect_stdout(io.StringIO()):
+        frames = [GoogleSheetService._parse_sheet(None, stock, "美股"),
+                  GoogleSheetService._parse_sheet(None, crypto, "加密貨幣")]
+    return GoogleSheetService._merge_frames(frames)
+
+
+def best_of(fn, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10000,50000,100000", help="美股 Sheet 列數，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"⏱️  持倉表解析 (repeat={args.repeat}，加密貨幣 Sheet 為美股列數的 1/10)")
+    print(f"  {'rows':>8}{'rowwise':>12}{'vectorized':>13}{'speedup':>10}")
+    for rows in [int(r) for r in args.rows.split(",") if r]:
+        stock, crypto = sheet_values(stock_symbols(rows)), crypto_values(rows // 10)
+
+        expected, actual = rowwise(stock, crypto), vectorized(stock, crypto)
+        pd.testing.assert_frame_equal(expected[actual.columns], actual, check_dtype=False)
+
+        slow = best_of(rowwise, args.repeat, stock, crypto)
+        fast = best_of(vectorized, args.repeat, stock, crypto)
+        print(f"  {rows + rows // 10:>8}{slow * 1000:>10.1f}ms{fast * 1000:>11.1f}ms{slow / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
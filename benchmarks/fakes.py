@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+離線測試替身 (Offline Fakes for Benchmarks)
+以確定性的合成數據取代 yfinance / ccxt / Google Sheets / Fear & Greed API，
+讓效能測試不需要網路、每次執行的輸入完全相同。
+- synthetic_ohlcv：依標的名稱決定亂數種子，產生到今天為止的日線
+- FakeYFinance / FakeExchange / FakeAsyncExchange：與被替換的 API 相同的呼叫介面
+- FakeSheetsAPI + sheet_values：Sheets v4 values().get() / batchGet() 回傳的原始字串表格
+- offline_environment：暫時替換 market_data / google_sheet / crypto_async 模組中的外部依賴
+"""
+
+import contextlib
+import zlib
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+BARS = 300
+CRYPTO_SYMBOLS = ["BTC", "ETH", "SOL", "BNB", "WLD"]
+
+
+def synthetic_ohlcv(symbol, bars=BARS, end=None):
+    """產生確定性的日線 K 線 (同一個 symbol 每次結果相同)"""
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    end = pd.Timestamp(end or datetime.now()).normalize()
+    index = pd.date_range(end=end, periods=bars, freq="D", name="Date")
+    close = 50 * np.exp(np.cumsum(rng.normal(0, 0.02, bars)))
+    spread = np.abs(rng.normal(0, 0.01, bars))
+    return pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.005, bars)),
+        "High": close * (1 + spread),
+        "Low": close * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(1_000, 1_000_000, bars).astype(float),
+    }, index=index)
+
+
+def stock_symbols(n):
+    return [f"S{i:05d}" for i in range(n)]
+
+
+def holding_symbols(n):
+    """n 檔持倉：前幾檔為 Config.CRYPTO_MAPPING 中的加密貨幣，其餘為美股"""
+    crypto = CRYPTO_SYMBOLS[:max(1, n // 10)] if n > 1 else []
+    return crypto + stock_symbols(n - len(crypto))
+
+
+class FakeYFinance:
+    """取代 yfinance 模組：download() 依 start 裁切合成 K 線，多檔時回傳 (Ticker, Price) MultiIndex 面板"""
+    def __init__(self, bars=BARS):
+        self.bars = bars
+        self.calls = 0
+
+    def download(self, tickers, start=None, **kwargs):
+        self.calls += 1
+        single = isinstance(tickers, str)
+        tickers = [tickers] if single else list(tickers)
+        frames = {}
+        for ticker in tickers:
+            df = synthetic_ohlcv(ticker, self.bars)
+            frames[ticker] = df[df.index >= pd.Timestamp(start)] if start is not None else df
+        if single:
+            return frames[tickers[0]]
+        return pd.concat(frames, axis=1)
+
+
+class FakeExchange:
+    """取代 ccxt.binance()：fetch_ohlcv 回傳 [[ts_ms, o, h, l, c, v], ...]"""
+    def __init__(self, *args, **kwargs):
+        self.calls = 0
+
+    def fetch_ohlcv(self, pair, timeframe='1d', since=None, limit=None):
+        self.calls += 1
+        df = synthetic_ohlcv(pair.split('/')[0], max(limit or BARS, 1))
+        if since is not None:
+            df = df[df.index.asi8 // 10**6 >= since]
+        ts = (df.index.asi8 // 10**6).reshape(-1, 1)
+        return np.hstack([ts, df.to_numpy()]).tolist()
+
+    def load_markets(self):
+        """交易對清單：CRYPTO_SYMBOLS 的 USDT 現貨 + 一個非 USDT 現貨、一個合約、一個已下架交易對"""
+        markets = {f"{base}/USDT": {"base": base, "quote": "USDT", "spot": True, "active": True}
+                   for base in CRYPTO_SYMBOLS}
+        markets["ETH/BTC"] = {"base": "ETH", "quote": "BTC", "spot": True, "active": True}
+        markets["BTC/USDT:USDT"] = {"base": "BTC", "quote": "USDT", "spot": False, "active": True}
+        markets["LUNA/USDT"] = {"base": "LUNA", "quote": "USDT", "spot": True, "active": False}
+        return markets
+
+
+class FakeAsyncExchange(FakeExchange):
+    async def fetch_ohlcv(self, pair, timeframe='1d', since=None, limit=None):
+        return FakeExchange.fetch_ohlcv(self, pair, timeframe, since, limit)
+
+    async def close(self):
+        pass
+
+
+def sheet_values(symbols):
+    """Sheets API 回傳的原始表格 (第一列為表頭，數值為帶 $ , % 的字串)"""
+    rng = np.random.default_rng(len(symbols))
+    header = ["stock", "總數量", "每股成本", "目前價格", "目前價值", "損益", "獲益率"]
+    rows = [header]
+    for symbol in symbols:
+        qty = float(rng.integers(1, 500))
+        cost = float(rng.uniform(5, 500))
+        price = cost * float(rng.uniform(0.5, 2.0))
+        rows.append([
+            symbol, f"{qty:,.0f}", f"${cost:,.2f}", f"${price:,.2f}", f"${qty * price:,.2f}",
+            f"${qty * (price - cost):,.2f}", f"{(price / cost - 1) * 100:.1f}%",
+        ])
+    return rows
+
+
+class _Request:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def execute(self):
+        return self.payload
+
+
+class FakeSheetsAPI:
+    """
+    取代 googleapiclient 建立的 Sheets 服務 (stub discovery client)：
+    spreadsheets().values().get / batchGet 與 spreadsheets().get (頁簽清單)
+    :param values_by_sheet: {sheet_id: 原始表格}，同一個 spreadsheet 的任何 range 都回傳同一份表格
+    :param tabs: {sheet_id: [頁簽名稱]}，提供時 range 的頁簽不在清單中會拋出錯誤 (模擬 Range 錯誤)
+    calls 依序記錄 (method, spreadsheetId, ranges)
+    """
+    def __init__(self, values_by_sheet, tabs=None):
+        self.values_by_sheet = values_by_sheet
+        self.tabs = tabs or {}
+        self.calls = []
+
+    def spreadsheets(self):
+        return _FakeSpreadsheets(self)
+
+    def _values(self, spreadsheet_id, range_name):
+        tabs = self.tabs.get(spreadsheet_id)
+        if tabs is not None and range_name.rsplit('!', 1)[0].strip("'") not in tabs:
+            raise ValueError(f"Unable to parse range: {range_name}")
+        return self.values_by_sheet.get(spreadsheet_id, [])
+
+
+class _FakeSpreadsheets:
+    def __init__(self, api):
+        self.api = api
+
+    def values(self):
+        return _FakeValues(self.api)
+
+    def get(self, spreadsheetId, fields=None):
+        self.api.calls.append(("get", spreadsheetId, None))
+        titles = self.api.tabs.get(spreadsheetId, ["總損益"])
+        return _Request({"sheets": [{"properties": {"title": title}} for title in titles]})
+
+
+class _FakeValues:
+    def __init__(self, api):
+        self.api = api
+
+    def get(self, spreadsheetId, range=None):
+        self.api.calls.append(("values.get", spreadsheetId, [range]))
+        return _LazyRequest(lambda: {"range": range, "values": self.api._values(spreadsheetId, range)})
+
+    def batchGet(self, spreadsheetId, ranges=None):
+        ranges = list(ranges or [])
+        self.api.calls.append(("values.batchGet", spreadsheetId, ranges))
+        return _LazyRequest(lambda: {"valueRanges": [
+            {"range": range_name, "values": self.api._values(spreadsheetId, range_name)} for range_name in ranges
+        ]})
+
+
+class _LazyRequest:
+    """與 googleapiclient 相同，錯誤在 execute() 時才拋出"""
+    def __init__(self, build):
+        self.build = build
+
+    def execute(self):
+        return self.build()
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeRequests:
+    """取代 requests：Fear & Greed API 固定回傳 50 (Neutral)"""
+    @staticmethod
+    def get(url, timeout=None, **kwargs):
+        return FakeResponse({"data": [{"value": "50", "value_classification": "Neutral"}]})
+
+
+@contextlib.contextmanager
+def _patched(target, name, value):
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+@contextlib.contextmanager
+def offline_environment(holdings, credentials_file, bars=BARS):
+    """
+    在 with 區塊內以假物件取代所有外部 API
+    :param holdings: 持倉代號清單 (寫入假的美股 Sheet)
+    :param credentials_file: 存在的檔案路徑 (GoogleSheetService 只檢查檔案是否存在)
+    """
+    from investment_bot.config import Config
+    from investment_bot.services import market_data, google_sheet, crypto_async
+
+    sheets = FakeSheetsAPI({"bench-sheet": sheet_values(holdings)})
+    with contextlib.ExitStack() as stack:
+        for target, name, value in [
+            (market_data, "yf", FakeYFinance(bars)),
+            (market_data.ccxt, "binance", FakeExchange),
+            (market_data, "requests", FakeRequests),
+            (crypto_async.AsyncCryptoDataService, "_default_exchange", staticmethod(FakeAsyncExchange)),
+            (google_sheet.GoogleSheetService, "_authenticate", lambda self: sheets),
+            (Config, "GOOGLE_CREDENTIALS_FILE", credentials_file),
+            (Config, "GOOGLE_SHEET_ID_STOCK", "bench-sheet"),
+            (Config, "GOOGLE_SHEET_ID_CRYPTO", None),
+            # 指標在主行程內計算，避免 Process Pool 啟動時間干擾量測
+            (Config, "PIPELINE_TA_WORKERS", 0),
+        ]:
+            stack.enter_context(_patched(target, name, value))
+        yield sheets
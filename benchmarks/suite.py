@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+離線效能測試套件 (Offline Benchmark Suite)
+以 fakes.py 的合成數據量測每個流程階段在不同持倉規模下的耗時與記憶體峰值：
+- sheet_parse     : GoogleSheetService._fetch_single_sheet 解析原始表格
+- datastore_write : DataStore.save_market_data_many 寫入 K 線
+- datastore_read  : DataStore.load_market_data 冷讀取 (L1 已清空)
+- ta_analyze      : TechnicalAnalysisService.analyze (含指標狀態與訊號快取寫入)
+- snapshot        : DataStore.save_portfolio_snapshot
+- main_e2e        : main.main() 完整流程 (所有外部 API 皆為假物件)
+耗時取 --repeat 次中最快的一次；記憶體峰值另外以 tracemalloc 跑一次量測 (--no-memory 可略過)。
+結果寫成 JSON，並可與基準檔比較，超過門檻即以非零代碼結束。
+
+用法:
+    python benchmarks/suite.py                                  # 10 / 1000 / 10000 檔
+    python benchmarks/suite.py --sizes 10,1000 --stages ta_analyze,snapshot
+    python benchmarks/suite.py --update-baseline                # 以本次結果覆寫基準檔
+"""
+
+import sys
+import os
+import io
+import gc
+import json
+import time
+import argparse
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, current_dir):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import numpy as np
+import pandas as pd
+from fakes import (
+    BARS, synthetic_ohlcv, stock_symbols, holding_symbols, sheet_values, FakeSheetsAPI, offline_environment
+)
+
+DEFAULT_SIZES = [10, 1000, 10000]
+DEFAULT_BASELINE = os.path.join(current_dir, "baseline.json")
+DEFAULT_OUTPUT = os.path.join(current_dir, "results", "latest.json")
+DEFAULT_THRESHOLD = 0.25
+# 基準耗時低於此值的項目不做耗時比較 (計時雜訊大於實際差異)
+MIN_COMPARE_SECONDS = 0.01
+MIN_COMPARE_MB = 1.0
+
+
+class Workspace:
+    """每次量測使用獨立的暫存目錄與 DataStore，互不影響"""
+    def __init__(self):
+        from investment_bot.utils.data_store import DataStore
+
+        self._tmp = tempfile.TemporaryDirectory(prefix="investment_bot_bench_")
+        self.root = self._tmp.name
+        self.store = DataStore(db_path=os.path.join(self.root, "bench.db"),
+                               market_data_dir=os.path.join(self.root, "market_data"))
+        self.credentials = os.path.join(self.root, "credentials.json")
+        with open(self.credentials, "w") as f:
+            f.write("{}")
+
+    def close(self):
+        self.store.db.engine.dispose()
+        self._tmp.cleanup()
+
+
+def _frames(size):
+    return {symbol: synthetic_ohlcv(symbol) for symbol in stock_symbols(size)}
+
+
+# --- 各階段：setup(ws, size) 準備輸入 (不計時)，回傳 run() ---
+
+def stage_sheet_parse(ws, size):
+    from investment_bot.services.google_sheet import GoogleSheetService
+
+    service = GoogleSheetService(store=ws.store)
+    service.service = FakeSheetsAPI({"bench-sheet": sheet_values(holding_symbols(size))})
+    return lambda: service._fetch_single_sheet("bench-sheet", "總損益!A:Z", "bench")
+
+
+def stage_datastore_write(ws, size):
+    frames = _frames(size)
+    return lambda: ws.store.save_market_data_many(frames, "Stock")
+
+
+def stage_datastore_read(ws, size):
+    frames = _frames(size)
+    ws.store.save_market_data_many(frames, "Stock")
+    ws.store.frame_cache.clear()
+    return lambda: [ws.store.load_market_data(symbol, "Stock") for symbol in frames]
+
+
+def stage_ta_analyze(ws, size):
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService
+
+    frames = _frames(size)
+    service = TechnicalAnalysisService(store=ws.store)
+    return lambda: [service.analyze(df, "Stock", symbol=symbol) for symbol, df in frames.items()]
+
+
+def stage_snapshot(ws, size):
+    from investment_bot.services.google_sheet import GoogleSheetService
+
+    service = GoogleSheetService(store=ws.store)
+    service.service = FakeSheetsAPI({"bench-sheet": sheet_values(holding_symbols(size))})
+    portfolio = service._fetch_single_sheet("bench-sheet", "總損益!A:Z", "bench")
+    today = datetime.now().strftime('%Y-%m-%d')
+    return lambda: ws.store.save_portfolio_snapshot(portfolio, today)
+
+
+def stage_main_e2e(ws, size):
+    from investment_bot import main as main_module
+    from investment_bot.utils import data_store
+
+    def run():
+        with offline_environment(holding_symbols(size), ws.credentials), \
+                contextlib.ExitStack() as stack:
+            original = data_store.get_data_store
+            data_store.get_data_store = lambda: ws.store
+            stack.callback(setattr, data_store, "get_data_store", original)
+            main_module.main()
+    return run
+
+
+STAGES = {
+    "sheet_parse": stage_sheet_parse,
+    "datastore_write": stage_datastore_write,
+    "datastore_read": stage_datastore_read,
+    "ta_analyze": stage_ta_analyze,
+    "snapshot": stage_snapshot,
+    "main_e2e": stage_main_e2e,
+}
+
+
+def measure(stage, size, repeat, memory=True):
+    """
+    量測單一階段
+    :param memory: 是否另外在 tracemalloc 下執行一次量測記憶體峰值
+    :return: {"seconds": 最快一次的耗時, "peak_mb": tracemalloc 記錄的 Python/NumPy 配置峰值 (或 None)}
+    """
+    timings, peak = [], None
+    for _ in range(repeat + int(memory)):
+        ws = Workspace()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                run = STAGES[stage](ws, size)
+                gc.collect()
+                if len(timings) < repeat:
+                    start = time.perf_counter()
+                    run()
+                    timings.append(time.perf_counter() - start)
+                else:
+                    # 最後一次在 tracemalloc 下執行 (會拖慢速度，不列入耗時)
+                    tracemalloc.start()
+                    try:
+                        run()
+                        _, peak = tracemalloc.get_traced_memory()
+                    finally:
+                        tracemalloc.stop()
+        finally:
+            ws.close()
+    return {"seconds": round(min(timings), 6), "peak_mb": round(peak / 1024 ** 2, 3) if memory else None}
+
+
+def run_suite(sizes=None, stages=None, repeat=3, memory=True, log=print):
+    sizes = sizes or DEFAULT_SIZES
+    stages = stages or list(STAGES)
+    results = {}
+    for size in sizes:
+        for stage in stages:
+            result = measure(stage, size, repeat, memory)
+            results[f"{stage}@{size}"] = result
+            peak = f"{result['peak_mb']:>12.2f} MB" if memory else f"{'-':>15}"
+            log(f"  {stage:<16}{size:>7}{result['seconds']:>12.4f}s{peak}")
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "bars": BARS,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    與基準比較，耗時或記憶體峰值超過 (1 + threshold) 倍即視為退化
+    只比較兩邊都有的項目；太小的數值不比較 (雜訊)
+    :return: [(key, metric, baseline, current, ratio), ...]
+    """
+    regressions = []
+    for key, result in current["results"].items():
+        base = baseline.get("results", {}).get(key)
+        if base is None:
+            continue
+        for metric, floor in (("seconds", MIN_COMPARE_SECONDS), ("peak_mb", MIN_COMPARE_MB)):
+            if result.get(metric) is None or (base.get(metric) or 0) < floor:
+                continue
+            ratio = result[metric] / base[metric]
+            if ratio > 1 + threshold:
+                regressions.append((key, metric, base[metric], result[metric], ratio))
+    return regressions
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False, sort_keys=True)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="持倉規模，逗號分隔")
+    parser.add_argument("--stages", default=",".join(STAGES), help="要量測的階段，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=3, help="耗時量測次數 (取最快)")
+    parser.add_argument("--no-memory", action="store_true", help="略過 tracemalloc 記憶體量測 (tracemalloc 會讓執行時間變成數倍)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="結果 JSON 路徑")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="基準 JSON 路徑")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="允許的退化比例 (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="以本次結果覆寫基準檔")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    stages = [stage for stage in args.stages.split(",") if stage]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"未知的階段: {sorted(unknown)}")
+
+    print(f"⏱️  離線效能測試 (sizes={sizes}, repeat={args.repeat})")
+    print(f"  {'stage':<16}{'size':>7}{'time':>13}{'peak':>15}")
+    current = run_suite(sizes, stages, args.repeat, memory=not args.no_memory)
+    write_json(args.output, current)
+    print(f"📝 結果已寫入 {args.output}")
+
+    if args.update_baseline:
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                merged = json.load(f)
+            merged["results"].update(current["results"])
+            merged["meta"] = current["meta"]
+        else:
+            merged = current
+        write_json(args.baseline, merged)
+        print(f"📌 基準已更新 {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("⚠️ 找不到基準檔，略過退化檢查 (以 --update-baseline 建立)")
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = compare(current, baseline, args.threshold)
+    if not regressions:
+        print(f"✅ 沒有超過 {args.threshold:.0%} 的退化")
+        return 0
+    print(f"❌ {len(regressions)} 項超過 {args.threshold:.0%} 的退化:")
+    for key, metric, base, value, ratio in regressions:
+        print(f"   {key:<24}{metric:<9}{base:>12.4f} -> {value:<12.4f}({ratio:.2f}x)")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
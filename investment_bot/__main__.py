@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""python -m investment_bot <command>：見 cli.py"""
+
+import sys
+from .cli import main
+
+sys.exit(main())
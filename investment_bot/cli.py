@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+命令列入口 (Command Line Interface)
+    python -m investment_bot report [--job refresh] [--refresh Stock]   每日日報 (同 python -m investment_bot.main)
+    python -m investment_bot fetch TSLA NVDA [--asset Stock]            同步並顯示歷史 K 線
+    python -m investment_bot screen sp500.txt --top 20 [--local]        全市場掃描 (參數同 services.screener)
+    python -m investment_bot backtest --asset Crypto --strategy rsi     以已儲存的歷史 K 線回測
+    python -m investment_bot cache stats                                快取與資料集統計
+每個子指令只在自己的 handler 內 import 用到的服務：yfinance / ccxt / googleapiclient / ta / SQLAlchemy / pandas
+都要數百毫秒才能載入，cache stats 完全不需要它們 (以標準庫 sqlite3 唯讀讀取)。
+用 `benchmarks/bench_import_time.py` 追蹤各子指令的 import 時間。
+"""
+
+import sys
+import argparse
+from .config import Config
+
+
+def _split_symbols(values):
+    """'TSLA,NVDA' 與 'TSLA NVDA' 皆可"""
+    return [s.strip() for value in values for s in value.split(',') if s.strip()]
+
+
+def cmd_report(args):
+    from .main import main as run
+
+    status = run(job=args.job, refresh=tuple(args.refresh))
+    return 0 if status == "ok" else 1
+
+
+def cmd_fetch(args):
+    from .services.market_data import MarketDataService
+
+    symbols = _split_symbols(args.symbols)
+    frames = MarketDataService().get_historical_data_many(symbols, args.asset, days=args.days)
+    missing = 0
+    for symbol in symbols:
+        df = frames.get(symbol)
+        if df is None or df.empty:
+            missing += 1
+            print(f"  ⚠️ {symbol:<10} 無數據")
+            continue
+        print(f"  {symbol:<10} {len(df):>5} 根  {df.index[0]:%Y-%m-%d} ~ {df.index[-1]:%Y-%m-%d}  "
+              f"收盤 ${float(df['Close'].iloc[-1]):,.2f}")
+    return 1 if missing == len(symbols) else 0
+
+
+def cmd_screen(args):
+    from .services.screener import main as screen
+
+    return screen(args.args)
+
+
+def cmd_backtest(args):
+    from .services.backtest import BacktestService
+
+    symbols = _split_symbols([args.symbols]) if args.symbols else None
+    try:
+        result = BacktestService().run(args.asset, symbols=symbols, start=args.start, end=args.end,
+                                       strategy=args.strategy, fee_bps=args.fee_bps)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if result.summary.empty:
+        print(f"⚠️ 資料集中沒有 {args.asset} 的歷史 K 線")
+        return 1
+    print(f"📊 {args.asset} {len(result.summary)} 檔，策略 {result.strategy}")
+    print(result.summary.to_string(float_format=lambda v: f"{v:.4f}"))
+    return 0
+
+
+def cmd_cache(args):
+    from .utils.cache_stats import collect_cache_stats, format_cache_stats
+
+    stats = collect_cache_stats(args.db, args.market_data_dir, args.hot_dir)
+    print(format_cache_stats(stats, args.market_data_dir, args.hot_dir))
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m investment_bot", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    report = commands.add_parser("report", help="執行每日日報")
+    report.add_argument("--job", default="report", choices=["report", "refresh"],
+                        help="refresh 只更新 K 線與技術訊號，不呼叫 LLM / Telegram")
+    report.add_argument("--refresh", action="append", default=[], choices=["Stock", "Crypto"],
+                        help="忽略新鮮快取、重新同步這個資產類別的 K 線 (可重複)")
+    report.set_defaults(handler=cmd_report)
+
+    fetch = commands.add_parser("fetch", help="同步並顯示歷史 K 線")
+    fetch.add_argument("symbols", nargs="+", help="標的代號 (空白或逗號分隔)")
+    fetch.add_argument("--asset", default="Stock", choices=["Stock", "Crypto"])
+    fetch.add_argument("--days", type=int, default=200)
+    fetch.set_defaults(handler=cmd_fetch)
+
+    # 其餘參數原樣交給 services.screener (含 --help)
+    screen = commands.add_parser("screen", help="全市場掃描 (參數同 python -m investment_bot.services.screener)",
+                                 add_help=False)
+    screen.add_argument("args", nargs=argparse.REMAINDER)
+    screen.set_defaults(handler=cmd_screen)
+
+    backtest = commands.add_parser("backtest", help="以已儲存的歷史 K 線回測")
+    backtest.add_argument("--asset", default="Stock", choices=["Stock", "Crypto"])
+    backtest.add_argument("--symbols", help="逗號分隔的標的，預設為資產類別下的全部標的")
+    backtest.add_argument("--start")
+    backtest.add_argument("--end")
+    backtest.add_argument("--strategy", default=None, help="預設 BACKTEST_STRATEGY")
+    backtest.add_argument("--fee-bps", type=float, default=None)
+    backtest.set_defaults(handler=cmd_backtest)
+
+    cache = commands.add_parser("cache", help="快取與資料集統計 (唯讀，不載入 pandas / SQLAlchemy)")
+    cache.add_argument("action", choices=["stats"])
+    cache.add_argument("--db", default=Config.DB_PATH)
+    cache.add_argument("--market-data-dir", default=Config.MARKET_DATA_DIR)
+    cache.add_argument("--hot-dir", default=Config.MARKET_DATA_HOT_DIR)
+    cache.set_defaults(handler=cmd_cache)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
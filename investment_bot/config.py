@@ -30,6 +30,12 @@ class Config:
     if not GOOGLE_SHEET_ID_STOCK and os.getenv("GOOGLE_SHEET_ID"):
         GOOGLE_SHEET_ID_STOCK = os.getenv("GOOGLE_SHEET_ID")
 
+    # 額外的 Sheet 來源：逗號分隔的 "sheet_id|range" (省略 range 時使用 GOOGLE_SHEET_RANGE)
+    # 同一個 spreadsheet 的所有 range 以一次 values().batchGet 讀取
+    GOOGLE_SHEET_SOURCES = os.getenv("GOOGLE_SHEET_SOURCES", "")
+    # 以原始表格的雜湊判斷持倉是否變動，未變動時略過解析、快照寫入與快取重寫
+    GOOGLE_SHEET_CHANGE_DETECTION = os.getenv("GOOGLE_SHEET_CHANGE_DETECTION", "true").lower() == "true"
+
     # --- Ticker Mapping (將 Sheet 中的名稱映射到 API 所需的 Symbol) ---
     # Crypto: 使用 Binance 格式 (e.g., BTC/USDT)
     # 注意：這裡需要根據使用者的實際 Google Sheet 內容進行擴充
@@ -70,6 +76,8 @@ class Config:
     EMA_CRYPTO_FAST = 5
     EMA_CRYPTO_MID = 10
     EMA_CRYPTO_SLOW = 20
+    # Crypto 趨勢分界線 (數據長度不足時退回 EMA_CRYPTO_SLOW)
+    EMA_CRYPTO_TREND = 60
 
     # MACD 參數
     MACD_FAST = 12
@@ -80,3 +88,98 @@ class Config:
     BB_WINDOW = 20
     BB_STD_DEV = 2
 
+
+    # --- 執行效能 (Pipeline Concurrency) ---
+    # 並行模式：API 抓取 (I/O-bound) 走 Thread Pool，技術指標 (CPU-bound) 走 Process Pool
+    PIPELINE_CONCURRENT = os.getenv("PIPELINE_CONCURRENT", "true").lower() == "true"
+    PIPELINE_FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "8"))
+    # 設為 0 則在主行程內計算指標 (不開 Process Pool)
+    PIPELINE_TA_WORKERS = int(os.getenv("PIPELINE_TA_WORKERS", str(min(4, os.cpu_count() or 1))))
+    # 整個抓取 + 分析階段的逾時秒數，逾時的標的視為失敗，不阻塞其他標的
+    PIPELINE_TIMEOUT_SECONDS = int(os.getenv("PIPELINE_TIMEOUT_SECONDS", "300"))
+    # 每次執行的 K 線記憶體預算 (MB)，0 表示不限制；超過時分批抓取，等待分析的 K 線溢出到磁碟
+    PIPELINE_MEMORY_BUDGET_MB = int(os.getenv("PIPELINE_MEMORY_BUDGET_MB", "0"))
+    # 並行流程每批抓取的標的數 (單一批次失敗時該批改為逐檔重試)
+    PIPELINE_STREAM_CHUNK_SIZE = int(os.getenv("PIPELINE_STREAM_CHUNK_SIZE", "50"))
+    PIPELINE_SPILL_DIR = os.getenv("PIPELINE_SPILL_DIR") or None
+
+    # --- 精簡記憶體表示 (Compact Frames) ---
+    # 開啟後 K 線以 float32 + int64 epoch index 保存，持倉表的 Symbol / Type 使用 category
+    COMPACT_FRAMES = os.getenv("COMPACT_FRAMES", "false").lower() == "true"
+    # float32 精度保護：來回轉換的相對誤差超過此值的欄位保留 float64
+    COMPACT_FLOAT_TOLERANCE = float(os.getenv("COMPACT_FLOAT_TOLERANCE", "1e-6"))
+
+    # --- 市場數據同步 (Market Data Sync) ---
+    # incremental: 只抓取最後一根已儲存 K 棒之後的數據並合併；full: 每次重新下載完整區間
+    MARKET_DATA_SYNC_MODE = os.getenv("MARKET_DATA_SYNC_MODE", "incremental")
+    # 增量同步時往回重疊的 K 棒數，用重疊區間比對歷史價格是否被調整 (分割/除權)
+    MARKET_DATA_SYNC_OVERLAP_BARS = 5
+    MARKET_DATA_ADJUST_TOLERANCE = 1e-3
+
+    # --- 加密貨幣 async 抓取 (ccxt.async_support) ---
+    CRYPTO_ASYNC_ENABLED = os.getenv("CRYPTO_ASYNC_ENABLED", "true").lower() == "true"
+    CRYPTO_ASYNC_CONCURRENCY = int(os.getenv("CRYPTO_ASYNC_CONCURRENCY", "10"))
+    # Binance 每分鐘請求權重上限 (1200 weight / min)
+    BINANCE_WEIGHT_PER_MINUTE = int(os.getenv("BINANCE_WEIGHT_PER_MINUTE", "1200"))
+    # GET /api/v3/klines 每次請求的權重 (現行 Spot API 不分 limit 固定為 2)
+    BINANCE_KLINES_WEIGHT = int(os.getenv("BINANCE_KLINES_WEIGHT", "2"))
+
+    # --- 本地儲存 (Local Storage) ---
+    DB_PATH = os.getenv("INVESTMENT_DB_PATH", "investment_bot/data/investment.db")
+    MARKET_DATA_DIR = os.getenv("MARKET_DATA_DIR", "investment_bot/data/market_data")
+    # K 線資料集依 <asset_type>/<symbol>/<year>.parquet 分區；row group 越小，「最後 N 根」讀取越精準
+    MARKET_DATA_ROW_GROUP_SIZE = int(os.getenv("MARKET_DATA_ROW_GROUP_SIZE", "128"))
+    # Arrow IPC 熱層 (選用)：未壓縮、以 memory map 開啟，重複讀取零複製且可跨行程共用 page cache
+    MARKET_DATA_HOT_TIER = os.getenv("MARKET_DATA_HOT_TIER", "false").lower() == "true"
+    MARKET_DATA_HOT_DIR = os.getenv("MARKET_DATA_HOT_DIR", "investment_bot/data/market_data_hot")
+    # SQLAlchemy 連線池 (同一資料庫路徑在行程內共用一個 Engine)
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # SQLite busy timeout (秒)：並行寫入時等待鎖釋放
+    DB_BUSY_TIMEOUT = int(os.getenv("DB_BUSY_TIMEOUT", "30"))
+    # SQLite 效能設定 (PRAGMA)
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+    # 行程內 L1 快取 (system_cache 查詢結果筆數上限、K 線 DataFrame 記憶體預算)
+    L1_CACHE_MAX_ENTRIES = int(os.getenv("L1_CACHE_MAX_ENTRIES", "2048"))
+    L1_FRAME_CACHE_MB = int(os.getenv("L1_FRAME_CACHE_MB", "256"))
+    # system_cache 中的 DataFrame 以 Arrow IPC 存成 BLOB；可選 zstd / lz4 壓縮 (預設不壓縮，解碼最快)
+    CACHE_FRAME_COMPRESSION = os.getenv("CACHE_FRAME_COMPRESSION") or None
+
+    # --- 回測 (Backtest) ---
+    # 進出場規則：trend_rsi (趨勢 + 超買出場) / trend / rsi，見 services/backtest.py
+    BACKTEST_STRATEGY = os.getenv("BACKTEST_STRATEGY", "trend_rsi")
+    # 單邊交易成本 (bps)，每次進場或出場各扣一次
+    BACKTEST_FEE_BPS = float(os.getenv("BACKTEST_FEE_BPS", "10"))
+    # 參數掃描 (python -m investment_bot.services.param_sweep)：結果逐筆附加到 JSONL，中斷後可續跑
+    SWEEP_DIR = os.getenv("SWEEP_DIR", "investment_bot/data/sweeps")
+    # 0 表示使用所有 CPU 核心
+    SWEEP_WORKERS = int(os.getenv("SWEEP_WORKERS", "0"))
+
+    # --- 全市場掃描 (Screener) ---
+    # python -m investment_bot.services.screener：每個榜單保留的筆數與每批抓取 / 分析的標的數
+    SCREEN_TOP_K = int(os.getenv("SCREEN_TOP_K", "20"))
+    SCREEN_CHUNK_SIZE = int(os.getenv("SCREEN_CHUNK_SIZE", "100"))
+
+    # --- 常駐模式 (Daemon) ---
+    # python -m investment_bot.daemon：服務只初始化一次，依下列時間表在行程內排程執行
+    # 日報：美股收盤後 (DAEMON_MARKET_TZ 的週一至週五 HH:MM)，留一點時間讓收盤價定案
+    DAEMON_REPORT_TIME = os.getenv("DAEMON_REPORT_TIME", "16:15")
+    DAEMON_MARKET_TZ = os.getenv("DAEMON_MARKET_TZ", "America/New_York")
+    # 加密貨幣日 K 於 00:00 UTC 收盤；收盤後執行的工作：refresh (同步 K 線與訊號) / report / off
+    DAEMON_CRYPTO_CLOSE_TIME = os.getenv("DAEMON_CRYPTO_CLOSE_TIME", "00:05")
+    DAEMON_CRYPTO_CLOSE_JOB = os.getenv("DAEMON_CRYPTO_CLOSE_JOB", "refresh")
+    # 美股盤中 (09:30 ~ 16:00) 每隔 N 分鐘刷新一次持倉 K 線，0 表示關閉
+    DAEMON_REFRESH_MINUTES = int(os.getenv("DAEMON_REFRESH_MINUTES", "0"))
+    # 本機觸發介面 (只綁定 localhost)：POST /run/report 立即執行一次
+    DAEMON_HOST = os.getenv("DAEMON_HOST", "127.0.0.1")
+    DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8765"))
+
+    # --- 執行指標 (Run Metrics) ---
+    # 每次執行結束時把各階段耗時、API 呼叫次數、快取命中率寫入 SQLite run_records
+    METRICS_RUN_RECORDS = os.getenv("METRICS_RUN_RECORDS", "true").lower() == "true"
+    # 設定路徑時另外輸出 Prometheus textfile (供 node_exporter textfile collector 讀取)
+    METRICS_PROMETHEUS_TEXTFILE = os.getenv("METRICS_PROMETHEUS_TEXTFILE") or None
@@ -0,0 +1,395 @@
+# -*- coding: utf-8 -*-
+"""
+常駐模式 (Daemon Mode)
+main.main 是一次性腳本：每次執行都要重新 import pandas / yfinance / ccxt / googleapiclient、
+重新驗證 Google Sheets、重建 ccxt client 與 DB Engine。常駐模式只初始化一次服務 (連同 L1 快取、
+技術分析 Process Pool)，之後：
+- 以時區感知的時間表在行程內排程：美股收盤後的日報 (America/New_York，自動處理夏令時間)、
+  00:00 UTC 加密貨幣日 K 收盤後的刷新，以及選用的盤中刷新
+- 在 localhost 提供觸發介面，快取已暖時隨選日報不需要再付出啟動成本
+所有工作由單一執行緒依序執行 (排程與手動觸發不會同時跑)，每次執行照常寫入 run record。
+
+用法:
+    python -m investment_bot.daemon                          # 啟動常駐行程
+    python -m investment_bot.daemon trigger report           # 立即執行一次日報 (等待完成並顯示耗時)
+    python -m investment_bot.daemon trigger refresh --refresh Stock --no-wait
+    python -m investment_bot.daemon status
+"""
+
+import sys
+import json
+import time
+import signal
+import argparse
+import threading
+import urllib.request
+import urllib.error
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time as dtime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from zoneinfo import ZoneInfo
+
+from investment_bot.config import Config
+from investment_bot.main import JOBS, main as run_job, init_services, close_services, create_ta_pool
+
+WEEKDAYS = (0, 1, 2, 3, 4)
+# 排程迴圈最長的睡眠時間：系統時間調整或電腦休眠後最多晚這麼久發現已到期的觸發
+MAX_SLEEP_SECONDS = 60
+RECENT_RUNS = 20
+
+
+def _parse_time(value):
+    """'HH:MM' -> datetime.time"""
+    if isinstance(value, dtime):
+        return value
+    hour, _, minute = value.partition(':')
+    return dtime(int(hour), int(minute or 0))
+
+
+def _utc(moment):
+    return moment.astimezone(timezone.utc)
+
+
+# --- 觸發時間 (Triggers) ---
+
+class DailyTrigger:
+    """
+    每天 (或指定星期) 在某時區的固定時刻觸發
+    以該時區的牆上時間計算，夏令時間切換前後都落在同一個當地時刻。
+    """
+    def __init__(self, name, at, tz, job="report", refresh=(), weekdays=None):
+        self.name = name
+        self.at = _parse_time(at)
+        self.tz = ZoneInfo(tz) if isinstance(tz, str) else tz
+        self.job = job
+        self.refresh = tuple(refresh)
+        self.weekdays = tuple(range(7)) if weekdays is None else tuple(weekdays)
+
+    def next_after(self, now):
+        """:return: now 之後的下一次觸發時間 (UTC)"""
+        now = _utc(now)
+        day = now.astimezone(self.tz).date()
+        while True:
+            if day.weekday() in self.weekdays:
+                candidate = _utc(datetime.combine(day, self.at, tzinfo=self.tz))
+                if candidate > now:
+                    return candidate
+            day += timedelta(days=1)
+
+    def describe(self):
+        days = "每天" if len(self.weekdays) == 7 else "週一至週五" if self.weekdays == WEEKDAYS else str(self.weekdays)
+        return f"{days} {self.at:%H:%M} {self.tz.key}"
+
+
+class IntervalTrigger:
+    """在某時區每日的時段內 (例如美股盤中 09:30 ~ 16:00) 每隔 N 分鐘觸發，時段開始時先觸發一次"""
+    def __init__(self, name, minutes, tz, start="09:30", end="16:00", job="refresh", refresh=(), weekdays=WEEKDAYS):
+        if minutes <= 0:
+            raise ValueError(f"觸發間隔必須大於 0: {minutes}")
+        self.name = name
+        self.step = timedelta(minutes=minutes)
+        self.tz = ZoneInfo(tz) if isinstance(tz, str) else tz
+        self.start, self.end = _parse_time(start), _parse_time(end)
+        self.job = job
+        self.refresh = tuple(refresh)
+        self.weekdays = tuple(weekdays)
+
+    def next_after(self, now):
+        """:return: now 之後的下一次觸發時間 (UTC)"""
+        now = _utc(now)
+        day = now.astimezone(self.tz).date()
+        while True:
+            if day.weekday() in self.weekdays:
+                start = _utc(datetime.combine(day, self.start, tzinfo=self.tz))
+                end = _utc(datetime.combine(day, self.end, tzinfo=self.tz))
+                if now < start:
+                    return start
+                candidate = start + ((now - start) // self.step + 1) * self.step
+                if candidate <= end:
+                    return candidate
+            day += timedelta(days=1)
+
+    def describe(self):
+        minutes = int(self.step.total_seconds() // 60)
+        return f"週一至週五 {self.start:%H:%M}~{self.end:%H:%M} {self.tz.key} 每 {minutes} 分鐘"
+
+
+def build_triggers():
+    """依 Config 建立排程：美股收盤日報、加密貨幣日 K 收盤、選用的盤中刷新"""
+    triggers = [
+        # 收盤後重新同步美股 (盤中刷新可能已把當天的未收盤 K 棒標記為新鮮)
+        DailyTrigger("us_close", Config.DAEMON_REPORT_TIME, Config.DAEMON_MARKET_TZ, job="report",
+                     refresh=("Stock",), weekdays=WEEKDAYS),
+    ]
+    if Config.DAEMON_CRYPTO_CLOSE_JOB != "off":
+        if Config.DAEMON_CRYPTO_CLOSE_JOB not in JOBS:
+            raise ValueError(f"未知的 DAEMON_CRYPTO_CLOSE_JOB: {Config.DAEMON_CRYPTO_CLOSE_JOB} "
+                             f"(可用: {', '.join(JOBS)}, off)")
+        triggers.append(DailyTrigger("crypto_close", Config.DAEMON_CRYPTO_CLOSE_TIME, "UTC",
+                                     job=Config.DAEMON_CRYPTO_CLOSE_JOB, refresh=("Crypto",)))
+    if Config.DAEMON_REFRESH_MINUTES > 0:
+        triggers.append(IntervalTrigger("intraday", Config.DAEMON_REFRESH_MINUTES, Config.DAEMON_MARKET_TZ,
+                                        job="refresh", refresh=("Stock", "Crypto")))
+    return triggers
+
+
+class Scheduler:
+    """
+    依各 Trigger 的下一次觸發時間送出工作
+    錯過的觸發 (例如電腦休眠) 醒來後只補執行一次，再從當下計算下一次。
+    """
+    def __init__(self, triggers, submit, clock=None):
+        """
+        :param submit: callable(job, refresh, source)，把工作交給執行緒 (不等待完成)
+        :param clock: 回傳目前時間 (aware datetime) 的函式，測試時可替換
+        """
+        self.triggers = list(triggers)
+        self.submit = submit
+        self.clock = clock or (lambda: datetime.now(timezone.utc))
+        now = self.clock()
+        self.next_runs = {trigger.name: trigger.next_after(now) for trigger in self.triggers}
+        self._stop = threading.Event()
+
+    def run_pending(self, now=None):
+        """:return: 本次送出的 trigger 名稱"""
+        now = now or self.clock()
+        fired = []
+        for trigger in self.triggers:
+            if self.next_runs[trigger.name] <= now:
+                self.submit(trigger.job, trigger.refresh, trigger.name)
+                self.next_runs[trigger.name] = trigger.next_after(now)
+                fired.append(trigger.name)
+        return fired
+
+    def seconds_until_next(self, now=None):
+        if not self.next_runs:
+            return MAX_SLEEP_SECONDS
+        now = now or self.clock()
+        return max(0.0, (min(self.next_runs.values()) - now).total_seconds())
+
+    def run(self):
+        while not self._stop.is_set():
+            self.run_pending()
+            self._stop.wait(min(MAX_SLEEP_SECONDS, self.seconds_until_next()))
+
+    def stop(self):
+        self._stop.set()
+
+
+# --- Daemon ---
+
+class Daemon:
+    def __init__(self, triggers=None, host=None, port=None, store=None, clock=None):
+        """
+        :param triggers: 排程清單，預設 build_triggers()
+        :param host / port: 本機觸發介面，預設 DAEMON_HOST / DAEMON_PORT (port=0 由系統分配)
+        :param store: 注入的 DataStore，未提供時使用行程內共用的 Store
+        """
+        self.host = host or Config.DAEMON_HOST
+        self.port = Config.DAEMON_PORT if port is None else port
+        self.store = store
+        self.services = None
+        self.ta_pool = None
+        self.started_at = datetime.now(timezone.utc)
+        self.recent = deque(maxlen=RECENT_RUNS)
+        self.running = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        self.scheduler = Scheduler(build_triggers() if triggers is None else triggers, self.submit, clock)
+        self.server = None
+        self._threads = []
+
+    def warm_up(self):
+        """
+        建立服務；沿用 start() 在 HTTP / 排程執行緒啟動前 fork 好的 Process Pool，
+        初始化失敗後在工作執行緒重試時不會再 fork (子行程可能繼承其他執行緒持有中的鎖)
+        """
+        if self.services is None:
+            print("🔧 初始化服務中...")
+            self.services = init_services(self.store, ta_pool=self.ta_pool)
+
+    def submit(self, job, refresh=(), source="manual"):
+        """:return: Future，結果為該次執行的摘要 dict"""
+        if job not in JOBS:
+            raise ValueError(f"未知的工作: {job} (可用: {', '.join(JOBS)})")
+        return self.executor.submit(self._run, job, tuple(refresh), source)
+
+    def _run(self, job, refresh, source):
+        started = time.perf_counter()
+        self.running = job
+        print(f"⏰ [{source}] 開始 {job}" + (f" (重新同步 {', '.join(refresh)})" if refresh else ""))
+        try:
+            try:
+                self.warm_up()
+            except Exception as e:
+                # 下次執行再重試 (例如憑證檔暫時不存在)
+                print(f"❌ 服務初始化失敗: {e}")
+                status = "init_failed"
+            else:
+                status = run_job(self.services, job, refresh)
+        except Exception as e:
+            print(f"❌ {job} 執行失敗: {e}")
+            status = "error"
+        finally:
+            self.running = None
+        entry = {
+            "job": job,
+            "source": source,
+            "status": status,
+            "seconds": round(time.perf_counter() - started, 3),
+            "finished_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        }
+        self.recent.append(entry)
+        return entry
+
+    def status(self):
+        return {
+            "started_at": self.started_at.isoformat(timespec='seconds'),
+            "warm": self.services is not None,
+            "running": self.running,
+            "triggers": [
+                {"name": t.name, "job": t.job, "schedule": t.describe(),
+                 "next_run": self.scheduler.next_runs[t.name].isoformat(timespec='seconds')}
+                for t in self.scheduler.triggers
+            ],
+            "recent": list(self.recent),
+        }
+
+    def start(self):
+        """初始化服務後啟動本機觸發介面與排程執行緒 (不阻塞)"""
+        # Process Pool 不依賴憑證，先於任何執行緒建立；服務初始化失敗也保留給之後的重試
+        if self.ta_pool is None:
+            self.ta_pool = create_ta_pool(Config.PIPELINE_TA_WORKERS)
+        try:
+            self.warm_up()
+        except Exception as e:
+            print(f"⚠️ 服務初始化失敗，將於第一次執行時重試: {e}")
+        self.server = ThreadingHTTPServer((self.host, self.port), _TriggerHandler)
+        self.server.daemon_ref = self
+        self.port = self.server.server_address[1]
+        for target, name in [(self.server.serve_forever, "trigger-http"), (self.scheduler.run, "scheduler")]:
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🟢 常駐模式啟動，觸發介面 http://{self.host}:{self.port}")
+        for t in self.scheduler.triggers:
+            print(f"   {t.name:<12} {t.job:<8} {t.describe()}  下次: {self.scheduler.next_runs[t.name]:%Y-%m-%d %H:%M} UTC")
+
+    def stop(self):
+        self.scheduler.stop()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        close_services(self.services)
+        if self.services is None and self.ta_pool is not None:
+            self.ta_pool.shutdown(wait=True, cancel_futures=True)
+        self.ta_pool = None
+
+    def serve_forever(self):
+        """啟動並阻塞到收到 SIGINT / SIGTERM"""
+        stopping = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+        self.start()
+        try:
+            # 以逾時輪詢等待，Windows 上 Ctrl+C 也能中斷
+            while not stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        print("🛑 停止常駐模式...")
+        self.stop()
+
+
+class _TriggerHandler(BaseHTTPRequestHandler):
+    """
+    GET  /status                            -> 排程與最近的執行紀錄
+    POST /run/<job>?refresh=Stock&wait=1    -> 執行一次工作；wait=0 時排入佇列後立即回應 202
+    """
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if urlparse(self.path).path != "/status":
+            return self._reply(404, {"error": "not found"})
+        self._reply(200, self.server.daemon_ref.status())
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != "run":
+            return self._reply(404, {"error": "not found"})
+        query = parse_qs(url.query)
+        refresh = [t for value in query.get("refresh", []) for t in value.split(',') if t]
+        try:
+            future = self.server.daemon_ref.submit(parts[1], refresh, source="trigger")
+        except ValueError as e:
+            return self._reply(400, {"error": str(e)})
+        if query.get("wait", ["1"])[0] == "0":
+            return self._reply(202, {"job": parts[1], "queued": True})
+        self._reply(200, future.result())
+
+    def log_message(self, format, *args):
+        pass
+
+
+# --- CLI ---
+
+def _request(method, path, host=None, port=None, timeout=None):
+    url = f"http://{host or Config.DAEMON_HOST}:{port or Config.DAEMON_PORT}{path}"
+    request = urllib.request.Request(url, method=method, data=b"" if method == "POST" else None)
+    with urllib.request.urlopen(request, timeout=timeout or Config.PIPELINE_TIMEOUT_SECONDS + 60) as response:
+        return json.load(response)
+
+
+def trigger(job, refresh=(), wait=True, host=None, port=None):
+    """請常駐行程執行一次工作 (wait=True 時等待完成並回傳摘要)"""
+    query = f"?wait={int(wait)}" + (f"&refresh={','.join(refresh)}" if refresh else "")
+    return _request("POST", f"/run/{job}{query}", host, port)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m investment_bot.daemon", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=None, help="本機觸發介面的 port，預設 DAEMON_PORT")
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="啟動常駐行程 (預設)")
+    run = commands.add_parser("trigger", help="請常駐行程立即執行一次工作")
+    run.add_argument("job", choices=list(JOBS))
+    run.add_argument("--refresh", default="", help="逗號分隔的資產類別，忽略新鮮快取重新同步 K 線")
+    run.add_argument("--no-wait", action="store_true", help="排入佇列後立即返回")
+    commands.add_parser("status", help="顯示排程與最近的執行紀錄")
+    args = parser.parse_args(argv)
+
+    if args.command in (None, "serve"):
+        Daemon(port=args.port).serve_forever()
+        return 0
+
+    try:
+        if args.command == "status":
+            print(json.dumps(_request("GET", "/status", port=args.port, timeout=10), ensure_ascii=False, indent=2))
+            return 0
+        refresh = [t.strip() for t in args.refresh.split(',') if t.strip()]
+        started = time.perf_counter()
+        result = trigger(args.job, refresh, wait=not args.no_wait, port=args.port)
+    except (urllib.error.URLError, OSError) as e:
+        print(f"❌ 無法連線到常駐行程 (是否已執行 python -m investment_bot.daemon？): {e}")
+        return 1
+    if args.no_wait:
+        print(f"📨 已排入佇列: {args.job}")
+        return 0
+    print(f"✅ {result['job']} {result['status']} (執行 {result['seconds']:.3f}s，"
+          f"含往返 {time.perf_counter() - started:.3f}s)")
+    return 0 if result["status"] == "ok" else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,11 @@
 
 import sys
 import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 
 # Add the project root to sys.path to ensure imports work correctly
 # Assuming structure: project_root/investment_bot/main.py
@@ -15,38 +20,384 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 try:
+    from investment_bot.utils.lazy import lazy_import
+    from investment_bot.utils.metrics import start_run, timed, write_prometheus_textfile
+    from investment_bot.config import Config
+except ImportError as e:
+    print(f"Import Error: {e}")
+    print("請嘗試在專案根目錄執行: python -m investment_bot.main")
+    sys.exit(1)
+
+# pandas / SQLAlchemy / pyarrow 與各服務模組延遲到 init_services 或實際處理持倉時才載入，
+# daemon / CLI 只 import main 不會先付出這些 import 成本
+pd = lazy_import("pandas")
+tech_analysis = lazy_import("investment_bot.services.tech_analysis")
+data_store = lazy_import("investment_bot.utils.data_store")
+compact_frames = lazy_import("investment_bot.utils.compact_frames")
+
+
+def _summarize_holding(symbol, asset_type, qty, cost, analysis):
+    """根據技術分析結果 (最新價格) 計算單一持倉的市值與損益"""
+    # 更新最新價格與市值
+    current_price = analysis['current_price']
+    market_value = current_price * qty
+
+    # 計算損益
+    # 如果 cost 為 0 (Free tokens)，unrealized_pl 就是 market_value
+    unrealized_pl = market_value - (cost * qty)
+    # 避免除以零 (需要 cost * qty > 0)
+    total_cost = cost * qty
+    return_rate = (unrealized_pl / total_cost) if total_cost > 0 else 0
+
+    return {
+        "symbol": symbol,
+        "type": asset_type,
+        "qty": qty,
+        "current_price": current_price,
+        "market_value": market_value,
+        "cost_basis": cost,
+        "unrealized_pl": unrealized_pl,
+        "return_rate": return_rate
+    }
+
+
+def analyze_holdings_sequential(holdings, market_service, ta_service):
+    """
+    逐一抓取並分析每個持倉 (原始的序列流程)
+    :param holdings: [(symbol, asset_type, qty, cost), ...]
+    :return: {index: (analysis or None, 失敗原因 or None)}
+    """
+    outcomes = {}
+    for idx, (symbol, asset_type, _, _) in enumerate(holdings):
+        print(f"  -> 處理中: {symbol} ({asset_type})...")
+        try:
+            hist_df = market_service.get_historical_data(symbol, asset_type)
+        except Exception as e:
+            outcomes[idx] = (None, f"抓取錯誤: {e}")
+            continue
+
+        if hist_df.empty:
+            outcomes[idx] = (None, "no_data")
+            continue
+
+        # 帶入 symbol 才會使用訊號快取 (K 線與參數不變時直接重用)
+        analysis = ta_service.analyze(hist_df, asset_type, symbol=symbol)
+        outcomes[idx] = (analysis, None if analysis else "ta_failed")
+    return outcomes
+
+
+def create_ta_pool(ta_workers):
+    """建立技術分析用的 Process Pool；無法建立 (或設定為 0) 時回傳 None，改在主行程計算"""
+    if ta_workers <= 0:
+        return None
+    try:
+        pool = ProcessPoolExecutor(max_workers=ta_workers)
+        # 先送一個空任務讓 worker 在 I/O 執行緒啟動前就 fork 完成，
+        # 避免子行程繼承到其他執行緒持有中的鎖
+        pool.submit(int).result()
+        return pool
+    except (OSError, BrokenProcessPool, NotImplementedError) as e:
+        print(f"     ⚠️ 無法建立 Process Pool，改在主行程計算指標: {e}")
+        return None
+
+
+def analyze_holdings_concurrent(holdings, market_service, fetch_workers=None, ta_workers=None, timeout=None, ta_service=None,
+                                memory_budget_mb=None, ta_pool=None):
+    """
+    並行抓取並分析每個持倉
+    - 歷史數據抓取 (I/O-bound) 依資產類別、每 PIPELINE_STREAM_CHUNK_SIZE 檔一批丟進 Thread Pool
+    - 技術指標計算 (CPU-bound) 丟進 Process Pool，哪個標的先抓完就先算
+    - 單一標的失敗或逾時只影響自己，不會卡住其他標的 (批次失敗時逐檔重試)
+    - 設定記憶體預算時改為串流：限制同時送進 Process Pool 的數量，
+      等待分析的 K 線超過預算的部分溢出到磁碟，分析完即釋放
+    :param holdings: [(symbol, asset_type, qty, cost), ...]
+    :param ta_service: 提供時先查訊號快取，命中的標的不進 Process Pool；其餘以 SQLite 中的指標狀態增量計算
+                       (狀態在主行程讀寫，Pool 只負責餵入新 K 棒)，新算出的訊號與狀態寫回
+    :param memory_budget_mb: K 線記憶體預算，預設 Config.PIPELINE_MEMORY_BUDGET_MB (0 表示不限制)
+    :param ta_pool: 沿用呼叫端的 Process Pool (daemon 模式)，結束時不關閉；未提供時每次建立
+    :return: {index: (analysis or None, 失敗原因 or None)}，由呼叫端依原順序組裝
+    """
+    fetch_workers = fetch_workers or Config.PIPELINE_FETCH_WORKERS
+    ta_workers = Config.PIPELINE_TA_WORKERS if ta_workers is None else ta_workers
+    timeout = timeout or Config.PIPELINE_TIMEOUT_SECONDS
+    budget_mb = Config.PIPELINE_MEMORY_BUDGET_MB if memory_budget_mb is None else memory_budget_mb
+    deadline = time.monotonic() + timeout
+
+    outcomes = {}
+    own_ta_pool = ta_pool is None
+    if own_ta_pool:
+        ta_pool = create_ta_pool(ta_workers)
+    use_ta_pool = ta_pool is not None
+    fetch_pool = ThreadPoolExecutor(max_workers=max(1, fetch_workers), thread_name_prefix="fetch")
+
+    ta_futures = {}
+    # 分析完成的訊號與指標狀態，全部分析結束後在同一個交易內寫入 (Unit of Work)
+    signal_records = []
+    # 已抓取、等待分析的 K 線 (未設定預算時等同 dict)
+    fetched = compact_frames.SpillBuffer(budget_mb * 1024 * 1024, Config.PIPELINE_SPILL_DIR)
+    # 等待送進 Process Pool 的標的；設定預算時同時在途的任務數有上限 (任務參數會留在 Pool 內直到完成)
+    pending = deque()
+    max_inflight = 2 * max(1, ta_workers) if budget_mb else None
+
+    def _fetch_group(asset_type, idxs):
+        """
+        在抓取執行緒內把結果放進 fetched，future 本身不持有 K 線
+        批次抓取失敗時改為逐檔重試，只有重試仍失敗的標的算失敗
+        :return: {idx: Exception}，抓取失敗的標的
+        """
+        if len(idxs) > 1:
+            try:
+                result = market_service.get_historical_data_many([holdings[idx][0] for idx in idxs], asset_type)
+            except Exception as e:
+                print(f"     ⚠️ 批次抓取失敗 ({asset_type} {len(idxs)} 檔): {e}，改為逐檔抓取")
+            else:
+                for idx in idxs:
+                    fetched.put(idx, result.get(holdings[idx][0], pd.DataFrame()))
+                return {}
+
+        errors = {}
+        for idx in idxs:
+            try:
+                fetched.put(idx, market_service.get_historical_data(holdings[idx][0], asset_type))
+            except Exception as e:
+                errors[idx] = e
+        return errors
+
+    def _ta_task(idx):
+        """
+        要執行的計算與參數：有 ta_service 時接續 SQLite 中的指標狀態 (回傳 (訊號, 狀態更新))，
+        否則完整計算；K 棒不足時回傳 None
+        """
+        symbol, asset_type = holdings[idx][0], holdings[idx][1]
+        hist_df = fetched.get(idx)
+        if ta_service is None:
+            return tech_analysis.compute_signals, (hist_df, asset_type, symbol)
+        try:
+            resume = ta_service.load_resume_state(hist_df, asset_type, symbol)
+        except Exception as e:
+            print(f"     ⚠️ 指標狀態讀取失敗: {symbol} ({e})，改為完整計算")
+            return tech_analysis.compute_signals, (hist_df, asset_type, symbol)
+        if resume is None:
+            return None
+        return tech_analysis.compute_signals_incremental, (hist_df, asset_type, resume, symbol)
+
+    def _record_ta(idx, result):
+        analysis, update = result if isinstance(result, tuple) else (result, None)
+        outcomes[idx] = (analysis, None if analysis else "ta_failed")
+        hist_df = fetched.pop(idx)
+        if ta_service is not None and (analysis or update):
+            symbol, asset_type = holdings[idx][0], holdings[idx][1]
+            try:
+                signal_records.append(ta_service.signal_record(hist_df, asset_type, symbol, analysis, update))
+            except Exception as e:
+                print(f"     ⚠️ 訊號快取寫入失敗: {symbol} ({e})")
+
+    def _run_ta_inline(idx):
+        with timed("ta"):
+            task = _ta_task(idx)
+            result = task[0](*task[1]) if task is not None else None
+        _record_ta(idx, result)
+
+    def _submit_pending():
+        nonlocal use_ta_pool
+        while pending and (max_inflight is None or len(ta_futures) < max_inflight):
+            idx = pending.popleft()
+            if not use_ta_pool:
+                _run_ta_inline(idx)
+                continue
+            task = _ta_task(idx)
+            if task is None:
+                _record_ta(idx, None)
+                continue
+            try:
+                ta_futures[ta_pool.submit(task[0], *task[1])] = idx
+            except BrokenProcessPool:
+                use_ta_pool = False
+                _run_ta_inline(idx)
+
+    def _collect_ta(done):
+        nonlocal use_ta_pool
+        for future in done:
+            idx = ta_futures.pop(future)
+            try:
+                _record_ta(idx, future.result())
+            except BrokenProcessPool:
+                use_ta_pool = False
+                _run_ta_inline(idx)
+            except Exception as e:
+                outcomes[idx] = (None, f"分析錯誤: {e}")
+                fetched.pop(idx)
+        _submit_pending()
+
+    def _dispatch_ta(idx, asset_type):
+        hist_df = fetched.get(idx, pd.DataFrame())
+        if hist_df.empty:
+            outcomes[idx] = (None, "no_data")
+            fetched.pop(idx)
+            return
+
+        if ta_service is not None:
+            cached = ta_service.get_cached_signal(hist_df, asset_type)
+            if cached:
+                outcomes[idx] = (cached, None)
+                fetched.pop(idx)
+                return
+
+        pending.append(idx)
+        _submit_pending()
+
+    try:
+        # 同一資產類別合併成批次 (美股一次 yf.download，加密貨幣以 async ccxt 並行抓取)，
+        # 每 PIPELINE_STREAM_CHUNK_SIZE 檔一批：單一批次卡住或失敗不會拖累同類別的所有標的
+        fetch_futures = {}
+        groups = {}
+        for idx, (symbol, asset_type, _, _) in enumerate(holdings):
+            print(f"  -> 處理中: {symbol} ({asset_type})...")
+            groups.setdefault(asset_type, []).append(idx)
+        chunk_size = max(1, Config.PIPELINE_STREAM_CHUNK_SIZE)
+        for asset_type, idxs in groups.items():
+            for pos in range(0, len(idxs), chunk_size):
+                chunk = idxs[pos:pos + chunk_size]
+                fetch_futures[fetch_pool.submit(_fetch_group, asset_type, chunk)] = chunk
+
+        try:
+            for future in as_completed(fetch_futures, timeout=max(0, deadline - time.monotonic())):
+                idxs = fetch_futures[future]
+                try:
+                    errors = future.result()
+                except Exception as e:
+                    errors = {idx: e for idx in idxs}
+
+                for idx in idxs:
+                    if idx in errors:
+                        outcomes[idx] = (None, f"抓取錯誤: {errors[idx]}")
+                        fetched.pop(idx)
+                    else:
+                        _dispatch_ta(idx, holdings[idx][1])
+                # 順便收回已完成的分析，釋放在途名額與 K 線
+                _collect_ta([f for f in ta_futures if f.done()])
+
+            while ta_futures or pending:
+                done, _ = wait(ta_futures, timeout=max(0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not done:
+                    raise FuturesTimeoutError()
+                _collect_ta(done)
+        except FuturesTimeoutError:
+            print(f"     ⚠️ 抓取/分析逾時 ({timeout}s)，未完成的標的將略過")
+
+        if signal_records:
+            try:
+                ta_service.save_signal_records(signal_records)
+            except Exception as e:
+                print(f"     ⚠️ 訊號快取寫入失敗: {len(signal_records)} 檔 ({e})")
+    finally:
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        if own_ta_pool and ta_pool is not None:
+            ta_pool.shutdown(wait=False, cancel_futures=True)
+        fetched.close()
+
+    for idx in range(len(holdings)):
+        outcomes.setdefault(idx, (None, "timeout"))
+    return outcomes
+
+def init_services(store=None, keep_ta_pool=False, ta_pool=None):
+    """
+    建立日報流程使用的服務 (所有 Service 共用同一個 DataStore：單一 Engine 與連線池)
+    daemon 模式下只建立一次，之後每次執行都沿用已驗證的 Sheets 服務、ccxt client 與 L1 快取
+    :param keep_ta_pool: 一併建立常駐的技術分析 Process Pool (須在啟動其他執行緒之前呼叫)
+    :param ta_pool: 沿用呼叫端在啟動執行緒前以 create_ta_pool 建立的 Process Pool (優先於 keep_ta_pool)
+    :return: dict of services，用完以 close_services 釋放
+    """
     from investment_bot.services.google_sheet import GoogleSheetService
     from investment_bot.services.market_data import MarketDataService
     from investment_bot.services.tech_analysis import TechnicalAnalysisService
     from investment_bot.services.llm_analyzer import LLMAnalyzerService
     from investment_bot.services.telegram_bot import TelegramBotService
-except ImportError as e:
-    print(f"Import Error: {e}")
-    print("請嘗試在專案根目錄執行: python -m investment_bot.main")
-    sys.exit(1)
 
-def main():
-    print("🚀 啟動 AI 投資日報機器人...")
-    
-    # 1. 初始化服務
+    store = store or data_store.get_data_store()
+    if ta_pool is None and keep_ta_pool:
+        ta_pool = create_ta_pool(Config.PIPELINE_TA_WORKERS)
+    return {
+        "store": store,
+        "sheet": GoogleSheetService(store=store),
+        "market": MarketDataService(store=store),
+        "ta": TechnicalAnalysisService(store=store),
+        "llm": LLMAnalyzerService(),
+        "telegram": TelegramBotService(),
+        "ta_pool": ta_pool,
+    }
+
+
+def close_services(services):
+    """關閉常駐的 Process Pool"""
+    if services and services.get("ta_pool") is not None:
+        services["ta_pool"].shutdown(wait=True, cancel_futures=True)
+        services["ta_pool"] = None
+
+
+def main(services=None, job="report", refresh=()):
+    """
+    執行一次日報流程，結束時寫入執行紀錄 (各階段耗時、API 呼叫次數、快取命中率)
+    :param services: init_services() 的結果 (daemon 模式重複使用)，未提供時在本次執行內建立
+    :param job: 'report' (完整日報) 或 'refresh' (只更新 K 線與技術訊號，暖快取用)
+    :param refresh: 要忽略新鮮快取、重新同步 K 線的資產類別 (例如收盤後的 ('Stock',))
+    :return: 執行狀態
+    """
+    metrics = start_run()
+    status = "error"
+    try:
+        status = JOBS[job](services, refresh=refresh)
+    finally:
+        _save_run_record(metrics, status, job, services["store"] if services else None)
+    return status
+
+
+def _save_run_record(metrics, status, job="report", store=None):
+    """執行紀錄寫入 SQLite run_records，並視設定輸出 Prometheus textfile；失敗不影響主流程"""
+    stages = ", ".join(f"{name} {entry['seconds']:.2f}s" for name, entry in metrics.stages.items())
+    print(f"⏱️ 各階段耗時: {stages or '-'} (總計 {metrics.elapsed():.2f}s)")
+
+    if Config.METRICS_RUN_RECORDS:
+        try:
+            store = store or data_store.get_data_store()
+            store.save_run_record(metrics.to_record(status, extra={"job": job, "l1_cache": store.cache_stats()}))
+        except Exception as e:
+            print(f"⚠️ 執行紀錄寫入失敗: {e}")
+    if Config.METRICS_PROMETHEUS_TEXTFILE:
+        try:
+            write_prometheus_textfile(Config.METRICS_PROMETHEUS_TEXTFILE, metrics, status)
+        except OSError as e:
+            print(f"⚠️ Prometheus textfile 寫入失敗: {e}")
+
+
+def _init_or_fail(services):
+    if services is not None:
+        return services
     print("🔧 初始化服務中...")
     try:
-        sheet_service = GoogleSheetService()
-        market_service = MarketDataService()
-        ta_service = TechnicalAnalysisService()
-        llm_service = LLMAnalyzerService()
-        telegram_service = TelegramBotService()
+        return init_services()
     except Exception as e:
         print(f"❌ 服務初始化失敗: {e}")
-        return
+        return None
+
+
+def collect_portfolio(services, refresh=()):
+    """
+    讀取持倉並抓取 K 線、計算技術指標 (日報流程的第 2 ~ 4 步)
+    :param refresh: 先清除這些資產類別的新鮮快取標記，強制以增量同步抓取最新 K 棒
+    :return: (portfolio_summary, tech_signals)；Sheet 為空時回傳 None
+    """
+    store = services["store"]
 
     # 2. 獲取持倉數據
     print("📊 正在讀取 Google Sheet 持倉數據...")
-    portfolio_df = sheet_service.get_portfolio_data()
+    # 快照與快取寫入合併成單一交易
+    with timed("sheet_read"), store.transaction():
+        portfolio_df = services["sheet"].get_portfolio_data()
     
     if portfolio_df.empty:
         print("❌ 無法獲取有效數據 (Google Sheet 為空且 Mock 數據未啟用)，程式終止。")
-        return
+        return None
 
     # 3. 準備數據容器
     tech_signals = {}
@@ -59,69 +410,98 @@ def main():
     print("📉 正在進行技術分析 (這可能需要一點時間)...")
     total_value = 0
     
-    for _, row in portfolio_df.iterrows():
-        symbol = row['Symbol']
-        asset_type = row['Type']
-        qty = row['Qty']
-        cost = row['Cost']
-        
-        print(f"  -> 處理中: {symbol} ({asset_type})...")
-        
-        # 抓取歷史數據
-        hist_df = market_service.get_historical_data(symbol, asset_type)
-        
-        if not hist_df.empty:
-            # 進行技術分析
-            analysis = ta_service.analyze(hist_df, asset_type)
-            
-            if analysis:
-                tech_signals[symbol] = analysis
-                # 更新最新價格與市值
-                current_price = analysis['current_price']
-                market_value = current_price * qty
-                total_value += market_value
-                
-                # 計算損益
-                # 如果 cost 為 0 (Free tokens)，unrealized_pl 就是 market_value
-                unrealized_pl = market_value - (cost * qty)
-                # 避免除以零 (需要 cost * qty > 0)
-                total_cost = cost * qty
-                return_rate = (unrealized_pl / total_cost) if total_cost > 0 else 0
-                
-                # 更新持倉資訊
-                portfolio_summary['assets'].append({
-                    "symbol": symbol,
-                    "type": asset_type,
-                    "qty": qty,
-                    "current_price": current_price,
-                    "market_value": market_value,
-                    "cost_basis": cost,
-                    "unrealized_pl": unrealized_pl,
-                    "return_rate": return_rate
-                })
-            else:
-                print(f"     ⚠️ 技術分析失敗: {symbol} (數據不足)")
+    holdings = [
+        (row['Symbol'], row['Type'], row['Qty'], row['Cost'])
+        for _, row in portfolio_df.iterrows()
+    ]
+    if refresh:
+        with store.transaction():
+            for symbol, asset_type, _, _ in holdings:
+                if asset_type in refresh:
+                    store.invalidate_market_data(symbol)
+
+    market_service, ta_service = services["market"], services["ta"]
+    with timed("market_data_ta"):
+        if Config.PIPELINE_CONCURRENT and len(holdings) > 1:
+            outcomes = analyze_holdings_concurrent(holdings, market_service, ta_service=ta_service,
+                                                   ta_pool=services.get("ta_pool"))
         else:
+            outcomes = analyze_holdings_sequential(holdings, market_service, ta_service)
+
+    # 依 Sheet 原始順序組裝結果，確保輸出與序列模式一致
+    for idx, (symbol, asset_type, qty, cost) in enumerate(holdings):
+        analysis, reason = outcomes[idx]
+
+        if analysis:
+            tech_signals[symbol] = analysis
+            asset = _summarize_holding(symbol, asset_type, qty, cost, analysis)
+            total_value += asset['market_value']
+            portfolio_summary['assets'].append(asset)
+        elif reason == "ta_failed":
+            print(f"     ⚠️ 技術分析失敗: {symbol} (數據不足)")
+        elif reason == "no_data":
             print(f"     ⚠️ 無法獲取歷史數據: {symbol}")
+        else:
+            print(f"     ⚠️ 處理失敗: {symbol} ({reason})")
 
     portfolio_summary['total_value'] = total_value
     print(f"💰 投資組合總價值: ${total_value:,.2f}")
+    return portfolio_summary, tech_signals
+
+
+def run_report(services=None, refresh=()):
+    """
+    日報流程本體
+    :return: 執行狀態 ('ok' / 'init_failed' / 'no_portfolio')，記錄在 run record 中
+    """
+    print("🚀 啟動 AI 投資日報機器人...")
+    
+    # 1. 初始化服務
+    services = _init_or_fail(services)
+    if services is None:
+        return "init_failed"
+
+    collected = collect_portfolio(services, refresh)
+    if collected is None:
+        return "no_portfolio"
+    portfolio_summary, tech_signals = collected
     
     # 5. 獲取市場情緒
     print("😨 正在獲取恐懼貪婪指數...")
-    sentiment = market_service.get_fear_and_greed_index()
+    with timed("sentiment"), services["store"].transaction():
+        sentiment = services["market"].get_market_sentiment()
     print(f"   指數: {sentiment['value']} ({sentiment['classification']})")
     
     # 6. 生成報告
     print("🧠 正在呼叫 LLM 生成報告 (請稍候)...")
-    report = llm_service.generate_report(portfolio_summary, tech_signals, sentiment)
+    with timed("llm"):
+        report = services["llm"].generate_report(portfolio_summary, tech_signals, sentiment)
     
     # 7. 發送報告
     print("📨 正在發送 Telegram 通知...")
-    telegram_service.send_report(report)
+    with timed("telegram"):
+        services["telegram"].send_report(report)
     
     print("✅ 任務完成！")
+    return "ok"
+
+
+def run_refresh(services=None, refresh=()):
+    """
+    盤中 / 收盤後刷新：只同步持倉 K 線並更新技術訊號 (寫入本地儲存與訊號快取)，不生成、不發送報告
+    :return: 執行狀態 ('ok' / 'init_failed' / 'no_portfolio')
+    """
+    print("🔄 刷新持倉 K 線與技術訊號...")
+    services = _init_or_fail(services)
+    if services is None:
+        return "init_failed"
+    if collect_portfolio(services, refresh) is None:
+        return "no_portfolio"
+    print("✅ 刷新完成")
+    return "ok"
+
+
+JOBS = {"report": run_report, "refresh": run_refresh}
 
 if __name__ == "__main__":
     main()
-
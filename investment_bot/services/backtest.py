@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+向量化回測引擎 (Vectorized Walk-forward Backtest)
+從 Parquet K 線資料集讀取整個資產類別的收盤價寬表，以 IndicatorGraph 一次算出
+每個歷史日期的 RSI / 趨勢線 (不是每天呼叫一次 analyze)，再依進出場規則模擬持倉。
+遞迴型指標在第 t 根只用到第 t 根以前的數據，因此每個日期的訊號都等同於「當天執行 analyze」的結果
+(walk-forward，沒有未來數據)。
+
+進出場規則 (閾值與 tech_analysis / compute_signals_batch 相同)：
+- trend_rsi：多頭趨勢且未超買時進場，超買或轉空頭時出場 (預設)
+- trend    ：收盤價在趨勢線之上時持有
+- rsi      ：超賣進場、超買出場 (均值回歸)
+- bb       ：收盤跌破布林下軌進場、突破上軌出場
+週期與閾值預設取自 Config，可由 strategy_params 覆寫 (參數掃描用)。
+訊號於收盤確認並以該收盤價成交，從下一根 K 棒開始承擔損益；每次進出場扣除 BACKTEST_FEE_BPS 成本。
+"""
+
+import numpy as np
+import pandas as pd
+from ..config import Config
+from ..utils.data_store import get_data_store
+from ..utils.metrics import timed
+from .indicators import (
+    CLOSE, MIN_BARS, IndicatorGraph, bb_nodes, ema_node, rsi_node, indicator_params, right_align, unalign
+)
+
+# 策略 -> 需要的訊號群組 (只計算用得到的指標)
+STRATEGY_SIGNALS = {
+    "trend_rsi": ("rsi", "trend"),
+    "trend": ("trend",),
+    "rsi": ("rsi",),
+    "bb": ("bb",),
+}
+STRATEGIES = tuple(STRATEGY_SIGNALS)
+# 年化報酬的每年 K 棒數 (美股交易日 / 加密貨幣全年無休)
+PERIODS_PER_YEAR = {"Stock": 252, "Crypto": 365}
+
+SUMMARY_COLUMNS = ["bars", "total_return", "annual_return", "buy_hold_return", "max_drawdown",
+                   "trades", "hit_rate", "exposure"]
+
+
+def strategy_params(asset_type, overrides=None):
+    """
+    回測可調整的參數，預設值取自 Config (與 compute_signals_batch 相同)
+    - rsi / overbought / oversold：RSI 週期與超買、超賣閾值
+    - trend / trend_fallback：趨勢線 EMA 週期，以及 K 棒數不足時退回的較短 EMA
+    - bb_window / bb_std：布林帶週期與標準差倍數
+    :param overrides: 要覆寫的參數 dict
+    """
+    params = indicator_params(asset_type)
+    crypto = asset_type == 'Crypto'
+    values = {
+        "rsi": params["rsi"],
+        "overbought": Config.RSI_OVERBOUGHT,
+        "oversold": Config.RSI_OVERSOLD,
+        "trend": params["ema_trend"] if crypto else params["ema_mid"],
+        "trend_fallback": params["ema_slow"] if crypto else params["ema_fast"],
+        "bb_window": Config.BB_WINDOW,
+        "bb_std": Config.BB_STD_DEV,
+    }
+    unknown = set(overrides or {}) - set(values)
+    if unknown:
+        raise ValueError(f"未知的回測參數: {', '.join(sorted(unknown))}")
+    values.update(overrides or {})
+    return values
+
+
+def signal_series(aligned, asset_type, params=None, graph=None, groups=("rsi", "trend")):
+    """
+    整段歷史的技術訊號 (每一根 K 棒一個值)
+    :param aligned: right_align 後的收盤價 (T, N)
+    :param params: strategy_params 的結果，None 表示 Config 預設值
+    :param graph: 共用的 IndicatorGraph (參數掃描時相同週期的 EMA / RSI 只算一次)
+    :param groups: 要計算的訊號群組 (rsi / trend / bb)
+    :return: dict of (T, N) ndarray：ready，以及
+             rsi 群組 rsi, is_overbought, is_oversold；trend 群組 trend_line, bullish；
+             bb 群組 below_lower, above_upper
+    """
+    params = params or strategy_params(asset_type)
+    graph = graph or IndicatorGraph(aligned)
+    close = graph.get(CLOSE)
+    # analyze 在 K 棒數不足 MIN_BARS 時不產生訊號
+    ready = np.cumsum(~np.isnan(aligned), axis=0) >= MIN_BARS
+    signals = {"ready": ready}
+
+    with np.errstate(invalid='ignore'):
+        if "rsi" in groups:
+            rsi = graph.get(rsi_node(params["rsi"]))
+            signals.update({
+                "rsi": rsi,
+                "is_overbought": ready & (rsi > params["overbought"]),
+                "is_oversold": ready & (rsi < params["oversold"]),
+            })
+        if "trend" in groups:
+            # 趨勢線與 compute_signals_batch 相同；K 棒數不足 (EMA 仍為 NaN) 時退回較短的 EMA
+            trend = graph.get(ema_node(params["trend"]))
+            trend_line = np.where(np.isnan(trend), graph.get(ema_node(params["trend_fallback"])), trend)
+            signals.update({"trend_line": trend_line, "bullish": ready & (close > trend_line)})
+        if "bb" in groups:
+            upper, lower = (graph.get(key) for key in bb_nodes(params["bb_window"], params["bb_std"]))
+            signals.update({"below_lower": ready & (close < lower), "above_upper": ready & (close > upper)})
+    return signals
+
+
+def strategy_rules(signals, strategy):
+    """:return: (進場, 出場) 布林矩陣；同一根同時成立時以出場為準"""
+    if strategy == "trend_rsi":
+        bearish = signals["ready"] & ~signals["bullish"]
+        return signals["bullish"] & ~signals["is_overbought"], bearish | signals["is_overbought"]
+    if strategy == "trend":
+        return signals["bullish"], signals["ready"] & ~signals["bullish"]
+    if strategy == "rsi":
+        return signals["is_oversold"], signals["is_overbought"]
+    if strategy == "bb":
+        return signals["below_lower"], signals["above_upper"]
+    raise ValueError(f"未知的回測策略: {strategy} (可用: {', '.join(STRATEGIES)})")
+
+
+def simulate(aligned, entries, exits, fee_bps=0.0):
+    """
+    由進出場訊號模擬單一部位 (0 或 1)
+    :return: (held, strategy_returns)，held[t] 為第 t 根 K 棒是否持有 (前一根收盤時的部位)
+    """
+    state = np.where(exits, 0.0, np.where(entries, 1.0, np.nan))
+    position = pd.DataFrame(state).ffill().fillna(0.0).to_numpy()
+    held = np.zeros_like(position)
+    held[1:] = position[:-1]
+
+    returns = np.zeros_like(aligned)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[1:] = aligned[1:] / aligned[:-1] - 1
+    returns = np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+    turnover = np.abs(np.diff(held, axis=0, prepend=0.0))
+    return held, held * returns - turnover * fee_bps / 10_000
+
+
+def _trade_stats(held, strategy_returns):
+    """
+    逐筆交易的報酬 (以 bincount 依 (標的, 交易編號) 分組，不逐筆迴圈)
+    出場那根 K 棒的手續費算在該筆交易內
+    :return: (每個標的的交易數, 獲利交易數)
+    """
+    prev = np.zeros_like(held)
+    prev[1:] = held[:-1]
+    starts = (held == 1) & (prev == 0)
+    in_trade = (held == 1) | ((held == 0) & (prev == 1))
+    trade_id = np.cumsum(starts, axis=0)
+
+    n_trades = int(trade_id[-1].max()) + 1 if held.size else 1
+    symbol_idx = np.broadcast_to(np.arange(held.shape[1]), held.shape)
+    keys = (symbol_idx * n_trades + trade_id)[in_trade]
+    size = held.shape[1] * n_trades
+    log_returns = np.bincount(keys, weights=np.log1p(strategy_returns[in_trade]), minlength=size)
+    exists = np.bincount(keys, minlength=size) > 0
+
+    trades = exists.reshape(-1, n_trades).sum(axis=1)
+    wins = (exists & (log_returns > 0)).reshape(-1, n_trades).sum(axis=1)
+    return trades, wins
+
+
+def summarize(aligned, counts, held, strategy_returns, asset_type):
+    """每個標的的總報酬、年化報酬、買進持有報酬、最大回撤、交易次數、勝率、持倉比例"""
+    equity = np.cumprod(1 + strategy_returns, axis=0)
+    drawdown = equity / np.maximum.accumulate(equity, axis=0) - 1
+    total = equity[-1] - 1
+
+    first = aligned[np.minimum(len(aligned) - counts, len(aligned) - 1), np.arange(aligned.shape[1])]
+    trades, wins = _trade_stats(held, strategy_returns)
+    periods = PERIODS_PER_YEAR.get(asset_type, 252)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return pd.DataFrame({
+            "bars": counts,
+            "total_return": total,
+            "annual_return": np.where(counts > 1, (1 + total) ** (periods / np.maximum(counts - 1, 1)) - 1, np.nan),
+            "buy_hold_return": aligned[-1] / first - 1,
+            "max_drawdown": drawdown.min(axis=0),
+            "trades": trades,
+            "hit_rate": np.where(trades > 0, wins / np.maximum(trades, 1), np.nan),
+            "exposure": np.where(counts > 0, held.sum(axis=0) / np.maximum(counts, 1), np.nan),
+        }, columns=SUMMARY_COLUMNS)
+
+
+class BacktestResult:
+    """
+    回測結果
+    - summary  ：每個標的一列的績效摘要 (SUMMARY_COLUMNS)
+    - returns  ：每日策略報酬 (index: 日期, columns: 標的)；該標的沒有 K 棒的日期為 NaN
+    - positions：每日持倉 (0 / 1)
+    """
+
+    def __init__(self, summary, returns, positions, strategy, asset_type):
+        self.summary = summary
+        self.returns = returns
+        self.positions = positions
+        self.strategy = strategy
+        self.asset_type = asset_type
+
+    @property
+    def equity(self):
+        """每個標的的策略淨值曲線 (起始為 1)"""
+        return (1 + self.returns.fillna(0)).cumprod()
+
+
+def evaluate(aligned, counts, asset_type, strategy, params=None, fee_bps=0.0, graph=None):
+    """
+    右對齊空間中的一次回測
+    :return: (held, strategy_returns, summary)
+    """
+    if strategy not in STRATEGY_SIGNALS:
+        raise ValueError(f"未知的回測策略: {strategy} (可用: {', '.join(STRATEGIES)})")
+    signals = signal_series(aligned, asset_type, params, graph=graph, groups=STRATEGY_SIGNALS[strategy])
+    entries, exits = strategy_rules(signals, strategy)
+    held, strategy_returns = simulate(aligned, entries, exits, fee_bps)
+    return held, strategy_returns, summarize(aligned, counts, held, strategy_returns, asset_type)
+
+
+def backtest_panel(panel, asset_type, strategy=None, fee_bps=None, params=None):
+    """
+    對收盤價寬表回測 (同一面板內的標的屬同一資產類別)
+    :param panel: DataFrame (index: 日期, columns: 標的)，各標的上市日不同或有缺值皆可
+    :param strategy: STRATEGIES 之一，預設 Config.BACKTEST_STRATEGY
+    :param fee_bps: 單邊交易成本 (bps)，預設 Config.BACKTEST_FEE_BPS
+    :param params: 覆寫的策略參數 (見 strategy_params)
+    :return: BacktestResult
+    """
+    strategy = strategy or Config.BACKTEST_STRATEGY
+    fee_bps = Config.BACKTEST_FEE_BPS if fee_bps is None else fee_bps
+    panel = panel.sort_index()
+
+    aligned, counts, order = right_align(panel, return_order=True)
+    held, strategy_returns, summary = evaluate(aligned, counts, asset_type, strategy,
+                                               strategy_params(asset_type, params), fee_bps)
+    summary.index = pd.Index(panel.columns, name="symbol")
+
+    # 放回日期對齊的位置；該標的沒有 K 棒的日期 (上市前 / 停牌) 為 NaN
+    missing = panel.isna().to_numpy()
+    returns = np.where(missing, np.nan, unalign(strategy_returns, order))
+    positions = np.where(missing, np.nan, unalign(held, order))
+    return BacktestResult(
+        summary,
+        pd.DataFrame(returns, index=panel.index, columns=panel.columns),
+        pd.DataFrame(positions, index=panel.index, columns=panel.columns),
+        strategy, asset_type,
+    )
+
+
+class BacktestService:
+    def __init__(self, store=None):
+        """:param store: 注入的 DataStore，未提供時使用行程內共用的 Store"""
+        self.store = store or get_data_store()
+
+    def run(self, asset_type, symbols=None, start=None, end=None, strategy=None, fee_bps=None, params=None):
+        """
+        以 Parquet 資料集中已儲存的歷史 K 線回測
+        :param symbols: 標的清單，None 表示該資產類別下已儲存的全部標的
+        :param start / end: 日期範圍 (含)；指標從 start 起算，需要暖身期時請提早 start
+        :param params: 覆寫的策略參數 (見 strategy_params)
+        :return: BacktestResult，沒有數據時 summary 為空
+        """
+        with timed("backtest.load"):
+            panel = self.store.market_data.read_panel(asset_type, symbols=symbols, start=start, end=end)
+        if panel.empty:
+            empty = pd.DataFrame(columns=SUMMARY_COLUMNS, index=pd.Index([], name="symbol"))
+            return BacktestResult(empty, pd.DataFrame(), pd.DataFrame(), strategy or Config.BACKTEST_STRATEGY,
+                                  asset_type)
+        with timed("backtest.simulate"):
+            return backtest_panel(panel, asset_type, strategy=strategy, fee_bps=fee_bps, params=params)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""
+非同步加密貨幣數據服務 (Async Crypto Data Service)
+使用 ccxt.async_support 並行呼叫 fetch_ohlcv，
+並以 Token Bucket 控制 Binance 請求權重 (1200 weight / 分鐘)。
+"""
+
+import asyncio
+import threading
+from datetime import datetime
+import pandas as pd
+from ..config import Config
+from ..utils.rate_limiter import AsyncTokenBucket, binance_klines_weight
+
+# Binance klines 單次最多回傳的 K 棒數
+OHLCV_PAGE_LIMIT = 1000
+
+# 每次 fetch_history_many 各自以 asyncio.run 建立 event loop 與 semaphore，
+# 多個執行緒同時呼叫 (例如 screener 的多個批次) 時在途請求數會變成 執行緒數 x max_concurrency，
+# 因此序列化：同一時間只有一個 loop 在對 Binance 發出請求
+_FETCH_LOCK = threading.Lock()
+
+
+class AsyncCryptoDataService:
+    def __init__(self, exchange_factory=None, limiter=None, max_concurrency=None, weight_fn=binance_klines_weight):
+        """
+        :param exchange_factory: 回傳 (async) exchange 物件的函式；預設為 ccxt.async_support.binance，
+                                 測試時可傳入假的交易所物件
+        :param limiter: AsyncTokenBucket，預設依 Config.BINANCE_WEIGHT_PER_MINUTE 建立；
+                        同一個 limiter 會在多次呼叫間共用，以正確累計權重
+        :param max_concurrency: 同時進行中的請求上限
+        :param weight_fn: 依 limit 計算單次請求權重的函式
+        """
+        self.exchange_factory = exchange_factory or self._default_exchange
+        self.limiter = limiter or AsyncTokenBucket.per_minute(Config.BINANCE_WEIGHT_PER_MINUTE)
+        self.max_concurrency = max_concurrency or Config.CRYPTO_ASYNC_CONCURRENCY
+        self.weight_fn = weight_fn
+
+    @staticmethod
+    def _default_exchange():
+        import ccxt.async_support as ccxt_async
+        # 權重由我們自己的 limiter 控制，關閉 ccxt 內建的固定間隔節流
+        return ccxt_async.binance({'enableRateLimit': False})
+
+    async def _fetch_one(self, exchange, semaphore, pair, timeframe, since, limit):
+        async with semaphore:
+            page = await self._fetch_page(exchange, pair, timeframe, since, limit)
+            ohlcv = list(page)
+            # 從較早的時間點重建歷史時超過單次上限，從最後一根之後繼續抓下一頁
+            since = next_page_since(page, since, limit)
+            while since is not None:
+                page = await self._fetch_page(exchange, pair, timeframe, since, limit)
+                ohlcv.extend(page)
+                since = next_page_since(page, since, limit)
+            return ohlcv
+
+    async def _fetch_page(self, exchange, pair, timeframe, since, limit):
+        await self.limiter.acquire(self.weight_fn(limit))
+        ohlcv = await exchange.fetch_ohlcv(pair, timeframe, since=since, limit=limit)
+
+        # 以交易所回報的實際已用權重校正 limiter
+        headers = getattr(exchange, 'last_response_headers', None) or {}
+        used = headers.get('x-mbx-used-weight-1m') or headers.get('X-MBX-USED-WEIGHT-1M')
+        if used:
+            self.limiter.sync_used_weight(int(used), Config.BINANCE_WEIGHT_PER_MINUTE)
+        return ohlcv
+
+    async def fetch_ohlcv_many(self, requests):
+        """
+        並行抓取多組 OHLCV
+        :param requests: {key: (pair, timeframe, since, limit)}
+        :return: {key: ohlcv list 或 Exception}，單一請求失敗不影響其他請求
+        """
+        exchange = self.exchange_factory()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        try:
+            keys = list(requests)
+            results = await asyncio.gather(
+                *(self._fetch_one(exchange, semaphore, *requests[key]) for key in keys),
+                return_exceptions=True
+            )
+            return dict(zip(keys, results))
+        finally:
+            close = getattr(exchange, 'close', None)
+            if close is not None:
+                await close()
+
+    def fetch_history_many(self, symbols, days=200, since=None, timeframe='1d'):
+        """
+        同步介面：並行抓取多個加密貨幣的歷史 K 線
+        :param symbols: Sheet 中的代號 (例如 BTC)，依 Config.CRYPTO_MAPPING 轉成交易對
+        :param since: {symbol: Timestamp}，有指定的標的只抓該時間點之後的 K 棒 (增量同步)
+        :return: {symbol: DataFrame}，失敗的標的為空 DataFrame
+        """
+        since = since or {}
+        requests = {}
+        for symbol in symbols:
+            pair = Config.CRYPTO_MAPPING.get(symbol, f"{symbol}/USDT")
+            since_ms, limit = ohlcv_request_window(days, since.get(symbol))
+            requests[symbol] = (pair, timeframe, since_ms, limit)
+
+        with _FETCH_LOCK:
+            results = asyncio.run(self.fetch_ohlcv_many(requests))
+
+        frames = {}
+        for symbol, ohlcv in results.items():
+            if isinstance(ohlcv, Exception):
+                print(f"ccxt 下載錯誤 {requests[symbol][0]}: {ohlcv}")
+                frames[symbol] = pd.DataFrame()
+            else:
+                frames[symbol] = ohlcv_to_frame(ohlcv)
+        return frames
+
+
+def ohlcv_request_window(days, since=None):
+    """
+    計算日線 fetch_ohlcv 的 (since, limit)
+    - 未指定 since：抓最近 days + 100 根 (指標計算需要 buffer)
+    - 指定 since (增量同步)：只抓該時間點之後的 K 棒，Binance 單次上限 1000 根 (超過時分頁，見 next_page_since)
+    """
+    if since is None:
+        return None, days + 100
+    since = pd.Timestamp(since)
+    now = pd.Timestamp(datetime.now())
+    if since.tzinfo is not None:
+        now = now.tz_localize(since.tzinfo)
+    return int(since.value // 10**6), min(OHLCV_PAGE_LIMIT, (now - since).days + 2)
+
+
+def next_page_since(page, since, limit):
+    """
+    指定 since 的請求整頁抓滿 (單次上限) 時，回傳下一頁的 since (最後一根 K 棒之後)；
+    沒有下一頁時回傳 None
+    """
+    if since is None or limit < OHLCV_PAGE_LIMIT or len(page) < limit:
+        return None
+    return page[-1][0] + 1
+
+
+def ohlcv_to_frame(ohlcv):
+    """將 ccxt 回傳的 [[ts, o, h, l, c, v], ...] 轉換為以日期為 index 的 DataFrame"""
+    df = pd.DataFrame(ohlcv, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])
+    df['Date'] = pd.to_datetime(df['Timestamp'], unit='ms')
+    df.set_index('Date', inplace=True)
+    df.drop(columns=['Timestamp'], inplace=True)
+    return df
@@ -6,26 +6,69 @@ Google Sheet 服務 (Google Sheet Service)
 """
 
 import os
+import json
+import hashlib
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
 from ..config import Config
-from ..utils.data_store import DataStore
+from ..utils.data_store import get_data_store
+from ..utils.compact_frames import compact_portfolio
+from ..utils.metrics import get_metrics, timed
+from ..utils.lazy import lazy_import
+
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+
+# 標準化後的數值欄位 (ReturnRate 另外處理百分比)
+NUMERIC_COLUMNS = ['Qty', 'Cost', 'MarketPrice', 'UnrealizedPL', 'TotalCost', 'MarketValue']
+
+PORTFOLIO_CACHE_KEY = "portfolio_data"
+PORTFOLIO_CACHE_TTL_MINUTES = 60
+# 持倉表雜湊：需比持倉快取保留更久，快取過期後仍能判斷表格是否變動
+FINGERPRINT_CACHE_KEY = "portfolio_fingerprint"
+FINGERPRINT_TTL_MINUTES = 7 * 24 * 60
+
+def _parse_numbers(values, strip=('$', ',')):
+    """
+    儲存格字串 -> float64 ndarray：移除 strip 中的字元與前後空白，空白儲存格為 NaN
+    金額 / 數量欄位只移除 $ ,；百分比只出現在 ReturnRate，由呼叫端以 strip=('%',) 另外轉換，
+    其他欄位出現 "5%" 仍視為無法解析 (與逐列轉換時相同)
+    以 Arrow compute 整批轉換；含無法解析的內容時改以 pd.to_numeric(errors='coerce') 容錯 (該格為 NaN)
+    """
+    arr = pa.array(values, type=pa.string(), from_pandas=True)
+    for char in strip:
+        arr = pc.replace_substring(arr, char, '')
+    arr = pc.utf8_trim_whitespace(arr)
+    arr = pc.if_else(pc.equal(arr, ''), pa.scalar(None, pa.string()), arr)
+    try:
+        return pc.cast(arr, pa.float64()).to_numpy(zero_copy_only=False)
+    except pa.ArrowInvalid:
+        cells = pd.Series(arr.to_numpy(zero_copy_only=False), dtype=object)
+        return pd.to_numeric(cells, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def _cells(column):
+    """欄位 -> object ndarray：缺少欄位時補上的 0 先轉成字串，原本的字串欄位 (含 None) 直接使用"""
+    return column.to_numpy(dtype=object) if column.dtype == object else column.astype(str).to_numpy(dtype=object)
+
 
 class GoogleSheetService:
-    def __init__(self):
-        """初始化 Google Sheet 服務（支援雙來源：美股 + 加密貨幣）"""
+    def __init__(self, store=None):
+        """
+        初始化 Google Sheet 服務（支援雙來源：美股 + 加密貨幣）
+        :param store: 注入的 DataStore，未提供時使用行程內共用的 Store
+        """
         self.creds_file = Config.GOOGLE_CREDENTIALS_FILE
         self.stock_sheet_id = Config.GOOGLE_SHEET_ID_STOCK
         self.crypto_sheet_id = Config.GOOGLE_SHEET_ID_CRYPTO
         self.scopes = ['https://www.googleapis.com/auth/spreadsheets.readonly']
         self.service = None
-        self.store = DataStore()
+        self.store = store or get_data_store()
         
         # 驗證至少有一個 Sheet ID 被配置
-        if not self.stock_sheet_id and not self.crypto_sheet_id:
-            print(f"  [GoogleSheet] 警告：未配置任何 Sheet ID，將使用 Mock 數據模式。")
+        if not self.stock_sheet_id and not self.crypto_sheet_id and not Config.GOOGLE_SHEET_SOURCES:
+            print("  [GoogleSheet] 警告：未配置任何 Sheet ID，將使用 Mock 數據模式。")
         
         # 如果憑證檔案存在才初始化，方便測試時不報錯
         if os.path.exists(self.creds_file):
@@ -41,10 +84,13 @@ class GoogleSheetService:
                 print(f"  [GoogleSheet] 憑證驗證失敗: {e}")
         else:
             print(f"  [GoogleSheet] 憑證檔不存在: {self.creds_file}，目前工作目錄: {os.getcwd()}")
-            print(f"  [GoogleSheet] 將使用 Mock 數據模式。")
+            print("  [GoogleSheet] 將使用 Mock 數據模式。")
 
     def _authenticate(self):
-        """驗證並建立 Sheet 服務實例"""
+        """驗證並建立 Sheet 服務實例 (googleapiclient 載入很慢，只在實際連線時 import)"""
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+
         creds = service_account.Credentials.from_service_account_file(
             self.creds_file, scopes=self.scopes)
         return build('sheets', 'v4', credentials=creds)
@@ -63,62 +109,111 @@ class GoogleSheetService:
         """
         if not sheet_id:
             return pd.DataFrame()
-        
+        sources = [(source_label, sheet_id, range_name)]
+        raw = self._fetch_values(sources)
+        if (sheet_id, range_name) not in raw:
+            return pd.DataFrame()
+        return self._parse_sheet(raw[(sheet_id, range_name)], source_label)
+
+    def _sheet_sources(self, range_name):
+        """
+        所有要讀取的來源 [(label, sheet_id, range)]：
+        美股 / 加密貨幣 Sheet，加上 GOOGLE_SHEET_SOURCES 額外設定的 "sheet_id|range"
+        """
+        sources = []
+        if self.stock_sheet_id:
+            sources.append(("美股", self.stock_sheet_id, range_name))
+        if self.crypto_sheet_id:
+            sources.append(("加密貨幣", self.crypto_sheet_id, range_name))
+        entries = [entry.strip() for entry in (Config.GOOGLE_SHEET_SOURCES or "").split(",") if entry.strip()]
+        for i, entry in enumerate(entries, 1):
+            sheet_id, _, extra_range = entry.partition("|")
+            sources.append((f"來源{i}", sheet_id.strip(), extra_range.strip() or range_name))
+        return sources
+
+    def _fetch_values(self, sources):
+        """
+        讀取所有來源的原始表格：同一個 spreadsheet 的所有 range 合併成一次 values().batchGet
+        (batchGet 無法跨 spreadsheet，美股與加密貨幣在不同檔案時仍是每個檔案一次請求)
+        :return: {(sheet_id, range): values}，讀取失敗的來源不在結果中
+        """
         if not self.service:
-            print(f"  [GoogleSheet] 服務未初始化，無法讀取 {source_label}。")
+            print(f"  [GoogleSheet] 服務未初始化，無法讀取 {', '.join(label for label, _, _ in sources)}。")
+            return {}
+
+        ranges_by_sheet = {}
+        for _, sheet_id, range_name in sources:
+            ranges = ranges_by_sheet.setdefault(sheet_id, [])
+            if range_name not in ranges:
+                ranges.append(range_name)
+
+        raw = {}
+        for sheet_id, ranges in ranges_by_sheet.items():
+            print(f"  [GoogleSheet] 正在讀取 (ID: {sheet_id}, Ranges: {ranges})...")
+            fetched = self._batch_get(sheet_id, ranges)
+            raw.update({(sheet_id, range_name): values for range_name, values in fetched.items()})
+        return raw
+
+    def _batch_get(self, sheet_id, ranges):
+        """
+        單一 spreadsheet 的 batchGet；Range 錯誤時 (通常是頁簽名稱不對) 讀一次頁簽清單，
+        不存在的頁簽改讀第一個頁簽後重試一次
+        :return: {原本的 range: values}
+        """
+        sheet = self.service.spreadsheets()
+        try:
+            return self._batch_values(sheet, sheet_id, ranges, ranges)
+        except Exception as range_error:
+            print(f"  [GoogleSheet] {sheet_id} Range 錯誤: {range_error}")
+            print(f"  [GoogleSheet] 嘗試列出 {sheet_id} 的所有可用頁簽...")
+
+        try:
+            metadata = self._execute(sheet.get(spreadsheetId=sheet_id, fields='sheets.properties.title'))
+            sheet_names = [s['properties']['title'] for s in metadata.get('sheets', [])]
+            print(f"  [GoogleSheet] {sheet_id} 可用的頁簽: {sheet_names}")
+            if not sheet_names:
+                print(f"  [GoogleSheet] {sheet_id} 中沒有找到任何頁簽")
+                return {}
+            # 頁簽不存在的 range 改用第一個頁簽
+            fallback = [
+                range_name if self._tab_name(range_name) in sheet_names else f"{sheet_names[0]}!A:Z"
+                for range_name in ranges
+            ]
+            print(f"  [GoogleSheet] {sheet_id} 改用頁簽範圍: {fallback}")
+            return self._batch_values(sheet, sheet_id, ranges, fallback)
+        except Exception as e2:
+            print(f"  [GoogleSheet] 無法讀取 {sheet_id}: {e2}")
+            return {}
+
+    def _batch_values(self, sheet, sheet_id, ranges, request_ranges):
+        """batchGet 回傳的 valueRanges 與請求的 ranges 順序相同 (API 回傳的 range 名稱會被正規化，不能拿來對應)"""
+        unique = list(dict.fromkeys(request_ranges))
+        result = self._execute(sheet.values().batchGet(spreadsheetId=sheet_id, ranges=unique))
+        values = dict(zip(unique, (vr.get('values', []) for vr in result.get('valueRanges', []))))
+        return {range_name: values.get(request, []) for range_name, request in zip(ranges, request_ranges)}
+
+    @staticmethod
+    def _tab_name(range_name):
+        """'總損益'!A:Z -> 總損益；沒有頁簽名稱時回傳 None"""
+        if '!' not in range_name:
+            return None
+        return range_name.rsplit('!', 1)[0].strip("'")
+
+    def _parse_sheet(self, values, source_label="Sheet"):
+        """將 Sheets API 回傳的原始表格 (第一列為表頭) 標準化成持倉 DataFrame"""
+        if not values:
+            print(f"  [GoogleSheet] {source_label} API 回傳成功，但沒有數據 (values is empty)。")
             return pd.DataFrame()
-        
+
         try:
-            print(f"  [GoogleSheet] 正在讀取 {source_label} (ID: {sheet_id}, Range: {range_name})...")
-            sheet = self.service.spreadsheets()
-            
-            # 先嘗試讀取，如果失敗可能是頁簽名稱不對
-            try:
-                result = sheet.values().get(spreadsheetId=sheet_id,
-                                            range=range_name).execute()
-                values = result.get('values', [])
-            except Exception as range_error:
-                # 如果 Range 錯誤，嘗試列出所有可用的頁簽
-                print(f"  [GoogleSheet] {source_label} Range 錯誤: {range_error}")
-                print(f"  [GoogleSheet] 嘗試列出 {source_label} 的所有可用頁簽...")
-                try:
-                    metadata = sheet.get(spreadsheetId=sheet_id).execute()
-                    sheet_names = [s['properties']['title'] for s in metadata.get('sheets', [])]
-                    print(f"  [GoogleSheet] {source_label} 可用的頁簽: {sheet_names}")
-                    if sheet_names:
-                        # 使用第一個頁簽
-                        first_sheet = sheet_names[0]
-                        print(f"  [GoogleSheet] {source_label} 改用第一個頁簽: {first_sheet}")
-                        range_name = f"{first_sheet}!A:Z"
-                        result = sheet.values().get(spreadsheetId=sheet_id,
-                                                    range=range_name).execute()
-                        values = result.get('values', [])
-                    else:
-                        print(f"  [GoogleSheet] {source_label} 中沒有找到任何頁簽")
-                        return pd.DataFrame()
-                except Exception as e2:
-                    print(f"  [GoogleSheet] 無法讀取 {source_label}: {e2}")
-                    return pd.DataFrame()
-
-            if not values:
-                print(f"  [GoogleSheet] {source_label} API 回傳成功，但沒有數據 (values is empty)。")
-                return pd.DataFrame()
-            
             print(f"  [GoogleSheet] 成功讀取 {source_label} {len(values)} 行數據。")
             df = pd.DataFrame(values[1:], columns=values[0])
             
             # 基本清洗：移除沒有 stock/token 的行
-            if 'stock' in df.columns:
-                df = df.dropna(subset=['stock'])
-                df = df[df['stock'] != '']
-            elif 'token' in df.columns:
-                # 加密貨幣 Sheet 使用 'token' 欄位
-                df = df.dropna(subset=['token'])
-                df = df[df['token'] != '']
-            elif 'Symbol' in df.columns:
-                # 兼容舊的英文欄位名稱
-                df = df.dropna(subset=['Symbol'])
-                df = df[df['Symbol'] != '']
+            # 加密貨幣 Sheet 使用 'token' 欄位，'Symbol' 為兼容舊的英文欄位名稱
+            key_col = next((col for col in ('stock', 'token', 'Symbol') if col in df.columns), None)
+            if key_col is not None:
+                df = df[df[key_col].notna() & (df[key_col] != '')]
             else:
                 print(f"  [GoogleSheet] {source_label} 警告: 找不到 'stock'、'token' 或 'Symbol' 欄位")
             
@@ -154,118 +249,177 @@ class GoogleSheetService:
                     print(f"  [GoogleSheet] {source_label} 警告: 缺少欄位 {col}，將自動補零。")
                     df[col] = 0
 
-            # 數值轉換 (移除 $ , 等符號並轉 float)
-            numeric_cols = ['Qty', 'Cost', 'MarketPrice', 'UnrealizedPL', 'TotalCost', 'MarketValue']
-            for col in numeric_cols:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(
-                        df[col].astype(str).str.replace(r'[$,]', '', regex=True), 
-                        errors='coerce'
-                    ).fillna(0)
+            # 數值轉換：所有數值欄位攤平成一個陣列，一次移除 $ , 並轉成 float (無法解析補 0)
+            numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns]
+            flat = np.concatenate([_cells(df[col]) for col in numeric_cols])
+            parsed = np.nan_to_num(_parse_numbers(flat), nan=0.0).reshape(len(df), len(numeric_cols), order='F')
+            df = df.assign(**{col: parsed[:, i] for i, col in enumerate(numeric_cols)})
 
-            # 處理百分比欄位 (ReturnRate)
             if 'ReturnRate' in df.columns:
-                # 將 "34.8%" 轉換為 0.348
-                df['ReturnRate'] = df['ReturnRate'].astype(str).str.replace('%', '').apply(
-                    lambda x: pd.to_numeric(x, errors='coerce') / 100 if x.strip() != '' else 0
-                ).fillna(0)
+                # 將 "34.8%" 轉換為 0.348 (空白或無法解析時為 0)
+                rate = _parse_numbers(_cells(df['ReturnRate']), strip=('%',))
+                df['ReturnRate'] = np.nan_to_num(rate, nan=0.0) / 100
             else:
                 # 如果沒有 ReturnRate 欄位，自動計算
-                df['ReturnRate'] = df.apply(
-                    lambda row: (row['MarketPrice'] - row['Cost']) / row['Cost'] 
-                    if row['Cost'] != 0 else 0, 
-                    axis=1
-                )
+                cost = df['Cost'].to_numpy()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    df['ReturnRate'] = np.where(cost != 0, (df['MarketPrice'].to_numpy() - cost) / cost, 0.0)
 
             # 區分 Type (Crypto / Stock)
-            crypto_keys = set(Config.CRYPTO_MAPPING.keys())
-            
-            def determine_type(symbol):
-                symbol = str(symbol).upper().strip()
-                if symbol in crypto_keys:
-                    return 'Crypto'
-                return 'Stock'
-
-            df['Type'] = df['Symbol'].apply(determine_type)
+            # 交易紀錄中同一標的會重複出現，只對不重複的代號做字串正規化
+            crypto_keys = list(Config.CRYPTO_MAPPING.keys())
+            codes, uniques = pd.factorize(df['Symbol'].astype(str))
+            is_crypto = pd.Index(uniques).str.strip().str.upper().isin(crypto_keys)
+            df['Type'] = np.where(is_crypto[codes], 'Crypto', 'Stock')
             
             print(f"  [GoogleSheet] {source_label} 數據處理完成，共 {len(df)} 筆。")
             return df
             
         except Exception as e:
-            print(f"  [GoogleSheet] 讀取 {source_label} 時發生錯誤: {e}")
+            print(f"  [GoogleSheet] 解析 {source_label} 時發生錯誤: {e}")
             return pd.DataFrame()
 
+    @staticmethod
+    def _execute(request):
+        """執行 Sheets API 請求並記錄呼叫次數與回傳的儲存格字元數"""
+        with timed("fetch.google_sheets"):
+            result = request.execute()
+        value_ranges = result.get('valueRanges', [result])
+        nbytes = sum(len(str(cell)) for vr in value_ranges for row in vr.get('values', []) for cell in row)
+        get_metrics().api_call("google_sheets", nbytes)
+        return result
+
     def get_portfolio_data(self, range_name=None):
         """
-        讀取持倉數據並標準化（支援雙來源：美股 + 加密貨幣）
-        Logic: Check Cache (1h TTL) -> Fetch from Multiple Sheets -> Merge -> Save Snapshot & Update Cache
+        讀取持倉數據並標準化（支援多來源：美股 + 加密貨幣 + GOOGLE_SHEET_SOURCES）
+        Logic: Check Cache (1h TTL) -> batchGet Raw Values -> Unchanged? Reuse Cache
+               -> Parse & Merge -> Save Snapshot & Update Cache
         """
         # 如果沒有指定 range_name，使用 Config 中的預設值
         if range_name is None:
             range_name = Config.GOOGLE_SHEET_RANGE
         
-        cache_key = "portfolio_data"
-        
         # 1. Check Cache (TTL: 60 minutes)
-        cached_data = self.store.get_cache(cache_key)
-        if cached_data:
+        cached_df = self._cached_portfolio()
+        get_metrics().cache_lookup("portfolio", cached_df is not None)
+        if cached_df is not None:
             # print("  [Portfolio Cache Hit]")
-            # Cache stores JSON, need to convert back to DataFrame
-            return pd.DataFrame(cached_data)
+            return self._compact(cached_df)
+
+        # 2. Fetch raw values from API (每個 spreadsheet 一次 batchGet)
+        sources = self._sheet_sources(range_name)
+        raw = self._fetch_values(sources) if sources else {}
+        today = datetime.now().strftime('%Y-%m-%d')
+
+        # 2.1 原始表格與上次相同時沿用快取，不重新解析
+        fingerprint = None
+        if raw and Config.GOOGLE_SHEET_CHANGE_DETECTION:
+            fingerprint = self._fingerprint(sources, raw)
+            df = self._reuse_unchanged(fingerprint, today)
+            if df is not None:
+                return self._compact(df)
+
+        # 2.2 解析各來源
+        frames = []
+        for label, sheet_id, source_range in sources:
+            if (sheet_id, source_range) in raw:
+                parsed = self._parse_sheet(raw[(sheet_id, source_range)], label)
+                if not parsed.empty:
+                    frames.append((label, parsed))
 
-        # 2. Fetch from API (支援雙來源)
-        stock_df = pd.DataFrame()
-        crypto_df = pd.DataFrame()
-        
-        # 2.1 讀取美股 Sheet
-        if self.stock_sheet_id:
-            stock_df = self._fetch_single_sheet(self.stock_sheet_id, range_name, "美股")
-        
-        # 2.2 讀取加密貨幣 Sheet
-        if self.crypto_sheet_id:
-            crypto_df = self._fetch_single_sheet(self.crypto_sheet_id, range_name, "加密貨幣")
-        
         # 2.3 合併數據
-        if not stock_df.empty and not crypto_df.empty:
-            # 兩個都有數據，需要合併
-            # 先確保欄位一致，補齊缺失的欄位
-            all_cols = list(set(stock_df.columns) | set(crypto_df.columns))
-            for col in all_cols:
-                if col not in stock_df.columns:
-                    stock_df[col] = 0 if col in ['Qty', 'Cost', 'MarketPrice', 'UnrealizedPL', 'ReturnRate', 'TotalCost', 'MarketValue'] else ''
-                if col not in crypto_df.columns:
-                    crypto_df[col] = 0 if col in ['Qty', 'Cost', 'MarketPrice', 'UnrealizedPL', 'ReturnRate', 'TotalCost', 'MarketValue'] else ''
-            
-            # 轉成 dict list 再重新建立 DataFrame 避免 index 衝突
-            combined_data = stock_df.to_dict('records') + crypto_df.to_dict('records')
-            df = pd.DataFrame(combined_data)
-            print(f"  [GoogleSheet] 合併完成，共 {len(df)} 筆持倉數據 (美股: {len(stock_df)}, 加密貨幣: {len(crypto_df)})。")
-        elif not stock_df.empty:
-            # 只有美股數據
-            df = stock_df.copy()
-            print(f"  [GoogleSheet] 只讀取到美股數據，共 {len(df)} 筆。")
-        elif not crypto_df.empty:
-            # 只有加密貨幣數據
-            df = crypto_df.copy()
-            print(f"  [GoogleSheet] 只讀取到加密貨幣數據，共 {len(df)} 筆。")
+        if len(frames) > 1:
+            # 多個來源都有數據，需要合併
+            df = self._merge_frames([frame for _, frame in frames])
+            counts = ", ".join(f"{label}: {len(frame)}" for label, frame in frames)
+            print(f"  [GoogleSheet] 合併完成，共 {len(df)} 筆持倉數據 ({counts})。")
+        elif frames:
+            # 只有單一來源有數據
+            label, df = frames[0]
+            df = df.copy()
+            print(f"  [GoogleSheet] 只讀取到{label}數據，共 {len(df)} 筆。")
         else:
-            # 如果兩個都沒有數據，使用 Mock Data（僅限測試）
+            # 如果都沒有數據，使用 Mock Data（僅限測試），不記錄雜湊
             print("  [GoogleSheet] 未讀取到任何數據，使用 Mock Data。")
             df = self._get_mock_data()
+            fingerprint = None
 
         # 3. Save Snapshot to DB & Cache
         if not df.empty:
-            today = datetime.now().strftime('%Y-%m-%d')
-            
             # Save historical snapshot to SQLite
             self.store.save_portfolio_snapshot(df, today)
             
             # Save to Cache (for short-term reuse)
-            # Convert DataFrame to dict record for JSON serialization
-            self.store.set_cache(cache_key, df.to_dict('records'), ttl_minutes=60)
+            # DataFrame 以 Arrow IPC 存成 BLOB，讀回時 dtype 不變
+            self.store.set_cache(PORTFOLIO_CACHE_KEY, df, ttl_minutes=PORTFOLIO_CACHE_TTL_MINUTES)
+            if fingerprint:
+                self.store.set_cache(FINGERPRINT_CACHE_KEY, {"hash": fingerprint, "snapshot_date": today},
+                                     ttl_minutes=FINGERPRINT_TTL_MINUTES)
             
+        return self._compact(df)
+
+    def _cached_portfolio(self):
+        """
+        快取中的持倉表 (複本，呼叫端可修改)；不存在或為空時回傳 None
+        舊版快取以 JSON records 儲存，同樣轉回 DataFrame
+        """
+        cached = self.store.get_cache(PORTFOLIO_CACHE_KEY)
+        if cached is None or len(cached) == 0:
+            return None
+        return cached.copy() if isinstance(cached, pd.DataFrame) else pd.DataFrame(cached)
+
+    @staticmethod
+    def _merge_frames(frames):
+        """
+        合併多個來源的持倉表 (單一 pd.concat)
+        先確保欄位一致：其他來源才有的欄位，數值補 0、文字補空字串
+        """
+        all_cols = list(dict.fromkeys(col for frame in frames for col in frame.columns))
+        return pd.concat([
+            frame.assign(**{col: 0 if col in NUMERIC_COLUMNS + ['ReturnRate'] else ''
+                            for col in all_cols if col not in frame.columns})
+            for frame in frames
+        ], ignore_index=True)
+
+    @staticmethod
+    def _fingerprint(sources, raw):
+        """
+        原始表格的雜湊 (Sheets v4 API 不提供 revision，需另外呼叫 Drive API，因此直接比對內容)
+        CRYPTO_MAPPING 影響 Type 判斷，一併納入
+        """
+        payload = json.dumps({
+            "sources": [[sheet_id, source_range] for _, sheet_id, source_range in sources],
+            "values": [raw.get((sheet_id, source_range)) for _, sheet_id, source_range in sources],
+            "crypto": sorted(Config.CRYPTO_MAPPING),
+        }, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+
+    def _reuse_unchanged(self, fingerprint, today):
+        """
+        雜湊與上次相同：延長既有持倉快取的 TTL (不重寫內容)，當天已寫過快照則不再寫入
+        :return: 沿用的持倉 DataFrame；持倉有變動或快取已被刪除時回傳 None (需重新解析)
+        """
+        previous = self.store.get_cache(FINGERPRINT_CACHE_KEY)
+        unchanged = bool(previous) and previous.get("hash") == fingerprint
+        get_metrics().cache_lookup("portfolio_fingerprint", unchanged)
+        if not unchanged or not self.store.refresh_cache_ttl(PORTFOLIO_CACHE_KEY, PORTFOLIO_CACHE_TTL_MINUTES):
+            return None
+        df = self._cached_portfolio()
+        if df is None:
+            return None
+
+        if previous.get("snapshot_date") != today:
+            self.store.save_portfolio_snapshot(df, today)
+            self.store.set_cache(FINGERPRINT_CACHE_KEY, {"hash": fingerprint, "snapshot_date": today},
+                                 ttl_minutes=FINGERPRINT_TTL_MINUTES)
+        print(f"  [GoogleSheet] 持倉表未變動，沿用快取 ({len(df)} 筆，略過解析)。")
         return df
 
+    @staticmethod
+    def _compact(df):
+        """COMPACT_FRAMES 開啟時 Symbol / Type 改用 category"""
+        return compact_portfolio(df) if Config.COMPACT_FRAMES else df
+
     def _get_mock_data(self):
         """測試用的假數據"""
         print("⚠️ 使用 Mock Data...")
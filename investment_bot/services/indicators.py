@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+"""
+向量化指標引擎 (Vectorized Indicator Engine)
+一次對整個投資組合 (多個標的) 的收盤價面板計算 RSI / EMA / MACD / Bollinger Bands，
+公式與 ta 套件一致 (adjust=False 的 EMA、Wilder RSI、ddof=0 的布林帶)，
+以 NumPy 在「時間」維度迴圈、「標的」維度向量化，
+輸出與 tech_analysis.compute_signals 相同格式的訊號 dict。
+所有指標透過 IndicatorGraph 宣告相依關係，共用的 EMA / 滾動統計只計算一次。
+"""
+
+import json
+import hashlib
+from collections import Counter
+import numpy as np
+import pandas as pd
+from ..config import Config
+
+MIN_BARS = 20
+
+
+def as_panel(closes, symbols=None):
+    """
+    將輸入轉為寬表 DataFrame (index: 日期, columns: 標的)
+    :param closes: 寬表 DataFrame 或 2-D ndarray (shape: 日期 x 標的)
+    :param symbols: ndarray 輸入時的欄位名稱，預設為 0..N-1
+    """
+    if isinstance(closes, pd.DataFrame):
+        return closes
+    arr = np.asarray(closes, dtype=float)
+    if arr.ndim != 2:
+        raise ValueError(f"closes 必須是 2-D (日期 x 標的)，收到 shape={arr.shape}")
+    columns = list(symbols) if symbols is not None else list(range(arr.shape[1]))
+    return pd.DataFrame(arr, columns=columns)
+
+
+def build_close_panel(frames):
+    """將 {symbol: OHLCV DataFrame} 依日期對齊成收盤價寬表"""
+    closes = {symbol: df['Close'] for symbol, df in frames.items() if df is not None and not df.empty}
+    if not closes:
+        return pd.DataFrame()
+    return pd.concat(closes, axis=1).sort_index()
+
+
+def right_align(panel, return_order=False):
+    """
+    把每個標的的有效值推到底部 (以「距最新一根 K 棒的根數」對齊)
+    日期對齊的面板中，各標的上市日不同或有停牌缺值；對齊到各自最新一根後，
+    每一欄都等同該標的自己的序列 (前面補 NaN)，遞迴型指標的結果與逐檔計算完全相同。
+    :param return_order: 一併回傳排列索引，供 unalign 把整段指標序列放回原本的日期
+    :return: (ndarray shape=(T, N), 每個標的的有效 K 棒數[, 排列索引])
+    """
+    values = np.asarray(panel, dtype=float)
+    valid = ~np.isnan(values)
+    # stable argsort：NaN (False) 排前面，有效值維持原本的時間順序
+    order = np.argsort(valid, axis=0, kind='stable')
+    aligned = np.take_along_axis(values, order, axis=0)
+    if return_order:
+        return aligned, valid.sum(axis=0), order
+    return aligned, valid.sum(axis=0)
+
+
+def unalign(aligned, order):
+    """right_align 的反向操作：把右對齊空間的 (T, N) 序列放回日期對齊的位置"""
+    out = np.empty_like(aligned)
+    np.put_along_axis(out, order, aligned, axis=0)
+    return out
+
+
+# --- 指標 kernel (輸入為 (T,) 或右對齊的 (T, N)，只允許前段為 NaN) ---
+# 定義與 ta 套件相同；多標的時以「時間迴圈 x 標的向量」計算，避免 pandas 逐欄呼叫的額外開銷
+
+# 欄位數少於此值時改為逐欄的純量迴圈；欄位多時 NumPy 時間迴圈的固定開銷才划算
+EWM_VECTOR_MIN_COLUMNS = 64
+
+
+def _ewm_1d(values, alpha, min_periods):
+    """單一序列的純量遞迴 (比 pandas ewm 的呼叫開銷小很多)"""
+    out = []
+    prev, count = np.nan, 0
+    for x in values.tolist():
+        if x == x:  # 非 NaN
+            count += 1
+            prev = x if prev != prev else prev + alpha * (x - prev)
+        out.append(prev if count >= min_periods else np.nan)
+    return np.array(out, dtype=float)
+
+
+def ewm_recursive(values, alpha, min_periods):
+    """
+    adjust=False 的指數加權平均：y_t = y_{t-1} + alpha * (x_t - y_{t-1})，以第一個有效值起算
+    有效觀測數未達 min_periods 前輸出 NaN (與 pandas ewm 相同)
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        return _ewm_1d(values, alpha, min_periods)
+    if values.shape[1] < EWM_VECTOR_MIN_COLUMNS:
+        return np.column_stack([_ewm_1d(column, alpha, min_periods) for column in values.T]).reshape(values.shape)
+
+    out = np.empty(values.shape)
+    prev = np.full(values.shape[1:], np.nan)
+    for t in range(values.shape[0]):
+        x = values[t]
+        # 尚未開始的欄位以第一個有效值起算 (x - prev = 0)
+        np.copyto(prev, x, where=np.isnan(prev))
+        prev += alpha * (x - prev)
+        out[t] = prev
+    out[np.cumsum(~np.isnan(values), axis=0) < min_periods] = np.nan
+    return out
+
+
+def rolling_windows(values, window):
+    """(T - window + 1, ..., window) 的滑動視窗 view (不複製數據)"""
+    return np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+
+
+# --- 指標相依圖 (Indicator Dependency Graph) ---
+# 每個節點以 (kind, *args) 為 key，args 可以是其他節點的 key，例如
+#   ('ema', CLOSE, 12)、('ema', ('macd_line', 12, 26), 9)
+# 節點在第一次被取用時才計算並記憶，同一次計算中共用的 EMA / 滾動平均 / 滾動標準差只算一次，
+# 沒被任何訊號用到的節點則完全不會計算。
+
+CLOSE = ('close',)
+
+
+def ema_node(window, source=CLOSE):
+    return ('ema', source, window)
+
+
+def rsi_node(window):
+    return ('rsi', window)
+
+
+def macd_nodes(fast, slow, signal):
+    """:return: (line, signal, hist) 三個節點"""
+    line = ('macd_line', fast, slow)
+    return line, ema_node(signal, line), ('macd_hist', fast, slow, signal)
+
+
+def bb_nodes(window, std_dev):
+    """:return: (upper, lower) 兩個節點"""
+    return ('bb_upper', window, std_dev), ('bb_lower', window, std_dev)
+
+
+def _build_diff(graph):
+    values = graph.get(CLOSE)
+    diff = np.full(values.shape, np.nan)
+    diff[1:] = values[1:] - values[:-1]
+    return diff
+
+
+def _build_gain(graph):
+    # 第一根有效 K 棒的 diff 為 NaN，ta 將其視為 0 (沒有漲跌)
+    diff = graph.get(('diff',))
+    return np.where(np.isnan(graph.get(CLOSE)), np.nan, np.where(diff > 0, diff, 0.0))
+
+
+def _build_loss(graph):
+    diff = graph.get(('diff',))
+    return np.where(np.isnan(graph.get(CLOSE)), np.nan, np.where(diff < 0, -diff, 0.0))
+
+
+def _build_ema(graph, source, window):
+    return ewm_recursive(graph.get(source), 2.0 / (window + 1), window)
+
+
+def _build_wilder(graph, source, window):
+    return ewm_recursive(graph.get(source), 1.0 / window, window)
+
+
+def _build_rsi(graph, window):
+    """Wilder RSI (alpha = 1 / window)"""
+    emaup = graph.get(('wilder', ('gain',), window))
+    emadn = graph.get(('wilder', ('loss',), window))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(emadn == 0, 100, 100 - (100 / (1 + emaup / emadn)))
+
+
+def _build_macd_line(graph, fast, slow):
+    return graph.get(ema_node(fast)) - graph.get(ema_node(slow))
+
+
+def _build_macd_hist(graph, fast, slow, signal):
+    line, signal_line, _ = macd_nodes(fast, slow, signal)
+    return graph.get(line) - graph.get(signal_line)
+
+
+def _build_rolling_mean(graph, source, window):
+    """滾動平均；視窗內含 NaN 時輸出 NaN"""
+    values = graph.get(source)
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] >= window:
+        out[window - 1:] = rolling_windows(values, window).mean(axis=-1)
+    return out
+
+
+def _build_rolling_std(graph, source, window):
+    """滾動母體標準差 (ddof=0)，沿用 rolling_mean 節點做兩段式計算"""
+    values = graph.get(source)
+    out = np.full(values.shape, np.nan)
+    if values.shape[0] >= window:
+        mean = graph.get(('rolling_mean', source, window))[window - 1:]
+        centered = rolling_windows(values, window) - mean[..., np.newaxis]
+        out[window - 1:] = np.sqrt((centered ** 2).mean(axis=-1))
+    return out
+
+
+def _build_bb_upper(graph, window, std_dev):
+    return graph.get(('rolling_mean', CLOSE, window)) + std_dev * graph.get(('rolling_std', CLOSE, window))
+
+
+def _build_bb_lower(graph, window, std_dev):
+    return graph.get(('rolling_mean', CLOSE, window)) - std_dev * graph.get(('rolling_std', CLOSE, window))
+
+
+_NODE_BUILDERS = {
+    'diff': _build_diff,
+    'gain': _build_gain,
+    'loss': _build_loss,
+    'ema': _build_ema,
+    'wilder': _build_wilder,
+    'rsi': _build_rsi,
+    'macd_line': _build_macd_line,
+    'macd_hist': _build_macd_hist,
+    'rolling_mean': _build_rolling_mean,
+    'rolling_std': _build_rolling_std,
+    'bb_upper': _build_bb_upper,
+    'bb_lower': _build_bb_lower,
+}
+
+
+class IndicatorGraph:
+    """
+    記憶化的指標相依圖
+    :param close: 收盤價 (T,) 或右對齊的 (T, N) ndarray
+    evaluations 記錄每種節點實際計算的次數，供 profiling 與測試確認沒有重複計算。
+    """
+
+    def __init__(self, close):
+        self._memo = {CLOSE: np.asarray(close, dtype=float)}
+        self.evaluations = Counter()
+
+    def get(self, key):
+        value = self._memo.get(key)
+        if value is None:
+            kind, *args = key
+            if kind not in _NODE_BUILDERS:
+                raise KeyError(f"未知的指標節點: {key}")
+            value = _NODE_BUILDERS[kind](self, *args)
+            self._memo[key] = value
+            self.evaluations[kind] += 1
+        return value
+
+    def last(self, key):
+        """節點的最新值 (每個標的一個)"""
+        return self.get(key)[-1]
+
+    def evaluate(self, keys):
+        """一次取得多個節點 (只計算這些節點與其相依節點)"""
+        return {key: self.get(key) for key in keys}
+
+
+def indicator_params(asset_type):
+    """依資產類別取得 Config 中的指標週期"""
+    if asset_type == 'Crypto':
+        return {
+            "rsi": Config.RSI_PERIOD_CRYPTO,
+            "ema_fast": Config.EMA_CRYPTO_FAST,
+            "ema_mid": Config.EMA_CRYPTO_MID,
+            "ema_slow": Config.EMA_CRYPTO_SLOW,
+            "ema_trend": Config.EMA_CRYPTO_TREND,
+        }
+    return {
+        "rsi": Config.RSI_PERIOD_STOCK,
+        "ema_fast": Config.EMA_SHORT,
+        "ema_mid": Config.EMA_MEDIUM,
+        "ema_slow": Config.EMA_LONG,
+    }
+
+
+def compute_signals_batch(closes, asset_type, symbols=None):
+    """
+    向量化計算多個標的的最新技術訊號
+    :param closes: 收盤價寬表 DataFrame (index: 日期) 或 2-D ndarray；同一面板內的標的屬同一資產類別
+    :param asset_type: 'Stock' or 'Crypto'，決定 RSI / EMA 週期
+    :param symbols: ndarray 輸入時的標的名稱
+    :return: {symbol: signals dict 或 None (數據不足)}
+    """
+    panel = as_panel(closes, symbols)
+    if panel.empty:
+        return {}
+
+    aligned, counts = right_align(panel)
+    params = indicator_params(asset_type)
+    graph = IndicatorGraph(aligned)
+    nan = np.full(len(counts), np.nan)
+
+    def last_if(key, enough):
+        # 沒有任何標的用得到的節點 (數據長度不足而退回較短 EMA) 不計算
+        return graph.last(key) if enough.any() else nan
+
+    price = graph.last(CLOSE)
+    current_rsi = graph.last(rsi_node(params["rsi"]))
+
+    ema_fast = graph.last(ema_node(params["ema_fast"]))
+    if asset_type == 'Crypto':
+        ema_mid = graph.last(ema_node(params["ema_mid"]))
+        ema_slow = graph.last(ema_node(params["ema_slow"]))
+        has_trend = counts >= params["ema_trend"]
+        ema_trend = np.where(has_trend, last_if(ema_node(params["ema_trend"]), has_trend), ema_slow)
+    else:
+        # 數據長度不足時往較短的 EMA 退回 (與 ta 逐檔計算相同)
+        has_mid, has_slow = counts >= params["ema_mid"], counts >= params["ema_slow"]
+        ema_mid = np.where(has_mid, last_if(ema_node(params["ema_mid"]), has_mid), ema_fast)
+        ema_trend = ema_mid
+        ema_slow = np.where(has_slow, last_if(ema_node(params["ema_slow"]), has_slow), ema_mid)
+
+    macd_line, macd_signal, macd_hist = (graph.last(key) for key in macd_nodes(Config.MACD_FAST, Config.MACD_SLOW, Config.MACD_SIGNAL))
+    bb_upper, bb_lower = (graph.last(key) for key in bb_nodes(Config.BB_WINDOW, Config.BB_STD_DEV))
+
+    band = bb_upper - bb_lower
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_b = np.where(band != 0, np.round((price - bb_lower) / band, 2), 0)
+
+    results = {}
+    for i, symbol in enumerate(panel.columns):
+        if counts[i] < MIN_BARS:
+            results[symbol] = None
+            continue
+        # 轉成 Python float / bool (與逐檔計算相同，可直接 json 序列化寫入訊號快取)
+        results[symbol] = {
+            "current_price": round(float(price[i]), 2),
+            "rsi": round(float(current_rsi[i]), 2),
+            "is_overbought": bool(current_rsi[i] > Config.RSI_OVERBOUGHT),
+            "is_oversold": bool(current_rsi[i] < Config.RSI_OVERSOLD),
+            "trend": "Bullish" if price[i] > ema_trend[i] else "Bearish",
+            "ema_values": {
+                "fast": round(float(ema_fast[i]), 2),
+                "mid": round(float(ema_mid[i]), 2),
+                "slow": round(float(ema_slow[i]), 2)
+            },
+            "macd": {
+                "line": round(float(macd_line[i]), 2),
+                "signal": round(float(macd_signal[i]), 2),
+                "hist": round(float(macd_hist[i]), 2)
+            },
+            "bb": {
+                "upper": round(float(bb_upper[i]), 2),
+                "lower": round(float(bb_lower[i]), 2),
+                "pct_b": float(pct_b[i]) if band[i] != 0 else 0
+            }
+        }
+    return results
+
+
+# --- 增量狀態 (Incremental Indicator State) ---
+# EMA / Wilder RSI / MACD 都是遞迴濾波器，保存前一根 K 棒的狀態即可 O(1) 更新；
+# 布林帶則保存最近 BB_WINDOW 根收盤價 (滾動視窗)。狀態以 JSON 存進 SQLite indicator_state 表。
+
+INDICATOR_STATE_VERSION = 1
+
+
+def indicator_fingerprint(asset_type):
+    """指標參數指紋：Config 週期改變時，舊狀態即失效需完整重算"""
+    params = indicator_params(asset_type)
+    params.update({
+        "macd": [Config.MACD_FAST, Config.MACD_SLOW, Config.MACD_SIGNAL],
+        "bb": [Config.BB_WINDOW, Config.BB_STD_DEV],
+        "version": INDICATOR_STATE_VERSION,
+    })
+    return json.dumps(params, sort_keys=True)
+
+
+def signal_cache_key(df, asset_type):
+    """
+    訊號快取的內容位址：收盤價序列 (含日期) 的雜湊 + 資產類別 + 指標參數指紋
+    訊號只依賴 Close，因此只對 Close 取雜湊；任何一根 K 棒或 Config 週期改變都會得到不同的 key。
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(pd.util.hash_pandas_object(df['Close'], index=True).to_numpy().tobytes())
+    digest.update(asset_type.encode())
+    digest.update(indicator_fingerprint(asset_type).encode())
+    return digest.hexdigest()
+
+
+def _ema_windows(asset_type):
+    params = indicator_params(asset_type)
+    windows = {params["ema_fast"], params["ema_mid"], params["ema_slow"], Config.MACD_FAST, Config.MACD_SLOW}
+    if asset_type == 'Crypto':
+        windows.add(params["ema_trend"])
+    return sorted(windows)
+
+
+def new_indicator_state(asset_type):
+    """空狀態 (尚未輸入任何 K 棒)"""
+    return {
+        "fingerprint": indicator_fingerprint(asset_type),
+        "count": 0,
+        "last_close": None,
+        "ema": {str(window): None for window in _ema_windows(asset_type)},
+        "rsi": {"gain": None, "loss": None},
+        "macd": {"signal": None, "count": 0},
+        "bb": [],
+    }
+
+
+def _ewm_step(prev, x, alpha):
+    return x if prev is None else prev + alpha * (x - prev)
+
+
+def update_indicator_state(state, close, asset_type):
+    """
+    輸入一根新的收盤價，O(1) 更新狀態 (原地修改並回傳)
+    遞迴式與 ewm_recursive / rsi / macd 相同，因此結果與完整重算一致
+    """
+    close = float(close)
+    params = indicator_params(asset_type)
+
+    # RSI：第一根 K 棒沒有漲跌 (diff 視為 0)
+    diff = 0.0 if state["last_close"] is None else close - state["last_close"]
+    alpha = 1.0 / params["rsi"]
+    state["rsi"]["gain"] = _ewm_step(state["rsi"]["gain"], max(diff, 0.0), alpha)
+    state["rsi"]["loss"] = _ewm_step(state["rsi"]["loss"], max(-diff, 0.0), alpha)
+
+    for key, prev in state["ema"].items():
+        state["ema"][key] = _ewm_step(prev, close, 2.0 / (int(key) + 1))
+
+    state["count"] += 1
+    state["last_close"] = close
+
+    # MACD signal 從第一個有效的 MACD line (累積 MACD_SLOW 根) 開始遞迴
+    if state["count"] >= Config.MACD_SLOW:
+        line = state["ema"][str(Config.MACD_FAST)] - state["ema"][str(Config.MACD_SLOW)]
+        state["macd"]["signal"] = _ewm_step(state["macd"]["signal"], line, 2.0 / (Config.MACD_SIGNAL + 1))
+        state["macd"]["count"] += 1
+
+    state["bb"] = (state["bb"] + [close])[-Config.BB_WINDOW:]
+    return state
+
+
+def build_indicator_state(closes, asset_type, state=None):
+    """依序輸入多根收盤價 (state 為 None 時從頭建立)"""
+    state = state if state is not None else new_indicator_state(asset_type)
+    for close in np.asarray(closes, dtype=float):
+        if not np.isnan(close):
+            update_indicator_state(state, close, asset_type)
+    return state
+
+
+def signals_from_state(state, asset_type):
+    """由狀態組出與 compute_signals 相同格式的訊號 dict；K 棒數不足 MIN_BARS 時回傳 None"""
+    count = state["count"]
+    if count < MIN_BARS:
+        return None
+    params = indicator_params(asset_type)
+
+    def ema_value(window):
+        # 與 ewm min_periods=window 相同：有效 K 棒數不足時為 NaN
+        return state["ema"][str(window)] if count >= window else float('nan')
+
+    price = state["last_close"]
+
+    gain, loss = state["rsi"]["gain"], state["rsi"]["loss"]
+    if count < params["rsi"]:
+        current_rsi = float('nan')
+    else:
+        current_rsi = 100.0 if loss == 0 else 100 - (100 / (1 + gain / loss))
+
+    ema_fast = ema_value(params["ema_fast"])
+    if asset_type == 'Crypto':
+        ema_mid = ema_value(params["ema_mid"])
+        ema_slow = ema_value(params["ema_slow"])
+        ema_trend = ema_value(params["ema_trend"]) if count >= params["ema_trend"] else ema_slow
+    else:
+        # 數據長度不足時往較短的 EMA 退回 (與 compute_signals 相同)
+        ema_mid = ema_value(params["ema_mid"]) if count >= params["ema_mid"] else ema_fast
+        ema_trend = ema_mid
+        ema_slow = ema_value(params["ema_slow"]) if count >= params["ema_slow"] else ema_mid
+
+    if count >= Config.MACD_SLOW:
+        macd_line = state["ema"][str(Config.MACD_FAST)] - state["ema"][str(Config.MACD_SLOW)]
+    else:
+        macd_line = float('nan')
+    macd_signal = state["macd"]["signal"] if state["macd"]["count"] >= Config.MACD_SIGNAL else float('nan')
+    macd_hist = macd_line - macd_signal
+
+    window = np.asarray(state["bb"], dtype=float)
+    if len(window) >= Config.BB_WINDOW:
+        bb_upper = window.mean() + Config.BB_STD_DEV * window.std()
+        bb_lower = window.mean() - Config.BB_STD_DEV * window.std()
+    else:
+        bb_upper = bb_lower = float('nan')
+    band = bb_upper - bb_lower
+
+    return {
+        "current_price": round(price, 2),
+        "rsi": round(current_rsi, 2),
+        "is_overbought": current_rsi > Config.RSI_OVERBOUGHT,
+        "is_oversold": current_rsi < Config.RSI_OVERSOLD,
+        "trend": "Bullish" if price > ema_trend else "Bearish",
+        "ema_values": {
+            "fast": round(ema_fast, 2),
+            "mid": round(ema_mid, 2),
+            "slow": round(ema_slow, 2)
+        },
+        "macd": {
+            "line": round(macd_line, 2),
+            "signal": round(macd_signal, 2),
+            "hist": round(macd_hist, 2)
+        },
+        "bb": {
+            "upper": round(float(bb_upper), 2),
+            "lower": round(float(bb_lower), 2),
+            "pct_b": round((price - bb_lower) / band, 2) if band != 0 else 0
+        }
+    }
@@ -5,75 +5,339 @@
 整合 DataStore 實現快取優先策略。
 """
 
-import yfinance as yf
-import ccxt
+import numpy as np
 import pandas as pd
-import requests
+import threading
 from datetime import datetime, timedelta
 from ..config import Config
-from ..utils.data_store import DataStore
+from ..utils.data_store import DataStore, get_data_store
+from ..utils.compact_frames import compact_ohlcv
+from ..utils.metrics import get_metrics, timed, frame_nbytes
+from ..utils.lazy import lazy_import
+from .crypto_async import AsyncCryptoDataService, ohlcv_request_window, ohlcv_to_frame, next_page_since
+
+# yfinance / ccxt / requests 光 import 就要數百毫秒，K 線全部命中新鮮快取時完全用不到
+yf = lazy_import("yfinance")
+ccxt = lazy_import("ccxt")
+requests = lazy_import("requests")
+
+# yf.download 內部使用模組層級的共享狀態 (yfinance.shared._DFS)，
+# 多執行緒同時呼叫會互相覆蓋結果，因此需序列化
+_YF_DOWNLOAD_LOCK = threading.Lock()
 
 class MarketDataService:
-    def __init__(self):
-        """初始化市場數據服務"""
-        self.exchange = ccxt.binance()
-        self.store = DataStore()
+    def __init__(self, store=None):
+        """
+        初始化市場數據服務
+        :param store: 注入的 DataStore，未提供時使用行程內共用的 Store
+        """
+        self._exchange = None
+        self.async_crypto = AsyncCryptoDataService()
+        self.store = store or get_data_store()
+
+    @property
+    def exchange(self):
+        """同步 ccxt client (關閉非同步抓取時才會用到)，第一次使用時才建立"""
+        if getattr(self, "_exchange", None) is None:
+            self._exchange = ccxt.binance()
+        return self._exchange
+
+    @exchange.setter
+    def exchange(self, exchange):
+        self._exchange = exchange
         
     def get_historical_data(self, symbol, asset_type, days=200):
         """
         獲取歷史 K 線數據 (OHLCV)
-        Logic: Check Cache -> (Miss/Stale) -> Fetch API -> Save Cache -> Return
+        Logic: Check Cache -> (Miss/Stale) -> Fetch API (增量或完整) -> Save Cache -> Return
         """
         # 1. Check if data is fresh (cache key exists for today)
         if self.store.is_market_data_fresh(symbol):
             # print(f"  [Cache Hit] {symbol}")
-            return self.store.load_market_data(symbol)
+            # 只讀分析需要的日期範圍 (下推到年份分區與 row group)
+            return self._compact(self.store.load_market_data(symbol, asset_type, start=self._window_start(days)))
             
         # print(f"  [Cache Miss] Fetching API for {symbol}...")
         
-        # 2. Fetch from API
-        df = pd.DataFrame()
+        # 2. Fetch from API (增量模式下只抓最後一根 K 棒之後的數據)
+        existing = self._load_existing(symbol, asset_type)
+        df, updated, since = pd.DataFrame(), False, None
         try:
-            if asset_type == 'Crypto':
-                df = self._get_crypto_history(symbol, days)
-            else:
-                df = self._get_stock_history(symbol, days)
+            df, updated, since = self._sync_history(symbol, asset_type, days, existing)
         except Exception as e:
             print(f"獲取數據失敗 {symbol}: {e}")
+            df = existing
             
-        # 3. Save to Store (if valid)
-        if not df.empty:
-            self.store.save_market_data(df, symbol)
+        # 3. Save to Store (if valid；增量同步只重寫有變動的年份分區)
+        if updated and not df.empty:
+            self.store.save_market_data(df, symbol, asset_type, since=since)
             
-        return df
+        return self._compact(self._analysis_window(df, days))
+
+    def get_historical_data_many(self, symbols, asset_type='Stock', days=200):
+        """
+        批次獲取多個標的的歷史 K 線數據
+        Logic: Check Cache (逐一) -> 未命中的美股以單次 yf.download 一起下載 -> 一次寫入 Store
+        :param symbols: 標的清單 (同一資產類別)
+        :param asset_type: 'Stock' or 'Crypto' (Crypto 無批次 API，改以 async 並行抓取)
+        :return: {symbol: DataFrame}，抓取失敗的標的為空 DataFrame (或既有的舊數據)
+        """
+        results = {}
+        missed = []
+        for symbol in dict.fromkeys(symbols):
+            if self.store.is_market_data_fresh(symbol):
+                results[symbol] = self.store.load_market_data(symbol, asset_type, start=self._window_start(days))
+            else:
+                missed.append(symbol)
+
+        if missed:
+            existing = {symbol: self._load_existing(symbol, asset_type) for symbol in missed}
+            updated, since = {}, {}
+            try:
+                if asset_type == 'Crypto' and Config.CRYPTO_ASYNC_ENABLED:
+                    updated, since = self._sync_many(missed, days, existing, self._fetch_crypto_many)
+                elif asset_type == 'Crypto':
+                    for symbol in missed:
+                        df, ok, since[symbol] = self._sync_history(symbol, asset_type, days, existing[symbol])
+                        (updated if ok else results)[symbol] = df
+                else:
+                    updated, since = self._sync_many(missed, days, existing, self._fetch_stock_many)
+            except Exception as e:
+                print(f"批次獲取數據失敗 {missed}: {e}")
+
+            self.store.save_market_data_many(updated, asset_type, since=since)
+            results.update(updated)
+            # 抓取失敗的標的退回既有 (未標記為新鮮) 的數據
+            for symbol in missed:
+                if symbol not in results:
+                    results[symbol] = existing[symbol]
+                results[symbol] = self._analysis_window(results[symbol], days)
+
+        return {symbol: self._compact(results.get(symbol, pd.DataFrame())) for symbol in symbols}
+
+    @staticmethod
+    def _compact(df):
+        """COMPACT_FRAMES 開啟時回傳 float32 + epoch index 的精簡表示 (本地儲存仍是完整精度)"""
+        return compact_ohlcv(df) if Config.COMPACT_FRAMES else df
+
+    # --- 增量同步 (Incremental Sync) ---
+
+    def _load_existing(self, symbol, asset_type=None):
+        """增量模式下讀取已儲存的 K 線，完整模式回傳空 DataFrame"""
+        if Config.MARKET_DATA_SYNC_MODE != 'incremental':
+            return pd.DataFrame()
+        return self.store.load_market_data(symbol, asset_type)
+
+    @staticmethod
+    def _window_start(days):
+        """分析視窗起點：與完整下載相同，往前 days + 100 天 (指標計算需要 buffer)"""
+        return datetime.now() - timedelta(days=days + 100)
+
+    def _analysis_window(self, df, days):
+        """
+        只回傳分析視窗內的 K 棒；本地保存的完整歷史可能長達數年，
+        指標計算與新鮮快取讀取 (load_market_data(start=...)) 使用同一個視窗，結果才會一致
+        """
+        if df.empty:
+            return df
+        start = pd.Timestamp(self._window_start(days))
+        tz = getattr(df.index, 'tz', None)
+        if tz is not None:
+            start = start.tz_localize(tz)
+        return df[df.index >= start]
+
+    def _incremental_start(self, existing):
+        """
+        計算增量抓取的起點：從最後幾根已儲存 K 棒 (重疊區) 開始抓
+        太久未更新時同樣從重疊區開始 (中間的缺口由分頁 / start 參數補齊)；
+        已儲存的 K 棒不足重疊區時從第一根開始，確保不會以較短的序列取代舊數據
+        回傳 None 表示沒有舊數據，需要完整下載
+        """
+        if existing.empty:
+            return None
+        return existing.index[-min(len(existing), Config.MARKET_DATA_SYNC_OVERLAP_BARS)]
+
+    def _merge_incremental(self, existing, new):
+        """
+        合併新抓取的 K 棒；若重疊區間的收盤價與舊數據不符 (分割/除權調整)，回傳 None 要求完整重新同步
+        """
+        overlap = existing.index.intersection(new.index)
+        # 最後一根已儲存 K 棒可能是盤中未收盤的數據，不列入比對
+        overlap = overlap[overlap < existing.index[-1]]
+        if len(overlap):
+            old_close = existing.loc[overlap, 'Close'].to_numpy(dtype=float)
+            new_close = new.loc[overlap, 'Close'].to_numpy(dtype=float)
+            if not np.allclose(old_close, new_close, rtol=Config.MARKET_DATA_ADJUST_TOLERANCE, equal_nan=True):
+                return None
+        return DataStore.merge_bars(existing, new)
+
+    def _fetch_history(self, symbol, asset_type, days, start=None):
+        if asset_type == 'Crypto':
+            return self._get_crypto_history(symbol, days, since=start)
+        return self._get_stock_history(symbol, days, start=start)
+
+    def _sync_history(self, symbol, asset_type, days, existing):
+        """
+        同步單一標的的 K 線
+        :return: (DataFrame, 是否成功更新, 第一根變動的 K 棒)；抓取失敗時回傳既有數據與 False，
+                 完整同步時第三項為 None (整個資料集都要取代)
+        """
+        start = self._incremental_start(existing)
+        if start is None:
+            df = self._fetch_history(symbol, asset_type, days)
+            return df, not df.empty, None
+
+        new = self._fetch_history(symbol, asset_type, days, start=start)
+        if new.empty:
+            # 從重疊區開始抓一定會有數據，空的代表 API 失敗
+            return existing, False, None
+
+        merged = self._merge_incremental(existing, new)
+        if merged is None:
+            print(f"  [MarketData] {symbol} 偵測到歷史價格調整 (分割/除權)，重新完整同步")
+            self.store.invalidate_indicator_state(symbol)
+            # 從第一根已儲存的 K 棒重抓，完整取代時才不會丟掉視窗以外的舊年份
+            df = self._fetch_history(symbol, asset_type, days, start=existing.index[0])
+            return df, not df.empty, None
+        return merged, True, new.index[0]
+
+    def _sync_many(self, symbols, days, existing, fetch_many):
+        """
+        批次同步多個標的：無舊數據的標的完整下載，其餘從各自的增量起點抓取後合併
+        :param fetch_many: fetch_many(symbols, days, starts) -> {symbol: DataFrame}
+        :return: ({symbol: DataFrame}, {symbol: 第一根變動的 K 棒})，前者僅包含成功更新的標的；
+                 完整下載 / 重新同步的標的不在後者之中
+        """
+        starts = {symbol: self._incremental_start(existing[symbol]) for symbol in symbols}
+        fetched = fetch_many(symbols, days, {s: start for s, start in starts.items() if start is not None})
+
+        updated = {}
+        since = {}
+        rewritten = []
+        for symbol in symbols:
+            new = fetched.get(symbol, pd.DataFrame())
+            if not new.empty and starts[symbol] is not None:
+                # 批次下載以最早的起點抓取，只保留該標的自己的增量區間
+                new = new[new.index >= starts[symbol]]
+            if new.empty:
+                continue
+            if starts[symbol] is None:
+                updated[symbol] = new
+                continue
+            merged = self._merge_incremental(existing[symbol], new)
+            if merged is None:
+                rewritten.append(symbol)
+            else:
+                updated[symbol] = merged
+                since[symbol] = new.index[0]
+
+        if rewritten:
+            print(f"  [MarketData] {rewritten} 偵測到歷史價格調整 (分割/除權)，重新完整同步")
+            for symbol in rewritten:
+                self.store.invalidate_indicator_state(symbol)
+            # 從第一根已儲存的 K 棒重抓，完整取代時才不會丟掉視窗以外的舊年份
+            updated.update(fetch_many(rewritten, days, {symbol: existing[symbol].index[0] for symbol in rewritten}))
+
+        updated = {symbol: df for symbol, df in updated.items() if not df.empty}
+        return updated, {symbol: ts for symbol, ts in since.items() if symbol in updated}
+
+    def _fetch_stock_many(self, symbols, days, starts):
+        """新標的一次完整下載；已有數據的標的以最早的增量起點再一次下載"""
+        full = [symbol for symbol in symbols if symbol not in starts]
+        incremental = [symbol for symbol in symbols if symbol in starts]
 
-    def _get_stock_history(self, symbol, days):
+        frames = {}
+        if full:
+            frames.update(self._get_stock_history_many(full, days))
+        if incremental:
+            earliest = min(starts[symbol] for symbol in incremental)
+            frames.update(self._get_stock_history_many(incremental, days, start=earliest))
+        return frames
+
+    def _fetch_crypto_many(self, symbols, days, starts):
+        """以 async ccxt 並行抓取 (受 Binance 權重限制)"""
+        with timed("fetch.binance"):
+            frames = self.async_crypto.fetch_history_many(symbols, days, since=starts)
+        get_metrics().api_call("binance", sum(map(frame_nbytes, frames.values())), calls=len(symbols))
+        return frames
+
+    # --- API 抓取 (API Fetchers) ---
+
+    def _get_stock_history_many(self, symbols, days, start=None):
+        """以單次 yf.download 下載多檔美股，再拆成各自的 DataFrame"""
+        tickers = {symbol: Config.STOCK_MAPPING.get(symbol, symbol) for symbol in symbols}
+        start_date = start if start is not None else datetime.now() - timedelta(days=days + 100)
+
+        try:
+            with timed("fetch.yfinance"), _YF_DOWNLOAD_LOCK:
+                panel = yf.download(list(dict.fromkeys(tickers.values())), start=start_date,
+                                    progress=False, auto_adjust=True, group_by='ticker', threads=True)
+        except Exception as e:
+            print(f"yfinance 批次下載錯誤 {list(tickers.values())}: {e}")
+            return {}
+        get_metrics().api_call("yfinance", frame_nbytes(panel))
+
+        frames = self._split_download_panel(panel, list(tickers.values()))
+        results = {}
+        for symbol, ticker in tickers.items():
+            df = frames.get(ticker, pd.DataFrame())
+            if df.empty:
+                print(f"警告: {ticker} 下載不到數據")
+            results[symbol] = df
+        return results
+
+    @staticmethod
+    def _split_download_panel(panel, tickers):
+        """
+        將 yf.download 回傳的 MultiIndex 面板拆成 {ticker: DataFrame}
+        同時支援 (Ticker, Price) 與 (Price, Ticker) 兩種欄位層級順序
+        """
+        if panel is None or panel.empty:
+            return {}
+
+        if not isinstance(panel.columns, pd.MultiIndex):
+            # 單一 ticker 且欄位已是單層
+            return {tickers[0]: panel} if len(tickers) == 1 else {}
+
+        frames = {}
+        for ticker in tickers:
+            for level in range(panel.columns.nlevels):
+                if ticker in panel.columns.get_level_values(level):
+                    df = panel.xs(ticker, axis=1, level=level)
+                    # 各 ticker 的交易日可能不同 (如新上市)，去掉整列皆空的日期
+                    frames[ticker] = df.dropna(how='all')
+                    break
+        return frames
+
+    def _get_stock_history(self, symbol, days, start=None):
         
         # 對映 Symbol
         ticker = Config.STOCK_MAPPING.get(symbol, symbol)
         
-        # 為了確保有足夠數據計算指標 (如 EMA120)，多抓一點 buffer
-        start_date = datetime.now() - timedelta(days=days + 100)
+        # 為了確保有足夠數據計算指標 (如 EMA120)，多抓一點 buffer；增量模式則從指定日期開始
+        start_date = start if start is not None else datetime.now() - timedelta(days=days + 100)
         
         # auto_adjust=True 會讓 Close 變成 Adj Close，適合長期回測
         try:
-            df = yf.download(ticker, start=start_date, progress=False, auto_adjust=True)
+            with timed("fetch.yfinance"), _YF_DOWNLOAD_LOCK:
+                df = yf.download(ticker, start=start_date, progress=False, auto_adjust=True)
         except Exception as e:
             print(f"yfinance 下載錯誤 {ticker}: {e}")
             return pd.DataFrame()
+        get_metrics().api_call("yfinance", frame_nbytes(df))
         
         if df.empty:
             print(f"警告: {ticker} 下載不到數據")
             return df
             
-        # yfinance 可能回傳 MultiIndex columns
+        # yfinance 可能回傳 MultiIndex columns，依 ticker 取出對應欄位
         if isinstance(df.columns, pd.MultiIndex):
-             df.columns = df.columns.droplevel(1) # 簡單處理，假設只有一個 ticker
+            df = self._split_download_panel(df, [ticker]).get(ticker, pd.DataFrame())
         
         return df
 
-    def _get_crypto_history(self, symbol, days):
-        """使用 ccxt 獲取加密貨幣歷史數據"""
+    def _get_crypto_history(self, symbol, days, since=None):
+        """使用 ccxt 獲取加密貨幣歷史數據 (指定 since 時只抓該時間點之後的 K 棒)"""
         # Mapping: BTC -> BTC/USDT
         pair = Config.CRYPTO_MAPPING.get(symbol, f"{symbol}/USDT")
         
@@ -81,14 +345,18 @@ class MarketDataService:
             # fetch_ohlcv (symbol, timeframe, since, limit)
             # 每日線 '1d'
             # limit 預設 500, 我們需要 200 + buffer
-            ohlcv = self.exchange.fetch_ohlcv(pair, '1d', limit=days + 100)
-            
-            # 轉換為 DataFrame
-            df = pd.DataFrame(ohlcv, columns=['Timestamp', 'Open', 'High', 'Low', 'Close', 'Volume'])
-            df['Date'] = pd.to_datetime(df['Timestamp'], unit='ms')
-            df.set_index('Date', inplace=True)
-            df.drop(columns=['Timestamp'], inplace=True)
-            
+            since_ms, limit = ohlcv_request_window(days, since)
+            with timed("fetch.binance"):
+                page = self.exchange.fetch_ohlcv(pair, '1d', since=since_ms, limit=limit)
+                ohlcv = list(page)
+                # 超過單次上限 (從較早的時間點重建歷史) 時分頁往後抓
+                since_ms = next_page_since(page, since_ms, limit)
+                while since_ms is not None:
+                    page = self.exchange.fetch_ohlcv(pair, '1d', since=since_ms, limit=limit)
+                    ohlcv.extend(page)
+                    since_ms = next_page_since(page, since_ms, limit)
+            df = ohlcv_to_frame(ohlcv)
+            get_metrics().api_call("binance", frame_nbytes(df))
             return df
             
         except Exception as e:
@@ -104,6 +372,7 @@ class MarketDataService:
         
         # 1. Check DB Cache
         cached = self.store.get_sentiment(today)
+        get_metrics().cache_lookup("sentiment", bool(cached))
         if cached:
             # print("  [Sentiment Cache Hit]")
             return cached
@@ -112,7 +381,9 @@ class MarketDataService:
         try:
             # Crypto Fear & Greed API
             url = "https://api.alternative.me/fng/?limit=1"
-            response = requests.get(url, timeout=10)
+            with timed("fetch.fear_greed"):
+                response = requests.get(url, timeout=10)
+            get_metrics().api_call("fear_greed", len(getattr(response, 'content', b'') or b''))
             data = response.json()
             value = int(data['data'][0]['value'])
             classification = data['data'][0]['value_classification']
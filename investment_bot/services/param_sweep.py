@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+指標參數掃描 (Parameter Sweep)
+以 Parquet 資料集中的歷史 K 線，對回測參數 (RSI 週期 / 閾值、趨勢 EMA、布林帶) 做 grid 或 random search：
+- 收盤價寬表只讀取一次，在主行程右對齊後放進 multiprocessing.shared_memory，Process Pool 的 worker
+  以名稱掛載同一塊記憶體 (唯讀 view)，不經過 pickle 複製也不各自重新對齊；每個任務只傳遞參數組合
+- 指標週期相同的組合歸為同一個任務、共用一個 IndicatorGraph，只有閾值不同的組合不會重算 EMA / RSI
+- 每完成一個任務就把結果附加到 JSONL；以相同數據、策略與手續費重新執行時略過已完成的組合 (中斷後續跑)
+- 輸出排名表與可貼進 config.py 的設定片段
+
+績效以等權重投組 (每天對當天有 K 棒的標的平均) 計算 sharpe / 年化報酬 / 最大回撤，
+勝率、交易次數與持倉比例為各標的的平均。
+
+用法: python -m investment_bot.services.param_sweep [--asset Stock] [--strategy trend_rsi] [--mode grid|random]
+          [--set rsi=6,9,14] [--set overbought=65:85:5] [--samples 1000] [--workers 8] [--top 20] [--restart]
+"""
+
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from ..config import Config
+from ..utils.data_store import get_data_store
+from .backtest import STRATEGIES, PERIODS_PER_YEAR, evaluate, strategy_params
+from .indicators import IndicatorGraph, right_align, unalign
+
+# 各策略預設掃描的參數 (其餘參數沿用 Config，可用 --set 加入)
+STRATEGY_PARAMS = {
+    "trend_rsi": ("rsi", "overbought", "trend"),
+    "trend": ("trend",),
+    "rsi": ("rsi", "overbought", "oversold"),
+    "bb": ("bb_window", "bb_std"),
+}
+DEFAULT_GRID = {
+    "rsi": [6, 9, 14, 21],
+    "overbought": [65, 70, 75, 80, 85],
+    "oversold": [15, 20, 25, 30, 35],
+    "trend": [20, 40, 60, 90, 120, 200],
+    "trend_fallback": [5, 10, 20],
+    "bb_window": [10, 20, 30, 50],
+    "bb_std": [1.5, 2.0, 2.5, 3.0],
+}
+# random search 的取樣範圍 (含端點)；bb_std 取到小數第一位，其餘為整數
+RANDOM_SPACE = {
+    "rsi": (3, 30),
+    "overbought": (55, 95),
+    "oversold": (5, 45),
+    "trend": (10, 250),
+    "trend_fallback": (3, 60),
+    "bb_window": (5, 60),
+    "bb_std": (1.0, 3.5),
+}
+# 決定指標序列的週期參數：這些值相同的組合共用一個 IndicatorGraph
+WINDOW_PARAMS = ("rsi", "trend", "trend_fallback", "bb_window")
+# 可用來排名的指標 (越大越好)
+RANK_METRICS = ("sharpe", "annual_return", "total_return", "max_drawdown", "hit_rate")
+METRIC_COLUMNS = ["sharpe", "annual_return", "total_return", "max_drawdown", "hit_rate", "trades", "exposure"]
+
+# 參數 -> Config 屬性
+CONFIG_NAMES = {
+    "Stock": {"rsi": "RSI_PERIOD_STOCK", "trend": "EMA_MEDIUM", "trend_fallback": "EMA_SHORT"},
+    "Crypto": {"rsi": "RSI_PERIOD_CRYPTO", "trend": "EMA_CRYPTO_TREND", "trend_fallback": "EMA_CRYPTO_SLOW"},
+}
+SHARED_CONFIG_NAMES = {"overbought": "RSI_OVERBOUGHT", "oversold": "RSI_OVERSOLD",
+                       "bb_window": "BB_WINDOW", "bb_std": "BB_STD_DEV"}
+
+
+# --- 參數組合 ---
+
+def _number(text):
+    value = float(text)
+    return int(value) if value.is_integer() and '.' not in text else value
+
+
+def parse_values(text):
+    """'6,9,14' 或 'start:stop[:step]' (含 stop) -> 數值 list"""
+    if ':' in text:
+        parts = [_number(part) for part in text.split(':')]
+        start, stop, step = parts[0], parts[1], parts[2] if len(parts) > 2 else 1
+        values = np.arange(start, stop + step / 2, step)
+        if all(isinstance(part, int) for part in parts[:3]):
+            return [int(v) for v in values]
+        return [round(float(v), 6) for v in values]
+    return [_number(part) for part in text.split(',') if part]
+
+
+def _valid(params):
+    """超賣閾值須低於超買閾值，退回用的 EMA 不可比趨勢線 EMA 長"""
+    return params["oversold"] < params["overbought"] and params["trend_fallback"] <= params["trend"]
+
+
+def _swept_names(strategy, overrides):
+    names = list(STRATEGY_PARAMS[strategy])
+    return names + [name for name in overrides if name not in names]
+
+
+def grid_combinations(strategy, asset_type, overrides=None):
+    """
+    Grid search 的所有組合
+    :param overrides: {參數: 候選值 list}，覆寫 DEFAULT_GRID 或加入策略預設以外的參數
+    """
+    overrides = overrides or {}
+    base = strategy_params(asset_type)
+    names = _swept_names(strategy, overrides)
+    space = [overrides.get(name, DEFAULT_GRID[name]) for name in names]
+    combos = (dict(zip(names, values)) for values in itertools.product(*space))
+    return [combo for combo in combos if _valid({**base, **combo})]
+
+
+def random_combinations(strategy, asset_type, samples, seed=0, overrides=None):
+    """
+    Random search：在 RANDOM_SPACE (或 overrides 的候選值) 中取樣 samples 個不重複組合
+    固定 seed 時結果相同，因此中斷後以相同參數重新執行即可續跑
+    """
+    overrides = overrides or {}
+    base = strategy_params(asset_type)
+    names = _swept_names(strategy, overrides)
+    rng = random.Random(seed)
+
+    def draw(name):
+        if name in overrides:
+            return rng.choice(overrides[name])
+        low, high = RANDOM_SPACE[name]
+        return round(rng.uniform(low, high), 1) if isinstance(low, float) else rng.randint(low, high)
+
+    combos, seen = [], set()
+    for _ in range(samples * 20):
+        if len(combos) >= samples:
+            break
+        combo = {name: draw(name) for name in names}
+        key = _combo_key(combo)
+        if key not in seen and _valid({**base, **combo}):
+            seen.add(key)
+            combos.append(combo)
+    return combos
+
+
+def _combo_key(combo):
+    return json.dumps(combo, sort_keys=True)
+
+
+def _group_by_windows(combos):
+    """週期參數相同的組合歸為同一個任務，組合多的任務先送出"""
+    groups = {}
+    for combo in combos:
+        key = tuple(combo.get(name) for name in WINDOW_PARAMS)
+        groups.setdefault(key, []).append(combo)
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+# --- 評估 (worker) ---
+
+_WORKER = {}
+
+
+def _prepare(values):
+    """在主行程右對齊一次；worker 只掛載結果，不各自保留一份與面板同大小的陣列"""
+    aligned, counts, order = right_align(values, return_order=True)
+    return {"aligned": aligned, "order": order, "missing": np.isnan(values)}, counts
+
+
+def _attach(arrays, counts, asset_type, strategy, fee_bps):
+    """準備 worker 的回測狀態 (右對齊後的陣列在每個組合間共用)"""
+    _WORKER.update(arrays)
+    _WORKER.update({"counts": counts, "asset_type": asset_type, "strategy": strategy, "fee_bps": fee_bps})
+
+
+def _share(arrays):
+    """
+    把陣列複製進 shared memory
+    :return: (SharedMemory 清單, {name: (shm 名稱, shape, dtype)})
+    """
+    blocks, specs = [], {}
+    try:
+        for name, array in arrays.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            blocks.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+            specs[name] = (shm.name, array.shape, array.dtype.str)
+    except BaseException:
+        _release(blocks)
+        raise
+    return blocks, specs
+
+
+def _release(blocks):
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def _init_worker(specs, counts, asset_type, strategy, fee_bps):
+    """Process Pool initializer：以名稱掛載主行程建立的 shared memory (不複製、不重新對齊)"""
+    arrays = {}
+    blocks = []
+    for name, (shm_name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        blocks.append(shm)
+        view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        view.flags.writeable = False  # 所有 worker 共用同一塊記憶體
+        arrays[name] = view
+    _WORKER["shm"] = blocks  # 保持掛載直到 worker 結束
+    _attach(arrays, counts, asset_type, strategy, fee_bps)
+
+
+def _score(strategy_returns, summary):
+    state = _WORKER
+    daily = np.where(state["missing"], np.nan, unalign(strategy_returns, state["order"]))
+    active = (~state["missing"]).sum(axis=1)
+    portfolio = np.where(active > 0, np.nansum(daily, axis=1) / np.maximum(active, 1), 0.0)
+
+    periods = PERIODS_PER_YEAR.get(state["asset_type"], 252)
+    equity = np.cumprod(1 + portfolio)
+    std = portfolio.std()
+    return {
+        "sharpe": float(portfolio.mean() / std * np.sqrt(periods)) if std > 0 else 0.0,
+        "annual_return": float(equity[-1] ** (periods / len(portfolio)) - 1),
+        "total_return": float(equity[-1] - 1),
+        "max_drawdown": float((equity / np.maximum.accumulate(equity) - 1).min()),
+        "hit_rate": float(summary["hit_rate"].mean()) if summary["hit_rate"].notna().any() else 0.0,
+        "trades": float(summary["trades"].mean()),
+        "exposure": float(summary["exposure"].mean()),
+    }
+
+
+def _evaluate_group(combos):
+    """評估週期參數相同的一組組合 (共用 IndicatorGraph)"""
+    state = _WORKER
+    graph = IndicatorGraph(state["aligned"])
+    results = []
+    for combo in combos:
+        params = strategy_params(state["asset_type"], combo)
+        _, strategy_returns, summary = evaluate(state["aligned"], state["counts"], state["asset_type"],
+                                                state["strategy"], params, state["fee_bps"], graph=graph)
+        results.append((combo, _score(strategy_returns, summary)))
+    return results
+
+
+def _run_groups(values, groups, asset_type, strategy, fee_bps, workers):
+    """依序產出每個任務的結果；workers <= 1 時在主行程計算"""
+    arrays, counts = _prepare(values)
+    if workers <= 1 or len(groups) <= 1:
+        _attach(arrays, counts, asset_type, strategy, fee_bps)
+        for group in groups:
+            yield _evaluate_group(group)
+        return
+
+    blocks, specs = _share(arrays)
+    del arrays  # 主行程只保留 shared memory 中的一份
+    pool = None
+    try:
+        pool = ProcessPoolExecutor(max_workers=min(workers, len(groups)), initializer=_init_worker,
+                                   initargs=(specs, counts, asset_type, strategy, fee_bps))
+        futures = [pool.submit(_evaluate_group, group) for group in groups]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        _release(blocks)
+
+
+# --- 掃描 ---
+
+def sweep_fingerprint(panel, asset_type, strategy, fee_bps):
+    """同一次掃描的識別：數據 (日期 / 標的 / 收盤價)、策略、手續費與未掃描參數的 Config 值"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(json.dumps([asset_type, strategy, fee_bps, strategy_params(asset_type),
+                              [str(column) for column in panel.columns]], sort_keys=True).encode())
+    digest.update(panel.index.asi8.tobytes())
+    digest.update(np.ascontiguousarray(panel.to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+def _load_results(path, fingerprint):
+    """讀取先前已完成的結果 (只取同一個 fingerprint；寫到一半的最後一行略過)"""
+    done = {}
+    if not path or not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("run") == fingerprint:
+                done[_combo_key(record["params"])] = record["metrics"]
+    return done
+
+
+def _ends_with_newline(path):
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+def run_sweep(panel, asset_type, strategy, combos, fee_bps=None, workers=None, output=None, log=print):
+    """
+    評估所有參數組合
+    :param panel: 收盤價寬表 (index: 日期, columns: 標的)
+    :param combos: grid_combinations / random_combinations 的結果
+    :param workers: Process Pool 大小，預設 Config.SWEEP_WORKERS (0 = 所有核心)；<= 1 時在主行程計算
+    :param output: 結果 JSONL 路徑 (續跑用)，None 則不寫檔
+    :return: DataFrame，每個組合一列 (參數欄位 + METRIC_COLUMNS)，順序與 combos 相同
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"未知的回測策略: {strategy} (可用: {', '.join(STRATEGIES)})")
+    fee_bps = Config.BACKTEST_FEE_BPS if fee_bps is None else fee_bps
+    if workers is None:
+        workers = Config.SWEEP_WORKERS or os.cpu_count() or 1
+    panel = panel.sort_index()
+    fingerprint = sweep_fingerprint(panel, asset_type, strategy, fee_bps)
+
+    done = _load_results(output, fingerprint)
+    pending = [combo for combo in combos if _combo_key(combo) not in done]
+    groups = _group_by_windows(pending)
+    log(f"🔎 {len(combos)} 組參數：已完成 {len(combos) - len(pending)}，待計算 {len(pending)} "
+        f"({len(groups)} 個任務, workers={workers})")
+
+    sink = None
+    if output and pending:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        sink = open(output, 'a', encoding='utf-8')
+        if sink.tell() > 0 and not _ends_with_newline(output):
+            sink.write("\n")  # 上次中斷在寫到一半的行，新紀錄從下一行開始
+    try:
+        values = np.ascontiguousarray(panel.to_numpy(dtype=np.float64))
+        for results in _run_groups(values, groups, asset_type, strategy, fee_bps, workers):
+            for combo, metrics in results:
+                done[_combo_key(combo)] = metrics
+                if sink is not None:
+                    sink.write(json.dumps({"run": fingerprint, "params": combo, "metrics": metrics}) + "\n")
+            if sink is not None:
+                sink.flush()  # 每個任務完成即落盤，中斷後可續跑
+    finally:
+        if sink is not None:
+            sink.close()
+
+    rows = [{**combo, **done[_combo_key(combo)]} for combo in combos]
+    return pd.DataFrame(rows, columns=list(dict.fromkeys(k for combo in combos for k in combo)) + METRIC_COLUMNS)
+
+
+def rank_results(results, metric="sharpe", top=None):
+    """依 metric 由高到低排名 (名次從 1 開始)"""
+    if metric not in RANK_METRICS:
+        raise ValueError(f"未知的排名指標: {metric} (可用: {', '.join(RANK_METRICS)})")
+    ranked = results.sort_values(metric, ascending=False, kind='stable').reset_index(drop=True)
+    ranked.index = pd.RangeIndex(1, len(ranked) + 1, name="rank")
+    return ranked.head(top) if top else ranked
+
+
+def config_snippet(best, asset_type, strategy, metric="sharpe"):
+    """
+    最佳組合對應的 config.py 設定
+    :param best: 排名第一的列 (Series)
+    """
+    lines = [f"# 參數掃描最佳組合 ({asset_type} / {strategy}，{metric} = {best[metric]:.4f})"]
+    for name in best.index:
+        if name in METRIC_COLUMNS:
+            continue
+        attr = CONFIG_NAMES.get(asset_type, {}).get(name) or SHARED_CONFIG_NAMES[name]
+        value = best[name]
+        value = int(value) if name != "bb_std" and float(value).is_integer() else round(float(value), 6)
+        lines.append(f"{attr} = {value}")
+    if strategy != Config.BACKTEST_STRATEGY:
+        lines.append(f'BACKTEST_STRATEGY = "{strategy}"  # 或設定環境變數 BACKTEST_STRATEGY')
+    return "\n".join(lines)
+
+
+def main(argv=None, store=None):
+    parser = argparse.ArgumentParser(prog="python -m investment_bot.services.param_sweep", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--asset", default="Stock", choices=["Stock", "Crypto"])
+    parser.add_argument("--strategy", default=Config.BACKTEST_STRATEGY, choices=STRATEGIES)
+    parser.add_argument("--mode", default="grid", choices=["grid", "random"])
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUES",
+                        help="覆寫候選值，例如 rsi=6,9,14 或 overbought=65:85:5 (含 stop)")
+    parser.add_argument("--samples", type=int, default=1000, help="random search 的組合數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--symbols", help="逗號分隔的標的，預設為資產類別下的全部標的")
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    parser.add_argument("--fee-bps", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="預設 SWEEP_WORKERS (0 = 所有核心)")
+    parser.add_argument("--metric", default="sharpe", choices=RANK_METRICS)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--output", help="結果 JSONL (續跑用)，預設 SWEEP_DIR/<asset>_<strategy>_<mode>.jsonl")
+    parser.add_argument("--restart", action="store_true", help="刪除既有結果，從頭掃描")
+    args = parser.parse_args(argv)
+
+    overrides = {}
+    for item in args.set:
+        name, _, text = item.partition('=')
+        if name not in DEFAULT_GRID or not text:
+            parser.error(f"無效的 --set {item} (可用參數: {', '.join(DEFAULT_GRID)})")
+        overrides[name] = parse_values(text)
+
+    if args.mode == "grid":
+        combos = grid_combinations(args.strategy, args.asset, overrides)
+    else:
+        combos = random_combinations(args.strategy, args.asset, args.samples, args.seed, overrides)
+    if not combos:
+        print("⚠️ 沒有符合條件的參數組合")
+        return 1
+
+    output = args.output or os.path.join(Config.SWEEP_DIR, f"{args.asset.lower()}_{args.strategy}_{args.mode}.jsonl")
+    if args.restart and os.path.exists(output):
+        os.remove(output)
+
+    store = store or get_data_store()
+    symbols = [s.strip() for s in args.symbols.split(',') if s.strip()] if args.symbols else None
+    panel = store.market_data.read_panel(args.asset, symbols=symbols, start=args.start, end=args.end)
+    if panel.empty:
+        print(f"⚠️ 資料集中沒有 {args.asset} 的歷史 K 線")
+        return 1
+    print(f"📊 {args.asset} {panel.shape[1]} 檔 x {panel.shape[0]} 根 K 線，策略 {args.strategy}")
+
+    results = run_sweep(panel, args.asset, args.strategy, combos, fee_bps=args.fee_bps, workers=args.workers,
+                        output=output)
+    ranked = rank_results(results, args.metric)
+    print(f"\n🏆 依 {args.metric} 排名 (前 {min(args.top, len(ranked))} / {len(ranked)} 組)")
+    print(ranked.head(args.top).to_string(float_format=lambda v: f"{v:.4f}"))
+    print("\n📝 config.py 設定片段:")
+    print(config_snippet(ranked.iloc[0], args.asset, args.strategy, args.metric))
+    print(f"\n💾 結果: {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
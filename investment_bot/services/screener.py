@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""
+全市場掃描 (Universe Screener)
+對持倉以外的整個標的池 (例如 S&P 500 清單、Binance 所有 USDT 交易對) 計算技術指標，
+找出最超賣、最超買與剛翻轉趨勢的候選標的：
+- 標的池以串流方式讀取，依資產類別每 SCREEN_CHUNK_SIZE 檔切成一批
+- 每批以 MarketDataService.get_historical_data_many 批次 / 並行抓取 (或直接讀取本地 Parquet 資料集)，
+  再以 TechnicalAnalysisService.analyze_batch 一次計算整批的訊號
+- 同時在途的批次不超過 workers，各榜單只以大小為 K 的 heap 保留候選，
+  記憶體用量與標的池大小無關 (加密貨幣批次的抓取在 crypto_async 內序列化，Binance 權重限制對整個掃描生效)
+
+榜單：
+- oversold   ：RSI 由低到高
+- overbought ：RSI 由高到低
+- trend_flip ：最新一根 K 棒相對前一根由空翻多或由多翻空的標的，依收盤價偏離趨勢線的幅度排序
+
+用法: python -m investment_bot.services.screener <universe.txt|universe.csv|binance:USDT>
+          [--asset Stock|Crypto] [--top 20] [--local] [--chunk-size 100] [--workers 8]
+"""
+
+import os
+import csv
+import sys
+import heapq
+import argparse
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import numpy as np
+from ..config import Config
+from ..utils.data_store import get_data_store
+from ..utils.compact_frames import expand_ohlcv
+from ..utils.metrics import timed
+from ..utils.lazy import lazy_import
+from .backtest import signal_series
+from .indicators import build_close_panel, right_align
+from .market_data import MarketDataService
+from .tech_analysis import TechnicalAnalysisService
+
+ccxt = lazy_import("ccxt")
+
+RANKINGS = ("oversold", "overbought", "trend_flip")
+# CSV 標的池中可作為代號欄位的表頭 (不分大小寫)
+SYMBOL_COLUMNS = ("symbol", "ticker", "stock")
+TYPE_COLUMNS = ("type", "asset_type")
+
+
+# --- 標的池 (Universe) ---
+
+def _classify(symbol, asset_type=None):
+    """
+    :return: (symbol, asset_type)；"X/USDT" 視為加密貨幣 X，其他計價幣別的交易對無法抓取時回傳 None
+    """
+    symbol = symbol.strip().upper()
+    if '/' in symbol:
+        base, _, quote = symbol.partition('/')
+        if quote != 'USDT':
+            print(f"⚠️ 略過非 USDT 交易對: {symbol}")
+            return None
+        return base, 'Crypto'
+    if asset_type:
+        return symbol, asset_type
+    return symbol, 'Crypto' if symbol in Config.CRYPTO_MAPPING else 'Stock'
+
+
+def _binance_symbols(quote):
+    """Binance 上所有交易中的 <quote> 現貨交易對 (回傳 base 名稱)"""
+    if quote != 'USDT':
+        raise ValueError(f"目前只支援 USDT 交易對: binance:{quote}")
+    markets = ccxt.binance().load_markets()
+    for pair, market in sorted(markets.items()):
+        if market.get("quote") == quote and market.get("spot") and market.get("active", True):
+            yield f"{market['base']}/{quote}"
+
+
+def _file_symbols(path):
+    """txt：每行一個或逗號分隔 (# 之後為註解)；csv：Symbol / Ticker 欄位，選用 Type 欄位"""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if path.lower().endswith('.csv'):
+            reader = csv.DictReader(f)
+            fields = {name.strip().lower(): name for name in reader.fieldnames or []}
+            symbol_field = next((fields[c] for c in SYMBOL_COLUMNS if c in fields), None)
+            if symbol_field is None:
+                raise ValueError(f"{path} 缺少代號欄位 ({' / '.join(SYMBOL_COLUMNS)})")
+            type_field = next((fields[c] for c in TYPE_COLUMNS if c in fields), None)
+            for row in reader:
+                asset_type = (row.get(type_field) or '').strip().capitalize() if type_field else ''
+                yield row.get(symbol_field) or '', asset_type if asset_type in ('Stock', 'Crypto') else None
+            return
+        for line in f:
+            for symbol in line.split('#', 1)[0].split(','):
+                yield symbol, None
+
+
+def iter_universe(spec, asset_type=None):
+    """
+    串流讀取標的池 (重複的標的只回傳一次)
+    :param spec: 標的清單檔 (.txt / .csv) 或 "binance:USDT" (Binance 所有 USDT 現貨交易對)
+    :param asset_type: 強制指定資產類別；None 時依代號判斷 (X/USDT 或 CRYPTO_MAPPING 中的為加密貨幣)
+    :return: generator of (symbol, asset_type)
+    """
+    if spec.lower().startswith('binance'):
+        _, _, quote = spec.partition(':')
+        entries = ((pair, None) for pair in _binance_symbols(quote.upper() or 'USDT'))
+    else:
+        entries = _file_symbols(spec)
+
+    seen = set()
+    for symbol, row_type in entries:
+        if not symbol.strip():
+            continue
+        entry = _classify(symbol, asset_type or row_type)
+        if entry and entry not in seen:
+            seen.add(entry)
+            yield entry
+
+
+def iter_chunks(universe, chunk_size):
+    """依資產類別分批：每累積 chunk_size 檔就回傳一批 (asset_type, [symbols])，最後回傳未滿的批次"""
+    buffers = {}
+    for symbol, asset_type in universe:
+        buffer = buffers.setdefault(asset_type, [])
+        buffer.append(symbol)
+        if len(buffer) >= chunk_size:
+            yield asset_type, buffers.pop(asset_type)
+    for asset_type, buffer in buffers.items():
+        yield asset_type, buffer
+
+
+# --- Top-K ---
+
+class TopK:
+    """
+    只保留分數最高的 k 筆 (min-heap，堆頂是目前門檻)
+    分數相同時先進入的保留，結果與完整排序後取前 k 筆相同。
+    """
+    def __init__(self, k):
+        self.k = k
+        self._heap = []
+        self._seq = itertools.count()
+
+    def push(self, score, item):
+        """:return: 是否進入榜單"""
+        entry = (score, -next(self._seq), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+            return True
+        if self.k > 0 and entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+            return True
+        return False
+
+    def __len__(self):
+        return len(self._heap)
+
+    def items(self):
+        """由高分到低分排序的項目"""
+        return [item for _, _, item in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+
+
+# --- 掃描 ---
+
+def screen_candidates(panel, asset_type, ta_service):
+    """
+    計算一批標的的候選資訊
+    :param panel: 收盤價寬表 (index: 日期, columns: 標的)
+    :return: (候選 dict 清單, 數據不足的標的數)
+    """
+    if panel.empty:
+        return [], 0
+    signals = ta_service.analyze_batch(panel, asset_type)
+
+    # 趨勢翻轉：右對齊後最後兩列即為各標的最新兩根 K 棒
+    aligned, _ = right_align(panel)
+    trend = signal_series(aligned, asset_type, groups=("trend",))
+    flipped = trend["ready"][-2] & (trend["bullish"][-1] != trend["bullish"][-2])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distance = aligned[-1] / trend["trend_line"][-1] - 1
+
+    candidates, skipped = [], 0
+    for i, symbol in enumerate(panel.columns):
+        signal = signals.get(symbol)
+        if not signal:
+            skipped += 1
+            continue
+        candidates.append({
+            "symbol": symbol,
+            "asset_type": asset_type,
+            "date": panel[symbol].last_valid_index().strftime('%Y-%m-%d'),
+            "price": signal["current_price"],
+            "rsi": signal["rsi"],
+            "trend": signal["trend"],
+            "is_overbought": bool(signal["is_overbought"]),
+            "is_oversold": bool(signal["is_oversold"]),
+            "trend_flip": signal["trend"] if flipped[i] else None,
+            "trend_distance": round(float(distance[i]), 4),
+        })
+    return candidates, skipped
+
+
+class ScreenerService:
+    def __init__(self, store=None, market_service=None, ta_service=None):
+        """
+        :param store: 注入的 DataStore，未提供時使用行程內共用的 Store
+        :param market_service: fetch 模式使用的 MarketDataService (未提供時第一次使用才建立)
+        :param ta_service: TechnicalAnalysisService
+        """
+        self.store = store or get_data_store()
+        self.market_service = market_service
+        self.ta_service = ta_service or TechnicalAnalysisService(store=self.store)
+
+    def _load_panel(self, symbols, asset_type, source, days):
+        if source == 'local':
+            start = MarketDataService._window_start(days)
+            return self.store.market_data.read_panel(asset_type, symbols=symbols, start=start)
+        frames = self.market_service.get_historical_data_many(symbols, asset_type, days=days)
+        return build_close_panel({symbol: expand_ohlcv(df) for symbol, df in frames.items()})
+
+    def _screen_chunk(self, asset_type, symbols, source, days):
+        with timed("screen.load"):
+            panel = self._load_panel(symbols, asset_type, source, days)
+        with timed("screen.ta"):
+            candidates, skipped = screen_candidates(panel, asset_type, self.ta_service)
+        # 讀不到任何 K 線的標的不在面板中
+        return candidates, skipped + len(symbols) - panel.shape[1]
+
+    def screen(self, universe, top_k=None, source='fetch', chunk_size=None, workers=None, days=200):
+        """
+        串流掃描標的池
+        :param universe: iterable of (symbol, asset_type)，例如 iter_universe(...)
+        :param top_k: 每個榜單保留的筆數，預設 SCREEN_TOP_K
+        :param source: 'fetch' (經由 MarketDataService 抓取 / 讀取新鮮快取) 或 'local' (只讀本地資料集)
+        :param chunk_size: 每批標的數，預設 SCREEN_CHUNK_SIZE
+        :param workers: 同時在途的批次數，預設 PIPELINE_FETCH_WORKERS
+        :return: {"oversold": [...], "overbought": [...], "trend_flip": [...], "screened": n, "skipped": n}
+        """
+        if source not in ('fetch', 'local'):
+            raise ValueError(f"未知的數據來源: {source} (可用: fetch, local)")
+        top_k = Config.SCREEN_TOP_K if top_k is None else top_k
+        chunk_size = max(1, chunk_size or Config.SCREEN_CHUNK_SIZE)
+        workers = max(1, workers or Config.PIPELINE_FETCH_WORKERS)
+        if source == 'fetch' and self.market_service is None:
+            # 在主執行緒建立，各批次共用同一個 MarketDataService
+            self.market_service = MarketDataService(store=self.store)
+
+        rankings = {name: TopK(top_k) for name in RANKINGS}
+        screened = skipped = 0
+        chunks = iter_chunks(universe, chunk_size)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            while True:
+                # 補滿在途批次後等任一批完成；標的池只往前讀取 workers 批
+                for asset_type, symbols in itertools.islice(chunks, workers - len(pending)):
+                    pending.add(pool.submit(self._screen_chunk, asset_type, symbols, source, days))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                with timed("screen.rank"):
+                    for future in done:
+                        try:
+                            candidates, missing = future.result()
+                        except Exception as e:
+                            print(f"批次掃描失敗: {e}")
+                            continue
+                        skipped += missing
+                        screened += len(candidates)
+                        for candidate in candidates:
+                            if not np.isnan(candidate["rsi"]):
+                                rankings["oversold"].push(-candidate["rsi"], candidate)
+                                rankings["overbought"].push(candidate["rsi"], candidate)
+                            if candidate["trend_flip"]:
+                                rankings["trend_flip"].push(abs(candidate["trend_distance"]), candidate)
+
+        result = {name: ranking.items() for name, ranking in rankings.items()}
+        result.update({"screened": screened, "skipped": skipped})
+        return result
+
+
+# --- CLI ---
+
+def format_rankings(result, top_k):
+    titles = {"oversold": "📉 最超賣 (RSI 低)", "overbought": "📈 最超買 (RSI 高)", "trend_flip": "🔄 趨勢翻轉"}
+    lines = [f"🔎 掃描 {result['screened']} 檔 (數據不足或抓取失敗 {result['skipped']} 檔)"]
+    for name in RANKINGS:
+        lines.append(f"\n{titles[name]} 前 {top_k}")
+        if not result[name]:
+            lines.append("  (無)")
+        for c in result[name]:
+            flag = " 超賣" if c["is_oversold"] else " 超買" if c["is_overbought"] else ""
+            flip = f" → {c['trend_flip']} ({c['trend_distance']:+.2%})" if c["trend_flip"] else f" {c['trend']}"
+            lines.append(f"  {c['symbol']:<10} {c['asset_type']:<6} {c['date']}  ${c['price']:<10,.2f} "
+                         f"RSI {c['rsi']:6.2f}{flag}{flip}")
+    return "\n".join(lines)
+
+
+def main(argv=None, store=None):
+    parser = argparse.ArgumentParser(prog="python -m investment_bot.services.screener", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("universe", help="標的清單檔 (.txt / .csv) 或 binance:USDT")
+    parser.add_argument("--asset", choices=["Stock", "Crypto"], help="強制指定資產類別 (預設依代號判斷)")
+    parser.add_argument("--top", type=int, default=None, help="每個榜單的筆數，預設 SCREEN_TOP_K")
+    parser.add_argument("--local", action="store_true", help="只讀取本地 Parquet 資料集，不呼叫 API")
+    parser.add_argument("--chunk-size", type=int, default=None, help="每批標的數，預設 SCREEN_CHUNK_SIZE")
+    parser.add_argument("--workers", type=int, default=None, help="同時在途的批次數，預設 PIPELINE_FETCH_WORKERS")
+    parser.add_argument("--days", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if not args.universe.lower().startswith('binance') and not os.path.exists(args.universe):
+        print(f"⚠️ 找不到標的清單: {args.universe}")
+        return 1
+
+    top_k = Config.SCREEN_TOP_K if args.top is None else args.top
+    service = ScreenerService(store=store)
+    result = service.screen(iter_universe(args.universe, args.asset), top_k=top_k,
+                            source='local' if args.local else 'fetch', chunk_size=args.chunk_size,
+                            workers=args.workers, days=args.days)
+    print(format_rankings(result, top_k))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,15 +5,25 @@
 整合 DataStore 儲存分析結果。
 """
 
-import pandas as pd
-import ta
-from datetime import datetime
+import copy
+import numpy as np
 from ..config import Config
-from ..utils.data_store import DataStore
+from ..utils.data_store import get_data_store
+from ..utils.compact_frames import expand_ohlcv
+from ..utils.metrics import timed
+from ..utils.lazy import lazy_import
+from .indicators import (
+    build_close_panel, compute_signals_batch, indicator_fingerprint, signal_cache_key,
+    new_indicator_state, build_indicator_state, signals_from_state
+)
+
+# ta 只在單檔 compute_signals 路徑使用 (批次路徑走 indicators 的向量化計算)
+ta = lazy_import("ta")
 
 class TechnicalAnalysisService:
-    def __init__(self):
-        self.store = DataStore()
+    def __init__(self, store=None):
+        """:param store: 注入的 DataStore，未提供時使用行程內共用的 Store"""
+        self.store = store or get_data_store()
 
     def analyze(self, df, asset_type, symbol=None):
         """
@@ -26,102 +36,298 @@ class TechnicalAnalysisService:
         # 檢查數據量是否足夠
         if df.empty or len(df) < 20:
             return None
+        # 精簡表示 (float32 / epoch index) 只在計算時還原成完整精度
+        df = expand_ohlcv(df)
 
-        # 如果有提供 symbol，先檢查今日是否已分析過
+        # 如果有提供 symbol，先以 K 線內容 + 指標參數查詢訊號快取
+        # (只用最新日期當 key 時，盤中 K 棒更新或 Config 週期改變都會拿到過期的結果)
         if symbol:
-            today = datetime.now().strftime('%Y-%m-%d')
-            # 因為 K 線可能不是每天都有 (週末休市)，我們用 DataFrame 的最新日期作為 Key
-            # 但為了每日報告，通常還是希望能看到當下的分析狀態
-            # 這裡我們用「最新數據日期」來查詢是否已分析
-            last_date_str = df.index[-1].strftime('%Y-%m-%d')
-            
-            cached_signal = self.store.get_signal(symbol, last_date_str)
+            cached_signal = self.get_cached_signal(df, asset_type)
             if cached_signal:
-                # print(f"  [TA Cache Hit] {symbol} {last_date_str}")
                 return cached_signal
+            with timed("ta"):
+                signals = self._analyze_incremental(df, asset_type, symbol)
+        else:
+            with timed("ta"):
+                signals = compute_signals(df, asset_type, symbol)
+
+        # 儲存結果到 DB (如果有 symbol)
+        if signals and symbol:
+            self.save_computed_signal(df, asset_type, symbol, signals)
+
+        return signals
+
+    def get_cached_signal(self, df, asset_type):
+        """
+        依 K 線內容雜湊 + 指標參數指紋查詢已計算過的訊號
+        :return: 訊號 dict 或 None (未命中)
+        """
+        if df.empty:
+            return None
+        return self.store.get_cached_signal(signal_cache_key(expand_ohlcv(df), asset_type))
 
+    def save_computed_signal(self, df, asset_type, symbol, signals):
+        """儲存訊號：tech_signals 保留每日歷史，signal_cache 以內容位址供下次重用"""
+        self.save_signal_records([self.signal_record(df, asset_type, symbol, signals)])
+
+    def signal_record(self, df, asset_type, symbol, signals, state_update=None):
+        """
+        要寫入的訊號與指標狀態 (只保留 cache key 與日期，不持有 K 線)
+        main 的並行模式先收集每個標的的 record，分析結束後以 save_signal_records 一次寫入
+        """
+        df = expand_ohlcv(df)
+        return {
+            "symbol": symbol,
+            "asset_type": asset_type,
+            "date": df.index[-1].strftime('%Y-%m-%d'),
+            "cache_key": signal_cache_key(df, asset_type),
+            "signals": signals,
+            "state_update": state_update,
+        }
+
+    def save_signal_records(self, records):
+        """在同一個交易內寫入多筆 signal_record"""
+        with self.store.transaction():
+            for record in records:
+                symbol, asset_type = record['symbol'], record['asset_type']
+                self.save_resume_state(symbol, asset_type, record['state_update'])
+                if record['signals']:
+                    self.store.save_signal(symbol, asset_type, record['date'], record['signals'])
+                    self.store.save_cached_signal(record['cache_key'], symbol, asset_type, record['date'], record['signals'])
+
+    def _analyze_incremental(self, df, asset_type, symbol):
+        """
+        以 SQLite 中的指標狀態增量計算：只把狀態之後的新 K 棒依序餵入 (每根 O(1))
+        狀態只保存到倒數第二根 K 棒，最後一根可能是盤中未收盤的數據，每次都重新套用。
+        狀態失效 (歷史被改寫、參數改變) 時才從頭重算。
+        """
         try:
-            # 取得 Close 價格序列
-            close = df['Close']
-            
-            # 1. RSI
-            rsi_period = Config.RSI_PERIOD_CRYPTO if asset_type == 'Crypto' else Config.RSI_PERIOD_STOCK
-            rsi_indicator = ta.momentum.RSIIndicator(close=close, window=rsi_period)
-            current_rsi = rsi_indicator.rsi().iloc[-1]
-            
-            # 2. EMA
-            # 確保數據長度足夠計算 EMA
-            data_len = len(close)
+            resume = self.load_resume_state(df, asset_type, symbol)
+            if resume is None:
+                return None
+            signals, update = compute_signals_incremental(df, asset_type, resume, symbol)
+            self.save_resume_state(symbol, asset_type, update)
+            return signals
+        except Exception as e:
+            print(f"增量技術分析錯誤 {symbol}: {e}，改為完整計算")
+            return compute_signals(df, asset_type, symbol)
+
+    def load_resume_state(self, df, asset_type, symbol):
+        """
+        讀取可接續的指標狀態 (main 的並行模式在主行程讀取，再連同 K 線送進 Process Pool)
+        :return: {'state', 'start', 'first_date'}，start 為下一根要餵入的 K 棒位置；
+                 狀態失效時為從頭計算的空狀態，K 棒不足 20 根時回傳 None
+        """
+        close = expand_ohlcv(df)['Close'].dropna()
+        if len(close) < 20:
+            return None
+        dates = close.index.strftime('%Y-%m-%d')
+
+        record = self.store.get_indicator_state(symbol)
+        if record:
+            start = self._resume_position(record, asset_type, close, dates, symbol)
+            if start is not None:
+                return {"state": record['state'], "start": start, "first_date": record['first_date']}
+        return {"state": new_indicator_state(asset_type), "start": 0, "first_date": dates[0]}
+
+    def save_resume_state(self, symbol, asset_type, update):
+        """儲存 compute_signals_incremental 回傳的狀態更新 (沒有新 K 棒時為 None)"""
+        if update is not None:
+            self.store.save_indicator_state(symbol, asset_type, update['first_date'], update['last_date'], update['state'])
+
+    def _resume_position(self, record, asset_type, close, dates, symbol):
+        """
+        檢查既有狀態能否接續使用
+        傳入的 K 線是滑動的分析視窗，起點每天往後移，因此以狀態的最後一根 K 棒 (last_date) 對齊，
+        K 棒數則與本地儲存的完整序列 (first_date ~ last_date) 比對
+        :return: 下一根要餵入的 K 棒位置；狀態失效時回傳 None
+        """
+        state = record['state']
+        if record['asset_type'] != asset_type or state.get('fingerprint') != indicator_fingerprint(asset_type):
+            return None
+        positions = np.flatnonzero(dates == record['last_date'])
+        if not len(positions) or positions[0] >= len(close) - 1:
+            return None
+        pos = int(positions[0])
+        # K 棒數與最後收盤價都要吻合，否則代表中間的歷史被改寫
+        if state.get('count') != self._stored_bar_count(record, close, dates, pos, symbol):
+            return None
+        if not np.isclose(close.iloc[pos], state.get('last_close'), rtol=Config.MARKET_DATA_ADJUST_TOLERANCE):
+            return None
+        return pos + 1
+
+    def _stored_bar_count(self, record, close, dates, pos, symbol):
+        """first_date ~ last_date 之間的 K 棒數：視窗涵蓋 first_date 時直接計算，否則查本地儲存"""
+        first = np.flatnonzero(dates == record['first_date'])
+        if len(first):
+            return pos - int(first[0]) + 1
+        if dates[0] < record['first_date']:
+            return None
+        stored = self.store.load_market_data(symbol, start=record['first_date'], end=close.index[pos], columns=['Close'])
+        if stored.empty:
+            return None
+        return int(stored['Close'].notna().sum())
+
+    def analyze_batch(self, closes, asset_type, symbols=None):
+        """
+        向量化批次分析：一次計算整個面板所有標的的指標
+        :param closes: 收盤價寬表 DataFrame (index: 日期, columns: 標的) 或 2-D ndarray
+        :param asset_type: 'Stock' or 'Crypto' (同一面板使用同一組週期)
+        :param symbols: ndarray 輸入時的標的名稱
+        :return: {symbol: 與 analyze 相同格式的訊號 dict 或 None}
+        """
+        try:
+            return compute_signals_batch(closes, asset_type, symbols)
+        except Exception as e:
+            print(f"批次技術分析計算錯誤 ({asset_type}): {e}")
+            return {}
+
+    def analyze_many(self, frames, asset_types):
+        """
+        依資產類別分組後批次分析
+        :param frames: {symbol: OHLCV DataFrame}
+        :param asset_types: {symbol: 'Stock' or 'Crypto'}
+        :return: {symbol: 訊號 dict 或 None}
+        """
+        groups = {}
+        for symbol, df in frames.items():
+            groups.setdefault(asset_types.get(symbol, 'Stock'), {})[symbol] = expand_ohlcv(df)
+
+        results = {symbol: None for symbol in frames}
+        for asset_type, group in groups.items():
+            results.update(self.analyze_batch(build_close_panel(group), asset_type))
+        return results
+
+
+def compute_signals(df, asset_type, symbol=None):
+    """
+    純計算：對單一標的的 K 線計算技術指標 (不讀寫 DB)
+    定義在模組層級，方便 main 的並行模式丟進 Process Pool 執行。
+    透過 indicators.IndicatorGraph 計算，MACD / EMA / 布林帶共用的中間結果只算一次。
+    :param df: 包含 Close 的 DataFrame
+    :param asset_type: 'Stock' or 'Crypto'
+    :param symbol: (Optional) 僅用於錯誤訊息
+    :return: 包含指標的字典，失敗時回傳 None
+    """
+    if df.empty or len(df) < 20:
+        return None
+
+    try:
+        return compute_signals_batch(expand_ohlcv(df)[['Close']], asset_type)['Close']
+    except Exception as e:
+        print(f"技術分析計算錯誤 {symbol}: {e}")
+        return None
+
+
+def compute_signals_incremental(df, asset_type, resume, symbol=None):
+    """
+    純計算：從 load_resume_state 取得的狀態接續餵入新 K 棒 (不讀寫 DB，可丟進 Process Pool)
+    :param resume: {'state', 'start', 'first_date'}
+    :return: (訊號 dict 或 None, 狀態更新 {'first_date', 'last_date', 'state'} 或 None)
+    """
+    close = expand_ohlcv(df)['Close'].dropna()
+    state, start = resume['state'], resume['start']
+
+    update = None
+    committed = close.iloc[:-1]
+    if start < len(committed):
+        build_indicator_state(committed.iloc[start:].to_numpy(), asset_type, state)
+        update = {
+            "first_date": resume['first_date'],
+            "last_date": committed.index[-1].strftime('%Y-%m-%d'),
+            "state": state,
+        }
+
+    # 最後一根套用在副本上，不影響要持久化的狀態
+    live = build_indicator_state([close.iloc[-1]], asset_type, copy.deepcopy(state))
+    return signals_from_state(live, asset_type), update
+
+
+def compute_signals_ta(df, asset_type, symbol=None):
+    """
+    以 ta 套件逐一計算指標的參考實作 (每個指標物件各自重算 EMA / 滾動平均)
+    保留作為驗證與效能比較的基準，輸出格式與 compute_signals 相同。
+    """
+    if df.empty or len(df) < 20:
+        return None
+
+    try:
+        # 取得 Close 價格序列
+        close = df['Close']
+        
+        # 1. RSI
+        rsi_period = Config.RSI_PERIOD_CRYPTO if asset_type == 'Crypto' else Config.RSI_PERIOD_STOCK
+        rsi_indicator = ta.momentum.RSIIndicator(close=close, window=rsi_period)
+        current_rsi = rsi_indicator.rsi().iloc[-1]
+        
+        # 2. EMA
+        # 確保數據長度足夠計算 EMA
+        data_len = len(close)
+        
+        if asset_type == 'Crypto':
+            ema_fast_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_FAST).ema_indicator().iloc[-1]
+            ema_mid_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_MID).ema_indicator().iloc[-1]
+            ema_slow_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_SLOW).ema_indicator().iloc[-1]
+            # 對於 Crypto，我們用 EMA 60 (EMA_CRYPTO_TREND) 作為趨勢分界線 (如果數據夠長)
+            if data_len >= Config.EMA_CRYPTO_TREND:
+                ema_trend_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_TREND).ema_indicator().iloc[-1]
+            else:
+                ema_trend_val = ema_slow_val
+        else:
+            # 美股
+            ema_fast_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_SHORT).ema_indicator().iloc[-1]
             
-            if asset_type == 'Crypto':
-                ema_fast_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_FAST).ema_indicator().iloc[-1]
-                ema_mid_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_MID).ema_indicator().iloc[-1]
-                ema_slow_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_CRYPTO_SLOW).ema_indicator().iloc[-1]
-                # 對於 Crypto，我們用 EMA 60 作為趨勢分界線 (如果數據夠長)
-                if data_len >= 60:
-                    ema_trend_val = ta.trend.EMAIndicator(close=close, window=60).ema_indicator().iloc[-1]
-                else:
-                    ema_trend_val = ema_slow_val
+            if data_len >= Config.EMA_MEDIUM:
+                ema_mid_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_MEDIUM).ema_indicator().iloc[-1]
+                ema_trend_val = ema_mid_val
             else:
-                # 美股
-                ema_fast_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_SHORT).ema_indicator().iloc[-1]
-                
-                if data_len >= Config.EMA_MEDIUM:
-                    ema_mid_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_MEDIUM).ema_indicator().iloc[-1]
-                    ema_trend_val = ema_mid_val
-                else:
-                    ema_mid_val = ema_fast_val
-                    ema_trend_val = ema_fast_val
-                    
-                if data_len >= Config.EMA_LONG:
-                    ema_slow_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_LONG).ema_indicator().iloc[-1]
-                else:
-                    ema_slow_val = ema_mid_val
+                ema_mid_val = ema_fast_val
+                ema_trend_val = ema_fast_val
                 
-            # 3. MACD
-            macd = ta.trend.MACD(close=close, window_slow=Config.MACD_SLOW, window_fast=Config.MACD_FAST, window_sign=Config.MACD_SIGNAL)
-            macd_line = macd.macd().iloc[-1]
-            macd_signal = macd.macd_signal().iloc[-1]
-            macd_hist = macd.macd_diff().iloc[-1]
-            
-            # 4. Bollinger Bands (布林帶)
-            bb = ta.volatility.BollingerBands(close=close, window=Config.BB_WINDOW, window_dev=Config.BB_STD_DEV)
-            bb_upper = bb.bollinger_hband().iloc[-1]
-            bb_lower = bb.bollinger_lband().iloc[-1]
-            
-            # 當前價格
-            current_price = close.iloc[-1]
+            if data_len >= Config.EMA_LONG:
+                ema_slow_val = ta.trend.EMAIndicator(close=close, window=Config.EMA_LONG).ema_indicator().iloc[-1]
+            else:
+                ema_slow_val = ema_mid_val
             
-            # 組裝訊號
-            signals = {
-                "current_price": round(current_price, 2),
-                "rsi": round(current_rsi, 2),
-                "is_overbought": current_rsi > Config.RSI_OVERBOUGHT,
-                "is_oversold": current_rsi < Config.RSI_OVERSOLD,
-                "trend": "Bullish" if current_price > ema_trend_val else "Bearish",
-                "ema_values": {
-                    "fast": round(ema_fast_val, 2),
-                    "mid": round(ema_mid_val, 2),
-                    "slow": round(ema_slow_val, 2)
-                },
-                "macd": {
-                    "line": round(macd_line, 2),
-                    "signal": round(macd_signal, 2),
-                    "hist": round(macd_hist, 2)
-                },
-                "bb": {
-                    "upper": round(bb_upper, 2),
-                    "lower": round(bb_lower, 2),
-                    "pct_b": round((current_price - bb_lower) / (bb_upper - bb_lower), 2) if (bb_upper - bb_lower) != 0 else 0
-                }
+        # 3. MACD
+        macd = ta.trend.MACD(close=close, window_slow=Config.MACD_SLOW, window_fast=Config.MACD_FAST, window_sign=Config.MACD_SIGNAL)
+        macd_line = macd.macd().iloc[-1]
+        macd_signal = macd.macd_signal().iloc[-1]
+        macd_hist = macd.macd_diff().iloc[-1]
+        
+        # 4. Bollinger Bands (布林帶)
+        bb = ta.volatility.BollingerBands(close=close, window=Config.BB_WINDOW, window_dev=Config.BB_STD_DEV)
+        bb_upper = bb.bollinger_hband().iloc[-1]
+        bb_lower = bb.bollinger_lband().iloc[-1]
+        
+        # 當前價格
+        current_price = close.iloc[-1]
+        
+        # 組裝訊號
+        signals = {
+            "current_price": round(current_price, 2),
+            "rsi": round(current_rsi, 2),
+            "is_overbought": current_rsi > Config.RSI_OVERBOUGHT,
+            "is_oversold": current_rsi < Config.RSI_OVERSOLD,
+            "trend": "Bullish" if current_price > ema_trend_val else "Bearish",
+            "ema_values": {
+                "fast": round(ema_fast_val, 2),
+                "mid": round(ema_mid_val, 2),
+                "slow": round(ema_slow_val, 2)
+            },
+            "macd": {
+                "line": round(macd_line, 2),
+                "signal": round(macd_signal, 2),
+                "hist": round(macd_hist, 2)
+            },
+            "bb": {
+                "upper": round(bb_upper, 2),
+                "lower": round(bb_lower, 2),
+                "pct_b": round((current_price - bb_lower) / (bb_upper - bb_lower), 2) if (bb_upper - bb_lower) != 0 else 0
             }
-            
-            # 儲存結果到 DB (如果有 symbol)
-            if symbol:
-                last_date_str = df.index[-1].strftime('%Y-%m-%d')
-                self.store.save_signal(symbol, asset_type, last_date_str, signals)
-            
-            return signals
-        except Exception as e:
-            print(f"技術分析計算錯誤 {symbol}: {e}")
-            return None
+        }
+        
+        return signals
+    except Exception as e:
+        print(f"技術分析計算錯誤 {symbol}: {e}")
+        return None
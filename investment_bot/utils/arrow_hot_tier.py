@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Arrow IPC 熱層 (Memory-Mapped Arrow Hot Tier)
+把常用標的的完整 K 線存成未壓縮的 Arrow IPC (Feather v2) 檔案：
+    market_data_hot/<asset_type>/<symbol>.arrow
+讀取時以 memory map 開啟，數值欄位直接指向 page cache (零複製、免解壓縮)，
+多個 worker 行程讀同一個檔案也只佔一份實體記憶體。
+Parquet 分區資料集仍是持久化的冷層；熱層隨時可刪除重建。
+"""
+
+import os
+from .lazy import lazy_import
+from .parquet_dataset import DATE_COLUMN, asset_dir_name, safe_symbol
+
+pa = lazy_import("pyarrow")
+
+
+class ArrowHotTier:
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, symbol, asset_type):
+        return os.path.join(self.root, asset_dir_name(asset_type), f"{safe_symbol(symbol)}.arrow")
+
+    def locate(self, symbol, asset_type=None):
+        """找出熱層檔案；asset_type 未知時搜尋所有資產類別"""
+        if asset_type is not None:
+            path = self.path(symbol, asset_type)
+            return path if os.path.exists(path) else None
+        if not os.path.isdir(self.root):
+            return None
+        for entry in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, entry, f"{safe_symbol(symbol)}.arrow")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def write(self, df, symbol, asset_type):
+        """寫入完整序列 (先寫暫存檔再 rename，讀取中的行程仍持有舊檔的 mapping)"""
+        if df.empty:
+            return
+        path = self.path(symbol, asset_type)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(df.rename_axis(DATE_COLUMN), preserve_index=True)
+        tmp = path + ".tmp"
+        with pa.OSFile(tmp, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp, path)
+
+    def read(self, symbol, asset_type=None):
+        """
+        以 memory map 讀取
+        :return: DataFrame，不存在時回傳 None
+        """
+        path = self.locate(symbol, asset_type)
+        if path is None:
+            return None
+        with pa.memory_map(path, 'r') as source:
+            table = pa.ipc.open_file(source).read_all()
+        # split_blocks 讓每個數值欄位各自成為一個 block，直接引用 mmap 的 buffer 而不合併複製
+        return table.to_pandas(split_blocks=True)
+
+    def invalidate(self, symbol, asset_type=None):
+        path = self.locate(symbol, asset_type)
+        while path is not None:
+            os.remove(path)
+            path = self.locate(symbol, asset_type)
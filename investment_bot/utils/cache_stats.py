@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+快取統計 (Cache Stats)
+`python -m investment_bot cache stats` 使用：以標準庫 sqlite3 唯讀開啟資料庫、os.scandir 掃描 Parquet 與熱層目錄。
+不經過 DataStore，因此不載入 SQLAlchemy / pandas / pyarrow (三者光 import 就超過半秒)，也不會建立資料表或目錄。
+表格與欄位名稱須與 db_manager.py 一致；目錄結構見 parquet_dataset.py / arrow_hot_tier.py。
+"""
+
+import os
+import json
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+
+
+def _query(conn, sql, params=()):
+    """表格不存在 (舊版資料庫) 時回傳 None"""
+    try:
+        return conn.execute(sql, params).fetchone()
+    except sqlite3.OperationalError:
+        return None
+
+
+def database_stats(db_path, now=None):
+    """
+    SQLite 各快取表的筆數
+    :return: dict；資料庫尚未建立時回傳 None
+    """
+    if not os.path.exists(db_path):
+        return None
+    # SQLAlchemy 的 DateTime 在 SQLite 存成 'YYYY-MM-DD HH:MM:SS.ffffff'，可直接以字串比較
+    now = (now or datetime.now()).isoformat(sep=" ")
+    conn = sqlite3.connect(Path(db_path).absolute().as_uri() + "?mode=ro", uri=True)
+    try:
+        stats = {"path": db_path, "bytes": os.path.getsize(db_path)}
+        row = _query(conn, "SELECT COUNT(*), TOTAL(expires_at > ?), "
+                           "TOTAL(key LIKE 'market\\_data\\_%' ESCAPE '\\' AND expires_at > ?), "
+                           "TOTAL(IFNULL(LENGTH(CAST(value AS BLOB)), 0) + IFNULL(LENGTH(value_blob), 0)) "
+                           "FROM system_cache", (now, now))
+        if row is not None:
+            stats["system_cache"] = {"entries": row[0], "valid": int(row[1]), "expired": row[0] - int(row[1]),
+                                     "fresh_market_data": int(row[2]), "bytes": int(row[3])}
+        row = _query(conn, "SELECT COUNT(*), COUNT(DISTINCT symbol) FROM signal_cache")
+        if row is not None:
+            stats["signal_cache"] = {"entries": row[0], "symbols": row[1]}
+        row = _query(conn, "SELECT COUNT(*) FROM indicator_state")
+        if row is not None:
+            stats["indicator_state"] = {"symbols": row[0]}
+        row = _query(conn, "SELECT COUNT(*) FROM run_records")
+        if row is not None:
+            last = _query(conn, "SELECT record FROM run_records ORDER BY started_at DESC, id DESC LIMIT 1")
+            stats["run_records"] = {"entries": row[0], "last": json.loads(last[0]) if last and last[0] else None}
+        return stats
+    finally:
+        conn.close()
+
+
+def _scan_files(path, suffix):
+    """:return: (檔案數, 總位元組)"""
+    files = size = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(suffix):
+                files += 1
+                size += entry.stat().st_size
+    return files, size
+
+
+def dataset_stats(root):
+    """
+    Parquet 資料集：market_data/<asset_type>/<symbol>/<year>.parquet 以及舊版平面檔 <symbol>.parquet
+    :return: {asset_dir: {"symbols", "files", "bytes"}}；目錄不存在時回傳 None
+    """
+    if not os.path.isdir(root):
+        return None
+    stats = {}
+    legacy = _scan_files(root, ".parquet")
+    if legacy[0]:
+        stats["(legacy)"] = {"symbols": legacy[0], "files": legacy[0], "bytes": legacy[1]}
+    with os.scandir(root) as entries:
+        for asset_dir in sorted((e for e in entries if e.is_dir()), key=lambda e: e.name):
+            totals = {"symbols": 0, "files": 0, "bytes": 0}
+            with os.scandir(asset_dir.path) as symbols:
+                for symbol_dir in symbols:
+                    if not symbol_dir.is_dir():
+                        continue
+                    files, size = _scan_files(symbol_dir.path, ".parquet")
+                    if files:
+                        totals["symbols"] += 1
+                        totals["files"] += files
+                        totals["bytes"] += size
+            stats[asset_dir.name] = totals
+    return stats
+
+
+def hot_tier_stats(root):
+    """Arrow IPC 熱層：market_data_hot/<asset_type>/<symbol>.arrow；目錄不存在時回傳 None"""
+    if not os.path.isdir(root):
+        return None
+    stats = {}
+    with os.scandir(root) as entries:
+        for asset_dir in sorted((e for e in entries if e.is_dir()), key=lambda e: e.name):
+            files, size = _scan_files(asset_dir.path, ".arrow")
+            stats[asset_dir.name] = {"symbols": files, "files": files, "bytes": size}
+    return stats
+
+
+def collect_cache_stats(db_path, market_data_dir, hot_dir):
+    return {
+        "database": database_stats(db_path),
+        "market_data": dataset_stats(market_data_dir),
+        "hot_tier": hot_tier_stats(hot_dir),
+    }
+
+
+def _mb(size):
+    return f"{size / 1024 / 1024:.2f} MB"
+
+
+def _format_tree(lines, title, path, stats):
+    if stats is None:
+        lines.append(f"{title}: 尚未建立 ({path})")
+        return
+    lines.append(f"{title} ({path})")
+    if not stats:
+        lines.append("  (空)")
+    for name, entry in stats.items():
+        lines.append(f"  {name:<10} {entry['symbols']:>6} 檔  {entry['files']:>6} 個檔案  {_mb(entry['bytes']):>10}")
+
+
+def format_cache_stats(stats, market_data_dir, hot_dir):
+    lines = []
+    db = stats["database"]
+    if db is None:
+        lines.append("🗄️ SQLite: 尚未建立")
+    else:
+        lines.append(f"🗄️ SQLite ({db['path']}, {_mb(db['bytes'])})")
+        cache = db.get("system_cache")
+        if cache:
+            lines.append(f"  system_cache     {cache['entries']} 筆 (有效 {cache['valid']} / 過期 {cache['expired']})，"
+                         f"今日已同步的 K 線 {cache['fresh_market_data']} 檔，{_mb(cache['bytes'])}")
+        if "signal_cache" in db:
+            lines.append(f"  signal_cache     {db['signal_cache']['entries']} 筆 ({db['signal_cache']['symbols']} 檔)")
+        if "indicator_state" in db:
+            lines.append(f"  indicator_state  {db['indicator_state']['symbols']} 檔")
+        runs = db.get("run_records")
+        if runs:
+            last = runs["last"]
+            detail = (f"，最近一次 {last.get('started_at')} {last.get('job', 'report')} {last.get('status')} "
+                      f"{last.get('duration_seconds', 0):.2f}s") if last else ""
+            lines.append(f"  run_records      {runs['entries']} 筆{detail}")
+    _format_tree(lines, "📁 Parquet 資料集", market_data_dir, stats["market_data"])
+    _format_tree(lines, "🔥 Arrow 熱層", hot_dir, stats["hot_tier"])
+    return "\n".join(lines)
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+精簡記憶體表示 (Compact Frame Representation)
+篩選上千檔標的時，每檔 float64 K 線 + DatetimeIndex 同時留在記憶體會讓 RSS 隨標的數線性成長。
+- compact_ohlcv：OHLCV 轉 float32 (誤差超過 COMPACT_FLOAT_TOLERANCE 的欄位保留 float64)，
+  index 轉成 int64 epoch (奈秒)，時區記在 df.attrs
+- expand_ohlcv：分析前還原成 float64 + DatetimeIndex (只有正在計算的那一檔是完整精度)
+- compact_portfolio：持倉表的 Symbol / Type 轉成 category
+- SpillBuffer：以記憶體預算為上限的暫存區，超過預算時把最早放入的 DataFrame 寫到 Arrow IPC 檔案，
+  取回時以 memory map 讀取 (不佔匿名記憶體)
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from ..config import Config
+from .arrow_hot_tier import ArrowHotTier
+from .memory_cache import FrameCache
+
+EPOCH_TZ_ATTR = 'epoch_tz'
+
+
+def downcast_float32(values, tolerance=None):
+    """
+    float64 -> float32 的精度保護：來回轉換的最大相對誤差不超過 tolerance 才轉換
+    :return: float32 ndarray，不符合時回傳 None
+    """
+    tolerance = Config.COMPACT_FLOAT_TOLERANCE if tolerance is None else tolerance
+    values = np.asarray(values, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        compact = values.astype(np.float32)
+        error = np.abs(compact.astype(np.float64) - values) / np.abs(values)
+    error = error[np.isfinite(values) & (values != 0)]
+    # 超出 float32 範圍會變成 inf，同樣視為不符合
+    if not np.isfinite(compact[np.isfinite(values)]).all():
+        return None
+    if error.size and error.max() > tolerance:
+        return None
+    return compact
+
+
+def is_compact(df):
+    return EPOCH_TZ_ATTR in df.attrs
+
+
+def compact_ohlcv(df, tolerance=None):
+    """
+    將 K 線轉成精簡表示；空 DataFrame 或已精簡的 DataFrame 原樣回傳
+    :param tolerance: float32 允許的最大相對誤差，預設 Config.COMPACT_FLOAT_TOLERANCE
+    """
+    if df.empty or is_compact(df) or not isinstance(df.index, pd.DatetimeIndex):
+        return df
+
+    columns = {}
+    for col in df.columns:
+        values = df[col].to_numpy()
+        if values.dtype == np.float64:
+            compact = downcast_float32(values, tolerance)
+            if compact is not None:
+                values = compact
+        columns[col] = values
+
+    tz = df.index.tz
+    index = pd.Index(df.index.asi8, dtype='int64', name=df.index.name)
+    out = pd.DataFrame(columns, index=index)
+    out.attrs[EPOCH_TZ_ATTR] = str(tz) if tz is not None else ''
+    return out
+
+
+def expand_ohlcv(df):
+    """compact_ohlcv 的反向轉換；非精簡的 DataFrame 原樣回傳 (不複製)"""
+    if not is_compact(df):
+        return df
+    tz = df.attrs[EPOCH_TZ_ATTR]
+    index = pd.DatetimeIndex(pd.to_datetime(df.index.to_numpy(dtype='int64'), utc=bool(tz)), name=df.index.name)
+    if tz:
+        index = index.tz_convert(tz)
+    out = df.astype({col: np.float64 for col in df.columns if df[col].dtype == np.float32})
+    out.index = index
+    out.attrs = {}
+    return out
+
+
+def compact_portfolio(df):
+    """持倉表的文字欄位 (Symbol / Type) 轉成 category，重複的字串只存一份"""
+    if df.empty:
+        return df
+    df = df.copy()
+    for col in ('Symbol', 'Type'):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df
+
+
+class SpillBuffer:
+    def __init__(self, max_bytes=None, spill_dir=None):
+        """
+        以記憶體預算為上限的 DataFrame 暫存區 (thread-safe)
+        :param max_bytes: 記憶體預算，None 或 0 表示不限制 (行為等同 dict)
+        :param spill_dir: 溢出檔案目錄，未提供時在第一次溢出時建立暫存目錄，close() 時刪除
+        """
+        self.max_bytes = max_bytes or None
+        self._spill_dir = spill_dir
+        self._owns_dir = spill_dir is None
+        self._spill = None
+        self._frames = OrderedDict()  # key -> (DataFrame, nbytes)
+        self._spilled = {}  # key -> 原本的 index 名稱 (Arrow 檔案中固定為 Date)
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.peak_bytes = 0
+        self.spills = 0
+        self._closed = False
+
+    def _spill_tier(self):
+        if self._spill is None:
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(prefix="investment_bot_spill_")
+            self._spill = ArrowHotTier(self._spill_dir)
+        return self._spill
+
+    @staticmethod
+    def _name(key):
+        return f"k{key}"
+
+    def put(self, key, df):
+        nbytes = FrameCache.frame_nbytes(df)
+        with self._lock:
+            # 逾時後仍在執行的抓取執行緒可能晚於 close() 才放入，直接丟棄
+            if self._closed:
+                return
+            self._discard(key)
+            self._frames[key] = (df, nbytes)
+            self.current_bytes += nbytes
+            # 至少保留最新放入的一筆在記憶體，其餘依放入順序溢出到磁碟
+            while self.max_bytes is not None and self.current_bytes > self.max_bytes and len(self._frames) > 1:
+                old_key, (old_df, old_bytes) = self._frames.popitem(last=False)
+                # 空 DataFrame 不產生檔案，取回時直接回傳空 DataFrame
+                self._spill_tier().write(old_df, self._name(old_key), 'spill')
+                self._spilled[old_key] = old_df.index.name
+                self.current_bytes -= old_bytes
+                self.spills += 1
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                return entry[0]
+            if key not in self._spilled:
+                return default
+            # df.attrs (精簡表示的時區) 會隨 Arrow 的 pandas metadata 一起還原
+            df = self._spill.read(self._name(key), 'spill')
+            if df is None:
+                return pd.DataFrame()
+            df.index.name = self._spilled[key]
+            return df
+
+    def pop(self, key, default=None):
+        df = self.get(key, default)
+        with self._lock:
+            self._discard(key)
+        return df
+
+    def _discard(self, key):
+        entry = self._frames.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry[1]
+        if key in self._spilled:
+            del self._spilled[key]
+            self._spill.invalidate(self._name(key), 'spill')
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._frames or key in self._spilled
+
+    def __len__(self):
+        with self._lock:
+            return len(self._frames) + len(self._spilled)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._frames.clear()
+            self._spilled.clear()
+            self.current_bytes = 0
+            if self._owns_dir and self._spill_dir and os.path.isdir(self._spill_dir):
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_memory": len(self._frames),
+                "spilled": len(self._spilled),
+                "bytes": self.current_bytes,
+                "peak_bytes": self.peak_bytes,
+                "max_bytes": self.max_bytes,
+                "spills": self.spills,
+            }
@@ -7,63 +7,279 @@
 
 import os
 import json
-import pandas as pd
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from sqlalchemy import select, insert, update
-from .db_manager import DBManager
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.sql import func
+from ..config import Config
+from .db_manager import get_db_manager
+from .memory_cache import TTLCache, FrameCache, MISSING
+from .parquet_dataset import PartitionedOHLCVStore
+from .arrow_hot_tier import ArrowHotTier
+from .frame_codec import encode_frame, decode_frame, frame_encode_errors, FRAME_FORMAT
+from .metrics import get_metrics
+from .lazy import lazy_import, is_instance_of
+
+# pandas / numpy 只在讀寫 K 線、持倉時才需要；只查快取的指令不必付出 import 成本
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+_DEFAULT_STORE = None
+_DEFAULT_STORE_LOCK = threading.Lock()
+
+
+def _json_default(obj):
+    """訊號 dict 內含 numpy 純量 (np.float64 / np.bool_)，轉成 Python 原生型別"""
+    if is_instance_of(obj, "numpy", "generic"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _align_tz(value, index):
+    """讓查詢日期與 DatetimeIndex 的時區一致"""
+    value = pd.Timestamp(value)
+    tz = getattr(index, 'tz', None)
+    if tz is not None and value.tzinfo is None:
+        return value.tz_localize(tz)
+    if tz is None and value.tzinfo is not None:
+        return value.tz_convert(None)
+    return value
+
+
+def get_data_store():
+    """
+    取得行程內共用的 DataStore (預設路徑)
+    各 Service 未注入 store 時使用，避免每個 Service 各自建立 Engine 與檢查 Schema
+    """
+    global _DEFAULT_STORE
+    with _DEFAULT_STORE_LOCK:
+        if _DEFAULT_STORE is None:
+            _DEFAULT_STORE = DataStore()
+        return _DEFAULT_STORE
+
 
 class DataStore:
-    def __init__(self):
-        self.db = DBManager()
-        self.market_data_dir = "investment_bot/data/market_data"
+    def __init__(self, db_path=None, market_data_dir=None, hot_dir=None, hot_tier=None):
+        """
+        :param db_path: SQLite 路徑 (預設 Config.DB_PATH)，同一路徑在行程內共用 DBManager/Engine
+        :param market_data_dir: Parquet 目錄 (預設 Config.MARKET_DATA_DIR)
+        :param hot_dir: Arrow IPC 熱層目錄 (預設 Config.MARKET_DATA_HOT_DIR)
+        :param hot_tier: 是否啟用熱層 (預設 Config.MARKET_DATA_HOT_TIER)
+        """
+        self.db = get_db_manager(db_path)
+        self.market_data_dir = market_data_dir or Config.MARKET_DATA_DIR
         os.makedirs(self.market_data_dir, exist_ok=True)
+        self.market_data = PartitionedOHLCVStore(self.market_data_dir)
+        enable_hot = Config.MARKET_DATA_HOT_TIER if hot_tier is None else hot_tier
+        self.hot_tier = ArrowHotTier(hot_dir or Config.MARKET_DATA_HOT_DIR) if enable_hot else None
+        # 每個執行緒各自的 Unit of Work 連線
+        self._local = threading.local()
+        # L1 快取：system_cache 的查詢結果 (write-through) 與最近讀取的 K 線 DataFrame
+        self.cache = TTLCache(max_entries=Config.L1_CACHE_MAX_ENTRIES)
+        self.frame_cache = FrameCache(max_bytes=Config.L1_FRAME_CACHE_MB * 1024 * 1024)
+
+    # --- Transactions (Unit of Work) ---
+
+    @contextmanager
+    def transaction(self):
+        """
+        Unit of Work：區塊內 (同一執行緒) 的所有讀寫共用一條連線與一個交易，離開時一次 commit
+        巢狀呼叫會併入外層交易；發生例外時整批 rollback。
+        用法: with store.transaction(): ...
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        with self.db.engine.begin() as conn:
+            self._local.conn = conn
+            self._local.pending_keys = set()
+            try:
+                yield conn
+            except BaseException:
+                # 交易 rollback 時，L1 中已 write-through 的 key 也要作廢
+                for key in self._local.pending_keys:
+                    self.cache.invalidate(key)
+                raise
+            finally:
+                self._local.conn = None
+                self._local.pending_keys = None
+
+    @contextmanager
+    def _connect(self):
+        """取得連線：在 transaction() 內沿用該交易，否則開一個自動 commit 的短交易"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        with self.db.engine.begin() as conn:
+            yield conn
+
+    @staticmethod
+    def _upsert(table, conflict_cols, update_cols, extra_set=None):
+        """建立 SQLite 原生 INSERT ... ON CONFLICT DO UPDATE 語句"""
+        stmt = sqlite_insert(table)
+        set_ = {col: stmt.excluded[col] for col in update_cols}
+        set_.update(extra_set or {})
+        return stmt.on_conflict_do_update(index_elements=conflict_cols, set_=set_)
         
-    # --- Market Data (Parquet) ---
+    # --- Market Data (Partitioned Parquet) ---
     
-    def get_market_data_path(self, symbol):
-        """取得 Parquet 檔案路徑"""
-        # 簡單處理 symbol 中的特殊字符 (如 BTC/USDT -> BTC_USDT)
-        safe_symbol = symbol.replace('/', '_')
-        return os.path.join(self.market_data_dir, f"{safe_symbol}.parquet")
+    def get_market_data_path(self, symbol, asset_type=None):
+        """取得標的的分區目錄 (<asset_type>/<symbol>/)"""
+        return self.market_data.locate(symbol, asset_type) or self.market_data.symbol_dir(symbol, asset_type or 'Stock')
+
+    def _resolve_asset_type(self, symbol, asset_type):
+        """未指定資產類別時沿用既有分區，否則預設為 Stock"""
+        if asset_type is not None:
+            return asset_type
+        path = self.market_data.locate(symbol)
+        return os.path.basename(os.path.dirname(path)) if path else 'Stock'
 
-    def save_market_data(self, df, symbol):
+    def save_market_data(self, df, symbol, asset_type=None, since=None):
         """
-        儲存 K 線數據到 Parquet
-        採 Overwrite 策略：簡單起見，直接覆蓋舊檔 (因為我們每次都抓完整的 200+ 天)
+        儲存 K 線數據到分區 Parquet 資料集
+        傳入的 df 應為完整序列 (增量同步時由 Service 先以 merge_bars 合併新舊 K 棒)
+        :param since: 增量同步時第一根有變動的 K 棒，只重寫該年份之後的分區；None 表示完整取代舊數據
         """
         if df.empty:
             return
-        path = self.get_market_data_path(symbol)
-        df.to_parquet(path)
+        self._write_market_data(df, symbol, asset_type, since)
         
         # 更新快取記錄 (標記今日已更新)
         self.set_cache(f"market_data_{symbol}", "updated", ttl_minutes=60*12) # 12小時快取
 
-    def load_market_data(self, symbol):
-        """從 Parquet 讀取 K 線數據"""
-        path = self.get_market_data_path(symbol)
-        if os.path.exists(path):
+    @staticmethod
+    def merge_bars(existing, new):
+        """
+        合併新舊 K 線並依日期去重 (同一日期以新數據為準，例如盤中未收盤的最後一根 K 棒)
+        """
+        if existing is None or existing.empty:
+            return new
+        if new is None or new.empty:
+            return existing
+        merged = pd.concat([existing, new])
+        merged = merged[~merged.index.duplicated(keep='last')]
+        return merged.sort_index()
+
+    def save_market_data_many(self, frames, asset_type=None, since=None):
+        """
+        批次儲存多個標的的 K 線數據
+        Parquet 逐檔寫入，快取記錄則在同一個交易內一次更新
+        :param frames: {symbol: DataFrame}，空的 DataFrame 會被略過
+        :param since: {symbol: Timestamp}，增量同步的標的只重寫變動的年份 (見 save_market_data)
+        """
+        since = since or {}
+        saved = []
+        for symbol, df in frames.items():
+            if df is None or df.empty:
+                continue
+            self._write_market_data(df, symbol, asset_type, since.get(symbol))
+            saved.append(symbol)
+
+        if saved:
+            self.set_cache_many({f"market_data_{symbol}": "updated" for symbol in saved}, ttl_minutes=60*12)
+
+    def _write_market_data(self, df, symbol, asset_type, since=None):
+        """寫入冷層 (Parquet)，並 write-through 到熱層與 L1"""
+        asset_type = self._resolve_asset_type(symbol, asset_type)
+        self.market_data.write(df, symbol, asset_type, since=since)
+        if self.hot_tier is not None:
+            self.hot_tier.write(df, symbol, asset_type)
+        self.frame_cache.put(symbol, df)
+
+    def load_market_data(self, symbol, asset_type=None, start=None, end=None, columns=None, last_n=None):
+        """
+        讀取 K 線數據 (L1 記憶體快取 -> Arrow IPC 熱層 (mmap) -> 分區 Parquet)
+        :param start / end: 日期範圍 (含)；L1 未命中時下推到年份分區與 row group
+        :param columns: 欄位投影
+        :param last_n: 只取最後 N 根 (只讀最後幾個 row group)
+        是否「今日已更新」由 is_market_data_fresh 判斷，這裡不再重複查詢快取記錄
+        回傳的 DataFrame 可能與 L1 共用底層數據，呼叫端不應原地修改
+        """
+        partial = start is not None or end is not None or columns is not None or last_n is not None
+        cached = self.frame_cache.get(symbol)
+        if cached is not None:
+            return self._slice_frame(cached, start, end, columns, last_n) if partial else cached.copy(deep=False)
+
+        hot = self._load_hot(symbol, asset_type)
+        if hot is not None:
+            self.frame_cache.put(symbol, hot)
+            return self._slice_frame(hot, start, end, columns, last_n) if partial else hot.copy(deep=False)
+
+        try:
+            self._migrate_legacy_file(symbol, asset_type)
+            if partial and self.hot_tier is None:
+                # 部分讀取不放進 L1 (L1 只存完整序列)
+                return self.market_data.read(symbol, asset_type, start=start, end=end, columns=columns, last_n=last_n)
+            df = self.market_data.read(symbol, asset_type)
+        except Exception as e:
+            print(f"讀取 Parquet 失敗 {symbol}: {e}")
+            return pd.DataFrame()
+
+        if df.empty:
+            return df
+        self.frame_cache.put(symbol, df)
+        if self.hot_tier is not None:
+            # 冷層讀取後提升到熱層，下次 (包含其他行程) 直接 mmap
             try:
-                # 讀取 Parquet
-                df = pd.read_parquet(path)
-                
-                # 檢查是否為「今日已更新」
-                # 雖然檔案存在，但可能是昨天的。我們檢查 cache key
-                if self.get_cache(f"market_data_{symbol}"):
-                    return df
-                
-                # 如果 cache 過期，我們還是回傳 df，讓 Service 層決定是否要透過 API 更新
-                # 這裡可以設計成回傳 (df, is_stale)
-                return df
-                
-            except Exception as e:
-                print(f"讀取 Parquet 失敗 {symbol}: {e}")
-                return pd.DataFrame()
-        return pd.DataFrame()
+                self.hot_tier.write(df, symbol, self._resolve_asset_type(symbol, asset_type))
+            except OSError as e:
+                print(f"寫入熱層失敗 {symbol}: {e}")
+        return self._slice_frame(df, start, end, columns, last_n) if partial else df.copy(deep=False)
+
+    def _load_hot(self, symbol, asset_type):
+        if self.hot_tier is None:
+            return None
+        try:
+            return self.hot_tier.read(symbol, asset_type)
+        except Exception as e:
+            print(f"讀取熱層失敗 {symbol}: {e}，改讀 Parquet")
+            self.hot_tier.invalidate(symbol, asset_type)
+            return None
+
+    @staticmethod
+    def _slice_frame(df, start, end, columns, last_n):
+        """在記憶體中套用與 Parquet 讀取相同的篩選"""
+        if start is not None:
+            df = df[df.index >= _align_tz(start, df.index)]
+        if end is not None:
+            df = df[df.index <= _align_tz(end, df.index)]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        if last_n is not None:
+            df = df.iloc[-last_n:]
+        return df.copy(deep=False)
+
+    def _migrate_legacy_file(self, symbol, asset_type=None):
+        """舊版的平面檔 <symbol>.parquet 第一次讀取時搬進分區資料集"""
+        legacy = self.market_data.legacy_path(symbol)
+        if not os.path.exists(legacy) or self.market_data.locate(symbol, asset_type) is not None:
+            return
+        df = pd.read_parquet(legacy)
+        self.market_data.write(df, symbol, self._resolve_asset_type(symbol, asset_type))
+        os.remove(legacy)
+
+    def invalidate_market_data(self, symbol):
+        """作廢某標的的 K 線快取 (L1 DataFrame 與「今日已更新」記錄)，下次讀取會重新同步"""
+        self.frame_cache.invalidate(symbol)
+        self.invalidate_cache(f"market_data_{symbol}")
+
+    def delete_market_data(self, symbol):
+        """刪除某標的的所有 K 線數據 (冷層、熱層、L1 與「今日已更新」記錄)"""
+        self.market_data.delete(symbol)
+        if self.hot_tier is not None:
+            self.hot_tier.invalidate(symbol)
+        self.invalidate_market_data(symbol)
 
     def is_market_data_fresh(self, symbol):
         """檢查數據是否新鮮 (Cache Key 是否存在)"""
-        return self.get_cache(f"market_data_{symbol}") is not None
+        fresh = self.get_cache(f"market_data_{symbol}") is not None
+        get_metrics().cache_lookup("market_data", fresh)
+        return fresh
 
     # --- Tech Signals (SQLite) ---
     
@@ -90,26 +306,16 @@ class DataStore:
             'bb_pct_b': signal_dict['bb'].get('pct_b')
         }
         
-        with self.db.get_connection() as conn:
-            # 使用 Upsert (Insert or Replace)
-            # SQLite 的 INSERT OR REPLACE 語法，但在 SQLAlchemy 中我們可以用 delete + insert 簡單處理
-            # 或者先查詢是否存在
-            table = self.db.tech_signals
-            
-            # 刪除舊的 (如果有)
-            conn.execute(
-                table.delete().where(
-                    (table.c.symbol == symbol) & (table.c.date == date_str)
-                )
-            )
-            # 插入新的
-            conn.execute(table.insert().values(**values))
-            conn.commit()
+        # 使用 SQLite 原生 Upsert (依 uix_signal_symbol_date 唯一鍵)
+        table = self.db.tech_signals
+        update_cols = [col for col in values if col not in ('symbol', 'date')]
+        with self._connect() as conn:
+            conn.execute(self._upsert(table, ['symbol', 'date'], update_cols), values)
 
     def get_signal(self, symbol, date_str):
         """查詢特定日期的信號"""
         table = self.db.tech_signals
-        with self.db.get_connection() as conn:
+        with self._connect() as conn:
             result = conn.execute(
                 select(table).where(
                     (table.c.symbol == symbol) & (table.c.date == date_str)
@@ -143,56 +349,219 @@ class DataStore:
                 }
         return None
 
+    # --- Signal Cache (SQLite, content-addressed) ---
+
+    def save_cached_signal(self, cache_key, symbol, asset_type, date_str, signals):
+        """
+        以內容位址儲存訊號，同一標的只保留最新一筆 (舊 K 線或舊參數的結果不會再被命中)
+        """
+        table = self.db.signal_cache
+        values = {
+            'cache_key': cache_key,
+            'symbol': symbol,
+            'asset_type': asset_type,
+            'date': date_str,
+            'signals': json.dumps(signals, default=_json_default),
+        }
+        with self._connect() as conn:
+            conn.execute(self._upsert(table, ['cache_key'], ['symbol', 'asset_type', 'date', 'signals']), values)
+            conn.execute(table.delete().where((table.c.symbol == symbol) & (table.c.cache_key != cache_key)))
+        l1_key = f"signal:{cache_key}"
+        self.cache.set(l1_key, json.loads(values['signals']))
+        pending = getattr(self._local, 'pending_keys', None)
+        if pending is not None:
+            pending.add(l1_key)
+
+    def get_cached_signal(self, cache_key):
+        """依內容位址取得訊號 (L1 -> SQLite)，未命中回傳 None"""
+        l1_key = f"signal:{cache_key}"
+        value = self.cache.get(l1_key)
+        if value is not MISSING:
+            get_metrics().cache_lookup("signal_cache", True)
+            return value
+
+        table = self.db.signal_cache
+        with self._connect() as conn:
+            row = conn.execute(select(table.c.signals).where(table.c.cache_key == cache_key)).first()
+        get_metrics().cache_lookup("signal_cache", row is not None)
+        if row is None:
+            return None
+        value = json.loads(row.signals)
+        self.cache.set(l1_key, value)
+        return value
+
+    # --- Indicator State (SQLite) ---
+
+    def save_indicator_state(self, symbol, asset_type, first_date, last_date, state):
+        """儲存指標增量狀態 (每個標的只保留最新一筆)"""
+        values = {
+            'symbol': symbol,
+            'asset_type': asset_type,
+            'first_date': first_date,
+            'last_date': last_date,
+            'bar_count': state.get('count'),
+            'state': json.dumps(state),
+        }
+        table = self.db.indicator_state
+        update_cols = [col for col in values if col != 'symbol']
+        with self._connect() as conn:
+            conn.execute(self._upsert(table, ['symbol'], update_cols, extra_set={'updated_at': func.now()}), values)
+
+    def get_indicator_state(self, symbol):
+        """
+        讀取指標增量狀態
+        :return: {'asset_type', 'first_date', 'last_date', 'state'} 或 None
+        """
+        table = self.db.indicator_state
+        with self._connect() as conn:
+            row = conn.execute(select(table).where(table.c.symbol == symbol)).first()
+        if row is None:
+            return None
+        try:
+            state = json.loads(row.state)
+        except (TypeError, ValueError):
+            return None
+        return {
+            "asset_type": row.asset_type,
+            "first_date": row.first_date,
+            "last_date": row.last_date,
+            "state": state,
+        }
+
+    def invalidate_indicator_state(self, symbol):
+        """歷史 K 線被改寫 (分割/除權) 時刪除狀態，下次分析會完整重算"""
+        table = self.db.indicator_state
+        with self._connect() as conn:
+            conn.execute(table.delete().where(table.c.symbol == symbol))
+
     # --- Portfolio Snapshots (SQLite) ---
     
+    SNAPSHOT_COLUMNS = ['date', 'symbol', 'asset_type', 'qty', 'cost_basis', 'market_price',
+                        'market_value', 'unrealized_pl', 'return_rate']
+
     def save_portfolio_snapshot(self, df, date_str):
-        """儲存持倉快照"""
+        """
+        儲存持倉快照
+        直接由 DataFrame 的欄位陣列組成參數，以 DBAPI executemany 一次寫入 (不經過逐列的 dict)
+        """
         if df.empty:
             return
             
         table = self.db.portfolio_snapshots
+        qty = df['Qty'].to_numpy(dtype=np.float64)
+        price = df['MarketPrice'].to_numpy(dtype=np.float64)
+        columns = [
+            np.full(len(df), date_str, dtype=object),
+            df['Symbol'].astype(str).to_numpy(dtype=object),
+            df['Type'].astype(str).to_numpy(dtype=object),
+            qty,
+            df['Cost'].to_numpy(dtype=np.float64),
+            price,
+            price * qty,
+            df['UnrealizedPL'].to_numpy(dtype=np.float64),
+            df['ReturnRate'].to_numpy(dtype=np.float64),
+        ]
+        # tolist() 轉成 Python 原生型別 (float / str)，zip 組成每列的 tuple
+        rows = list(zip(*(col.tolist() for col in columns)))
+        stmt = str(table.insert().compile(dialect=self.db.engine.dialect, column_keys=self.SNAPSHOT_COLUMNS))
         
-        with self.db.get_connection() as conn:
+        # 快照沒有唯一鍵 (同日同標的可能有多筆)，以 delete + insert 在同一交易內完成
+        with self._connect() as conn:
             # 1. 清除當日舊快照 (避免重複)
             conn.execute(table.delete().where(table.c.date == date_str))
-            
             # 2. 批量插入
-            values_list = []
-            for _, row in df.iterrows():
-                values_list.append({
-                    'date': date_str,
-                    'symbol': row['Symbol'],
-                    'asset_type': row['Type'],
-                    'qty': row['Qty'],
-                    'cost_basis': row['Cost'],
-                    'market_price': row['MarketPrice'],
-                    'market_value': row['MarketPrice'] * row['Qty'],
-                    'unrealized_pl': row['UnrealizedPL'],
-                    'return_rate': row['ReturnRate']
-                })
-            
-            if values_list:
-                conn.execute(table.insert(), values_list)
-                conn.commit()
+            conn.exec_driver_sql(stmt, rows)
+
+    def get_portfolio_history(self, start=None, end=None, symbols=None):
+        """
+        持倉歷史 (單一 SQL 查詢：依日期與標的彙總，之後在 pandas 內向量化轉成寬表)
+        :param start / end: 'YYYY-MM-DD' 日期範圍 (含)，None 表示不限制
+        :param symbols: 只計算這些標的 (權重也只在這些標的之間分配)
+        :return: DatetimeIndex (date) 的 DataFrame，欄位為兩層 MultiIndex：
+                 ('portfolio', market_value / cost_basis / unrealized_pl / return_rate) 整體數值
+                 ('weight', <symbol>) 各標的市值占比 (當日沒有持倉為 0)
+        """
+        table = self.db.portfolio_snapshots
+        stmt = select(
+            table.c.date,
+            table.c.symbol,
+            func.sum(table.c.market_value).label('market_value'),
+            func.sum(table.c.qty * table.c.cost_basis).label('cost_basis'),
+            func.sum(table.c.unrealized_pl).label('unrealized_pl'),
+        ).group_by(table.c.date, table.c.symbol).order_by(table.c.date)
+        if start is not None:
+            stmt = stmt.where(table.c.date >= str(start))
+        if end is not None:
+            stmt = stmt.where(table.c.date <= str(end))
+        if symbols is not None:
+            stmt = stmt.where(table.c.symbol.in_(list(symbols)))
+
+        with self._connect() as conn:
+            result = conn.execute(stmt)
+            rows = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+        totals_cols = ['market_value', 'cost_basis', 'unrealized_pl', 'return_rate']
+        if rows.empty:
+            columns = pd.MultiIndex.from_tuples([('portfolio', col) for col in totals_cols])
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='date'), columns=columns, dtype=np.float64)
+
+        rows['date'] = pd.to_datetime(rows['date'])
+        rows[['market_value', 'cost_basis', 'unrealized_pl']] = \
+            rows[['market_value', 'cost_basis', 'unrealized_pl']].astype(np.float64).fillna(0.0)
+        totals = rows.groupby('date')[['market_value', 'cost_basis', 'unrealized_pl']].sum()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            totals['return_rate'] = np.where(totals['cost_basis'] != 0,
+                                             totals['unrealized_pl'] / totals['cost_basis'], 0.0)
+
+        values = rows.pivot(index='date', columns='symbol', values='market_value').fillna(0.0)
+        day_total = values.sum(axis=1).to_numpy()[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            weights = pd.DataFrame(np.where(day_total != 0, values.to_numpy() / day_total, 0.0),
+                                   index=values.index, columns=values.columns)
+
+        history = pd.concat({'portfolio': totals[totals_cols], 'weight': weights}, axis=1)
+        history.index.name = 'date'
+        history.columns.names = [None, None]
+        return history
+
+    # --- Run Records (SQLite) ---
+
+    def save_run_record(self, record):
+        """儲存一次執行的指標紀錄 (RunMetrics.to_record() 的輸出)"""
+        table = self.db.run_records
+        values = {
+            'started_at': datetime.fromisoformat(record['started_at']),
+            'duration_seconds': record.get('duration_seconds'),
+            'status': record.get('status'),
+            'record': json.dumps(record, default=_json_default),
+        }
+        with self._connect() as conn:
+            conn.execute(table.insert(), values)
+
+    def get_run_records(self, limit=20):
+        """最近的執行紀錄 (新到舊)"""
+        table = self.db.run_records
+        with self._connect() as conn:
+            rows = conn.execute(
+                select(table.c.record).order_by(table.c.started_at.desc(), table.c.id.desc()).limit(limit)
+            ).fetchall()
+        return [json.loads(row.record) for row in rows]
 
     # --- Market Sentiment (SQLite) ---
     
     def save_sentiment(self, date_str, sentiment_data):
         table = self.db.market_sentiment
-        with self.db.get_connection() as conn:
-            # Delete old
-            conn.execute(table.delete().where(table.c.date == date_str))
-            # Insert new
-            conn.execute(table.insert().values(
-                date=date_str,
-                value=sentiment_data['value'],
-                classification=sentiment_data['classification']
-            ))
-            conn.commit()
+        values = {
+            'date': date_str,
+            'value': sentiment_data['value'],
+            'classification': sentiment_data['classification']
+        }
+        with self._connect() as conn:
+            conn.execute(self._upsert(table, ['date'], ['value', 'classification']), values)
 
     def get_sentiment(self, date_str):
         table = self.db.market_sentiment
-        with self.db.get_connection() as conn:
+        with self._connect() as conn:
             result = conn.execute(
                 select(table).where(table.c.date == date_str)
             ).first()
@@ -206,27 +575,61 @@ class DataStore:
     # --- Cache Management ---
     
     def set_cache(self, key, value, ttl_minutes=60):
-        """設定快取"""
+        """設定快取 (DataFrame 以 Arrow IPC 存成 BLOB，其餘值存 JSON)"""
+        self.set_cache_many({key: value}, ttl_minutes=ttl_minutes)
+
+    def set_cache_many(self, items, ttl_minutes=60):
+        """批次設定快取 (單一 executemany Upsert)"""
+        if not items:
+            return
         expires_at = datetime.now() + timedelta(minutes=ttl_minutes)
         table = self.db.system_cache
-        
-        with self.db.get_connection() as conn:
-            # Delete old
-            conn.execute(table.delete().where(table.c.key == key))
-            # Insert
-            conn.execute(table.insert().values(
-                key=key,
-                value=json.dumps(value),
-                expires_at=expires_at
-            ))
-            conn.commit()
-            
+        stmt = self._upsert(table, ['key'], ['value', 'value_blob', 'value_format', 'expires_at'],
+                            {'updated_at': func.now()})
+
+        rows, values = [], {}
+        for key, value in items.items():
+            row, values[key] = self._encode_cache_value(value)
+            rows.append({'key': key, 'expires_at': expires_at, **row})
+        with self._connect() as conn:
+            conn.execute(stmt, rows)
+
+        # Write-through 到 L1 (存入與 SQLite 解碼後相同型別的值)
+        pending = getattr(self._local, 'pending_keys', None)
+        for key, value in values.items():
+            self.cache.set(key, value, expires_at)
+            if pending is not None:
+                pending.add(key)
+
+    @staticmethod
+    def _encode_cache_value(value):
+        """
+        :return: (system_cache 欄位, 寫入 L1 的值)
+        DataFrame 含 Arrow 無法推斷型別的混合欄位時退回 JSON records
+        """
+        if is_instance_of(value, "pandas", "DataFrame"):
+            try:
+                # L1 保存複本：呼叫端之後修改自己的 DataFrame 不影響快取
+                return {'value': None, 'value_blob': encode_frame(value), 'value_format': FRAME_FORMAT}, value.copy()
+            except frame_encode_errors() as e:
+                print(f"⚠️ [DataStore] DataFrame 無法以 Arrow 編碼 ({e})，改存 JSON records")
+                value = value.to_dict('records')
+        return {'value': json.dumps(value, default=_json_default), 'value_blob': None, 'value_format': None}, value
+
     def get_cache(self, key):
-        """取得快取 (若過期則回傳 None)"""
+        """
+        取得快取 (若過期則回傳 None)
+        先查 L1，未命中才查 SQLite；回傳值與 L1 共用，呼叫端不應原地修改
+        以 DataFrame 存入的值回傳 DataFrame (dtype 與 index 完整還原)
+        """
+        value = self.cache.get(key)
+        if value is not MISSING:
+            return value
+
         table = self.db.system_cache
         now = datetime.now()
         
-        with self.db.get_connection() as conn:
+        with self._connect() as conn:
             result = conn.execute(
                 select(table).where(
                     (table.c.key == key) & (table.c.expires_at > now)
@@ -234,6 +637,40 @@ class DataStore:
             ).first()
             
             if result:
-                return json.loads(result.value)
+                if result.value_format == FRAME_FORMAT:
+                    value = decode_frame(result.value_blob)
+                else:
+                    value = json.loads(result.value)
+                self.cache.set(key, value, result.expires_at)
+                return value
         return None
 
+    def refresh_cache_ttl(self, key, ttl_minutes=60):
+        """
+        只延長既有快取的到期時間 (包含已過期但尚未刪除的列)，不重寫內容
+        :return: 是否有快取被延長 (False 表示快取不存在，需呼叫端重新 set_cache)
+        """
+        table = self.db.system_cache
+        with self._connect() as conn:
+            updated = conn.execute(
+                table.update().where(table.c.key == key).values(
+                    expires_at=datetime.now() + timedelta(minutes=ttl_minutes), updated_at=func.now())
+            ).rowcount
+        # L1 可能持有舊的到期時間，下次 get_cache 從 SQLite 重新載入
+        self.cache.invalidate(key)
+        return updated > 0
+
+    def invalidate_cache(self, key):
+        """明確作廢快取 (L1 與 SQLite)"""
+        self.cache.invalidate(key)
+        table = self.db.system_cache
+        with self._connect() as conn:
+            conn.execute(table.delete().where(table.c.key == key))
+
+    def cache_stats(self):
+        """L1 快取的命中 / 未命中 / 淘汰統計，用於調整容量"""
+        return {
+            "system_cache": self.cache.stats(),
+            "market_data": self.frame_cache.stats(),
+        }
+
@@ -6,16 +6,93 @@
 """
 
 import os
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, String, Float, Boolean, DateTime, UniqueConstraint, Index
+import threading
+from sqlalchemy import create_engine, event, inspect, text, MetaData, Table, Column, Integer, String, Float, Boolean, DateTime, LargeBinary, UniqueConstraint, Index
+from sqlalchemy.pool import QueuePool, StaticPool
 from sqlalchemy.sql import func
+from ..config import Config
 
-class DBManager:
-    def __init__(self, db_path="investment_bot/data/investment.db"):
-        # 確保目錄存在
+# 行程內共用：每個資料庫路徑只建立一個 Engine (連線池)，Schema 也只檢查一次
+_ENGINES = {}
+_MANAGERS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def _normalize_path(db_path):
+    return db_path if db_path == ":memory:" else os.path.abspath(db_path)
+
+
+def get_engine(db_path=None):
+    """取得 (或建立) 指定資料庫路徑的共用 Engine"""
+    key = _normalize_path(db_path or Config.DB_PATH)
+    with _REGISTRY_LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine = _create_engine(key)
+            _ENGINES[key] = engine
+        return engine
+
+
+def _create_engine(db_path):
+    # check_same_thread=False：連線池中的連線會被不同 worker thread 取用
+    # timeout：SQLite busy timeout，並行寫入時等待鎖而不是直接拋出 "database is locked"
+    connect_args = {"check_same_thread": False, "timeout": Config.DB_BUSY_TIMEOUT}
+
+    if db_path == ":memory:":
+        # 記憶體資料庫只存在於單一連線中，必須共用同一條連線
+        engine = create_engine("sqlite://", echo=False, poolclass=StaticPool, connect_args=connect_args)
+    else:
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
-        
-        # 使用 SQLite
-        self.engine = create_engine(f"sqlite:///{db_path}", echo=False)
+        engine = create_engine(
+            f"sqlite:///{db_path}",
+            echo=False,
+            poolclass=QueuePool,
+            pool_size=Config.DB_POOL_SIZE,
+            max_overflow=Config.DB_MAX_OVERFLOW,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+            connect_args=connect_args,
+        )
+
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
+
+
+def _apply_sqlite_pragmas(dbapi_conn, _connection_record):
+    """
+    SQLite 效能設定 (每條新連線套用一次)
+    - WAL：讀寫互不阻塞，commit 只需 append WAL 而非改寫整頁
+    - synchronous=NORMAL：WAL 模式下僅在 checkpoint 時 fsync，斷電最多遺失最後幾筆交易但不會損毀
+    - mmap / cache_size：減少讀取時的 syscall 與重複 I/O
+    """
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}")
+        # 負值代表 KiB
+        cursor.execute(f"PRAGMA cache_size=-{Config.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def get_db_manager(db_path=None):
+    """取得行程內共用的 DBManager (每個資料庫路徑一個)"""
+    key = _normalize_path(db_path or Config.DB_PATH)
+    with _REGISTRY_LOCK:
+        manager = _MANAGERS.get(key)
+    if manager is None:
+        manager = DBManager(key)
+        with _REGISTRY_LOCK:
+            manager = _MANAGERS.setdefault(key, manager)
+    return manager
+
+
+class DBManager:
+    def __init__(self, db_path=None):
+        # 使用 SQLite (同一路徑共用 Engine 與連線池)
+        self.db_path = _normalize_path(db_path or Config.DB_PATH)
+        self.engine = get_engine(self.db_path)
         self.metadata = MetaData()
         
         # 定義 Schema
@@ -23,6 +100,26 @@ class DBManager:
         
         # 建立 Tables (如果不存在)
         self.metadata.create_all(self.engine)
+        self._migrate_schema()
+
+    def _migrate_schema(self):
+        """
+        輕量 Schema 遷移：create_all 不會修改既有的表，
+        - 舊資料庫缺少的新欄位 (皆為 nullable、無預設值) 以 ALTER TABLE ADD COLUMN 補上
+        - 既有的表上新增的 Index 以 CREATE INDEX 補上
+        """
+        inspector = inspect(self.engine)
+        with self.engine.begin() as conn:
+            for table in self.metadata.sorted_tables:
+                existing = {col['name'] for col in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing:
+                        col_type = column.type.compile(dialect=self.engine.dialect)
+                        conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+                existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing_indexes:
+                        index.create(conn)
         
     def _define_tables(self):
         """定義資料庫表結構"""
@@ -80,6 +177,8 @@ class DBManager:
         )
         # 手動建立 Index 需使用 Index 物件 (Table 定義外)
         Index('idx_portfolio_date', self.portfolio_snapshots.c.date)
+        # 單一標的的歷史查詢 (WHERE symbol = ? AND date BETWEEN ...)
+        Index('idx_portfolio_symbol_date', self.portfolio_snapshots.c.symbol, self.portfolio_snapshots.c.date)
         
         # 3. 市場情緒表 (Market Sentiment)
         self.market_sentiment = Table('market_sentiment', self.metadata,
@@ -94,9 +193,47 @@ class DBManager:
         self.system_cache = Table('system_cache', self.metadata,
             Column('key', String, primary_key=True),
             Column('value', String), # JSON string
+            Column('value_blob', LargeBinary), # DataFrame (Arrow IPC stream)
+            Column('value_format', String), # NULL: JSON (value)；'arrow': DataFrame (value_blob)
             Column('expires_at', DateTime),
             Column('updated_at', DateTime, server_default=func.now(), onupdate=func.now())
         )
+
+        # 5. 指標增量狀態表 (Indicator State)
+        # 每個標的一筆：EMA / RSI / MACD 遞迴值與布林帶視窗 (JSON)，新 K 棒只需 O(1) 更新
+        self.indicator_state = Table('indicator_state', self.metadata,
+            Column('symbol', String, primary_key=True),
+            Column('asset_type', String, nullable=False),
+            Column('first_date', String, nullable=False), # 狀態起算的第一根 K 棒
+            Column('last_date', String, nullable=False),  # 狀態已包含的最後一根 K 棒
+            Column('bar_count', Integer),
+            Column('state', String), # JSON string
+            Column('updated_at', DateTime, server_default=func.now(), onupdate=func.now())
+        )
+
+        # 6. 訊號快取表 (Signal Cache)
+        # 以「K 線內容雜湊 + 指標參數指紋」為 key，內容不變就直接重用訊號；參數改變時自然失效
+        self.signal_cache = Table('signal_cache', self.metadata,
+            Column('cache_key', String, primary_key=True),
+            Column('symbol', String, nullable=False),
+            Column('asset_type', String, nullable=False),
+            Column('date', String, nullable=False), # 最新一根 K 棒日期
+            Column('signals', String), # JSON string
+            Column('created_at', DateTime, server_default=func.now())
+        )
+        Index('idx_signal_cache_symbol', self.signal_cache.c.symbol)
+
+        # 7. 執行紀錄表 (Run Records)
+        # 每次執行一筆：各階段耗時、API 呼叫次數、抓取數據量與快取命中率 (JSON)，用來找出變慢的階段
+        self.run_records = Table('run_records', self.metadata,
+            Column('id', Integer, primary_key=True),
+            Column('started_at', DateTime, nullable=False),
+            Column('duration_seconds', Float),
+            Column('status', String),
+            Column('record', String), # JSON string
+            Column('created_at', DateTime, server_default=func.now())
+        )
+        Index('idx_run_records_started', self.run_records.c.started_at)
         
     def get_connection(self):
         return self.engine.connect()
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+DataFrame 二進位編碼 (Binary DataFrame Codec)
+system_cache 中的 DataFrame 以 Arrow IPC stream 存成 BLOB，取代 JSON records：
+- dtype (float32 / category / datetime64[tz] / bool ...)、index 與 df.attrs 隨 Arrow 的 pandas metadata 一起還原
+- 解碼是一次 IPC 讀取 + to_pandas，不需要逐列重建 dict
+- CACHE_FRAME_COMPRESSION 可選 zstd / lz4 (預設不壓縮，解碼最快)
+"""
+
+from ..config import Config
+from .lazy import lazy_import
+
+pa = lazy_import("pyarrow")
+
+FRAME_FORMAT = "arrow"
+
+
+def frame_encode_errors():
+    """欄位內混合型別 (例如同一欄有字串與數字) 時 Arrow 無法推斷型別，encode_frame 會拋出這些例外"""
+    return (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError)
+
+
+def encode_frame(df, compression=None):
+    """
+    DataFrame -> Arrow IPC stream bytes
+    :param compression: None / "zstd" / "lz4"，預設 Config.CACHE_FRAME_COMPRESSION
+    """
+    compression = compression if compression is not None else Config.CACHE_FRAME_COMPRESSION
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    options = pa.ipc.IpcWriteOptions(compression=compression or None)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=options) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_frame(data):
+    """Arrow IPC stream bytes -> DataFrame (壓縮格式由 stream 自行標記)"""
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+延遲載入 (Lazy Imports)
+pandas / pyarrow / yfinance / ccxt / ta 光是 import 就要數百毫秒，而只讀快取的指令 (例如 cache stats)
+或 K 線全部命中新鮮快取的日報根本用不到其中幾個。模組層級以 lazy_import 取得代理物件，
+第一次存取屬性時才真正 import，之後直接轉給真正的模組：
+    pd = lazy_import("pandas")
+    pd.DataFrame(...)          # 此時才 import pandas
+對代理設定屬性 (例如測試替換 ccxt.binance) 會設定到真正的模組上。
+"""
+
+import sys
+import importlib
+
+
+class LazyModule:
+    def __init__(self, name):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_module", None)
+
+    def _load(self):
+        module = object.__getattribute__(self, "_module")
+        if module is None:
+            module = importlib.import_module(object.__getattribute__(self, "_name"))
+            object.__setattr__(self, "_module", module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        name = object.__getattribute__(self, "_name")
+        state = "loaded" if object.__getattribute__(self, "_module") is not None else "not loaded"
+        return f"<lazy module '{name}' ({state})>"
+
+
+def lazy_import(name):
+    """:return: 第一次存取屬性時才 import name 的代理物件"""
+    return LazyModule(name)
+
+
+def is_instance_of(value, module_name, class_name):
+    """
+    isinstance 判斷但不觸發 import：模組尚未載入時，value 不可能是其中的類別
+    例如 is_instance_of(value, "pandas", "DataFrame")
+    """
+    module = sys.modules.get(module_name)
+    return module is not None and isinstance(value, getattr(module, class_name))
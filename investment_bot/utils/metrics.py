@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+執行指標 (Run Metrics)
+輕量的計時器與計數器，記錄每次執行各階段的耗時、API 呼叫次數、抓取的數據量與快取命中率。
+- get_metrics()：目前這次執行的 RunMetrics (main 每次執行開始時以 start_run() 重新建立)
+- timed(name)：context manager，累計階段耗時 (同一階段可被多個執行緒重複進入)
+- 執行結束時 to_record() 寫入 SQLite run_records，to_prometheus() 可輸出給 node_exporter textfile collector
+注意：Process Pool 子行程中的計數不會回傳主行程，主行程只記錄整體階段耗時。
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class RunMetrics:
+    def __init__(self):
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages = {}    # stage -> {"seconds": 累計秒數, "calls": 次數}
+        self.counters = {}  # (name, ((label, value), ...)) -> 累計值
+
+    # --- 記錄 ---
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            entry = self.stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            entry["seconds"] += seconds
+            entry["calls"] += 1
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def api_call(self, source, nbytes=0, calls=1):
+        """外部 API 呼叫次數與回傳數據量 (bytes)"""
+        self.incr("api_calls", calls, source=source)
+        if nbytes:
+            self.incr("bytes_fetched", int(nbytes), source=source)
+
+    def cache_lookup(self, cache, hit):
+        self.incr("cache_hits" if hit else "cache_misses", cache=cache)
+
+    # --- 查詢 ---
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def _by_label(self, name, label):
+        with self._lock:
+            return {dict(labels)[label]: value for (key, labels), value in self.counters.items()
+                    if key == name and label in dict(labels)}
+
+    def cache_hit_ratios(self):
+        hits, misses = self._by_label("cache_hits", "cache"), self._by_label("cache_misses", "cache")
+        return {cache: round(hits.get(cache, 0) / (hits.get(cache, 0) + misses.get(cache, 0)), 4)
+                for cache in sorted(set(hits) | set(misses))}
+
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    def to_record(self, status="ok", extra=None):
+        """整理成可 JSON 序列化的執行紀錄"""
+        with self._lock:
+            stages = {name: {"seconds": round(entry["seconds"], 6), "calls": entry["calls"]}
+                      for name, entry in self.stages.items()}
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        record = {
+            "started_at": self.started_at.isoformat(timespec='seconds'),
+            "duration_seconds": round(self.elapsed(), 6),
+            "status": status,
+            "stages": stages,
+            "counters": counters,
+            "api_calls": self._by_label("api_calls", "source"),
+            "bytes_fetched": self._by_label("bytes_fetched", "source"),
+            "cache_hit_ratio": self.cache_hit_ratios(),
+        }
+        if extra:
+            record.update(extra)
+        return record
+
+    def to_prometheus(self, prefix="investment_bot", status="ok"):
+        """Prometheus text exposition format (皆為最近一次執行的 gauge)"""
+        def fmt_labels(labels):
+            if not labels:
+                return ""
+            escaped = (k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                       for k, v in labels)
+            return "{" + ",".join(escaped) + "}"
+
+        series = {}  # metric -> (help, [(labels, value), ...])
+
+        def add(metric, help_text, labels, value):
+            series.setdefault(f"{prefix}_{metric}", (help_text, []))[1].append((labels, value))
+
+        add("run_timestamp_seconds", "Unix time the last run started", (), self.started_at.timestamp())
+        add("run_duration_seconds", "Wall time of the last run", (), self.elapsed())
+        add("run_success", "1 if the last run finished without error", (), int(status == "ok"))
+        with self._lock:
+            for name, entry in sorted(self.stages.items()):
+                add("stage_seconds", "Time spent per stage in the last run", (("stage", name),), entry["seconds"])
+                add("stage_calls", "Times each stage was entered in the last run", (("stage", name),), entry["calls"])
+            for (name, labels), value in sorted(self.counters.items()):
+                add(name, f"{name} in the last run", labels, value)
+        for cache, ratio in self.cache_hit_ratios().items():
+            add("cache_hit_ratio", "Cache hit ratio in the last run", (("cache", cache),), ratio)
+
+        lines = []
+        for metric, (help_text, samples) in series.items():
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(f"{metric}{fmt_labels(labels)} {value:g}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+_CURRENT = RunMetrics()
+_CURRENT_LOCK = threading.Lock()
+
+
+def get_metrics():
+    """目前這次執行的指標 (未呼叫 start_run 時為行程啟動時建立的實例)"""
+    return _CURRENT
+
+
+def start_run():
+    """開始新的一次執行，之後的計時與計數記錄到新的 RunMetrics"""
+    global _CURRENT
+    with _CURRENT_LOCK:
+        _CURRENT = RunMetrics()
+        return _CURRENT
+
+
+def timed(name):
+    """with timed("sheet_read"): ... 累計到目前這次執行的階段耗時"""
+    return get_metrics().stage(name)
+
+
+def frame_nbytes(df):
+    """API 回傳數據量以解析後的 DataFrame 大小估算 (不含 HTTP 標頭與壓縮)"""
+    return int(df.memory_usage(index=True).sum()) if df is not None and not df.empty else 0
+
+
+def write_prometheus_textfile(path, metrics=None, status="ok"):
+    """寫入 Prometheus textfile (先寫暫存檔再 rename，collector 不會讀到寫一半的檔案)"""
+    metrics = metrics or get_metrics()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(metrics.to_prometheus(status=status))
+    os.replace(tmp, path)
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+分區 Parquet K 線資料集 (Partitioned OHLCV Dataset)
+目錄結構依 design_storage.md 規劃，再細分到年份：
+    market_data/<asset_type>/<symbol>/<year>.parquet   例如 stock/TSLA/2024.parquet
+- 讀取時先依年份裁掉不需要的檔案 (partition pruning)，
+  再以 Date 欄位的 row group 統計值做 predicate pushdown，只解碼需要的 row group
+- 「最後 N 根」從最新的檔案、最後一個 row group 往回讀，讀滿 N 根即停止
+- 多標的單一欄位的寬表 (回測用) 逐檔只解碼 Date + 該欄位，直接以 NumPy 填入 (日期 x 標的) 矩陣
+"""
+
+import os
+import shutil
+from ..config import Config
+from .lazy import lazy_import
+
+# 建立 DataStore 不需要 pandas / pyarrow，第一次讀寫 K 線時才載入
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+pa = lazy_import("pyarrow")
+pc = lazy_import("pyarrow.compute")
+ds = lazy_import("pyarrow.dataset")
+pq = lazy_import("pyarrow.parquet")
+
+DATE_COLUMN = 'Date'
+
+
+def asset_dir_name(asset_type):
+    """'Stock' -> 'stock'，'Crypto' -> 'crypto'"""
+    return str(asset_type).lower()
+
+
+def _naive(ts):
+    """統一轉成不帶時區的 UTC 時間，方便比較"""
+    return ts.tz_convert(None) if ts.tzinfo is not None else ts
+
+
+def safe_symbol(symbol):
+    # 簡單處理 symbol 中的特殊字符 (如 BTC/USDT -> BTC_USDT)
+    return symbol.replace('/', '_')
+
+
+class PartitionedOHLCVStore:
+    def __init__(self, root, row_group_size=None):
+        """
+        :param root: 資料集根目錄 (Config.MARKET_DATA_DIR)
+        :param row_group_size: 每個 row group 的 K 棒數，越小「最後 N 根」讀得越精準
+        """
+        self.root = root
+        self.row_group_size = row_group_size or Config.MARKET_DATA_ROW_GROUP_SIZE
+
+    # --- 路徑 ---
+
+    def symbol_dir(self, symbol, asset_type):
+        return os.path.join(self.root, asset_dir_name(asset_type), safe_symbol(symbol))
+
+    def legacy_path(self, symbol):
+        """舊版的平面檔 <symbol>.parquet"""
+        return os.path.join(self.root, f"{safe_symbol(symbol)}.parquet")
+
+    def locate(self, symbol, asset_type=None):
+        """
+        找出標的所在的分區目錄；asset_type 未知時搜尋所有資產類別
+        :return: 目錄路徑或 None
+        """
+        if asset_type is not None:
+            path = self.symbol_dir(symbol, asset_type)
+            return path if os.path.isdir(path) else None
+        if not os.path.isdir(self.root):
+            return None
+        for entry in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, entry, safe_symbol(symbol))
+            if os.path.isdir(path):
+                return path
+        return None
+
+    def symbols(self, asset_type):
+        """資產類別下已儲存的標的 (目錄名稱，即 safe_symbol)"""
+        path = os.path.join(self.root, asset_dir_name(asset_type))
+        if not os.path.isdir(path):
+            return []
+        return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+    @staticmethod
+    def _year_files(path, start=None, end=None):
+        """依年份排序的分區檔案，並裁掉日期範圍以外的年份"""
+        files = []
+        for name in os.listdir(path):
+            stem, ext = os.path.splitext(name)
+            if ext != '.parquet' or not stem.isdigit():
+                continue
+            year = int(stem)
+            if start is not None and year < start.year:
+                continue
+            if end is not None and year > end.year:
+                continue
+            files.append((year, os.path.join(path, name)))
+        return [file for _, file in sorted(files)]
+
+    # --- 寫入 ---
+
+    def write(self, df, symbol, asset_type, since=None):
+        """
+        寫入完整序列，每年一個檔案
+        :param since: 增量同步時第一根有變動的 K 棒 (含重疊區)；只重寫該年份之後的檔案，
+                      更早的年份不動。None 表示以 df 取代整個資料集，df 中不存在的年份會被移除
+                      (例如分割調整後完整重新同步，舊年份的未調整價格不應留下)
+        """
+        if df.empty:
+            return
+        df = df.rename_axis(DATE_COLUMN)
+        path = self.symbol_dir(symbol, asset_type)
+        os.makedirs(path, exist_ok=True)
+
+        years = df.index.year
+        first_year = pd.Timestamp(since).year if since is not None else None
+        written = set()
+        for year in pd.unique(years):
+            if first_year is not None and year < first_year:
+                continue
+            target = os.path.join(path, f"{year}.parquet")
+            tmp = target + ".tmp"
+            table = pa.Table.from_pandas(df[years == year], preserve_index=True)
+            pq.write_table(table, tmp, row_group_size=self.row_group_size, write_statistics=True)
+            os.replace(tmp, target)
+            written.add(target)
+
+        if since is not None:
+            return
+        for stale in self._year_files(path):
+            if stale not in written:
+                os.remove(stale)
+
+    def delete(self, symbol, asset_type=None):
+        path = self.locate(symbol, asset_type)
+        if path is not None:
+            shutil.rmtree(path)
+        if os.path.exists(self.legacy_path(symbol)):
+            os.remove(self.legacy_path(symbol))
+
+    # --- 讀取 ---
+
+    def read(self, symbol, asset_type=None, start=None, end=None, columns=None, last_n=None):
+        """
+        讀取 K 線
+        :param start / end: 日期範圍 (含)，下推到檔案 (年份) 與 row group (統計值)
+        :param columns: 欄位投影，例如 ['Close']；Date 一律作為 index 回傳
+        :param last_n: 只取最後 N 根 (可與 end 併用)
+        :return: DataFrame (index: Date)，不存在時為空 DataFrame
+        """
+        path = self.locate(symbol, asset_type)
+        if path is None:
+            return pd.DataFrame()
+
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        files = self._year_files(path, start, end)
+        if not files:
+            return pd.DataFrame()
+
+        read_columns = None if columns is None else [c for c in columns if c != DATE_COLUMN] + [DATE_COLUMN]
+        if last_n is not None and start is None:
+            table = self._read_tail(files, last_n, read_columns, end)
+        else:
+            table = self._read_range(files, read_columns, start, end)
+        if table is None or table.num_rows == 0:
+            return pd.DataFrame()
+
+        df = table.to_pandas()
+        if DATE_COLUMN in df.columns:
+            df = df.set_index(DATE_COLUMN)
+        df = df.sort_index()
+        return df.iloc[-last_n:] if last_n is not None else df
+
+    def read_panel(self, asset_type, symbols=None, start=None, end=None, column='Close'):
+        """
+        讀取多個標的的單一欄位寬表 (回測 / 批次指標用)
+        數千個小檔案時 Dataset 掃描的每個 fragment 固定開銷比解碼本身還大，
+        因此逐檔以 ParquetFile 只讀 Date + column，再一次以 NumPy 填入矩陣 (不經過 pivot)。
+        各標的 Date 的時區不同時統一轉成第一個檔案的時區。
+        :param symbols: 標的清單，None 表示資產類別下的全部標的
+        :return: DataFrame (index: Date, columns: symbol)，沒有數據時為空 DataFrame
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        if symbols is None:
+            symbols = self.symbols(asset_type)
+
+        labels, dates, values, codes = [], [], [], []
+        target = None
+        for symbol in symbols:
+            path = self.symbol_dir(symbol, asset_type)
+            files = self._year_files(path, start, end) if os.path.isdir(path) else []
+            for file in files:
+                table = pq.ParquetFile(file).read(columns=[DATE_COLUMN, column])
+                if target is None:
+                    target = pa.timestamp('ns', tz=getattr(table.schema.field(DATE_COLUMN).type, 'tz', None))
+                dates.extend(table.column(DATE_COLUMN).cast(target).chunks)
+                values.extend(table.column(column).cast(pa.float64()).chunks)
+                codes.append(np.full(table.num_rows, len(labels)))
+            if files:
+                labels.append(symbol)
+        if not labels:
+            return pd.DataFrame()
+
+        dates = pa.chunked_array(dates, type=target)
+        mask = np.ones(len(dates), dtype=bool)
+        if start is not None:
+            mask &= pc.greater_equal(dates, self._date_bound(start, target)).to_numpy(zero_copy_only=False)
+        if end is not None:
+            mask &= pc.less_equal(dates, self._date_bound(end, target)).to_numpy(zero_copy_only=False)
+
+        stamps = dates.to_numpy()[mask].view('int64')
+        unique, rows = np.unique(stamps, return_inverse=True)
+        grid = np.full((len(unique), len(labels)), np.nan)
+        grid[rows, np.concatenate(codes)[mask]] = pa.chunked_array(values, type=pa.float64()).to_numpy()[mask]
+
+        index = pd.DatetimeIndex(unique.view('datetime64[ns]'), name=DATE_COLUMN)
+        if target.tz is not None:
+            index = index.tz_localize('UTC').tz_convert(target.tz)
+        return pd.DataFrame(grid, index=index, columns=labels)
+
+    @staticmethod
+    def _date_bound(value, field_type):
+        """把查詢日期轉成與 Date 欄位相同的型別 (時區)"""
+        tz = getattr(field_type, 'tz', None)
+        if tz and value.tzinfo is None:
+            value = value.tz_localize(tz)
+        elif not tz and value.tzinfo is not None:
+            value = value.tz_convert(None)
+        return pa.scalar(value, type=field_type)
+
+    def _read_range(self, files, columns, start, end):
+        dataset = ds.dataset(files, format='parquet')
+        field_type = dataset.schema.field(DATE_COLUMN).type
+        condition = None
+        if start is not None:
+            condition = ds.field(DATE_COLUMN) >= self._date_bound(start, field_type)
+        if end is not None:
+            upper = ds.field(DATE_COLUMN) <= self._date_bound(end, field_type)
+            condition = upper if condition is None else condition & upper
+        table = dataset.to_table(columns=columns, filter=condition)
+        # Dataset 合併後的 schema 不保證帶有 pandas metadata，補回第一個檔案的
+        return table.replace_schema_metadata(pq.read_schema(files[0]).metadata)
+
+    def _read_tail(self, files, last_n, columns, end):
+        """從最新的 row group 往回讀，直到累積 last_n 根 (end 之前) 為止"""
+        pieces = []
+        remaining = last_n
+        for path in reversed(files):
+            parquet_file = pq.ParquetFile(path)
+            date_index = parquet_file.schema_arrow.get_field_index(DATE_COLUMN)
+            field_type = parquet_file.schema_arrow.field(DATE_COLUMN).type
+            bound = self._date_bound(end, field_type) if end is not None else None
+
+            for rg in reversed(range(parquet_file.num_row_groups)):
+                if bound is not None:
+                    stats = parquet_file.metadata.row_group(rg).column(date_index).statistics
+                    if stats is not None and stats.has_min_max and _naive(pd.Timestamp(stats.min)) > _naive(end):
+                        continue
+                table = parquet_file.read_row_group(rg, columns=columns)
+                if bound is not None:
+                    table = table.filter(pc.less_equal(table[DATE_COLUMN], bound))
+                pieces.append(table)
+                remaining -= table.num_rows
+                if remaining <= 0:
+                    break
+            if remaining <= 0:
+                break
+
+        if not pieces:
+            return None
+        metadata = pieces[0].schema.metadata
+        return pa.concat_tables(reversed(pieces)).replace_schema_metadata(metadata)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+速率限制器 (Rate Limiter)
+以 Token Bucket 控制對外 API 的請求權重 (Request Weight)，
+例如 Binance 每分鐘 1200 weight 的限制。
+"""
+
+import asyncio
+import threading
+import time
+from ..config import Config
+
+
+def binance_klines_weight(limit):
+    """
+    Binance GET /api/v3/klines 的請求權重
+    現行 Spot API (2023-08 起) 不論 limit 一律為 2 (舊版依 limit 分級 1/2/5/10)，
+    權重值由 Config.BINANCE_KLINES_WEIGHT 設定，交易所再調整時不用改程式
+    :param limit: 請求的 K 棒數 (保留給 weight_fn 介面，目前不影響權重)
+    """
+    return Config.BINANCE_KLINES_WEIGHT
+
+
+class AsyncTokenBucket:
+    """
+    asyncio 版 Token Bucket
+    - capacity: 桶子容量 (例如 1200 weight)
+    - refill_per_second: 每秒補充的 token 數 (例如 1200 / 60 = 20)
+    多個 coroutine 依先來後到取得 token，不足時等待補充。
+    token 的檢查與扣除另以 threading.Lock 保護，不同執行緒 (各自的 event loop) 共用同一個桶子時也不會超額。
+    """
+
+    def __init__(self, capacity, refill_per_second, clock=time.monotonic):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._updated_at = clock()
+        self._lock = None
+        self._lock_loop = None
+        self._thread_lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, weight_per_minute, **kwargs):
+        return cls(weight_per_minute, weight_per_minute / 60.0, **kwargs)
+
+    def _refill(self):
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self._updated_at = now
+
+    def _get_lock(self):
+        # asyncio.Lock 綁定 event loop；每次 asyncio.run 都是新的 loop，需重新建立
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self, weight=1):
+        """取得指定權重的 token，不足時等待"""
+        if weight > self.capacity:
+            raise ValueError(f"weight {weight} 超過桶子容量 {self.capacity}")
+
+        async with self._get_lock():
+            while True:
+                with self._thread_lock:
+                    self._refill()
+                    if self.tokens >= weight:
+                        self.tokens -= weight
+                        return
+                    delay = (weight - self.tokens) / self.refill_per_second
+                await asyncio.sleep(delay)
+
+    def sync_used_weight(self, used, limit=None):
+        """
+        依交易所回報的已用權重 (例如 X-MBX-USED-WEIGHT-1M) 校正剩餘 token，
+        避免其他程式共用同一 IP 時低估用量
+        """
+        limit = limit or self.capacity
+        remaining = max(0.0, (limit - used) * self.capacity / limit)
+        with self._thread_lock:
+            self._refill()
+            self.tokens = min(self.tokens, remaining)
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+共用測試 Fixture (Shared Test Fixtures)
+- ohlcv：確定性的合成日線 K 線工廠，與 benchmarks 共用 fakes.synthetic_ohlcv
+"""
+
+import sys
+import os
+import pytest
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import BARS, synthetic_ohlcv
+
+# 固定結束日：K 線內容 (與訊號快取 key) 不隨執行測試的日期改變
+OHLCV_END = "2024-12-31"
+
+
+@pytest.fixture
+def ohlcv():
+    """
+    合成 K 線工廠：ohlcv(key, bars=300, end=OHLCV_END) -> OHLCV DataFrame (index: Date)
+    key 可以是標的名稱或整數種子，同一個 key 每次產生相同的 K 線
+    """
+    def make(key, bars=BARS, end=OHLCV_END):
+        return synthetic_ohlcv(str(key), bars, end)
+    return make
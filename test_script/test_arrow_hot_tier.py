@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Arrow IPC 熱層測試 (Memory-Mapped Hot Tier Test)
+驗證熱層 write-through、冷層讀取後自動提升、零複製 (mmap) 讀取，
+以及熱層損毀或被刪除時退回 Parquet 冷層。
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def tmp_dir():
+    with tempfile.TemporaryDirectory() as tmp:
+        yield tmp
+
+
+def make_store(tmp, hot_tier=True):
+    from investment_bot.utils.data_store import DataStore
+    return DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=os.path.join(tmp, "market_data"),
+                     hot_dir=os.path.join(tmp, "hot"), hot_tier=hot_tier)
+
+
+def make_frame(bars=500):
+    index = pd.bdate_range(end="2024-12-31", periods=bars, name="Date")
+    close = np.linspace(10, 20, bars)
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close, "Volume": np.full(bars, 5.0)}, index=index)
+
+
+def test_write_through_and_zero_copy_read(tmp_dir):
+    df = make_frame()
+    make_store(tmp_dir).save_market_data(df, "TSLA", "Stock")
+    assert os.path.exists(os.path.join(tmp_dir, "hot", "stock", "TSLA.arrow"))
+
+    # 新的 Store (模擬另一個行程)：L1 是空的，由熱層 mmap 讀取
+    loaded = make_store(tmp_dir).load_market_data("TSLA")
+    pd.testing.assert_frame_equal(loaded, df, check_freq=False)
+    assert not loaded["Close"].to_numpy().flags.writeable  # 直接引用 mmap 的唯讀 buffer
+
+    tail = make_store(tmp_dir).load_market_data("TSLA", last_n=50, columns=["Close"])
+    pd.testing.assert_frame_equal(tail, df[["Close"]].iloc[-50:], check_freq=False)
+    print("  ✅ 熱層 write-through 與 mmap 讀取")
+
+
+def test_cold_read_promotes_to_hot_tier(tmp_dir):
+    df = make_frame()
+    make_store(tmp_dir, hot_tier=False).save_market_data(df, "BTC", "Crypto")
+    hot_path = os.path.join(tmp_dir, "hot", "crypto", "BTC.arrow")
+    assert not os.path.exists(hot_path)
+
+    pd.testing.assert_frame_equal(make_store(tmp_dir).load_market_data("BTC", "Crypto", last_n=10), df.iloc[-10:], check_freq=False)
+    assert os.path.exists(hot_path)
+
+
+def test_corrupt_hot_file_falls_back_to_parquet(tmp_dir):
+    df = make_frame()
+    store = make_store(tmp_dir)
+    store.save_market_data(df, "ETH", "Crypto")
+    with open(os.path.join(tmp_dir, "hot", "crypto", "ETH.arrow"), "wb") as f:
+        f.write(b"not an arrow file")
+
+    pd.testing.assert_frame_equal(make_store(tmp_dir).load_market_data("ETH"), df, check_freq=False)
+
+    store.delete_market_data("ETH")
+    assert make_store(tmp_dir).load_market_data("ETH").empty
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
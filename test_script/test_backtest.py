@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+向量化回測測試 (Vectorized Backtest Test)
+驗證整段歷史一次算出的訊號與「當天執行 compute_signals_batch」逐日結果一致 (沒有未來數據)、
+進出場模擬 / 手續費 / 勝率 / 回撤的計算，以及從 Parquet 資料集讀取寬表回測。
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import synthetic_ohlcv
+
+
+def _panel(symbols, bars=200, end="2024-06-30"):
+    panel = pd.concat({s: synthetic_ohlcv(s, bars=bars, end=end)["Close"] for s in symbols}, axis=1)
+    panel.iloc[:40, 1] = np.nan   # 較晚上市
+    panel.iloc[90:95, 2] = np.nan  # 停牌
+    return panel
+
+
+@pytest.mark.parametrize("asset_type", ["Stock", "Crypto"])
+def test_signals_match_daily_analysis(asset_type):
+    from investment_bot.services.indicators import compute_signals_batch, right_align, unalign
+    from investment_bot.services.backtest import signal_series
+
+    panel = _panel(["AAA", "BBB", "CCC"])
+    aligned, _, order = right_align(panel, return_order=True)
+    signals = {key: unalign(value, order) for key, value in signal_series(aligned, asset_type).items()}
+
+    for t in [25, 59, 61, 70, 119, 121, 150, 199]:
+        daily = compute_signals_batch(panel.iloc[:t + 1], asset_type)
+        for j, symbol in enumerate(panel.columns):
+            if np.isnan(panel.iat[t, j]):
+                continue
+            expected = daily[symbol]
+            assert signals["ready"][t, j] == (expected is not None)
+            if expected is None:
+                continue
+            assert signals["is_overbought"][t, j] == expected["is_overbought"]
+            assert signals["is_oversold"][t, j] == expected["is_oversold"]
+            assert signals["bullish"][t, j] == (expected["trend"] == "Bullish")
+    print(f"  ✅ {asset_type} 整段訊號與逐日分析一致")
+
+
+def test_simulation_and_summary():
+    from investment_bot.services.backtest import simulate, summarize
+
+    close = np.array([[100.0], [110.0], [99.0], [99.0], [120.0], [90.0]])
+    entries = np.array([[True], [False], [False], [True], [False], [False]])
+    exits = np.array([[False], [False], [True], [False], [False], [False]])
+    held, returns = simulate(close, entries, exits, fee_bps=100)
+
+    # 收盤進場，下一根開始持有；出場那根收盤之後不再持有
+    assert held[:, 0].tolist() == [0, 1, 1, 0, 1, 1]
+    np.testing.assert_allclose(returns[:, 0], [0, 0.1 - 0.01, -0.1, -0.01, 120 / 99 - 1 - 0.01, -0.25])
+
+    summary = summarize(close, np.array([6]), held, returns, "Stock")
+    row = summary.iloc[0]
+    assert row["trades"] == 2 and row["hit_rate"] == 0.0  # 兩筆交易都虧損 (含出場手續費)
+    assert row["total_return"] == pytest.approx(np.prod(1 + returns[:, 0]) - 1)
+    assert row["buy_hold_return"] == pytest.approx(-0.1)
+    assert row["max_drawdown"] == pytest.approx(-0.25)
+    assert row["exposure"] == pytest.approx(4 / 6)
+    print("  ✅ 進出場模擬與績效摘要")
+
+
+def test_backtest_from_parquet_store():
+    from investment_bot.utils.data_store import DataStore
+    from investment_bot.services.backtest import BacktestService, STRATEGIES, SUMMARY_COLUMNS
+
+    symbols = ["AAA", "BBB", "CCC", "DDD"]
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "bt.db"), market_data_dir=os.path.join(tmp, "market_data"))
+        store.save_market_data_many({s: synthetic_ohlcv(s, bars=800, end="2024-06-30") for s in symbols}, "Stock")
+        store.save_market_data(synthetic_ohlcv("BTC/USDT", bars=400, end="2024-06-30"), "BTC/USDT", "Crypto")
+        service = BacktestService(store=store)
+
+        result = service.run("Stock")
+        assert list(result.summary.index) == symbols and list(result.summary.columns) == SUMMARY_COLUMNS
+        assert (result.summary["bars"] == 800).all() and (result.summary["trades"] > 0).all()
+        assert result.returns.shape == (800, 4) and set(np.unique(result.positions)) <= {0.0, 1.0}
+        np.testing.assert_allclose(result.equity.iloc[-1], 1 + result.summary["total_return"])
+
+        crypto = service.run("Crypto", symbols=["BTC/USDT"], start="2024-01-01", strategy="rsi")
+        assert list(crypto.summary.index) == ["BTC/USDT"]
+        assert crypto.returns.index.min() >= pd.Timestamp("2024-01-01")
+
+        for strategy in STRATEGIES:
+            assert service.run("Stock", symbols=["AAA"], strategy=strategy).summary["bars"].iloc[0] == 800
+        with pytest.raises(ValueError):
+            service.run("Stock", strategy="unknown")
+        assert service.run("Stock", symbols=["ZZZ"]).summary.empty
+        store.db.engine.dispose()
+    print("  ✅ 從 Parquet 資料集讀取寬表回測")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
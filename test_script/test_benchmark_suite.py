@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+離線效能測試套件測試 (Benchmark Suite Test)
+以最小規模執行 benchmarks/suite.py 的每個階段，確認完全離線、輸出格式正確，
+且退化比較會標出超過門檻的項目。
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def test_fakes_are_deterministic():
+    from fakes import synthetic_ohlcv, FakeYFinance, FakeExchange
+
+    a, b = synthetic_ohlcv("S00001"), synthetic_ohlcv("S00001")
+    assert a.equals(b) and not a.equals(synthetic_ohlcv("S00002"))
+
+    panel = FakeYFinance().download(["S00001", "S00002"], start=a.index[-10])
+    assert panel["S00001"].shape == (10, 5)
+    ohlcv = FakeExchange().fetch_ohlcv("BTC/USDT", "1d", limit=50)
+    assert len(ohlcv) == 50 and len(ohlcv[0]) == 6
+    print("  ✅ 合成數據可重現")
+
+
+def test_suite_runs_offline():
+    import suite
+
+    result = suite.run_suite(sizes=[10], repeat=1, log=lambda *_: None)
+    assert set(result["results"]) == {f"{stage}@10" for stage in suite.STAGES}
+    for metrics in result["results"].values():
+        assert metrics["seconds"] > 0 and metrics["peak_mb"] > 0
+    print("  ✅ 所有階段離線執行完成")
+
+
+def test_main_e2e_uses_fakes():
+    import suite
+
+    ws = suite.Workspace()
+    try:
+        suite.stage_main_e2e(ws, 20)()
+        with ws.store.db.engine.connect() as conn:
+            rows = conn.execute(ws.store.db.portfolio_snapshots.select()).fetchall()
+            signals = conn.execute(ws.store.db.tech_signals.select()).fetchall()
+        assert len(rows) == 20
+        assert len(signals) == 20
+    finally:
+        ws.close()
+    print("  ✅ main.main() 完整流程使用假 API")
+
+
+def test_compare_flags_regressions():
+    import suite
+
+    baseline = {"results": {"ta_analyze@10": {"seconds": 1.0, "peak_mb": 10.0},
+                            "snapshot@10": {"seconds": 0.001, "peak_mb": 0.1}}}
+    current = {"results": {"ta_analyze@10": {"seconds": 1.2, "peak_mb": 14.0},
+                           "snapshot@10": {"seconds": 0.005, "peak_mb": 0.5},
+                           "main_e2e@10": {"seconds": 9.0, "peak_mb": 90.0}}}
+    regressions = suite.compare(current, baseline, threshold=0.25)
+    # 只有超過門檻且高於雜訊下限的項目；基準中沒有的項目不比較
+    assert [(key, metric) for key, metric, *_ in regressions] == [("ta_analyze@10", "peak_mb")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output, baseline_path = os.path.join(tmp, "out.json"), os.path.join(tmp, "baseline.json")
+        args = ["--sizes", "10", "--stages", "snapshot", "--repeat", "1", "--output", output, "--baseline", baseline_path]
+        assert suite.main(args + ["--update-baseline"]) == 0
+        assert suite.main(args) == 0
+        with open(output, encoding="utf-8") as f:
+            assert "snapshot@10" in json.load(f)["results"]
+    print("  ✅ 退化比較與基準檔更新")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
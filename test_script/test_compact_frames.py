@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+精簡記憶體表示測試 (Compact Frames Test)
+驗證 float32 / epoch index 的來回轉換與精度保護、持倉表 category 欄位，
+以及記憶體預算下的 SpillBuffer 與串流流程結果不變。
+"""
+
+import sys
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from test_pipeline_concurrency import FakeMarketService
+
+
+def test_compact_roundtrip_and_precision_guard(ohlcv):
+    from investment_bot.utils.compact_frames import compact_ohlcv, expand_ohlcv, downcast_float32
+
+    df = ohlcv(1)
+    df.index = df.index.tz_localize("UTC")
+    compact = compact_ohlcv(df)
+    assert compact.index.dtype == np.int64
+    assert all(dtype == np.float32 for dtype in compact.dtypes)
+    assert compact.memory_usage(deep=True).sum() < 0.6 * df.memory_usage(deep=True).sum()
+
+    restored = expand_ohlcv(compact)
+    pd.testing.assert_index_equal(restored.index, df.index)
+    assert all(dtype == np.float64 for dtype in restored.dtypes)
+    np.testing.assert_allclose(restored.to_numpy(), df.to_numpy(), rtol=1e-6)
+
+    # 非精簡的 DataFrame 原樣回傳
+    assert expand_ohlcv(df) is df
+
+    # 超出 float32 範圍或誤差超過門檻的欄位保留 float64
+    assert downcast_float32(np.array([1e300, 1.0])) is None
+    assert downcast_float32(np.array([100.123456789]), tolerance=0) is None
+    guarded = compact_ohlcv(df.assign(Volume=1e300))
+    assert guarded["Volume"].dtype == np.float64 and guarded["Close"].dtype == np.float32
+    print("  ✅ float32 / epoch index 來回轉換")
+
+
+def test_compact_signals_match(ohlcv):
+    from investment_bot.services.tech_analysis import compute_signals
+    from investment_bot.utils.compact_frames import compact_ohlcv
+
+    for asset_type in ("Stock", "Crypto"):
+        df = ohlcv(7)
+        assert compute_signals(compact_ohlcv(df), asset_type) == compute_signals(df, asset_type)
+    print("  ✅ 精簡表示的訊號與完整精度一致")
+
+
+def test_compact_portfolio():
+    from investment_bot.utils.compact_frames import compact_portfolio
+
+    df = pd.DataFrame({"Symbol": ["TSLA", "BTC"] * 500, "Type": ["Stock", "Crypto"] * 500, "Qty": 1.0})
+    compact = compact_portfolio(df)
+    assert isinstance(compact["Symbol"].dtype, pd.CategoricalDtype)
+    assert isinstance(compact["Type"].dtype, pd.CategoricalDtype)
+    assert compact.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum() / 5
+    assert df["Symbol"].dtype == object  # 不修改原本的 DataFrame
+    print("  ✅ 持倉表 Symbol / Type 改用 category")
+
+
+def test_spill_buffer(ohlcv):
+    from investment_bot.utils.compact_frames import SpillBuffer, compact_ohlcv
+
+    frames = {idx: compact_ohlcv(ohlcv(idx)) for idx in range(6)}
+    one = frames[0].memory_usage(index=True, deep=True).sum()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        buffer = SpillBuffer(max_bytes=int(2.5 * one), spill_dir=tmp)
+        for idx, df in frames.items():
+            buffer.put(idx, df)
+        stats = buffer.stats()
+        assert stats["in_memory"] == 2 and stats["spilled"] == 4
+        assert stats["peak_bytes"] <= 2.5 * one
+
+        for idx, df in frames.items():
+            restored = buffer.pop(idx)
+            pd.testing.assert_frame_equal(restored, df)
+            assert restored.attrs == df.attrs
+        assert len(buffer) == 0 and not os.listdir(os.path.join(tmp, "spill"))
+        buffer.close()
+    print("  ✅ 超過預算的 K 線溢出到磁碟並可取回")
+
+
+def test_pipeline_with_memory_budget(ohlcv, monkeypatch):
+    from investment_bot.config import Config
+    from investment_bot.main import analyze_holdings_concurrent
+
+    holdings = [(f"SYM{i}", "Crypto" if i % 3 == 0 else "Stock", 1.0, 10.0) for i in range(12)]
+    market = FakeMarketService(ohlcv, failing={"SYM3"}, empty={"SYM7"})
+    expected = analyze_holdings_concurrent(holdings, market, fetch_workers=4, ta_workers=0, timeout=60)
+
+    monkeypatch.setattr(Config, "PIPELINE_STREAM_CHUNK_SIZE", 2)
+    for ta_workers in (0, 2):
+        # 預算小於單檔 K 線：每檔放入後其餘都溢出到磁碟
+        streamed = analyze_holdings_concurrent(holdings, market, fetch_workers=4, ta_workers=ta_workers,
+                                               timeout=60, memory_budget_mb=0.01)
+        assert streamed == expected
+    print("  ✅ 記憶體預算下串流分析結果不變")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
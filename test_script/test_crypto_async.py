@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+非同步加密貨幣抓取測試 (Async Crypto Fetch Test)
+以本地假交易所驗證並行抓取、Token Bucket 權重限制與錯誤隔離。
+"""
+
+import sys
+import os
+import asyncio
+import time
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+class FakeAsyncExchange:
+    """模擬 ccxt.async_support 交易所：記錄同時進行的請求數與呼叫時間"""
+    def __init__(self, latency=0.02, failing=()):
+        self.latency = latency
+        self.failing = set(failing)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+        self.closed = False
+
+    async def fetch_ohlcv(self, pair, timeframe, since=None, limit=None):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        self.calls.append((pair, since, limit, time.monotonic()))
+        try:
+            await asyncio.sleep(self.latency)
+            if pair in self.failing:
+                raise RuntimeError("exchange error")
+            # 未指定 since 時回傳最近幾天的 K 棒 (落在分析視窗內)
+            start = since if since is not None else int(time.time() - 5 * 86_400) * 1000
+            return [[start + i * 86_400_000, 1.0, 2.0, 0.5, 1.5, 10.0] for i in range(min(limit, 5))]
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        self.closed = True
+
+
+def test_token_bucket_enforces_weight_rate():
+    from investment_bot.utils.rate_limiter import AsyncTokenBucket
+
+    bucket = AsyncTokenBucket(capacity=10, refill_per_second=100)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(bucket.acquire(5) for _ in range(10)))  # 50 weight, 容量 10
+        return time.monotonic() - start
+
+    elapsed = asyncio.run(run())
+    # 前 10 weight 立即可用，其餘 40 weight 需以 100/s 補充 => 至少約 0.4 秒
+    assert elapsed >= 0.35, elapsed
+    print(f"  ✅ Token Bucket 限速生效 ({elapsed:.2f}s)")
+
+
+def test_token_bucket_sync_used_weight():
+    from investment_bot.utils.rate_limiter import AsyncTokenBucket
+
+    bucket = AsyncTokenBucket.per_minute(1200)
+    bucket.sync_used_weight(1100, 1200)
+    assert bucket.tokens <= 100.5
+
+
+def test_binance_klines_weight_is_flat(monkeypatch):
+    from investment_bot.config import Config
+    from investment_bot.utils.rate_limiter import binance_klines_weight
+
+    # /api/v3/klines 現行權重不隨 limit 分級
+    assert [binance_klines_weight(n) for n in (None, 5, 300, 1000)] == [2, 2, 2, 2]
+    monkeypatch.setattr(Config, "BINANCE_KLINES_WEIGHT", 5)
+    assert binance_klines_weight(1000) == 5
+
+
+def test_request_window_accepts_tz_aware_since():
+    from investment_bot.services.crypto_async import ohlcv_request_window
+
+    since = pd.Timestamp.now(tz="UTC").normalize() - pd.Timedelta(days=3)
+    since_ms, limit = ohlcv_request_window(200, since)
+    assert since_ms == since.value // 10**6 and 4 <= limit <= 6
+    assert ohlcv_request_window(200, since.tz_localize(None))[1] == limit
+
+
+def test_fetch_history_many_concurrent_and_isolated():
+    from investment_bot.services.crypto_async import AsyncCryptoDataService
+    from investment_bot.utils.rate_limiter import AsyncTokenBucket
+
+    exchange = FakeAsyncExchange(failing={"ETH/USDT"})
+    service = AsyncCryptoDataService(
+        exchange_factory=lambda: exchange,
+        limiter=AsyncTokenBucket(capacity=1000, refill_per_second=1000),
+        max_concurrency=4,
+    )
+    symbols = ["BTC", "ETH", "SOL", "BNB", "WLD", "DOGE", "ADA", "XRP"]
+    since = {"BTC": pd.Timestamp.now().normalize() - pd.Timedelta(days=3)}
+
+    start = time.monotonic()
+    frames = service.fetch_history_many(symbols, days=200, since=since)
+    elapsed = time.monotonic() - start
+
+    assert exchange.max_in_flight == 4  # 受 max_concurrency 限制但確實並行
+    assert elapsed < 0.02 * len(symbols)  # 比逐一呼叫快
+    assert exchange.closed
+    assert frames["ETH"].empty and not frames["BTC"].empty
+    btc_call = next(call for call in exchange.calls if call[0] == "BTC/USDT")
+    assert btc_call[1] is not None and btc_call[2] <= 5  # 增量同步只抓少量 K 棒
+    assert frames["DOGE"].index.name == "Date"
+    print("  ✅ 並行抓取、失敗隔離")
+
+
+def test_market_service_uses_async_path_for_crypto_batch():
+    from investment_bot.services.market_data import MarketDataService
+    from investment_bot.services.crypto_async import AsyncCryptoDataService
+
+    class Store:
+        saved = {}
+        def is_market_data_fresh(self, symbol): return False
+        def load_market_data(self, symbol, asset_type=None, **kwargs): return pd.DataFrame()
+        def save_market_data_many(self, frames, asset_type=None, since=None): self.saved.update(frames)
+
+    exchange = FakeAsyncExchange()
+    service = MarketDataService.__new__(MarketDataService)
+    service.store = Store()
+    service.async_crypto = AsyncCryptoDataService(exchange_factory=lambda: exchange)
+
+    result = service.get_historical_data_many(["BTC", "ETH"], "Crypto")
+    assert len(exchange.calls) == 2
+    assert set(service.store.saved) == {"BTC", "ETH"}
+    assert all(not df.empty for df in result.values())
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+常駐模式測試 (Daemon Mode Test)
+驗證時區感知的觸發時間 (美股收盤含夏令時間切換、00:00 UTC 加密貨幣日 K、盤中間隔)、
+排程器錯過觸發時只補執行一次，以及常駐行程的本機觸發介面在快取已暖時於 1 秒內完成日報。
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+import contextlib
+import urllib.request
+import urllib.error
+from datetime import datetime, timezone
+import pytest
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import holding_symbols, offline_environment
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_daily_trigger_follows_market_timezone():
+    from investment_bot.daemon import DailyTrigger, WEEKDAYS
+
+    us_close = DailyTrigger("us_close", "16:15", "America/New_York", weekdays=WEEKDAYS)
+    # 2026-03-06 是週五：下一次是週一，且美東已切換到夏令時間 (UTC-4)
+    assert us_close.next_after(utc(2026, 3, 6, 22, 0)) == utc(2026, 3, 9, 20, 15)
+    assert us_close.next_after(utc(2026, 3, 5, 20, 0)) == utc(2026, 3, 5, 21, 15)  # 冬令 (UTC-5)，當天稍後
+    assert us_close.next_after(utc(2026, 3, 5, 21, 15)) == utc(2026, 3, 6, 21, 15)  # 剛好到點不重複觸發
+    # 11 月切回冬令時間
+    assert us_close.next_after(utc(2026, 10, 30, 21, 0)) == utc(2026, 11, 2, 21, 15)
+
+    crypto_close = DailyTrigger("crypto_close", "00:05", "UTC")
+    assert crypto_close.next_after(utc(2026, 3, 7, 23, 59)) == utc(2026, 3, 8, 0, 5)
+    assert crypto_close.next_after(utc(2026, 3, 8, 0, 5)) == utc(2026, 3, 9, 0, 5)
+    print("  ✅ 美股收盤 / 加密貨幣日 K 收盤的觸發時間")
+
+
+def test_interval_trigger_within_session():
+    from investment_bot.daemon import IntervalTrigger
+
+    intraday = IntervalTrigger("intraday", 30, "America/New_York")
+    assert intraday.next_after(utc(2026, 7, 1, 12, 0)) == utc(2026, 7, 1, 13, 30)   # 開盤前 -> 開盤
+    assert intraday.next_after(utc(2026, 7, 1, 13, 30)) == utc(2026, 7, 1, 14, 0)
+    assert intraday.next_after(utc(2026, 7, 1, 14, 10)) == utc(2026, 7, 1, 14, 30)
+    assert intraday.next_after(utc(2026, 7, 1, 19, 45)) == utc(2026, 7, 1, 20, 0)   # 收盤時刻
+    assert intraday.next_after(utc(2026, 7, 3, 20, 0)) == utc(2026, 7, 6, 13, 30)   # 週五收盤 -> 週一開盤
+    with pytest.raises(ValueError):
+        IntervalTrigger("bad", 0, "UTC")
+    print("  ✅ 盤中間隔觸發")
+
+
+def test_scheduler_coalesces_missed_runs(monkeypatch):
+    from investment_bot.config import Config
+    from investment_bot.daemon import Scheduler, DailyTrigger, build_triggers
+
+    now = [utc(2026, 3, 5, 12, 0)]
+    submitted = []
+    triggers = [DailyTrigger("us_close", "16:15", "America/New_York", refresh=("Stock",)),
+                DailyTrigger("crypto_close", "00:05", "UTC", job="refresh", refresh=("Crypto",))]
+    scheduler = Scheduler(triggers, lambda *args: submitted.append(args), clock=lambda: now[0])
+    assert scheduler.run_pending() == []
+    assert scheduler.seconds_until_next() == pytest.approx((9 * 60 + 15) * 60)
+
+    # 休眠三天後醒來：每個觸發只補執行一次
+    now[0] = utc(2026, 3, 8, 12, 0)
+    assert scheduler.run_pending() == ["us_close", "crypto_close"]
+    assert submitted == [("report", ("Stock",), "us_close"), ("refresh", ("Crypto",), "crypto_close")]
+    assert scheduler.next_runs["crypto_close"] == utc(2026, 3, 9, 0, 5)
+
+    monkeypatch.setattr(Config, "DAEMON_CRYPTO_CLOSE_JOB", "off")
+    monkeypatch.setattr(Config, "DAEMON_REFRESH_MINUTES", 15)
+    assert [t.name for t in build_triggers()] == ["us_close", "intraday"]
+    monkeypatch.setattr(Config, "DAEMON_CRYPTO_CLOSE_JOB", "unknown")
+    with pytest.raises(ValueError):
+        build_triggers()
+    print("  ✅ 錯過的觸發只補執行一次")
+
+
+def test_warm_trigger_runs_report_under_one_second():
+    from investment_bot.daemon import Daemon, trigger
+    from investment_bot.services import market_data
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "daemon.db"), market_data_dir=os.path.join(tmp, "market_data"))
+        credentials = os.path.join(tmp, "credentials.json")
+        with open(credentials, "w") as f:
+            f.write("{}")
+
+        with offline_environment(holding_symbols(30), credentials), contextlib.redirect_stdout(io.StringIO()):
+            daemon = Daemon(triggers=[], port=0, store=store)
+            daemon.start()
+            try:
+                cold = trigger("report", port=daemon.port)
+                downloads = market_data.yf.calls
+                warm = trigger("report", port=daemon.port)
+                assert market_data.yf.calls == downloads  # 今日已同步，直接讀取快取
+                refresh = trigger("refresh", refresh=["Stock"], port=daemon.port)
+                assert market_data.yf.calls == downloads + 1  # 忽略新鮮快取重新同步美股
+                with urllib.request.urlopen(f"http://127.0.0.1:{daemon.port}/status") as response:
+                    status = json.load(response)
+                request = urllib.request.Request(f"http://127.0.0.1:{daemon.port}/run/unknown", method="POST", data=b"")
+                with pytest.raises(urllib.error.HTTPError) as error:
+                    urllib.request.urlopen(request)
+            finally:
+                daemon.stop()
+
+        assert cold["status"] == warm["status"] == refresh["status"] == "ok"
+        assert warm["seconds"] < 1.0, warm
+        assert error.value.code == 400
+        assert status["warm"] and [r["job"] for r in status["recent"]] == ["report", "report", "refresh"]
+        # 每次執行照常寫入 run record，並記錄工作類型
+        assert [r["job"] for r in store.get_run_records()] == ["refresh", "report", "report"]
+        store.db.engine.dispose()
+    print(f"  ✅ 快取已暖時隨選日報 {warm['seconds']:.3f}s (首次 {cold['seconds']:.3f}s)")
+
+
+def test_warm_up_retry_reuses_pool_forked_before_threads(monkeypatch):
+    import threading
+    from investment_bot import daemon as daemon_module
+
+    created, received = [], []
+
+    class Pool:
+        def shutdown(self, wait=True, cancel_futures=False):
+            created.remove(self)
+
+    def create_ta_pool(ta_workers):
+        # 建立 (fork) 時不能已有 HTTP / 排程執行緒
+        assert {t.name for t in threading.enumerate()}.isdisjoint({"trigger-http", "scheduler"})
+        created.append(Pool())
+        return created[-1]
+
+    def init_services(store=None, ta_pool=None):
+        received.append(ta_pool)
+        if len(received) == 1:
+            raise RuntimeError("憑證檔暫時不存在")
+        return {"ta_pool": ta_pool}
+
+    monkeypatch.setattr(daemon_module, "create_ta_pool", create_ta_pool)
+    monkeypatch.setattr(daemon_module, "init_services", init_services)
+    monkeypatch.setattr(daemon_module, "run_job", lambda services, job, refresh: "ok")
+    monkeypatch.setattr(daemon_module, "close_services", lambda services: services["ta_pool"].shutdown())
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        daemon = daemon_module.Daemon(triggers=[], port=0)
+        daemon.start()
+        try:
+            result = daemon.submit("report").result(timeout=10)
+        finally:
+            daemon.stop()
+
+    assert result["status"] == "ok"
+    # 工作執行緒中的重試沿用 start() 時建立的同一個 Pool，不會在執行緒啟動後再 fork
+    assert len(received) == 2 and received[0] is received[1] is not None
+    assert created == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
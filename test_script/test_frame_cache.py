@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+DataFrame 二進位快取測試 (Binary DataFrame Cache Test)
+驗證 system_cache 中的 DataFrame 以 Arrow IPC BLOB 儲存後 dtype / index / attrs 完整還原，
+混合型別欄位退回 JSON records，以及舊版資料庫 (沒有 BLOB 欄位、JSON records 持倉快取) 的遷移。
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+        yield store
+        store.db.engine.dispose()
+
+
+def _typed_frame():
+    df = pd.DataFrame({
+        "Symbol": pd.Categorical(["TSLA", "BTC", "TSLA"]),
+        "Qty": np.array([10, 0.5, 3], dtype=np.float32),
+        "Lots": np.array([1, 2, 3], dtype=np.int64),
+        "Active": [True, False, True],
+        "Updated": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]).tz_localize("Asia/Taipei"),
+        "Note": ["a", None, "c"],
+    }, index=pd.Index([7, 8, 9], name="row"))
+    df.attrs["epoch_tz"] = ""
+    return df
+
+
+def test_frame_round_trip_through_sqlite(store):
+    from sqlalchemy import select
+
+    df = _typed_frame()
+    store.set_cache("frame", df, ttl_minutes=5)
+    df.loc[7, "Lots"] = 100  # 呼叫端之後修改自己的 DataFrame 不影響 L1
+
+    pd.testing.assert_frame_equal(store.get_cache("frame"), _typed_frame())
+    store.cache.clear()
+    from_sqlite = store.get_cache("frame")
+    pd.testing.assert_frame_equal(from_sqlite, _typed_frame())
+    assert from_sqlite.attrs == {"epoch_tz": ""}
+
+    table = store.db.system_cache
+    with store.db.engine.connect() as conn:
+        row = conn.execute(select(table).where(table.c.key == "frame")).first()
+    assert row.value is None and row.value_format == "arrow" and isinstance(row.value_blob, bytes)
+    print("  ✅ DataFrame 以 Arrow BLOB 儲存，dtype 完整還原")
+
+
+def test_mixed_column_falls_back_to_json(store):
+    store.set_cache("mixed", pd.DataFrame({"Symbol": ["TSLA", 0]}))
+    store.cache.clear()
+    assert store.get_cache("mixed") == [{"Symbol": "TSLA"}, {"Symbol": 0}]
+    # 非 DataFrame 的值仍是 JSON
+    store.set_cache("plain", {"hash": "abc"})
+    store.cache.clear()
+    assert store.get_cache("plain") == {"hash": "abc"}
+    print("  ✅ 混合型別欄位退回 JSON records")
+
+
+def test_legacy_database_is_migrated(monkeypatch):
+    from investment_bot.config import Config
+    from investment_bot.utils.data_store import DataStore
+    from investment_bot.services.google_sheet import GoogleSheetService, PORTFOLIO_CACHE_KEY
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE system_cache (key VARCHAR PRIMARY KEY, value VARCHAR, "
+                     "expires_at DATETIME, updated_at DATETIME)")
+        conn.execute("INSERT INTO system_cache VALUES (?, ?, datetime('now', 'localtime', '+1 hour'), NULL)",
+                     (PORTFOLIO_CACHE_KEY, '[{"Symbol": "TSLA", "Qty": 10.0, "Type": "Stock"}]'))
+        conn.commit()
+        conn.close()
+
+        store = DataStore(db_path=db_path, market_data_dir=tmp)
+        columns = {row[1] for row in sqlite3.connect(db_path).execute("PRAGMA table_info(system_cache)")}
+        assert {"value_blob", "value_format"} <= columns
+
+        # 舊版 JSON records 持倉快取仍可讀取
+        monkeypatch.setattr(Config, "COMPACT_FRAMES", False)
+        service = GoogleSheetService.__new__(GoogleSheetService)
+        service.store = store
+        df = service.get_portfolio_data()
+        assert list(df["Symbol"]) == ["TSLA"] and df["Qty"].dtype == np.float64
+
+        # 改寫後以 BLOB 儲存
+        store.set_cache(PORTFOLIO_CACHE_KEY, df)
+        store.cache.clear()
+        pd.testing.assert_frame_equal(store.get_cache(PORTFOLIO_CACHE_KEY), df)
+        store.db.engine.dispose()
+    print("  ✅ 舊版資料庫自動補上 BLOB 欄位")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
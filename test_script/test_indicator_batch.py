@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+向量化指標引擎測試 (Vectorized Indicator Engine Test)
+驗證批次計算結果與逐檔 compute_signals (ta 套件) 一致，
+包含不同上市日期、停牌缺值與數據不足的標的。
+"""
+
+import sys
+import json
+import os
+import time
+import numpy as np
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def make_frames(ohlcv, n_symbols, bars, seed=0):
+    """以 ohlcv fixture 產生同一日期軸的多檔 K 線，再依 seed 製造較晚上市、停牌缺值與數據不足的標的"""
+    rng = np.random.default_rng(seed)
+    frames = {}
+    for i in range(n_symbols):
+        df = ohlcv(f"{seed}-S{i}", bars)
+        if i % 4 == 1:
+            df = df.iloc[rng.integers(30, bars - 40):]   # 較晚上市
+        if i % 4 == 2:
+            df = df.drop(df.index[rng.integers(0, bars, 5)])  # 停牌缺值
+        if i % 7 == 3:
+            df = df.iloc[-15:]                            # 數據不足
+        frames[f"S{i}"] = df
+    return frames
+
+
+def assert_signals_close(expected, actual, symbol):
+    if expected is None:
+        assert actual is None, symbol
+        return
+    assert actual is not None, symbol
+    for key, value in expected.items():
+        if isinstance(value, dict):
+            for sub, sub_value in value.items():
+                np.testing.assert_allclose(actual[key][sub], sub_value, atol=0.011, err_msg=f"{symbol} {key}.{sub}")
+        elif isinstance(value, str) or isinstance(value, (bool, np.bool_)):
+            assert actual[key] == value, (symbol, key)
+        else:
+            np.testing.assert_allclose(actual[key], value, atol=0.011, err_msg=f"{symbol} {key}")
+
+
+def assert_builtin_types(signals, symbol):
+    """訊號值必須是 Python 內建型別 (不是 np.float64 / np.bool_)，才能直接 json 序列化"""
+    if signals is None:
+        return
+    for key, value in signals.items():
+        if isinstance(value, dict):
+            assert all(type(v) in (float, int) for v in value.values()), (symbol, key, value)
+        elif key.startswith("is_"):
+            assert type(value) is bool, (symbol, key, type(value))
+        elif key != "trend":
+            assert type(value) is float, (symbol, key, type(value))
+    json.dumps(signals)
+
+
+def test_batch_matches_per_symbol(ohlcv):
+    from investment_bot.services.indicators import build_close_panel, compute_signals_batch
+    from investment_bot.services.tech_analysis import compute_signals_ta as compute_signals
+
+    for asset_type in ("Stock", "Crypto"):
+        frames = make_frames(ohlcv, 24, 300, seed=1 if asset_type == "Stock" else 2)
+        batch = compute_signals_batch(build_close_panel(frames), asset_type)
+        for symbol, df in frames.items():
+            assert_signals_close(compute_signals(df, asset_type, symbol), batch[symbol], symbol)
+            assert_builtin_types(batch[symbol], symbol)
+    print("  ✅ 批次結果與逐檔計算一致")
+
+
+def test_ndarray_input(ohlcv):
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService, compute_signals_ta as compute_signals
+
+    frames = make_frames(ohlcv, 4, 200, seed=5)
+    arr = np.column_stack([frames[s]["Close"].reindex(frames["S0"].index).to_numpy() for s in ("S0", "S3")])
+    service = TechnicalAnalysisService.__new__(TechnicalAnalysisService)
+    result = service.analyze_batch(arr, "Stock", symbols=["A", "B"])
+    assert_signals_close(compute_signals(frames["S0"], "Stock"), result["A"], "A")
+
+
+def test_analyze_many_groups_by_asset_type(ohlcv):
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService, compute_signals_ta as compute_signals
+
+    frames = make_frames(ohlcv, 6, 250, seed=9)
+    asset_types = {s: ("Crypto" if i % 2 else "Stock") for i, s in enumerate(frames)}
+    service = TechnicalAnalysisService.__new__(TechnicalAnalysisService)
+    result = service.analyze_many(frames, asset_types)
+    for symbol, df in frames.items():
+        assert_signals_close(compute_signals(df, asset_types[symbol]), result[symbol], symbol)
+
+
+def test_batch_is_faster_than_loop(ohlcv):
+    from investment_bot.services.indicators import build_close_panel, compute_signals_batch
+    from investment_bot.services.tech_analysis import compute_signals_ta as compute_signals
+
+    frames = make_frames(ohlcv, 200, 300, seed=3)
+    panel = build_close_panel(frames)
+
+    start = time.perf_counter()
+    compute_signals_batch(panel, "Stock")
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for symbol, df in frames.items():
+        compute_signals(df, "Stock", symbol)
+    loop_time = time.perf_counter() - start
+
+    print(f"  批次: {batch_time * 1000:.1f} ms, 逐檔: {loop_time * 1000:.1f} ms")
+    assert batch_time * 5 < loop_time
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
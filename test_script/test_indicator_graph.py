@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+指標相依圖測試 (Indicator Dependency Graph Test)
+驗證 IndicatorGraph 的節點只計算一次、只計算需要的節點，
+且 compute_signals 的結果與 ta 參考實作一致。
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from test_indicator_batch import assert_signals_close
+
+
+def make_close(bars, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 30 * np.exp(np.cumsum(rng.normal(0, 0.025, bars)))
+    return pd.DataFrame({"Close": close}, index=pd.date_range("2024-01-01", periods=bars, freq="D"))
+
+
+def test_shared_nodes_evaluated_once():
+    from investment_bot.services.indicators import IndicatorGraph, CLOSE, ema_node, macd_nodes, bb_nodes
+
+    graph = IndicatorGraph(make_close(200)["Close"].to_numpy())
+    keys = [ema_node(12), ema_node(26), *macd_nodes(12, 26, 9), *bb_nodes(20, 2), ('rolling_mean', CLOSE, 20)]
+    values = graph.evaluate(keys)
+
+    # EMA12 / EMA26 由 MACD line 與單獨請求共用；rolling_mean 由上下軌與 rolling_std 共用
+    assert graph.evaluations == {"ema": 3, "macd_line": 1, "macd_hist": 1,
+                                 "rolling_mean": 1, "rolling_std": 1, "bb_upper": 1, "bb_lower": 1}
+    np.testing.assert_allclose(values[macd_nodes(12, 26, 9)[0]], values[ema_node(12)] - values[ema_node(26)])
+
+
+def test_only_required_nodes_evaluated(monkeypatch):
+    from investment_bot.services import indicators
+
+    graphs = []
+    original = indicators.IndicatorGraph
+    monkeypatch.setattr(indicators, "IndicatorGraph", lambda close: graphs.append(original(close)) or graphs[-1])
+
+    # 40 根 K 棒：EMA60 / EMA120 會退回較短的 EMA，不需要計算
+    indicators.compute_signals_batch(make_close(40)[["Close"]], "Stock")
+    computed = {key for key in graphs[-1]._memo if key[0] == "ema"}
+    assert indicators.ema_node(60) not in computed and indicators.ema_node(120) not in computed
+
+
+def test_compute_signals_matches_ta():
+    from investment_bot.services.tech_analysis import compute_signals, compute_signals_ta
+
+    for asset_type in ("Stock", "Crypto"):
+        for bars in (19, 20, 35, 65, 130, 400):
+            df = make_close(bars, seed=bars)
+            assert_signals_close(compute_signals_ta(df, asset_type), compute_signals(df, asset_type), f"{asset_type}-{bars}")
+    print("  ✅ 相依圖計算結果與 ta 一致")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+指標增量狀態測試 (Incremental Indicator State Test)
+驗證 O(1) 增量更新的訊號與完整重算 (compute_signals / ta) 一致，
+狀態會持久化到 SQLite，且歷史被改寫時自動完整重算。
+"""
+
+import sys
+import os
+import tempfile
+import pytest
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from test_indicator_batch import assert_signals_close
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+        yield store
+        store.db.engine.dispose()
+
+
+def test_state_matches_full_recompute(ohlcv):
+    from investment_bot.services.indicators import build_indicator_state, signals_from_state
+    from investment_bot.services.tech_analysis import compute_signals_ta as compute_signals
+
+    for asset_type in ("Stock", "Crypto"):
+        history = ohlcv(3, bars=260)
+        for bars in (15, 25, 40, 70, 260):
+            df = history.iloc[:bars]
+            state = build_indicator_state(df["Close"], asset_type)
+            assert_signals_close(compute_signals(df, asset_type), signals_from_state(state, asset_type), f"{asset_type}-{bars}")
+    print("  ✅ 增量狀態與完整重算一致")
+
+
+def test_analyze_resumes_from_persisted_state(store, ohlcv, monkeypatch):
+    from investment_bot.services import tech_analysis
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService, compute_signals_ta as compute_signals
+
+    history = ohlcv("TSLA")
+    service = TechnicalAnalysisService(store=store)
+    service.analyze(history.iloc[:280], "Stock", symbol="TSLA")
+
+    record = store.get_indicator_state("TSLA")
+    assert record["last_date"] == history.index[278].strftime('%Y-%m-%d')
+    assert record["state"]["count"] == 279
+
+    # 盤中最後一根 K 棒被更新：狀態不含最後一根，因此可以直接接續
+    intraday = history.iloc[:280].copy()
+    intraday.iloc[-1, intraday.columns.get_loc("Close")] *= 1.05
+
+    fed = []
+    original = tech_analysis.build_indicator_state
+    monkeypatch.setattr(tech_analysis, "build_indicator_state",
+                        lambda closes, *a, **kw: fed.append(len(closes)) or original(closes, *a, **kw))
+
+    store.get_cached_signal = lambda cache_key: None  # 略過訊號快取，強制重新計算
+    for df in (intraday, history):
+        assert_signals_close(compute_signals(df, "Stock"), service.analyze(df, "Stock", symbol="TSLA"), "TSLA")
+
+    # 只餵入新 K 棒：[最後一根] ，[20 根新 K 棒]，[最後一根]
+    assert fed == [1, 20, 1]
+    assert store.get_indicator_state("TSLA")["state"]["count"] == 299
+    print("  ✅ 從 SQLite 狀態增量更新")
+
+
+def test_rewritten_history_triggers_recompute(store, ohlcv):
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService, compute_signals_ta as compute_signals
+
+    history = ohlcv("ETH", bars=200)
+    service = TechnicalAnalysisService(store=store)
+    service.analyze(history.iloc[:150], "Crypto", symbol="ETH")
+
+    adjusted = history.copy()
+    adjusted["Close"] *= 0.5  # 分割調整：整段歷史被改寫
+    signals = service.analyze(adjusted, "Crypto", symbol="ETH")
+    assert_signals_close(compute_signals(adjusted, "Crypto"), signals, "ETH")
+    assert store.get_indicator_state("ETH")["state"]["count"] == 199
+
+    store.invalidate_indicator_state("ETH")
+    assert store.get_indicator_state("ETH") is None
+    print("  ✅ 歷史改寫時完整重算")
+
+
+class SlidingWindowMarket:
+    """每天回傳本地儲存的最後 window 根 K 棒 (與 MarketDataService 的分析視窗相同，起點每天往後移)"""
+    def __init__(self, store, window=300):
+        self.store = store
+        self.window = window
+
+    def get_historical_data(self, symbol, asset_type, days=200):
+        return self.store.load_market_data(symbol, asset_type, last_n=self.window)
+
+    def get_historical_data_many(self, symbols, asset_type='Stock', days=200):
+        return {symbol: self.get_historical_data(symbol, asset_type, days) for symbol in symbols}
+
+
+def test_concurrent_pipeline_resumes_across_days(store, ohlcv, monkeypatch):
+    from investment_bot.main import analyze_holdings_concurrent
+    from investment_bot.services import tech_analysis
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService
+
+    histories = {symbol: ohlcv(symbol, bars=400) for symbol in ("TSLA", "NVDA")}
+    holdings = [(symbol, "Stock", 1.0, 10.0) for symbol in histories]
+    ta_service = TechnicalAnalysisService(store=store)
+    market = SlidingWindowMarket(store)
+
+    # 第一天：從頭建立狀態
+    for symbol, history in histories.items():
+        store.save_market_data(history.iloc[:350], symbol, "Stock")
+    day1 = analyze_holdings_concurrent(holdings, market, fetch_workers=2, ta_workers=0, timeout=60, ta_service=ta_service)
+    assert all(analysis for analysis, _ in day1.values())
+    assert store.get_indicator_state("TSLA")["state"]["count"] == 299
+
+    fed = []
+    original = tech_analysis.build_indicator_state
+    monkeypatch.setattr(tech_analysis, "build_indicator_state",
+                        lambda closes, *a, **kw: fed.append(len(closes)) or original(closes, *a, **kw))
+
+    # 第二天：多了一根 K 棒，分析視窗的起點也往後移了一根
+    for symbol, history in histories.items():
+        store.save_market_data(history.iloc[:351], symbol, "Stock")
+    day2 = analyze_holdings_concurrent(holdings, market, fetch_workers=2, ta_workers=0, timeout=60, ta_service=ta_service)
+    assert all(analysis for analysis, _ in day2.values())
+
+    # 每個標的只餵入一根新的已收盤 K 棒 (+ 套用在副本上的最後一根)
+    assert fed == [1, 1] * len(holdings)
+    for symbol, history in histories.items():
+        record = store.get_indicator_state(symbol)
+        assert record["state"]["count"] == 300
+        assert record["last_date"] == history.index[349].strftime('%Y-%m-%d')
+    print("  ✅ 並行流程跨日接續指標狀態")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+延遲載入與子指令 CLI 測試 (Lazy Imports & CLI Test)
+驗證 lazy_import 在第一次存取時才 import、服務模組不再於載入時 import yfinance / ccxt / ta / googleapiclient、
+cache stats 不載入 pandas / SQLAlchemy / pyarrow 且統計數字正確，以及 import 時間 benchmark 的解析與退化檢查。
+"""
+
+import sys
+import os
+import io
+import json
+import tempfile
+import contextlib
+import subprocess
+import pytest
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import synthetic_ohlcv, stock_symbols
+
+HEAVY = ["pandas", "numpy", "pyarrow", "sqlalchemy", "yfinance", "ccxt", "ta", "googleapiclient"]
+
+
+def _loaded_after(code):
+    """在乾淨的子行程執行 code，回傳之後已載入的重量級套件"""
+    script = f"import sys, json\n{code}\nprint(json.dumps([m for m in {HEAVY!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=project_root, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_lazy_import_defers_until_first_use():
+    from investment_bot.utils.lazy import lazy_import, is_instance_of
+
+    sys.modules.pop("colorsys", None)
+    colorsys = lazy_import("colorsys")
+    assert "colorsys" not in sys.modules and "not loaded" in repr(colorsys)
+    assert colorsys.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+    assert "colorsys" in sys.modules
+
+    # 設定屬性會轉給真正的模組 (測試替換 ccxt.binance 依賴這個行為)
+    colorsys.MARKER = 1
+    assert sys.modules["colorsys"].MARKER == 1
+    del colorsys.MARKER
+    assert not hasattr(sys.modules["colorsys"], "MARKER")
+
+    sys.modules.pop("wave", None)
+    assert is_instance_of(object(), "wave", "Wave_read") is False and "wave" not in sys.modules
+    print("  ✅ 第一次存取屬性時才 import")
+
+
+def test_services_do_not_import_api_clients():
+    assert _loaded_after("import investment_bot.main") == []
+    with tempfile.TemporaryDirectory() as tmp:
+        code = ("from investment_bot.services.market_data import MarketDataService\n"
+                "from investment_bot.utils.data_store import DataStore\n"
+                f"service = MarketDataService(store=DataStore(db_path={os.path.join(tmp, 'lazy.db')!r}, "
+                f"market_data_dir={os.path.join(tmp, 'market_data')!r}))")
+        assert "ccxt" not in _loaded_after(code)  # 同步 ccxt client 第一次使用時才建立
+    assert _loaded_after("from investment_bot.cli import main\nmain(['cache', 'stats', '--db', 'missing.db', "
+                         "'--market-data-dir', 'missing', '--hot-dir', 'missing'])") == []
+    print("  ✅ 載入服務不再 import yfinance / ccxt / ta / googleapiclient，cache stats 不載入 pandas / SQLAlchemy")
+
+
+def test_cache_stats_counts():
+    from investment_bot.cli import main
+    from investment_bot.utils.cache_stats import collect_cache_stats
+    from investment_bot.utils.data_store import DataStore
+    from investment_bot.utils.metrics import start_run
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {"db": os.path.join(tmp, "stats.db"), "market_data": os.path.join(tmp, "market_data"),
+                 "hot": os.path.join(tmp, "hot")}
+        empty = collect_cache_stats(paths["db"], paths["market_data"], paths["hot"])
+        assert empty == {"database": None, "market_data": None, "hot_tier": None}
+        assert not os.path.exists(paths["db"])  # 唯讀：不建立資料庫
+
+        store = DataStore(db_path=paths["db"], market_data_dir=paths["market_data"], hot_dir=paths["hot"],
+                          hot_tier=True)
+        symbols = stock_symbols(4)
+        store.save_market_data_many({s: synthetic_ohlcv(s) for s in symbols}, "Stock")
+        store.save_market_data(synthetic_ohlcv("BTC"), "BTC", "Crypto")
+        store.set_cache("expired", {"a": 1}, ttl_minutes=-1)
+        store.save_run_record(start_run().to_record("ok", extra={"job": "refresh"}))
+        store.load_market_data(symbols[0], "Stock")  # 寫入熱層
+
+        stats = collect_cache_stats(paths["db"], paths["market_data"], paths["hot"])
+        cache = stats["database"]["system_cache"]
+        assert (cache["entries"], cache["valid"], cache["expired"], cache["fresh_market_data"]) == (6, 5, 1, 5)
+        assert stats["database"]["run_records"]["entries"] == 1
+        assert stats["database"]["run_records"]["last"]["job"] == "refresh"
+        assert stats["market_data"]["stock"]["symbols"] == 4 and stats["market_data"]["crypto"]["symbols"] == 1
+        assert stats["market_data"]["stock"]["files"] >= 4 and stats["market_data"]["stock"]["bytes"] > 0
+        assert stats["hot_tier"]["stock"]["symbols"] >= 1
+
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            assert main(["cache", "stats", "--db", paths["db"], "--market-data-dir", paths["market_data"],
+                         "--hot-dir", paths["hot"]]) == 0
+        text = stdout.getvalue()
+        assert "有效 5 / 過期 1" in text and "refresh ok" in text
+        store.db.engine.dispose()
+    print("  ✅ cache stats 統計數字正確")
+
+
+def test_import_benchmark():
+    import bench_import_time as bench
+
+    sample = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       100 |        100 |   encodings.aliases",
+        "import time:       200 |        300 | encodings",
+        "import time:        50 |         50 |     pandas.core",
+        "import time:       150 |        200 |   pandas",
+        "import time:        40 |        240 | app",
+    ])
+    total, packages, modules = bench.parse_importtime(sample, skip={"encodings"})
+    assert total == pytest.approx(240e-6)
+    assert packages == pytest.approx({"pandas": 200e-6, "app": 40e-6})
+    assert modules == {"pandas.core", "pandas", "app"}
+
+    result, violations = bench.run_benchmark(["cache_stats", "report"], repeat=1, symbols=5, log=lambda *_: None)
+    assert violations == []
+    assert set(result["results"]) == {"import.cache_stats", "import.report", "wall.python_startup",
+                                      "wall.cache_stats"}
+    assert result["results"]["import.cache_stats"]["seconds"] < result["results"]["import.report"]["seconds"]
+    print(f"  ✅ cache stats {result['results']['wall.cache_stats']['seconds'] * 1000:.0f} ms (wall)")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+美股批次下載測試 (Batched Stock Download Test)
+以假的 yf.download 驗證 get_historical_data_many 只發出一次請求，
+並正確拆分 MultiIndex 面板、一次寫入 Store。
+"""
+
+import sys
+import os
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def make_panel(tickers, bars=50, ticker_first=True):
+    """模擬 yf.download 多 ticker 回傳的 MultiIndex 面板"""
+    index = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=bars)
+    frames = {}
+    for i, ticker in enumerate(tickers):
+        close = np.linspace(100, 150, bars) + i
+        frames[ticker] = pd.DataFrame({
+            "Open": close, "High": close, "Low": close, "Close": close, "Volume": np.full(bars, 1000.0)
+        }, index=index)
+    panel = pd.concat(frames, axis=1, names=["Ticker", "Price"])
+    if not ticker_first:
+        panel = panel.swaplevel(axis=1).sort_index(axis=1)
+    return panel
+
+
+class FakeStore:
+    def __init__(self, fresh=()):
+        self.fresh = set(fresh)
+        self.saved = []
+
+    def is_market_data_fresh(self, symbol):
+        return symbol in self.fresh
+
+    def load_market_data(self, symbol, asset_type=None, **kwargs):
+        # 只有「今日已更新」的標的有本地數據
+        return make_panel([symbol])[symbol] if symbol in self.fresh else pd.DataFrame()
+
+    def save_market_data_many(self, frames, asset_type=None, since=None):
+        self.saved.append(sorted(frames))
+
+
+def test_split_download_panel_both_layouts():
+    from investment_bot.services.market_data import MarketDataService
+
+    for ticker_first in (True, False):
+        panel = make_panel(["TSLA", "NVDA"], ticker_first=ticker_first)
+        frames = MarketDataService._split_download_panel(panel, ["TSLA", "NVDA"])
+        assert set(frames) == {"TSLA", "NVDA"}
+        assert set(frames["NVDA"].columns) == {"Open", "High", "Low", "Close", "Volume"}
+        assert frames["NVDA"]["Close"].iloc[0] == 101
+    print("  ✅ MultiIndex 面板拆分正確")
+
+
+def test_get_historical_data_many_single_request(monkeypatch):
+    from investment_bot.services import market_data
+
+    calls = []
+
+    def fake_download(tickers, **kwargs):
+        calls.append(list(tickers))
+        return make_panel(tickers)
+
+    monkeypatch.setattr(market_data.yf, "download", fake_download)
+
+    service = market_data.MarketDataService.__new__(market_data.MarketDataService)
+    service.store = FakeStore(fresh={"AAPL"})
+
+    result = service.get_historical_data_many(["TSLA", "AAPL", "NVDA", "MSFT"], "Stock")
+
+    assert calls == [["TSLA", "NVDA", "MSFT"]]  # 只有快取未命中的標的，且只發出一次請求
+    assert list(result) == ["TSLA", "AAPL", "NVDA", "MSFT"]
+    assert all(not df.empty for df in result.values())
+    assert service.store.saved == [["MSFT", "NVDA", "TSLA"]]
+    print("  ✅ 單次請求下載多檔美股")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+增量同步測試 (Incremental OHLCV Sync Test)
+以假的 ccxt / yf.download 驗證：
+- 已有數據時只從最後幾根 K 棒開始抓取，並合併去重
+- 重疊區價格被調整 (分割) 時改為完整重新同步
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def daily_bars(end, bars, scale=1.0):
+    index = pd.date_range(end=end, periods=bars, freq="D")
+    close = (100 + np.arange(bars, dtype=float)) * scale
+    return pd.DataFrame({
+        "Open": close, "High": close, "Low": close, "Close": close, "Volume": np.full(bars, 10.0)
+    }, index=index)
+
+
+class FakeStore:
+    def __init__(self, existing):
+        self.existing = existing
+        self.saved = {}
+        self.since = {}
+        self.invalidated = []
+
+    def is_market_data_fresh(self, symbol):
+        return False
+
+    def load_market_data(self, symbol, asset_type=None, **kwargs):
+        return self.existing.get(symbol, pd.DataFrame())
+
+    def save_market_data(self, df, symbol, asset_type=None, since=None):
+        self.saved[symbol] = df
+        self.since[symbol] = since
+
+    def save_market_data_many(self, frames, asset_type=None, since=None):
+        self.saved.update(frames)
+        self.since.update({symbol: (since or {}).get(symbol) for symbol in frames})
+
+    def invalidate_indicator_state(self, symbol):
+        self.invalidated.append(symbol)
+
+
+class FakeExchange:
+    """以完整的「交易所歷史」回應 fetch_ohlcv，記錄每次的 since / limit"""
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+
+    def fetch_ohlcv(self, pair, timeframe, since=None, limit=None):
+        self.calls.append((since, limit))
+        df = self.history
+        if since is not None:
+            df = df[df.index >= pd.to_datetime(since, unit="ms")]
+        df = df.tail(limit) if since is None else df.head(limit)
+        ts = (df.index.asi8 // 10**6).tolist()
+        return [[t, *row] for t, row in zip(ts, df[["Open", "High", "Low", "Close", "Volume"]].values.tolist())]
+
+
+def make_service(store, exchange=None):
+    from investment_bot.services.market_data import MarketDataService
+    service = MarketDataService.__new__(MarketDataService)
+    service.store = store
+    service.exchange = exchange
+    return service
+
+
+def today():
+    return pd.Timestamp(datetime.now().date())
+
+
+def test_crypto_incremental_fetch_only_new_bars():
+    from investment_bot.config import Config
+
+    history = daily_bars(today(), 400)
+    stored = history.iloc[:-3].copy()
+    stored.iloc[-1, stored.columns.get_loc("Close")] = -1  # 最後一根視為盤中未收盤數據，應被覆蓋
+
+    exchange = FakeExchange(history)
+    store = FakeStore({"BTC": stored})
+    df = make_service(store, exchange).get_historical_data("BTC", "Crypto")
+
+    since, limit = exchange.calls[0]
+    assert since is not None and limit < 20
+    assert store.since["BTC"] == stored.index[-Config.MARKET_DATA_SYNC_OVERLAP_BARS]  # 只重寫重疊區之後的年份分區
+    assert df.index.is_unique and df.index.is_monotonic_increasing
+    # 本地保存完整歷史，回傳的則是分析視窗 (days + 100 天)
+    pd.testing.assert_series_equal(store.saved["BTC"]["Close"], history["Close"], check_names=False, check_freq=False)
+    pd.testing.assert_series_equal(df["Close"], history["Close"].iloc[-300:], check_names=False, check_freq=False)
+    print("  ✅ 加密貨幣只抓新 K 棒並合併")
+
+
+def test_crypto_split_triggers_full_resync():
+    history = daily_bars(today(), 400, scale=0.5)  # 交易所端整段歷史被調整
+    stored = daily_bars(today() - timedelta(days=3), 397)
+
+    exchange = FakeExchange(history)
+    store = FakeStore({"ETH": stored})
+    df = make_service(store, exchange).get_historical_data("ETH", "Crypto", days=200)
+
+    # 從第一根已儲存的 K 棒重抓，而不是只抓分析視窗
+    assert len(exchange.calls) == 2 and exchange.calls[1][0] == stored.index[0].value // 10**6
+    assert store.invalidated == ["ETH"]  # 指標增量狀態需一併作廢
+    assert store.since["ETH"] is None  # 完整取代
+    assert df["Close"].iloc[0] == history["Close"].iloc[-300]
+    print("  ✅ 偵測到調整時完整重新同步")
+
+
+def test_adjustment_resync_keeps_history_beyond_window():
+    # 儲存的歷史 (1500 根) 遠超過分析視窗 days + 100，且超過 Binance 單次上限 1000 根
+    history = daily_bars(today(), 1500, scale=0.5)
+    stored = daily_bars(today() - timedelta(days=3), 1497)
+
+    exchange = FakeExchange(history)
+    store = FakeStore({"ETH": stored})
+    make_service(store, exchange).get_historical_data("ETH", "Crypto", days=200)
+
+    assert len(exchange.calls) == 3  # 增量一次 + 重建分兩頁
+    saved = store.saved["ETH"]
+    assert saved.index[0] == stored.index[0] and saved.index[-1] == today()
+    assert saved.index.is_unique and len(saved) == 1500
+    pd.testing.assert_series_equal(saved["Close"], history["Close"], check_names=False, check_freq=False)
+    print("  ✅ 調整後重建完整的已儲存歷史")
+
+
+def test_incremental_start_with_tz_aware_index():
+    from investment_bot.config import Config
+
+    service = make_service(FakeStore({}))
+    stored = daily_bars(today() - timedelta(days=2), 300).tz_localize("America/New_York")
+    assert service._incremental_start(stored) == stored.index[-Config.MARKET_DATA_SYNC_OVERLAP_BARS]
+
+    stale = daily_bars(today() - timedelta(days=400), 300).tz_localize("UTC")
+    assert service._incremental_start(stale) == stale.index[-Config.MARKET_DATA_SYNC_OVERLAP_BARS]
+    short = stored.iloc[:2]
+    assert service._incremental_start(short) == short.index[0]
+    assert service._incremental_start(pd.DataFrame()) is None
+    print("  ✅ 帶時區的 K 線也能計算增量起點")
+
+
+def test_stale_symbol_keeps_old_history(monkeypatch):
+    from investment_bot.services import market_data
+
+    # 最後一根已儲存 K 棒早於分析視窗 (days + 100 天)：仍從重疊區增量抓取，不得以視窗取代整段歷史
+    history = daily_bars(today(), 2400)
+    stored = history.iloc[:-400]
+    assert len(stored) > 1000
+
+    exchange = FakeExchange(history)
+    store = FakeStore({"BTC": stored})
+    make_service(store, exchange).get_historical_data("BTC", "Crypto", days=200)
+    assert exchange.calls[0][0] == stored.index[-5].value // 10**6
+    assert store.since["BTC"] is not None
+    pd.testing.assert_series_equal(store.saved["BTC"]["Close"], history["Close"], check_names=False, check_freq=False)
+
+    def fake_download(tickers, start=None, **kwargs):
+        frames = {t: history[history.index >= pd.Timestamp(start)] for t in tickers}
+        return pd.concat(frames, axis=1, names=["Ticker", "Price"])
+
+    monkeypatch.setattr(market_data.yf, "download", fake_download)
+    store = FakeStore({"TSLA": stored})
+    make_service(store).get_historical_data_many(["TSLA", "NVDA"], "Stock", days=200)
+    assert store.since["TSLA"] is not None and store.since["NVDA"] is None
+    assert store.saved["TSLA"].index[0] == stored.index[0] and store.saved["TSLA"].index[-1] == today()
+    print("  ✅ 太久未更新的標的仍增量同步，保留舊年份")
+
+
+def test_stock_batch_incremental(monkeypatch):
+    from investment_bot.services import market_data
+
+    history = {t: daily_bars(today(), 300) for t in ("TSLA", "NVDA", "AAPL")}
+    history["NVDA"] = daily_bars(today(), 300, scale=0.1)  # NVDA 分割
+    starts = []
+
+    def fake_download(tickers, start=None, **kwargs):
+        starts.append(pd.Timestamp(start))
+        frames = {t: history[t][history[t].index >= pd.Timestamp(start)] for t in tickers}
+        return pd.concat(frames, axis=1, names=["Ticker", "Price"])
+
+    monkeypatch.setattr(market_data.yf, "download", fake_download)
+
+    stored = {t: daily_bars(today() - timedelta(days=2), 298) for t in ("TSLA", "NVDA")}
+    store = FakeStore(stored)
+    result = make_service(store).get_historical_data_many(["TSLA", "NVDA", "AAPL"], "Stock")
+
+    # AAPL 完整下載、TSLA/NVDA 增量一次下載、NVDA 調整後完整重抓
+    assert len(starts) == 3
+    assert result["TSLA"].index[-1] == today() and len(result["TSLA"]) == 300
+    assert result["NVDA"]["Close"].iloc[-1] == history["NVDA"]["Close"].iloc[-1]
+    assert set(store.saved) == {"TSLA", "NVDA", "AAPL"}
+    assert store.invalidated == ["NVDA"]
+    # NVDA 從第一根已儲存的 K 棒重抓並完整取代；TSLA 只重寫變動的區間
+    assert starts[-1] == stored["NVDA"].index[0]
+    assert store.since["NVDA"] is None and store.since["TSLA"] is not None
+    print("  ✅ 美股批次增量同步")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+L1 記憶體快取測試 (In-Memory L1 Cache Test)
+驗證 LRU / TTL / 記憶體預算淘汰，以及 DataStore 的 write-through 與作廢行為。
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+        yield store
+        store.db.engine.dispose()
+
+
+def count_queries(engine):
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+    return queries
+
+
+def test_ttl_cache_lru_and_expiry():
+    from investment_bot.utils.memory_cache import TTLCache, MISSING
+
+    now = [datetime(2025, 1, 1)]
+    cache = TTLCache(max_entries=2, clock=lambda: now[0])
+    cache.set("a", 1, now[0] + timedelta(minutes=5))
+    cache.set("b", 2)
+    cache.get("a")          # a 變成最近使用
+    cache.set("c", 3)       # 淘汰 b
+    assert cache.get("b") is MISSING
+    now[0] += timedelta(minutes=10)
+    assert cache.get("a") is MISSING  # 過期
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1 and stats["expirations"] == 1 and stats["hits"] == 2
+    print("  ✅ LRU + TTL")
+
+
+def test_frame_cache_memory_budget():
+    from investment_bot.utils.memory_cache import FrameCache
+
+    df = pd.DataFrame({"Close": np.arange(1000, dtype=float)})
+    size = FrameCache.frame_nbytes(df)
+    cache = FrameCache(max_bytes=int(size * 2.5))
+    for key in ("a", "b", "c"):
+        cache.put(key, df)
+    assert cache.get("a") is None and cache.get("c") is not None
+    assert cache.current_bytes <= cache.max_bytes
+    assert cache.stats()["evictions"] == 1
+
+
+def test_get_cache_served_from_l1(store):
+    store.set_cache("portfolio_data", [{"Symbol": "TSLA"}])
+    queries = count_queries(store.db.engine)
+
+    for _ in range(5):
+        assert store.get_cache("portfolio_data") == [{"Symbol": "TSLA"}]
+    assert queries == []
+    print("  ✅ Write-through 後由 L1 命中")
+
+
+def test_market_data_fresh_check_and_load_hit_memory(store):
+    df = pd.DataFrame({"Close": np.linspace(1, 2, 50)}, index=pd.date_range("2025-01-01", periods=50))
+    store.save_market_data(df, "BTC")
+    store.frame_cache.clear()
+    store.cache.clear()
+
+    queries = count_queries(store.db.engine)
+    assert store.is_market_data_fresh("BTC")
+    first = store.load_market_data("BTC")
+    assert store.is_market_data_fresh("BTC")
+    second = store.load_market_data("BTC")
+
+    assert len(queries) == 1  # 只有第一次 freshness 檢查查 SQLite
+    pd.testing.assert_frame_equal(first, second)
+    assert store.cache_stats()["market_data"]["hits"] == 1
+
+
+def test_invalidation_and_rollback(store):
+    store.set_cache("k", 1)
+    store.invalidate_cache("k")
+    assert store.get_cache("k") is None
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.set_cache("tx_key", 1)
+            raise RuntimeError("boom")
+    assert store.get_cache("tx_key") is None
+
+    df = pd.DataFrame({"Close": [1.0, 2.0]}, index=pd.date_range("2025-01-01", periods=2))
+    store.save_market_data(df, "ETH")
+    store.invalidate_market_data("ETH")
+    assert not store.is_market_data_fresh("ETH")
+    assert store.frame_cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+執行指標測試 (Run Metrics Test)
+驗證階段計時、計數器、快取命中率與 Prometheus textfile 輸出，
+以及 main.main() 每次執行結束時寫入 SQLite 的 run record (以 benchmarks/fakes.py 離線執行)。
+"""
+
+import sys
+import os
+import tempfile
+import threading
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+def test_stage_timers_and_counters():
+    from investment_bot.utils.metrics import RunMetrics
+
+    metrics = RunMetrics()
+    with metrics.stage("ta"):
+        pass
+
+    def worker():
+        for _ in range(100):
+            with metrics.stage("fetch.yfinance"):
+                metrics.api_call("yfinance", nbytes=10)
+            metrics.cache_lookup("market_data", hit=True)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    metrics.cache_lookup("market_data", hit=False)
+
+    record = metrics.to_record()
+    assert record["stages"]["fetch.yfinance"]["calls"] == 400
+    assert record["stages"]["ta"]["calls"] == 1
+    assert record["api_calls"] == {"yfinance": 400}
+    assert record["bytes_fetched"] == {"yfinance": 4000}
+    assert record["cache_hit_ratio"] == {"market_data": round(400 / 401, 4)}
+    print("  ✅ 計時器與計數器 (多執行緒)")
+
+
+def test_prometheus_textfile():
+    from investment_bot.utils.metrics import RunMetrics, write_prometheus_textfile
+
+    metrics = RunMetrics()
+    metrics.add_time("sheet_read", 0.5)
+    metrics.api_call("binance", nbytes=2048)
+    metrics.cache_lookup("signal_cache", hit=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "textfile", "investment_bot.prom")
+        write_prometheus_textfile(path, metrics)
+        with open(path) as f:
+            text = f.read()
+    assert '# TYPE investment_bot_stage_seconds gauge' in text
+    assert 'investment_bot_stage_seconds{stage="sheet_read"} 0.5' in text
+    assert 'investment_bot_api_calls{source="binance"} 1' in text
+    assert 'investment_bot_bytes_fetched{source="binance"} 2048' in text
+    assert 'investment_bot_cache_hit_ratio{cache="signal_cache"} 1' in text
+    assert 'investment_bot_run_success 1' in text
+    print("  ✅ Prometheus textfile 輸出")
+
+
+def test_main_writes_run_record(monkeypatch):
+    import suite
+    from investment_bot.config import Config
+
+    ws = suite.Workspace()
+    try:
+        prom = os.path.join(ws.root, "metrics.prom")
+        monkeypatch.setattr(Config, "METRICS_PROMETHEUS_TEXTFILE", prom)
+        suite.stage_main_e2e(ws, 12)()
+        suite.stage_main_e2e(ws, 12)()  # 第二次執行：持倉與 K 線都來自快取
+
+        records = ws.store.get_run_records()
+        assert len(records) == 2
+        latest, first = records[0], records[1]
+        assert latest["status"] == "ok"
+        for stage in ("sheet_read", "market_data_ta", "sentiment", "llm", "telegram"):
+            assert stage in first["stages"], stage
+        assert first["api_calls"]["yfinance"] >= 1 and first["api_calls"]["google_sheets"] == 1
+        assert first["bytes_fetched"]["yfinance"] > 0
+        assert "yfinance" not in latest["api_calls"] and "google_sheets" not in latest["api_calls"]
+        assert latest["cache_hit_ratio"]["market_data"] == 1.0
+        assert latest["cache_hit_ratio"]["signal_cache"] == 1.0
+        assert os.path.exists(prom)
+    finally:
+        ws.close()
+    print("  ✅ 每次執行寫入 run record")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+參數掃描測試 (Parameter Sweep Test)
+驗證 grid / random 組合展開、Process Pool (shared memory) 與主行程計算結果一致、
+JSONL 續跑只計算尚未完成的組合，以及排名表與 config.py 設定片段。
+"""
+
+import sys
+import os
+import json
+import tempfile
+import contextlib
+import io
+import pandas as pd
+import pytest
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import synthetic_ohlcv
+
+SYMBOLS = ["AAA", "BBB", "CCC", "DDD", "EEE"]
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "sweep.db"), market_data_dir=os.path.join(tmp, "market_data"))
+        store.save_market_data_many({s: synthetic_ohlcv(s, bars=500, end="2024-06-30") for s in SYMBOLS}, "Stock")
+        store.tmp = tmp
+        yield store
+        store.db.engine.dispose()
+
+
+def test_combinations():
+    from investment_bot.services.param_sweep import grid_combinations, random_combinations, parse_values
+
+    assert parse_values("6,9,14") == [6, 9, 14]
+    assert parse_values("65:80:5") == [65, 70, 75, 80]
+    assert parse_values("1.5:2.5:0.5") == [1.5, 2.0, 2.5]
+
+    grid = grid_combinations("trend_rsi", "Stock")
+    assert len(grid) == 4 * 5 * 6 and set(grid[0]) == {"rsi", "overbought", "trend"}
+    # 超賣須低於超買：oversold=35 時 overbought 只能取 > 35 的值
+    rsi_grid = grid_combinations("rsi", "Stock", {"oversold": [35, 40], "overbought": [38, 70]})
+    assert all(c["oversold"] < c["overbought"] for c in rsi_grid) and len(rsi_grid) == 4 * 3
+    # 策略預設以外的參數可用 overrides 加入；退回用的 EMA 不可比趨勢線長
+    trend_grid = grid_combinations("trend", "Stock", {"trend": [10, 60], "trend_fallback": [5, 20]})
+    assert trend_grid == [{"trend": 10, "trend_fallback": 5}, {"trend": 60, "trend_fallback": 5},
+                          {"trend": 60, "trend_fallback": 20}]
+
+    samples = random_combinations("bb", "Stock", 50, seed=1)
+    assert samples == random_combinations("bb", "Stock", 50, seed=1)
+    assert len({json.dumps(c, sort_keys=True) for c in samples}) == 50
+    assert all(5 <= c["bb_window"] <= 60 and 1.0 <= c["bb_std"] <= 3.5 for c in samples)
+    print("  ✅ grid / random 組合展開")
+
+
+def test_process_pool_matches_inline_and_resumes(store):
+    from investment_bot.services.param_sweep import grid_combinations, run_sweep
+    from investment_bot.services.backtest import backtest_panel
+
+    panel = store.market_data.read_panel("Stock")
+    combos = grid_combinations("trend_rsi", "Stock", {"rsi": [6, 14], "overbought": [70, 80], "trend": [20, 60]})
+    logs = []
+    inline = run_sweep(panel, "Stock", "trend_rsi", combos, fee_bps=10, workers=0, log=logs.append)
+
+    # 單一組合的結果與 backtest_panel 一致
+    single = backtest_panel(panel, "Stock", "trend_rsi", fee_bps=10, params=combos[0])
+    assert inline.loc[0, "trades"] == pytest.approx(single.summary["trades"].mean())
+    assert inline.loc[0, "exposure"] == pytest.approx(single.summary["exposure"].mean())
+
+    output = os.path.join(store.tmp, "sweeps", "stock.jsonl")
+    pooled = run_sweep(panel, "Stock", "trend_rsi", combos, fee_bps=10, workers=2, output=output, log=logs.append)
+    pd.testing.assert_frame_equal(pooled, inline)
+    with open(output) as f:
+        lines = f.readlines()
+    assert len(lines) == len(combos)
+
+    # 模擬中斷：只保留前 3 筆與一行寫到一半的紀錄，續跑時只計算其餘組合
+    with open(output, "w") as f:
+        f.writelines(lines[:3] + ['{"run": "trunc'])
+    resumed = run_sweep(panel, "Stock", "trend_rsi", combos, fee_bps=10, workers=2, output=output, log=logs.append)
+    assert f"已完成 3，待計算 {len(combos) - 3}" in logs[-1]
+    pd.testing.assert_frame_equal(resumed, inline)
+    with open(output) as f:
+        assert len(f.readlines()) == len(combos) + 1  # 寫到一半的那行 + 完整的紀錄
+
+    # 數據或手續費不同時不沿用舊結果
+    run_sweep(panel, "Stock", "trend_rsi", combos[:2], fee_bps=0, workers=0, output=output, log=logs.append)
+    assert "已完成 0，待計算 2" in logs[-1]
+    print("  ✅ Process Pool 與主行程結果一致，可續跑")
+
+
+def test_workers_attach_aligned_views_without_realigning(store, monkeypatch):
+    import numpy as np
+    from investment_bot.services import param_sweep
+
+    panel = store.market_data.read_panel("Stock")
+    arrays, counts = param_sweep._prepare(panel.to_numpy())
+    blocks, specs = param_sweep._share(arrays)
+    try:
+        monkeypatch.setattr(param_sweep, "right_align", lambda *a, **kw: pytest.fail("worker 不應重新對齊"))
+        monkeypatch.setattr(param_sweep, "_WORKER", {})
+        param_sweep._init_worker(specs, counts, "Stock", "trend_rsi", 10)
+
+        for name, array in arrays.items():
+            view = param_sweep._WORKER[name]
+            # 直接引用 shared memory 的唯讀 view，不是 worker 自己的副本
+            assert not view.flags.owndata and not view.flags.writeable
+            np.testing.assert_array_equal(view, array)
+    finally:
+        for shm in param_sweep._WORKER.get("shm", []):
+            shm.close()
+        param_sweep._release(blocks)
+    print("  ✅ worker 只掛載主行程對齊好的陣列")
+
+
+def test_cli_outputs_ranking_and_snippet(store):
+    from investment_bot.services.param_sweep import main
+
+    output = os.path.join(store.tmp, "cli.jsonl")
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        code = main(["--strategy", "trend", "--set", "trend=20:60:20", "--workers", "0",
+                     "--output", output, "--top", "2"], store=store)
+    text = stdout.getvalue()
+    assert code == 0
+    assert "依 sharpe 排名 (前 2 / 3 組)" in text
+    snippet = text.split("config.py 設定片段:")[1]
+    assert "EMA_MEDIUM = " in snippet and 'BACKTEST_STRATEGY = "trend"' in snippet
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert main(["--asset", "Crypto", "--workers", "0", "--output", output], store=store) == 1
+        with pytest.raises(SystemExit):
+            main(["--set", "unknown=1"], store=store)
+    print("  ✅ 排名表與 config.py 設定片段")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
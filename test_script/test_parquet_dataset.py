@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+分區 Parquet 資料集測試 (Partitioned Parquet Dataset Test)
+驗證 <asset_type>/<symbol>/<year>.parquet 分區、日期範圍 / 欄位投影 / 最後 N 根讀取，
+以及「最後 N 根」只解碼最後幾個 row group。
+"""
+
+import sys
+import os
+import tempfile
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=os.path.join(tmp, "market_data"))
+        yield store
+        store.db.engine.dispose()
+
+
+def test_partition_layout_and_full_roundtrip(store, ohlcv):
+    df = ohlcv("TSLA", bars=20 * 365)
+    store.save_market_data(df, "TSLA", "Stock")
+
+    symbol_dir = os.path.join(store.market_data_dir, "stock", "TSLA")
+    assert store.get_market_data_path("TSLA") == symbol_dir
+    years = sorted(int(name.split(".")[0]) for name in os.listdir(symbol_dir))
+    assert years == sorted(set(df.index.year))
+
+    store.frame_cache.clear()
+    pd.testing.assert_frame_equal(store.load_market_data("TSLA"), df, check_freq=False)
+
+    # 以較短的序列取代 (例如分割後完整重新同步)：舊年份要一併移除
+    store.save_market_data(df.iloc[-300:], "TSLA", "Stock")
+    assert len(os.listdir(symbol_dir)) == len(set(df.index[-300:].year))
+    print("  ✅ 分區寫入與讀回")
+
+
+def test_incremental_write_only_touches_changed_years(store, ohlcv):
+    df = ohlcv("TSLA", bars=3 * 365)
+    store.save_market_data(df, "TSLA", "Stock")
+    symbol_dir = os.path.join(store.market_data_dir, "stock", "TSLA")
+    mtimes = {name: os.stat(os.path.join(symbol_dir, name)).st_mtime_ns for name in os.listdir(symbol_dir)}
+
+    # 新增一根 K 棒 (跨到新年份)，重疊區從 12 月開始
+    new_bar = df.iloc[[-1]].set_axis(pd.DatetimeIndex([pd.Timestamp("2025-01-02")], name="Date"))
+    merged = pd.concat([df, new_bar])
+    store.save_market_data(merged, "TSLA", "Stock", since=pd.Timestamp("2024-12-20"))
+
+    after = {name: os.stat(os.path.join(symbol_dir, name)).st_mtime_ns for name in os.listdir(symbol_dir)}
+    assert sorted(after) == ["2022.parquet", "2023.parquet", "2024.parquet", "2025.parquet"]
+    assert after["2022.parquet"] == mtimes["2022.parquet"] and after["2023.parquet"] == mtimes["2023.parquet"]
+
+    store.frame_cache.clear()
+    pd.testing.assert_frame_equal(store.market_data.read("TSLA", "Stock"), merged, check_freq=False)
+    print("  ✅ 增量寫入只重寫變動的年份")
+
+
+def test_range_projection_and_tail_reads(store, ohlcv):
+    df = ohlcv("TSLA", bars=20 * 365)
+    store.save_market_data(df, "TSLA", "Stock")
+    store.frame_cache.clear()
+
+    ranged = store.load_market_data("TSLA", start="2015-03-01", end="2016-06-30", columns=["Close"])
+    expected = df.loc["2015-03-01":"2016-06-30", ["Close"]]
+    pd.testing.assert_frame_equal(ranged, expected, check_freq=False)
+
+    tail = store.load_market_data("TSLA", "Stock", last_n=300)
+    pd.testing.assert_frame_equal(tail, df.iloc[-300:], check_freq=False)
+
+    tail_before = store.load_market_data("TSLA", last_n=50, end="2020-01-15", columns=["Close"])
+    pd.testing.assert_frame_equal(tail_before, df.loc[:"2020-01-15", ["Close"]].iloc[-50:], check_freq=False)
+
+    # L1 命中時以記憶體切片回傳相同結果
+    store.load_market_data("TSLA")
+    pd.testing.assert_frame_equal(store.load_market_data("TSLA", last_n=300), tail, check_freq=False)
+
+
+def test_tail_read_decodes_only_last_row_groups(store, ohlcv, monkeypatch):
+    from investment_bot.config import Config
+
+    df = ohlcv("BTC", bars=20 * 365)
+    store.save_market_data(df, "BTC", "Crypto")
+    store.frame_cache.clear()
+
+    reads = []
+    original = pq.ParquetFile.read_row_group
+    monkeypatch.setattr(pq.ParquetFile, "read_row_group",
+                        lambda self, i, *args, **kwargs: reads.append(i) or original(self, i, *args, **kwargs))
+
+    tail = store.load_market_data("BTC", "Crypto", last_n=300, columns=["Close"])
+    assert len(tail) == 300
+    # 300 根最多跨兩個年份檔案 (各自最後一個 row group 可能不滿)，只讀取最後幾個 row group
+    assert len(reads) <= -(-300 // Config.MARKET_DATA_ROW_GROUP_SIZE) + 2
+    print(f"  ✅ 最後 300 根只讀取 {len(reads)} 個 row group (共 {len(df) // Config.MARKET_DATA_ROW_GROUP_SIZE}+ 個)")
+
+
+def test_legacy_flat_file_is_migrated(store, ohlcv):
+    df = ohlcv("ETH", bars=365)
+    df.to_parquet(os.path.join(store.market_data_dir, "ETH.parquet"))
+
+    loaded = store.load_market_data("ETH", "Crypto")
+    pd.testing.assert_frame_equal(loaded, df, check_freq=False)
+    assert not os.path.exists(os.path.join(store.market_data_dir, "ETH.parquet"))
+    assert os.path.isdir(os.path.join(store.market_data_dir, "crypto", "ETH"))
+
+
+def test_read_panel(store, ohlcv):
+    df = ohlcv("TSLA", bars=3 * 365)
+    store.save_market_data_many({"TSLA": df, "NVDA": df.iloc[100:] * 2}, "Stock")
+    store.save_market_data(df.iloc[-10:].tz_localize("UTC"), "BTC/USDT", "Crypto")
+
+    panel = store.market_data.read_panel("Stock")
+    assert list(panel.columns) == ["NVDA", "TSLA"]
+    pd.testing.assert_series_equal(panel["TSLA"], df["Close"], check_names=False, check_freq=False)
+    assert panel["NVDA"].isna().sum() == 100
+
+    window = store.market_data.read_panel("Stock", symbols=["TSLA", "AAPL"], start="2024-03-01", end="2024-03-31")
+    assert list(window.columns) == ["TSLA"] and window.index.min() >= pd.Timestamp("2024-03-01")
+    pd.testing.assert_series_equal(window["TSLA"], df.loc["2024-03", "Close"], check_names=False, check_freq=False)
+
+    crypto = store.market_data.read_panel("Crypto", symbols=["BTC/USDT"])
+    assert list(crypto.columns) == ["BTC/USDT"] and str(crypto.index.tz) == "UTC" and len(crypto) == 10
+    assert store.market_data.read_panel("Crypto", symbols=["ETH"]).empty
+    print("  ✅ 多標的寬表讀取")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q", "-s"]))
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+並行流程測試 (Pipeline Concurrency Test)
+使用假的 MarketDataService (離線、無 API)，驗證並行模式與序列模式結果一致，
+且單一標的失敗不影響其他標的。
+"""
+
+import sys
+import os
+import time
+import pandas as pd
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+class FakeMarketService:
+    """模擬網路延遲與失敗的市場數據服務 (K 線由 ohlcv fixture 產生)"""
+    def __init__(self, ohlcv, failing=(), empty=()):
+        self.ohlcv = ohlcv
+        self.failing = set(failing)
+        self.empty = set(empty)
+
+    def get_historical_data(self, symbol, asset_type, days=200):
+        # 讓前面的標的比較慢完成，確保組裝順序不是依完成順序
+        time.sleep(0.05 if symbol.endswith("0") else 0.01)
+        if symbol in self.failing:
+            raise RuntimeError("boom")
+        if symbol in self.empty:
+            return pd.DataFrame()
+        return self.ohlcv(symbol)
+
+    def get_historical_data_many(self, symbols, asset_type='Stock', days=200):
+        # 批次 API：任一標的失敗只讓該標的回傳空 DataFrame
+        results = {}
+        for symbol in symbols:
+            try:
+                results[symbol] = self.get_historical_data(symbol, asset_type, days)
+            except RuntimeError:
+                results[symbol] = pd.DataFrame()
+        return results
+
+
+class FakeTAService:
+    def analyze(self, df, asset_type, symbol=None):
+        from investment_bot.services.tech_analysis import compute_signals
+        return compute_signals(df, asset_type, symbol)
+
+
+def test_concurrent_matches_sequential(ohlcv):
+    from investment_bot.main import analyze_holdings_concurrent, analyze_holdings_sequential
+
+    holdings = [(f"SYM{i}", "Crypto" if i % 3 == 0 else "Stock", 1.0, 10.0) for i in range(12)]
+    market = FakeMarketService(ohlcv, failing={"SYM3", "SYM4"}, empty={"SYM7"})
+
+    sequential = analyze_holdings_sequential(holdings, market, FakeTAService())
+    concurrent = analyze_holdings_concurrent(holdings, market, fetch_workers=4, ta_workers=2, timeout=60)
+
+    assert list(sorted(concurrent)) == list(range(len(holdings)))
+    for idx in range(len(holdings)):
+        seq_analysis, seq_reason = sequential[idx]
+        con_analysis, con_reason = concurrent[idx]
+        assert seq_analysis == con_analysis, holdings[idx][0]
+        assert (seq_reason is None) == (con_reason is None)
+
+    assert concurrent[3][0] is None and concurrent[4][0] is None
+    assert concurrent[7] == (None, "no_data")
+    print("  ✅ 並行與序列結果一致，失敗標的已隔離")
+
+
+def test_concurrent_inline_ta(ohlcv):
+    """PIPELINE_TA_WORKERS=0 時不開 Process Pool"""
+    from investment_bot.main import analyze_holdings_concurrent
+
+    holdings = [("AAA0", "Stock", 1.0, 1.0), ("BBB1", "Crypto", 2.0, 1.0)]
+    outcomes = analyze_holdings_concurrent(holdings, FakeMarketService(ohlcv), fetch_workers=2, ta_workers=0, timeout=60)
+    assert all(analysis for analysis, _ in outcomes.values())
+
+
+def test_failed_batch_retries_symbols_individually(ohlcv, monkeypatch):
+    """批次 API 因單一標的拋出例外時逐檔重試，只有該標的失敗"""
+    from investment_bot.config import Config
+    from investment_bot.main import analyze_holdings_concurrent
+
+    class BatchRaisingMarket(FakeMarketService):
+        def __init__(self):
+            super().__init__(ohlcv, failing={"SYM3"})
+            self.batches = []
+
+        def get_historical_data_many(self, symbols, asset_type='Stock', days=200):
+            self.batches.append(list(symbols))
+            if "SYM3" in symbols:
+                raise RuntimeError("batch boom")
+            return super().get_historical_data_many(symbols, asset_type, days)
+
+    monkeypatch.setattr(Config, "PIPELINE_STREAM_CHUNK_SIZE", 3)
+    holdings = [(f"SYM{i}", "Stock", 1.0, 10.0) for i in range(8)]
+    market = BatchRaisingMarket()
+    outcomes = analyze_holdings_concurrent(holdings, market, fetch_workers=3, ta_workers=0, timeout=60)
+
+    assert sorted(map(len, market.batches)) == [2, 3, 3]  # 預設即分批抓取
+    assert outcomes[3][0] is None and outcomes[3][1].startswith("抓取錯誤")
+    assert all(outcomes[idx][0] for idx in range(len(holdings)) if idx != 3)
+    print("  ✅ 批次失敗時逐檔重試，只有失敗的標的受影響")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+持倉快照與歷史查詢測試 (Portfolio Snapshot & History Test)
+驗證快照的批次寫入、(symbol, date) 複合索引 (含舊資料庫遷移)，
+以及 get_portfolio_history 以單一查詢回傳一年份的市值、損益與權重。
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import event
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+        yield store
+        store.db.engine.dispose()
+
+
+def _portfolio(scale=1.0):
+    return pd.DataFrame({
+        "Symbol": pd.Categorical(["TSLA", "NVDA", "BTC"]),
+        "Type": ["Stock", "Stock", "Crypto"],
+        "Qty": [10, 5, 0.5],
+        "Cost": [200.0, 400.0, 30000.0],
+        "MarketPrice": [250.0 * scale, 800.0 * scale, 60000.0 * scale],
+        "UnrealizedPL": [500.0, 2000.0, 15000.0],
+        "ReturnRate": [0.25, 1.0, 1.0],
+    })
+
+
+def test_bulk_snapshot_insert(store):
+    store.save_portfolio_snapshot(_portfolio(), "2024-01-01")
+    store.save_portfolio_snapshot(_portfolio(2.0), "2024-01-01")  # 同日重寫取代舊快照
+
+    table = store.db.portfolio_snapshots
+    with store.db.engine.connect() as conn:
+        rows = conn.execute(table.select().order_by(table.c.id)).fetchall()
+    assert [(r.date, r.symbol, r.asset_type) for r in rows] == [
+        ("2024-01-01", "TSLA", "Stock"), ("2024-01-01", "NVDA", "Stock"), ("2024-01-01", "BTC", "Crypto")]
+    assert [r.market_value for r in rows] == [5000.0, 8000.0, 60000.0]
+    assert [r.cost_basis for r in rows] == [200.0, 400.0, 30000.0]
+    assert all(r.created_at is not None for r in rows)
+    print("  ✅ 快照批次寫入")
+
+
+def test_history_is_a_single_query(store):
+    dates = pd.date_range("2023-01-01", periods=365, freq="D").strftime("%Y-%m-%d")
+    for i, date_str in enumerate(dates):
+        store.save_portfolio_snapshot(_portfolio(1 + i / 365), date_str)
+
+    queries = []
+    listener = lambda *args: queries.append(args[2])
+    event.listen(store.db.engine, "before_cursor_execute", listener)
+    try:
+        history = store.get_portfolio_history()
+    finally:
+        event.remove(store.db.engine, "before_cursor_execute", listener)
+
+    assert len(queries) == 1
+    assert len(history) == 365 and isinstance(history.index, pd.DatetimeIndex)
+    assert list(history["portfolio"].columns) == ["market_value", "cost_basis", "unrealized_pl", "return_rate"]
+    first = history.iloc[0]
+    assert first[("portfolio", "market_value")] == 2500.0 + 4000.0 + 30000.0
+    assert first[("portfolio", "cost_basis")] == 2000.0 + 2000.0 + 15000.0
+    assert first[("portfolio", "return_rate")] == pytest.approx(17500.0 / 19000.0)
+    np.testing.assert_allclose(history["weight"].sum(axis=1), 1.0)
+    assert sorted(history["weight"].columns) == ["BTC", "NVDA", "TSLA"]
+
+    window = store.get_portfolio_history(start="2023-03-01", end="2023-03-31", symbols=["TSLA", "NVDA"])
+    assert len(window) == 31 and list(window["weight"].columns) == ["NVDA", "TSLA"]
+    assert window.iloc[0][("weight", "TSLA")] == pytest.approx(2500.0 / 6500.0, rel=1e-2)
+    assert store.get_portfolio_history(start="2030-01-01").empty
+    print("  ✅ 一年份歷史以單一查詢取得")
+
+
+def test_composite_index_added_to_legacy_database():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE portfolio_snapshots (id INTEGER PRIMARY KEY, date VARCHAR NOT NULL, "
+                     "symbol VARCHAR NOT NULL, asset_type VARCHAR NOT NULL, qty FLOAT, cost_basis FLOAT, "
+                     "market_price FLOAT, market_value FLOAT, unrealized_pl FLOAT, return_rate FLOAT, "
+                     "created_at DATETIME)")
+        conn.commit()
+        conn.close()
+
+        store = DataStore(db_path=db_path, market_data_dir=tmp)
+        conn = sqlite3.connect(db_path)
+        indexes = {row[1] for row in conn.execute("PRAGMA index_list(portfolio_snapshots)")}
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM portfolio_snapshots WHERE symbol = 'TSLA' AND date >= '2024-01-01'"))
+        conn.close()
+        store.db.engine.dispose()
+    assert {"idx_portfolio_date", "idx_portfolio_symbol_date"} <= indexes
+    assert "idx_portfolio_symbol_date" in plan
+    print("  ✅ 舊資料庫補上 (symbol, date) 複合索引")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+全市場掃描測試 (Universe Screener Test)
+驗證標的池解析 (txt / csv / binance:USDT)、bounded heap 的 Top-K、
+串流分批掃描的榜單與逐檔 compute_signals 完整排序後的結果一致，
+以及同時在途的批次數不超過 workers。
+"""
+
+import sys
+import os
+import io
+import tempfile
+import threading
+import contextlib
+import numpy as np
+import pytest
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from fakes import synthetic_ohlcv, stock_symbols, offline_environment, CRYPTO_SYMBOLS
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "screen.db"), market_data_dir=os.path.join(tmp, "market_data"))
+        store.tmp = tmp
+        yield store
+        store.db.engine.dispose()
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+    return path
+
+
+def _expected(frames_by_type, top_k):
+    """逐檔計算後完整排序 (對照組)"""
+    from investment_bot.services.tech_analysis import compute_signals
+
+    rows = []
+    for asset_type, frames in frames_by_type.items():
+        for symbol, df in frames.items():
+            signal = compute_signals(df, asset_type, symbol)
+            previous = compute_signals(df.iloc[:-1], asset_type, symbol)
+            if signal:
+                flipped = previous is not None and previous["trend"] != signal["trend"]
+                rows.append((symbol, signal["rsi"], flipped))
+    by_rsi = sorted(rows, key=lambda r: r[1])
+    return ([r[0] for r in by_rsi[:top_k]], [r[0] for r in by_rsi[::-1][:top_k]],
+            {r[0] for r in rows if r[2]})
+
+
+def _check_rankings(result, frames_by_type, top_k):
+    oversold, overbought, flipped = _expected(frames_by_type, top_k)
+    assert [c["symbol"] for c in result["oversold"]] == oversold
+    assert [c["symbol"] for c in result["overbought"]] == overbought
+    assert {c["symbol"] for c in result["trend_flip"]} <= flipped
+    assert len(result["trend_flip"]) == min(top_k, len(flipped))
+    distances = [abs(c["trend_distance"]) for c in result["trend_flip"]]
+    assert distances == sorted(distances, reverse=True)
+
+
+def test_top_k_keeps_best_scores():
+    from investment_bot.services.screener import TopK
+
+    values = np.random.default_rng(0).normal(size=1000)
+    top = TopK(10)
+    for i, value in enumerate(values):
+        top.push(value, i)
+    assert len(top) == 10
+    assert top.items() == list(np.argsort(-values)[:10])
+
+    # 同分時先進入的保留
+    ties = TopK(2)
+    for name in ["a", "b", "c"]:
+        ties.push(1.0, name)
+    assert ties.items() == ["a", "b"]
+    assert TopK(0).push(1.0, "x") is False
+    print("  ✅ bounded heap 只保留分數最高的 K 筆")
+
+
+def test_universe_parsing(store):
+    from investment_bot.services.screener import iter_universe, iter_chunks
+
+    txt = _write(os.path.join(store.tmp, "universe.txt"),
+                 "# S&P 500\nAAPL, msft\nBTC\nETH/USDT\nETH/BTC  # 非 USDT\n\nAAPL\n")
+    assert list(iter_universe(txt)) == [("AAPL", "Stock"), ("MSFT", "Stock"), ("BTC", "Crypto"), ("ETH", "Crypto")]
+    assert list(iter_universe(txt, "Stock"))[2] == ("BTC", "Stock")
+
+    csv_path = _write(os.path.join(store.tmp, "universe.csv"), "Ticker,Name,Type\nTSLA,Tesla,\nDOGE,Dogecoin,crypto\n")
+    assert list(iter_universe(csv_path)) == [("TSLA", "Stock"), ("DOGE", "Crypto")]
+    with pytest.raises(ValueError):
+        list(iter_universe(_write(os.path.join(store.tmp, "bad.csv"), "Name\nTesla\n")))
+
+    with offline_environment([], txt):
+        assert list(iter_universe("binance:USDT")) == sorted((s, "Crypto") for s in CRYPTO_SYMBOLS)
+        with pytest.raises(ValueError):
+            list(iter_universe("binance:BTC"))
+
+    chunks = list(iter_chunks([("A", "Stock"), ("B", "Crypto"), ("C", "Stock"), ("D", "Stock")], 2))
+    assert chunks == [("Stock", ["A", "C"]), ("Crypto", ["B"]), ("Stock", ["D"])]
+    print("  ✅ 標的池解析 (txt / csv / binance:USDT)")
+
+
+def test_fetch_mode_matches_full_ranking(store):
+    from investment_bot.services.screener import ScreenerService, iter_universe
+
+    symbols = stock_symbols(60)
+    universe = _write(os.path.join(store.tmp, "universe.txt"), "\n".join(symbols + CRYPTO_SYMBOLS))
+    with offline_environment([], universe):
+        service = ScreenerService(store=store)
+        result = service.screen(iter_universe(universe), top_k=5, chunk_size=16, workers=3)
+        # 對照組使用相同的 K 線 (第二次讀取命中今日的新鮮快取)
+        frames = {asset_type: {s: df for s, df in service.market_service.get_historical_data_many(group, asset_type).items()}
+                  for asset_type, group in [("Stock", symbols), ("Crypto", CRYPTO_SYMBOLS)]}
+
+    assert result["screened"] == len(symbols) + len(CRYPTO_SYMBOLS) and result["skipped"] == 0
+    _check_rankings(result, frames, 5)
+    assert {c["asset_type"] for c in result["oversold"] + result["overbought"]} <= {"Stock", "Crypto"}
+
+    # 本地資料集模式讀到的是剛才寫入的同一份 K 線
+    local = ScreenerService(store=store).screen([(s, "Stock") for s in symbols], top_k=5,
+                                                source="local", chunk_size=7, workers=2)
+    _check_rankings(local, {"Stock": frames["Stock"]}, 5)
+    print("  ✅ 串流分批的榜單與逐檔完整排序一致")
+
+
+def test_local_mode_and_cli(store):
+    from investment_bot.services.screener import main
+
+    symbols = stock_symbols(12)
+    store.save_market_data_many({s: synthetic_ohlcv(s) for s in symbols}, "Stock")
+    store.save_market_data(synthetic_ohlcv("NEW", bars=10), "NEW", "Stock")  # 數據不足
+    universe = _write(os.path.join(store.tmp, "universe.txt"), ",".join(symbols + ["NEW", "MISSING"]))
+
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout):
+        assert main([universe, "--local", "--top", "3", "--chunk-size", "5"], store=store) == 0
+        assert main([os.path.join(store.tmp, "none.txt")], store=store) == 1
+    text = stdout.getvalue()
+    assert "掃描 12 檔 (數據不足或抓取失敗 2 檔)" in text
+    assert "最超賣 (RSI 低) 前 3" in text and "趨勢翻轉" in text
+    print("  ✅ 本地資料集掃描與 CLI 輸出")
+
+
+def test_in_flight_chunks_bounded(store):
+    from investment_bot.services.screener import ScreenerService
+
+    lock = threading.Lock()
+    state = {"active": 0, "peak": 0, "read": 0, "calls": 0}
+
+    def universe():
+        for symbol in stock_symbols(40):
+            state["read"] += 1
+            yield symbol, "Stock"
+
+    class SlowMarket:
+        def get_historical_data_many(self, symbols, asset_type, days=200):
+            with lock:
+                state["active"] += 1
+                state["calls"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                # 已完成的批次少於已開始的批次，標的池最多只比它多讀取 workers 批
+                state["ok"] = state.get("ok", True) and state["read"] <= (state["calls"] - 1 + 2) * 4
+            threading.Event().wait(0.01)
+            with lock:
+                state["active"] -= 1
+            return {s: synthetic_ohlcv(s, bars=60) for s in symbols}
+
+    result = ScreenerService(store=store, market_service=SlowMarket()).screen(
+        universe(), top_k=3, chunk_size=4, workers=2)
+    assert state["peak"] <= 2 and state["ok"] and result["screened"] == 40
+    print(f"  ✅ 同時在途批次 {state['peak']} <= workers")
+
+
+def test_concurrent_crypto_chunks_respect_binance_limits(store):
+    import time
+    from investment_bot.services.screener import ScreenerService
+    from investment_bot.services.market_data import MarketDataService
+    from investment_bot.services.crypto_async import AsyncCryptoDataService
+    from investment_bot.utils.rate_limiter import AsyncTokenBucket, binance_klines_weight
+
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0, "calls": []}
+
+    class FakeAsyncExchange:
+        """多個執行緒 (各自的 event loop) 共用的假交易所"""
+        async def fetch_ohlcv(self, pair, timeframe, since=None, limit=None):
+            import asyncio
+            with lock:
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+                state["calls"].append((time.monotonic(), binance_klines_weight(limit)))
+            try:
+                await asyncio.sleep(0.005)
+                start = int(time.time() // 86_400 - 59) * 86_400_000
+                return [[start + i * 86_400_000, 1.0, 2.0, 0.5, 1.0 + (i % 7) * 0.1, 10.0] for i in range(60)]
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+        async def close(self):
+            pass
+
+    capacity, refill = 10, 200.0
+    exchange = FakeAsyncExchange()
+    market = MarketDataService(store=store)
+    market.async_crypto = AsyncCryptoDataService(exchange_factory=lambda: exchange, max_concurrency=2,
+                                                 limiter=AsyncTokenBucket(capacity, refill))
+
+    symbols = [f"C{i}" for i in range(24)]
+    began = time.monotonic()
+    result = ScreenerService(store=store, market_service=market).screen(
+        [(s, "Crypto") for s in symbols], top_k=3, chunk_size=4, workers=4)
+
+    assert result["screened"] == len(symbols)
+    # 4 個批次同時在途，但在途請求數仍不超過單一 loop 的 max_concurrency
+    assert len(state["calls"]) == len(symbols) and state["peak"] <= 2
+    # 任一時間點累計的權重不超過 容量 + 補充速率 x 經過時間
+    used = 0
+    for at, weight in sorted(state["calls"]):
+        used += weight
+        assert used <= capacity + refill * (at - began) + 1e-6
+    print(f"  ✅ 加密貨幣批次並行時在途請求 {state['peak']}、權重限制仍生效")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
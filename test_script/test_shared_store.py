@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+共用儲存層測試 (Shared Store Test)
+驗證同一資料庫路徑在行程內只建立一個 Engine、Schema 只建立一次，
+Service 可注入 Store，且多執行緒並行寫入不會發生鎖衝突。
+"""
+
+import sys
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+def test_single_engine_and_manager_per_path():
+    from investment_bot.utils.data_store import DataStore
+    from investment_bot.utils.db_manager import get_engine
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "investment.db")
+        market_dir = os.path.join(tmp, "market_data")
+
+        store_a = DataStore(db_path=db_path, market_data_dir=market_dir)
+        store_b = DataStore(db_path=db_path, market_data_dir=market_dir)
+
+        assert store_a.db is store_b.db
+        assert store_a.db.engine is get_engine(db_path)
+        store_a.db.engine.dispose()
+    print("  ✅ 同一路徑共用 DBManager / Engine")
+
+
+def test_services_share_injected_store():
+    from investment_bot.utils.data_store import DataStore
+    from investment_bot.services.market_data import MarketDataService
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "x.db"), market_data_dir=tmp)
+        assert MarketDataService(store=store).store is store
+        assert TechnicalAnalysisService(store=store).store is store
+        store.db.engine.dispose()
+
+
+def test_parallel_writes_do_not_lock():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+
+        def write(i):
+            store.set_cache(f"key_{i}", {"i": i})
+            return store.get_cache(f"key_{i}")
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(write, range(64)))
+
+        assert results == [{"i": i} for i in range(64)]
+        store.db.engine.dispose()
+    print("  ✅ 並行寫入無鎖衝突")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Google Sheet 批次讀取測試 (Sheet batchGet & Change Detection Test)
+以 benchmarks/fakes.py 的 FakeSheetsAPI (stub discovery client) 驗證：
+- 同一個 spreadsheet 的所有 range 只發一次 values().batchGet
+- Range 錯誤時讀一次頁簽清單並改用第一個頁簽重試
+- 原始表格未變動時略過解析、快照寫入與持倉快取重寫；變動時重新解析
+"""
+
+import sys
+import os
+import tempfile
+
+# Ensure investment_bot and benchmarks can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+for path in (project_root, os.path.join(project_root, "benchmarks")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import pandas as pd
+from fakes import FakeSheetsAPI, sheet_values
+
+STOCKS = ["TSLA", "NVDA", "AAPL"]
+CRYPTO = [["token", "總數量", "每顆成本", "目前價格", "損益"], ["BTC", "0.5", "$30,000", "$65,000", "$17,500"]]
+
+
+def _service(tmp, monkeypatch, api, sources=""):
+    from investment_bot.config import Config
+    from investment_bot.utils.data_store import DataStore
+    from investment_bot.services.google_sheet import GoogleSheetService
+
+    monkeypatch.setattr(Config, "GOOGLE_SHEET_ID_STOCK", "stock-sheet")
+    monkeypatch.setattr(Config, "GOOGLE_SHEET_ID_CRYPTO", "crypto-sheet")
+    monkeypatch.setattr(Config, "GOOGLE_SHEET_SOURCES", sources)
+    monkeypatch.setattr(Config, "GOOGLE_SHEET_CHANGE_DETECTION", True)
+    monkeypatch.setattr(Config, "COMPACT_FRAMES", False)
+    store = DataStore(db_path=os.path.join(tmp, "sheet.db"), market_data_dir=os.path.join(tmp, "market_data"))
+    service = GoogleSheetService(store=store)
+    service.service = api
+    return service
+
+
+def _methods(api):
+    return [method for method, _, _ in api.calls]
+
+
+def test_single_batch_get_per_spreadsheet(monkeypatch):
+    api = FakeSheetsAPI({"stock-sheet": sheet_values(STOCKS), "crypto-sheet": CRYPTO})
+    with tempfile.TemporaryDirectory() as tmp:
+        # 額外來源與美股在同一個 spreadsheet：與美股的 range 合併成同一次 batchGet
+        service = _service(tmp, monkeypatch, api, sources="stock-sheet|持倉!A:Z")
+        df = service.get_portfolio_data()
+        service.store.db.engine.dispose()
+
+    assert _methods(api) == ["values.batchGet", "values.batchGet"]
+    assert api.calls[0][2] == ["總損益!A:Z", "持倉!A:Z"]
+    assert sorted(df['Symbol']) == sorted(STOCKS * 2 + ["BTC"])
+    assert set(df.loc[df['Symbol'] == "BTC", 'Type']) == {"Crypto"}
+    print("  ✅ 每個 spreadsheet 一次 batchGet")
+
+
+def test_range_error_falls_back_to_first_tab(monkeypatch):
+    api = FakeSheetsAPI({"stock-sheet": sheet_values(STOCKS)}, tabs={"stock-sheet": ["工作表1"]})
+    with tempfile.TemporaryDirectory() as tmp:
+        service = _service(tmp, monkeypatch, api)
+        service.crypto_sheet_id = None
+        df = service.get_portfolio_data()
+        service.store.db.engine.dispose()
+
+    assert _methods(api) == ["values.batchGet", "get", "values.batchGet"]
+    assert api.calls[2][2] == ["工作表1!A:Z"]
+    assert sorted(df['Symbol']) == sorted(STOCKS)
+    print("  ✅ Range 錯誤改讀第一個頁簽")
+
+
+def test_vectorized_normalization():
+    from investment_bot.services.google_sheet import GoogleSheetService
+
+    stock = [
+        ["stock", "總數量", "每股成本", "目前價格", "損益", "獲益率"],
+        ["TSLA", "1,000", "$200.50", "$250", "$49,500", "24.7%"],
+        ["", "1", "1", "1", "1", "1%"],             # 沒有代號的列被移除
+        [" btc ", "abc", "$1", "$2", "$1", ""],      # 無法解析 / 空白補 0，代號不分大小寫
+        ["NVDA", "5", "$400"],                       # API 省略尾端空白儲存格
+    ]
+    crypto = [
+        ["token", "總數量", "每顆成本", "目前價格", "損益", "總投入USDT"],
+        ["ETH", "2", "$2,000", "$3,000", "$2,000", "4000"],
+        ["SOL", "10", "$0", "$150", "$1,500", "0"],  # 成本為 0 時 ReturnRate 為 0
+    ]
+    service = GoogleSheetService.__new__(GoogleSheetService)
+    stock_df, crypto_df = service._parse_sheet(stock, "美股"), service._parse_sheet(crypto, "加密貨幣")
+
+    assert list(stock_df['Symbol']) == ["TSLA", " btc ", "NVDA"]
+    assert list(stock_df['Qty']) == [1000.0, 0.0, 5.0]
+    assert list(stock_df['MarketPrice']) == [250.0, 2.0, 0.0]
+    assert abs(stock_df['ReturnRate'].iloc[0] - 0.247) < 1e-12 and stock_df['ReturnRate'].iloc[1] == 0
+    assert list(stock_df['Type']) == ["Stock", "Crypto", "Stock"]
+    assert list(crypto_df['ReturnRate']) == [0.5, 0.0]
+    assert set(crypto_df['Type']) == {"Crypto"}
+
+    merged = GoogleSheetService._merge_frames([stock_df, crypto_df])
+    assert len(merged) == 5 and list(merged.index) == list(range(5))
+    assert list(merged['TotalCost']) == [0, 0, 0, 4000.0, 0.0]
+    print("  ✅ 向量化標準化與合併")
+
+
+def test_percent_only_stripped_from_return_rate():
+    from investment_bot.services.google_sheet import GoogleSheetService
+
+    stock = [
+        ["stock", "總數量", "每股成本", "目前價格", "損益", "獲益率"],
+        ["TSLA", "5%", "$200", "$250", "$250", " 25% "],
+        ["NVDA", "2", "$400", "$300", "$-200", "$5"],
+    ]
+    service = GoogleSheetService.__new__(GoogleSheetService)
+    df = service._parse_sheet(stock, "美股")
+
+    # 數量等金額欄位的 "5%" 視為無法解析 (補 0)，不會被當成 5
+    assert list(df['Qty']) == [0.0, 2.0]
+    assert list(df['ReturnRate']) == [0.25, 0.0]
+
+
+def test_unchanged_sheet_skips_parse_and_writes(monkeypatch):
+    from investment_bot.services.google_sheet import PORTFOLIO_CACHE_KEY
+
+    api = FakeSheetsAPI({"stock-sheet": sheet_values(STOCKS), "crypto-sheet": CRYPTO})
+    with tempfile.TemporaryDirectory() as tmp:
+        service = _service(tmp, monkeypatch, api)
+        first = service.get_portfolio_data()
+
+        # 持倉快取過期 (列仍在 SQLite 中)，下一次會重新讀取 Sheet
+        service.store.refresh_cache_ttl(PORTFOLIO_CACHE_KEY, ttl_minutes=-1)
+        assert service.store.get_cache(PORTFOLIO_CACHE_KEY) is None
+
+        writes = []
+        monkeypatch.setattr(service, "_parse_sheet", lambda *a, **k: (_ for _ in ()).throw(AssertionError("parsed")))
+        monkeypatch.setattr(service.store, "save_portfolio_snapshot", lambda *a, **k: writes.append("snapshot"))
+        original_set_cache = service.store.set_cache
+        monkeypatch.setattr(service.store, "set_cache",
+                            lambda key, *a, **k: (writes.append(key), original_set_cache(key, *a, **k)))
+        second = service.get_portfolio_data()
+
+        assert writes == []
+        assert service.store.get_cache(PORTFOLIO_CACHE_KEY) is not None  # TTL 已延長
+        pd.testing.assert_frame_equal(second, first)
+        assert _methods(api).count("values.batchGet") == 4
+        service.store.db.engine.dispose()
+    print("  ✅ 表格未變動時略過解析、快照與快取重寫")
+
+
+def test_changed_sheet_is_reparsed(monkeypatch):
+    from investment_bot.services.google_sheet import PORTFOLIO_CACHE_KEY
+
+    api = FakeSheetsAPI({"stock-sheet": sheet_values(STOCKS), "crypto-sheet": CRYPTO})
+    with tempfile.TemporaryDirectory() as tmp:
+        service = _service(tmp, monkeypatch, api)
+        service.get_portfolio_data()
+        service.store.refresh_cache_ttl(PORTFOLIO_CACHE_KEY, ttl_minutes=-1)
+
+        api.values_by_sheet["stock-sheet"] = sheet_values(STOCKS + ["MSFT"])
+        snapshots = []
+        original_snapshot = service.store.save_portfolio_snapshot
+        monkeypatch.setattr(service.store, "save_portfolio_snapshot",
+                            lambda df, date_str: (snapshots.append(len(df)), original_snapshot(df, date_str)))
+        df = service.get_portfolio_data()
+        service.store.db.engine.dispose()
+
+    assert "MSFT" in set(df['Symbol'])
+    assert snapshots == [len(STOCKS) + 2]
+    print("  ✅ 表格變動時重新解析")
+
+
+if __name__ == "__main__":
+    import pytest
+    sys.exit(pytest.main([__file__, "-q"]))
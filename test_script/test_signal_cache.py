@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""
+訊號快取測試 (Content-Addressed Signal Cache Test)
+驗證訊號快取以「K 線內容 + 指標參數」為 key：內容或 Config 週期改變即失效，
+且 main 的序列 / 並行流程重跑時會跳過技術分析。
+"""
+
+import sys
+import os
+import tempfile
+import pytest
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from test_pipeline_concurrency import FakeMarketService
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+        yield store
+        store.db.engine.dispose()
+
+
+def test_cache_key_tracks_bars_and_params(ohlcv, monkeypatch):
+    from investment_bot.config import Config
+    from investment_bot.services.indicators import signal_cache_key
+
+    df = ohlcv(1)
+    key = signal_cache_key(df, "Stock")
+    assert key == signal_cache_key(df.copy(), "Stock")
+    assert key != signal_cache_key(df, "Crypto")
+
+    changed = df.copy()
+    changed.iloc[-1, changed.columns.get_loc("Close")] += 0.01  # 盤中最後一根 K 棒更新
+    assert key != signal_cache_key(changed, "Stock")
+
+    monkeypatch.setattr(Config, "RSI_PERIOD_STOCK", 21)
+    assert key != signal_cache_key(df, "Stock")
+
+
+def test_analyze_reuses_signal_until_params_change(store, ohlcv, monkeypatch):
+    from investment_bot.config import Config
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService
+
+    df = ohlcv("TSLA")
+    service = TechnicalAnalysisService(store=store)
+    first = service.analyze(df, "Stock", symbol="TSLA")
+
+    calls = []
+    monkeypatch.setattr(service, "_analyze_incremental", lambda *args: calls.append(args) or first)
+    store.cache.clear()  # 確認 SQLite 層也能命中
+    assert service.analyze(df, "Stock", symbol="TSLA") == first
+    assert calls == []
+
+    monkeypatch.setattr(Config, "RSI_PERIOD_STOCK", 21)
+    service.analyze(df, "Stock", symbol="TSLA")
+    assert len(calls) == 1
+    print("  ✅ 訊號快取依參數指紋失效")
+
+
+def test_main_rerun_skips_ta(store, ohlcv, monkeypatch):
+    from investment_bot import main as main_module
+    from investment_bot.services import tech_analysis
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService, compute_signals_incremental
+
+    holdings = [(f"SYM{i}", "Crypto" if i % 2 else "Stock", 1.0, 10.0) for i in range(6)]
+    market = FakeMarketService(ohlcv)
+    ta_service = TechnicalAnalysisService(store=store)
+
+    computed = []
+    monkeypatch.setattr(tech_analysis, "compute_signals_incremental",
+                        lambda *args: computed.append(args[3]) or compute_signals_incremental(*args))
+
+    first = main_module.analyze_holdings_concurrent(holdings, market, fetch_workers=2, ta_workers=0, timeout=60, ta_service=ta_service)
+    assert len(computed) == len(holdings)
+
+    computed.clear()
+    second = main_module.analyze_holdings_concurrent(holdings, market, fetch_workers=2, ta_workers=0, timeout=60, ta_service=ta_service)
+    assert computed == []
+    for idx in first:
+        for key in ("current_price", "rsi", "trend"):
+            assert second[idx][0][key] == first[idx][0][key]
+
+    # 序列模式共用同一份快取 (帶入 symbol)
+    monkeypatch.setattr(ta_service, "_analyze_incremental", lambda *args: pytest.fail("應命中訊號快取"))
+    sequential = main_module.analyze_holdings_sequential(holdings, market, ta_service)
+    assert all(analysis for analysis, _ in sequential.values())
+    print("  ✅ 重跑時跳過技術分析")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))
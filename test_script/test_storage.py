@@ -34,9 +34,7 @@ def test_storage_integration():
         
         # Force clear cache for test
         print(f"  Clearing cache for {symbol}...")
-        parquet_path = store.get_market_data_path(symbol)
-        if os.path.exists(parquet_path):
-            os.remove(parquet_path)
+        store.delete_market_data(symbol)
         # Clear system cache key
         with store.db.get_connection() as conn:
             from sqlalchemy import text
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite 效能設定測試 (SQLite Storage Profile Test)
+驗證 WAL / PRAGMA、原生 UPSERT 與 Unit of Work 交易行為。
+"""
+
+import sys
+import os
+import tempfile
+import pytest
+from sqlalchemy import text, event
+
+# Ensure investment_bot can be imported
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+
+@pytest.fixture
+def store():
+    from investment_bot.utils.data_store import DataStore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = DataStore(db_path=os.path.join(tmp, "investment.db"), market_data_dir=tmp)
+        yield store
+        store.db.engine.dispose()
+
+
+def make_signal(rsi):
+    return {
+        "current_price": 100.0, "rsi": rsi, "is_overbought": False, "is_oversold": False, "trend": "Bullish",
+        "ema_values": {"fast": 1.0, "mid": 2.0, "slow": 3.0},
+        "macd": {"line": 0.1, "signal": 0.2, "hist": -0.1},
+        "bb": {"upper": 110.0, "lower": 90.0, "pct_b": 0.5},
+    }
+
+
+def test_pragmas_applied(store):
+    with store.db.get_connection() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar().lower() == "wal"
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+    print("  ✅ WAL / synchronous=NORMAL")
+
+
+def test_upsert_updates_in_place(store):
+    store.save_signal("TSLA", "Stock", "2025-01-02", make_signal(40.0))
+    store.save_signal("TSLA", "Stock", "2025-01-02", make_signal(55.0))
+    store.save_sentiment("2025-01-02", {"value": 20, "classification": "Fear"})
+    store.save_sentiment("2025-01-02", {"value": 80, "classification": "Greed"})
+    store.set_cache("k", 1)
+    store.set_cache("k", 2)
+
+    with store.db.get_connection() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM tech_signals")).scalar() == 1
+        assert conn.execute(text("SELECT COUNT(*) FROM market_sentiment")).scalar() == 1
+    assert store.get_signal("TSLA", "2025-01-02")["rsi"] == 55.0
+    assert store.get_sentiment("2025-01-02")["classification"] == "Greed"
+    assert store.get_cache("k") == 2
+    print("  ✅ ON CONFLICT DO UPDATE")
+
+
+def test_transaction_commits_once(store):
+    commits = []
+    event.listen(store.db.engine, "commit", lambda conn: commits.append(1))
+
+    with store.transaction():
+        for i in range(20):
+            store.set_cache(f"key_{i}", i)
+            store.save_sentiment(f"2025-01-{i + 1:02d}", {"value": i, "classification": "x"})
+        # 交易內可以讀到尚未 commit 的寫入
+        assert store.get_cache("key_3") == 3
+
+    assert len(commits) == 1
+    assert store.get_cache("key_19") == 19
+    print("  ✅ Unit of Work 單次 commit")
+
+
+def test_transaction_rolls_back_on_error(store):
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            store.set_cache("rolled_back", 1)
+            with store.transaction():  # 巢狀呼叫併入外層交易
+                store.set_cache("nested", 1)
+            raise RuntimeError("boom")
+
+    assert store.get_cache("rolled_back") is None
+    assert store.get_cache("nested") is None
+
+
+def test_concurrent_pipeline_writes_signals_in_one_transaction(store, ohlcv, monkeypatch):
+    from investment_bot.main import analyze_holdings_concurrent
+    from investment_bot.services.tech_analysis import TechnicalAnalysisService
+    from test_pipeline_concurrency import FakeMarketService
+
+    connections = []
+    original = store.save_signal
+    monkeypatch.setattr(store, "save_signal",
+                        lambda *args: connections.append(store._local.conn) or original(*args))
+
+    holdings = [(f"SYM{i}", "Crypto" if i % 2 else "Stock", 1.0, 10.0) for i in range(6)]
+    outcomes = analyze_holdings_concurrent(holdings, FakeMarketService(ohlcv), fetch_workers=2, ta_workers=0, timeout=60,
+                                           ta_service=TechnicalAnalysisService(store=store))
+
+    assert all(analysis for analysis, _ in outcomes.values())
+    # 所有標的的訊號在分析結束後於同一個交易 (同一條連線) 內寫入
+    assert len(connections) == len(holdings) and connections[0] is not None
+    assert all(conn is connections[0] for conn in connections)
+    assert store.get_indicator_state("SYM0") is not None
+    print("  ✅ 並行流程的訊號批次寫入")
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-q"]))